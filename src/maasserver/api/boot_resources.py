@@ -9,8 +9,8 @@ __all__ = [
     "BootResourceFileUploadHandler",
 ]
 
+import hashlib
 import http.client
-import os
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
@@ -35,6 +35,7 @@ from maasserver.exceptions import (
     MAASAPIValidationError,
 )
 from maasserver.forms import BootResourceForm, BootResourceNoContentForm
+from maasserver.largefilestorage import get_storage
 from maasserver.models import BootResource, BootResourceFile
 from maasserver.utils.orm import post_commit_do
 
@@ -45,6 +46,10 @@ TYPE_MAPPING = {
 }
 
 
+# Read the saved content at 1MiB per chunk when checking it.
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
 # XXX blake_r 2014-09-22 bug=1361370: We currently allow both generated and
 # uploaded resource to be uploaded. This is until the MAAS can generate its
 # own images.
@@ -54,6 +59,20 @@ ALLOW_UPLOAD_RTYPES = [
 ]
 
 
+def is_saved_content_valid(storage, largefile):
+    """Return whether the content saved in `storage` matches the sha256 of
+    `largefile`."""
+    sha256 = hashlib.sha256()
+    offset = 0
+    while offset < largefile.size:
+        data = storage.read(largefile, offset, UPLOAD_CHUNK_SIZE)
+        if len(data) == 0:
+            break
+        sha256.update(data)
+        offset += len(data)
+    return sha256.hexdigest() == largefile.sha256
+
+
 def get_content_parameter(request):
     """Get the "content" parameter from a POST or PUT."""
     content = get_optional_param(request.FILES, "content", None)
@@ -389,24 +408,25 @@ class BootResourceFileUploadHandler(OperationsHandler):
         if rfile.largefile.complete:
             raise MAASAPIBadRequest("Cannot upload to a complete file.")
 
-        with rfile.largefile.content.open("wb") as stream:
-            stream.seek(0, os.SEEK_END)
-
-            # Check that the uploading data will not make the file larger
-            # than expected.
-            current_size = stream.tell()
-            if current_size + size > rfile.largefile.total_size:
-                raise MAASAPIBadRequest("Too much data recieved.")
+        # Check that the uploading data will not make the file larger
+        # than expected.
+        current_size = rfile.largefile.size
+        if current_size + size > rfile.largefile.total_size:
+            raise MAASAPIBadRequest("Too much data recieved.")
 
-            stream.write(data)
-            rfile.largefile.size = current_size + size
-            rfile.largefile.save()
+        storage = get_storage()
+        storage.write(rfile.largefile, current_size, data)
+        rfile.largefile.size = current_size + size
+        rfile.largefile.save()
 
         if rfile.largefile.complete:
-            if not rfile.largefile.valid:
+            # Checked before committing, as content committed to the
+            # filesystem isn't rolled back with the transaction.
+            if not is_saved_content_valid(storage, rfile.largefile):
                 raise MAASAPIBadRequest(
                     "Saved content does not match given SHA256 value."
                 )
+            storage.commit(rfile.largefile)
             # Avoid circular import.
             from maasserver.clusterrpc.boot_images import (
                 RackControllersImporter,
@@ -10,7 +10,7 @@ from maasserver.api.support import admin_method, operation, OperationsHandler
 from maasserver.api.utils import get_optional_param
 from maasserver.exceptions import MAASAPIValidationError
 from maasserver.forms.subnet import SubnetForm
-from maasserver.models import Space, Subnet
+from maasserver.models import Space, Subnet, SubnetStatistics
 from maasserver.permissions import NodePermission
 from provisioningserver.utils.network import IPRangeStatistics
 
@@ -358,6 +358,11 @@ class SubnetHandler(OperationsHandler):
         the suggested gateway and dynamic range for this subnet, if it were to
         be configured. '1' == True, '0' == False.
 
+        @param (int) "cached" [required=false] If '1', returns the statistics
+        stored as the subnet last changed, which may lag behind recent
+        changes, rather than computing them. Ignored if ranges or suggestions
+        are included. '1' == True, '0' == False.
+
         @success (http-status-code) "server-success" 200
         @success (json) "success-json" A JSON object containing the statistics.
         @success-example "success-json" [exkey=subnets-statistics]
@@ -380,6 +385,12 @@ class SubnetHandler(OperationsHandler):
             default=False,
             validator=StringBool,
         )
+        cached = get_optional_param(
+            request.GET, "cached", default=False, validator=StringBool
+        )
+        if cached and not include_ranges and not include_suggestions:
+            statistics = SubnetStatistics.objects.get_statistics([subnet])
+            return statistics[subnet.id].statistics
         full_iprange = subnet.get_iprange_usage()
         statistics = IPRangeStatistics(full_iprange)
         return statistics.render_json(
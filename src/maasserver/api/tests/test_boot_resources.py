@@ -23,9 +23,11 @@ from maasserver.enum import (
     BOOT_RESOURCE_TYPE_CHOICES_DICT,
 )
 from maasserver.fields import LargeObjectFile
+from maasserver.largefilestorage import get_filesystem_storage
 from maasserver.models import BootResource, LargeFile
 from maasserver.testing.api import APITestCase
 from maasserver.testing.architecture import make_usable_architecture
+from maasserver.testing.config import RegionConfigurationFixture
 from maasserver.testing.factory import factory
 from maasserver.utils.converters import json_load_bytes
 from maasserver.utils.orm import post_commit_hooks, reload_object
@@ -517,6 +519,27 @@ class TestBootResourceFileUploadAPI(APITestCase.ForUser):
         )
         self.assertEqual(content, self.read_content(rfile))
 
+    def test_PUT_resource_file_writes_content_to_filesystem(self):
+        prevent_scheduling_of_image_imports(self)
+        self.useFixture(
+            RegionConfigurationFixture(
+                image_storage="filesystem", image_storage_path=self.make_dir()
+            )
+        )
+        self.become_admin()
+        rfile, content = self.make_empty_resource_file()
+        response = self.client.put(
+            self.get_boot_resource_file_upload_uri(rfile), data=content
+        )
+        self.assertEqual(
+            http.client.OK, response.status_code, response.content
+        )
+        storage = get_filesystem_storage()
+        self.assertTrue(storage.has_content(rfile.largefile))
+        with storage.open(rfile.largefile) as stream:
+            self.assertEqual(content, stream.read())
+        self.assertEqual(b"", self.read_content(rfile))
+
     def test_PUT_requires_admin(self):
         rfile, content = self.make_empty_resource_file()
         response = self.client.put(
@@ -553,6 +576,8 @@ class TestBootResourceFileUploadAPI(APITestCase.ForUser):
         rfile, content = self.make_empty_resource_file()
         with rfile.largefile.content.open("wb") as stream:
             stream.write(content)
+        rfile.largefile.size = len(content)
+        rfile.largefile.save()
 
         response = self.client.put(
             self.get_boot_resource_file_upload_uri(rfile), data=content
@@ -583,6 +608,24 @@ class TestBootResourceFileUploadAPI(APITestCase.ForUser):
             http.client.BAD_REQUEST, response.status_code, response.content
         )
 
+    def test_PUT_doesnt_commit_content_not_matching_sha256(self):
+        self.useFixture(
+            RegionConfigurationFixture(
+                image_storage="filesystem", image_storage_path=self.make_dir()
+            )
+        )
+        self.become_admin()
+        rfile, content = self.make_empty_resource_file()
+        content = factory.make_bytes(size=len(content))
+        response = self.client.put(
+            self.get_boot_resource_file_upload_uri(rfile), data=content
+        )
+        self.assertEqual(
+            http.client.BAD_REQUEST, response.status_code, response.content
+        )
+        storage = get_filesystem_storage()
+        self.assertFalse(storage.has_content(rfile.largefile))
+
     def test_PUT_on_complete_calls_clusters_to_import_boot_images(self):
         self.become_admin()
 
@@ -13,6 +13,7 @@ from django.urls import reverse
 from testtools.matchers import Contains, ContainsDict, Equals, HasLength
 
 from maasserver.enum import IPADDRESS_TYPE, NODE_STATUS, RDNS_MODE_CHOICES
+from maasserver.models import SubnetStatistics
 from maasserver.testing.api import APITestCase, explain_unexpected_response
 from maasserver.testing.factory import factory, RANDOM
 from maasserver.utils.orm import reload_object
@@ -693,6 +694,26 @@ class TestSubnetStatisticsAPI(APITestCase.ForUser):
         expected_result = statistics.render_json(include_ranges=False)
         self.assertThat(result, Equals(expected_result))
 
+    def test_with_cached(self):
+        subnet = factory.make_Subnet()
+        factory.make_StaticIPAddress(
+            alloc_type=IPADDRESS_TYPE.USER_RESERVED, subnet=subnet
+        )
+        response = self.client.get(
+            get_subnet_uri(subnet), {"op": "statistics", "cached": "true"}
+        )
+        self.assertEqual(
+            http.client.OK,
+            response.status_code,
+            explain_unexpected_response(http.client.OK, response),
+        )
+        result = json.loads(response.content.decode(settings.DEFAULT_CHARSET))
+        statistics = SubnetStatistics.objects.get(subnet=subnet)
+        self.assertThat(result, Equals(statistics.statistics))
+        full_iprange = subnet.get_iprange_usage()
+        expected_result = IPRangeStatistics(full_iprange).render_json()
+        self.assertThat(result, Equals(expected_result))
+
 
 class TestSubnetIPAddressesAPI(APITestCase.ForUser):
     def test_default_parameters(self):
@@ -24,7 +24,7 @@ import time
 
 from django.db import connection, connections
 from django.db.utils import load_backend
-from django.http import HttpResponse, StreamingHttpResponse
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from pkg_resources import parse_version
 from simplestreams import util as sutil
 from simplestreams.mirrors import BasicMirrorWriter, UrlMirrorReader
@@ -47,6 +47,7 @@ from maasserver.components import (
     discard_persistent_error,
     register_persistent_error,
 )
+from maasserver.config import RegionConfiguration
 from maasserver.enum import (
     BOOT_RESOURCE_FILE_TYPE,
     BOOT_RESOURCE_FILE_TYPE_CHOICES,
@@ -56,6 +57,11 @@ from maasserver.enum import (
 from maasserver.eventloop import services
 from maasserver.exceptions import MAASAPINotFound
 from maasserver.fields import LargeObjectFile
+from maasserver.largefilestorage import (
+    DatabaseStorage,
+    get_filesystem_storage,
+    get_storage,
+)
 from maasserver.models import (
     BootResource,
     BootResourceFile,
@@ -94,6 +100,7 @@ from provisioningserver.import_images.helpers import (
 from provisioningserver.import_images.keyrings import write_all_keyrings
 from provisioningserver.import_images.product_mapping import map_products
 from provisioningserver.logger import get_maas_logger, LegacyLogger
+from provisioningserver.prometheus.metrics import PROMETHEUS_METRICS
 from provisioningserver.rpc.cluster import ListBootImages, ListBootImagesV2
 from provisioningserver.upgrade_cluster import create_gnupg_home
 from provisioningserver.utils.fs import tempdir
@@ -361,10 +368,23 @@ class SimpleStreamsHandler:
             rfile = resource_set.files.get(filename=filename)
         except BootResourceFile.DoesNotExist:
             raise MAASAPINotFound()
-        response = StreamingHttpResponse(
-            ConnectionWrapper(rfile.largefile.content),
-            content_type="application/octet-stream",
-        )
+        storage = get_filesystem_storage()
+        if storage.has_content(rfile.largefile):
+            # Served straight from the file, with the WSGI server's file
+            # wrapper (and so sendfile) when it has one.
+            response = FileResponse(
+                storage.open(rfile.largefile),
+                content_type="application/octet-stream",
+            )
+        elif DatabaseStorage().has_content(rfile.largefile):
+            response = StreamingHttpResponse(
+                ConnectionWrapper(rfile.largefile.content),
+                content_type="application/octet-stream",
+            )
+        else:
+            # The content was saved on the filesystem of another region,
+            # serving the large object would truncate it.
+            raise MAASAPINotFound()
         response["Content-Length"] = rfile.largefile.total_size
         return response
 
@@ -412,7 +432,8 @@ class BootResourceStore(ObjectStore):
 
     # Number of threads to run at the same time to write the contents of
     # files from simplestreams into the database. Increasing this number
-    # might cause high network and database load.
+    # might cause high network and database load. Set from the region's
+    # configuration, see `get_write_threads`.
     write_threads = 2
 
     # Read at 10MiB per chunk.
@@ -422,8 +443,24 @@ class BootResourceStore(ObjectStore):
         """Initialize store."""
         self.cache_current_resources()
         self._content_to_finalize = {}
+        self._largefiles_to_finalize = set()
         self._finalizing = False
         self._cancel_finalize = False
+        self.write_threads = self.get_write_threads()
+
+    def get_write_threads(self):
+        """Return the number of threads to write the content of files with.
+
+        This is the number configured for the region, limited so that the
+        chunks buffered by the threads fit in the configured memory. Each
+        thread buffers at most two chunks at once: one from simplestreams,
+        and one from the storage when resuming a file.
+        """
+        with RegionConfiguration.open() as config:
+            write_threads = config.image_write_threads
+            write_memory = config.image_write_memory * 1024 * 1024
+        buffered_threads = write_memory // (2 * self.read_size)
+        return max(1, min(write_threads, buffered_threads))
 
     def get_resource_identifiers(self, resource):
         """Return os, arch, subarch, and series for the given resource."""
@@ -473,6 +510,7 @@ class BootResourceStore(ObjectStore):
         :param content: File-like object.
         """
         self._content_to_finalize[rfile.id] = content
+        self._largefiles_to_finalize.add(rfile.largefile_id)
 
     def get_or_create_boot_resource(self, product):
         """Get existing `BootResource` for the given product or create a new
@@ -713,6 +751,15 @@ class BootResourceStore(ObjectStore):
             )
             needs_saving = True
             log.debug("New large file created {lf}.", lf=largefile)
+        elif (
+            not largefile.complete
+            and largefile.id not in self._largefiles_to_finalize
+        ):
+            # The content of the largefile was only partly saved, because a
+            # previous import was interrupted. Saving it resumes from the
+            # content that was saved, see `write_content_thread`.
+            needs_saving = True
+            log.debug("Resuming large file {lf}.", lf=largefile)
 
         # A largefile now exists for this resource file. Its either a new
         # largefile or an existing one that already existed in the database.
@@ -755,7 +802,13 @@ class BootResourceStore(ObjectStore):
 
     def write_content_thread(self, rid, reader):
         """Writes the data from the given reader, into the object storage
-        for the given `BootResourceFile`."""
+        for the given `BootResourceFile`.
+
+        The data is written to the configured storage, see
+        `maasserver.largefilestorage`. Content that was already saved by a
+        previous import is kept, as long as it matches the data from the
+        reader, and the writing resumes from the end of it.
+        """
 
         @transactional
         def get_rfile_and_ident():
@@ -766,36 +819,85 @@ class BootResourceStore(ObjectStore):
 
         rfile, ident = get_rfile_and_ident()
         cksummer = sutil.checksummer({"sha256": rfile.largefile.sha256})
+        storage = get_storage()
         log.debug("Finalizing boot image {ident}.", ident=ident)
 
-        # Ensure that the size of the largefile starts at zero.
-        rfile.largefile.size = 0
-        transactional(rfile.largefile.save)(update_fields=["size"])
+        @transactional
+        def is_chunk_saved(offset, buf):
+            """Return whether the chunk at `offset` is already saved."""
+            if offset + len(buf) > rfile.largefile.size:
+                return False
+            return storage.read(rfile.largefile, offset, len(buf)) == buf
+
+        @transactional
+        def truncate(size):
+            """Truncate the saved content to `size`."""
+            storage.truncate(rfile.largefile, size)
+            rfile.largefile.size = size
+            rfile.largefile.save(update_fields=["size"])
 
         @transactional
-        def write_chunk():
-            """Write a chunk into the database with a transaction per trunk.
+        def write_chunk(offset, buf, last):
+            """Write a chunk into the storage with a transaction per trunk.
 
             This ensures that the content and the size is committed into the
             database per chunk. This makes the process be reported correctly.
+            The content is committed to the storage with the last chunk, so
+            that it's there once its size says it's complete.
             """
-            with rfile.largefile.content.open("wb") as stream:
-                buf = reader.read(self.read_size)
-                stream.seek(0, 2)
-                stream.write(buf)
-                cksummer.update(buf)
-                buf_len = len(buf)
-                rfile.largefile.size += buf_len
-                rfile.largefile.save(update_fields=["size"])
-                if buf_len != self.read_size:
-                    return True
-                else:
-                    return False
+            storage.write(rfile.largefile, offset, buf)
+            if last:
+                storage.commit(rfile.largefile)
+            rfile.largefile.size = offset + len(buf)
+            rfile.largefile.save(update_fields=["size"])
+
+        # Skip over the chunks saved by a previous import, checking them
+        # against the data from the reader. The writing resumes from the
+        # first chunk that doesn't match.
+        size, buf = 0, None
+        while size < rfile.largefile.size and not self._cancel_finalize:
+            buf = reader.read(self.read_size)
+            if len(buf) == 0:
+                # The reader ended before the saved content did. The content
+                # is checked against its checksum below, which fails the
+                # import unless the saved content was longer than needed.
+                break
+            if not is_chunk_saved(size, buf):
+                break
+            cksummer.update(buf)
+            size += len(buf)
+            buf = None
+        if size > 0:
+            log.debug(
+                "Resuming boot image {ident} from {size} bytes.",
+                ident=ident,
+                size=size,
+            )
+        truncate(size)
 
-        # Write chunks until it says its done.
+        # Write chunks until the reader is exhausted.
+        written, started = 0, time.monotonic()
+        filetype = rfile.filetype
         while not self._cancel_finalize:
-            if write_chunk():
+            if buf is None:
+                buf = reader.read(self.read_size)
+            cksummer.update(buf)
+            last = len(buf) != self.read_size
+            if last and not cksummer.check():
+                # Don't commit corrupt content.
                 break
+            write_chunk(size, buf, last)
+            size += len(buf)
+            written += len(buf)
+            PROMETHEUS_METRICS.update(
+                "maas_boot_image_written_bytes",
+                "inc",
+                value=len(buf),
+                labels={"filetype": filetype},
+            )
+            if last:
+                break
+            buf = None
 
         # Don't check the checksum if finalization was cancelled.
         if self._cancel_finalize:
@@ -819,8 +921,17 @@ class BootResourceStore(ObjectStore):
                 EVENT_TYPES.REGION_IMPORT_ERROR, msg
             )
             maaslog.error(msg)
+            storage.discard(rfile.largefile)
             transactional(rfile.delete)()
         else:
+            elapsed = time.monotonic() - started
+            if elapsed > 0:
+                PROMETHEUS_METRICS.update(
+                    "maas_boot_image_write_throughput",
+                    "observe",
+                    value=written / elapsed,
+                    labels={"filetype": filetype},
+                )
             log.debug("Finalized boot image {ident}.", ident=ident)
 
     def perform_write(self):
@@ -1000,6 +1111,7 @@ class BootResourceStore(ObjectStore):
         for rid in self._content_to_finalize.keys():
             BootResourceFile.objects.filter(id=rid).delete()
         self._content_to_finalize = {}
+        self._largefiles_to_finalize = set()
 
     def finalize(self, notify=None):
         """Perform the finalization of data into the database.
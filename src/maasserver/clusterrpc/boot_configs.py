@@ -0,0 +1,52 @@
+# Copyright 2020 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""RPC helpers relating to the boot configurations cached by racks."""
+
+__all__ = ["invalidate_boot_configs"]
+
+from twisted.internet.defer import DeferredList
+from twisted.protocols.amp import UnhandledCommand
+
+from maasserver.rpc import getAllClients
+from provisioningserver.logger import LegacyLogger
+from provisioningserver.rpc.cluster import InvalidateBootConfigs
+from provisioningserver.utils.twisted import asynchronous, suppress
+
+log = LegacyLogger()
+
+
+@asynchronous
+def invalidate_boot_configs(system_ids, racks=None, unknown=False):
+    """Invalidate the boot configurations of the nodes with `system_ids` on
+    connected rack controllers.
+
+    :param racks: The system IDs of the rack controllers to invalidate the
+        configurations on, or None for all of them.
+    :param unknown: Whether to invalidate the configurations of unknown
+        machines too.
+
+    Rack controllers that don't cache boot configurations are ignored, as are
+    failures, which are logged; the racks' caches expire regardless.
+    """
+
+    def invalidate(client):
+        d = client(
+            InvalidateBootConfigs,
+            system_ids=list(system_ids),
+            unknown=unknown,
+        )
+        d.addErrback(suppress, UnhandledCommand)
+        d.addErrback(
+            log.err,
+            "Failed to invalidate boot configurations on rack controller "
+            "'%s'." % client.ident,
+        )
+        return d
+
+    clients = [
+        client
+        for client in getAllClients()
+        if racks is None or client.ident in racks
+    ]
+    return DeferredList(map(invalidate, clients))
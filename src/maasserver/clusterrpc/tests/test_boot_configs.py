@@ -0,0 +1,93 @@
+# Copyright 2020 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for :py:mod:`maasserver.clusterrpc.boot_configs`."""
+
+
+from unittest.mock import Mock
+
+from crochet import wait_for
+from twisted.internet.defer import fail, inlineCallbacks, succeed
+from twisted.protocols.amp import UnhandledCommand
+
+from maasserver.clusterrpc import boot_configs as boot_configs_module
+from maasserver.clusterrpc.boot_configs import invalidate_boot_configs
+from maasserver.testing.factory import factory
+from maastesting.matchers import MockCalledOnceWith, MockNotCalled
+from maastesting.testcase import MAASTestCase
+from maastesting.twisted import TwistedLoggerFixture
+from provisioningserver.rpc.cluster import InvalidateBootConfigs
+
+wait_for_reactor = wait_for(30)  # 30 seconds.
+
+
+def make_client(result=None):
+    client = Mock()
+    client.ident = factory.make_name("system_id")
+    client.return_value = succeed({}) if result is None else result
+    return client
+
+
+class TestInvalidateBootConfigs(MAASTestCase):
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_invalidates_on_all_racks(self):
+        clients = [make_client() for _ in range(3)]
+        self.patch(boot_configs_module, "getAllClients").return_value = clients
+        system_ids = [factory.make_name("system_id") for _ in range(2)]
+        yield invalidate_boot_configs(system_ids)
+        for client in clients:
+            self.assertThat(
+                client,
+                MockCalledOnceWith(
+                    InvalidateBootConfigs,
+                    system_ids=system_ids,
+                    unknown=False,
+                ),
+            )
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_invalidates_on_given_racks(self):
+        client, other_client = make_client(), make_client()
+        self.patch(boot_configs_module, "getAllClients").return_value = [
+            client,
+            other_client,
+        ]
+        system_ids = [factory.make_name("system_id")]
+        yield invalidate_boot_configs(
+            system_ids, {client.ident}, unknown=True
+        )
+        self.assertThat(
+            client,
+            MockCalledOnceWith(
+                InvalidateBootConfigs, system_ids=system_ids, unknown=True
+            ),
+        )
+        self.assertThat(other_client, MockNotCalled())
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_ignores_racks_without_cache(self):
+        client = make_client(fail(UnhandledCommand()))
+        self.patch(boot_configs_module, "getAllClients").return_value = [
+            client
+        ]
+        with TwistedLoggerFixture() as logger:
+            yield invalidate_boot_configs([factory.make_name("system_id")])
+        self.assertEqual("", logger.output)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_logs_failures(self):
+        client = make_client(fail(factory.make_exception()))
+        self.patch(boot_configs_module, "getAllClients").return_value = [
+            client
+        ]
+        with TwistedLoggerFixture() as logger:
+            yield invalidate_boot_configs([factory.make_name("system_id")])
+        self.assertIn(
+            "Failed to invalidate boot configurations on rack controller "
+            "'%s'." % client.ident,
+            logger.output,
+        )
@@ -4,7 +4,7 @@
 """Configuration for the MAAS region."""
 
 
-from formencode.validators import Int
+from formencode.validators import Int, OneOf
 
 from provisioningserver.config import (
     Configuration,
@@ -97,6 +97,32 @@ class RegionConfiguration(Configuration, metaclass=RegionConfigurationMeta):
         Int(if_missing=4, accept_python=False, min=1),
     )
 
+    # Boot image options.
+    image_write_threads = ConfigurationOption(
+        "image_write_threads",
+        "The number of boot image files written at once.",
+        Int(if_missing=2, accept_python=False, min=1),
+    )
+    image_write_memory = ConfigurationOption(
+        "image_write_memory",
+        "The memory, in MiB, available for buffering boot image files being "
+        "written. Limits the number of files written at once.",
+        Int(if_missing=64, accept_python=False, min=1),
+    )
+    image_storage = ConfigurationOption(
+        "image_storage",
+        "Where boot image files are stored: 'database' or 'filesystem'.",
+        OneOf(["database", "filesystem"], if_missing="database"),
+    )
+    image_storage_path = ConfigurationOption(
+        "image_storage_path",
+        "The directory boot image files are stored in when image_storage is "
+        "'filesystem'; defaults to image-storage in the MAAS data directory. "
+        "Must be shared between the region controllers when there are "
+        "several.",
+        UnicodeString(if_missing="", accept_python=False),
+    )
+
     # Debug options.
     debug = ConfigurationOption(
         "debug",
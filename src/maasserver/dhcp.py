@@ -5,8 +5,12 @@
 
 
 from collections import defaultdict, namedtuple
+from copy import deepcopy
+from hashlib import sha256
 from itertools import groupby
+import json
 from operator import itemgetter
+import threading
 from typing import Iterable, Optional, Union
 
 from django.conf import settings
@@ -45,8 +49,10 @@ from provisioningserver.logger import LegacyLogger
 from provisioningserver.rpc.cluster import (
     ConfigureDHCPv4,
     ConfigureDHCPv4_V2,
+    ConfigureDHCPv4_V3,
     ConfigureDHCPv6,
     ConfigureDHCPv6_V2,
+    ConfigureDHCPv6_V3,
     ValidateDHCPv4Config,
     ValidateDHCPv4Config_V2,
     ValidateDHCPv6Config,
@@ -54,7 +60,10 @@ from provisioningserver.rpc.cluster import (
 )
 from provisioningserver.rpc.clusterservice import DHCP_TIMEOUT
 from provisioningserver.rpc.dhcp import downgrade_shared_networks
-from provisioningserver.rpc.exceptions import NoConnectionsAvailable
+from provisioningserver.rpc.exceptions import (
+    DHCPConfigurationOutOfSync,
+    NoConnectionsAvailable,
+)
 from provisioningserver.utils import typed
 from provisioningserver.utils.network import get_source_address
 from provisioningserver.utils.text import split_string_list
@@ -685,19 +694,175 @@ def get_dhcp_configure_for(
     )
 
 
+def get_dhcp_configuration_digest(data):
+    """Return the digest of `data`, a JSON-like structure."""
+    data = json.dumps(data, sort_keys=True, default=str)
+    return sha256(data.encode("utf-8")).hexdigest()
+
+
+DHCPConfigurationFragment = namedtuple(
+    "DHCPConfigurationFragment",
+    ("failover_peer", "shared_network", "hosts", "interface", "digest"),
+)
+
+
+def get_dhcp_configuration_fragments(
+    rack_controller,
+    vlan,
+    ntp_servers,
+    domain,
+    search_list=None,
+    dhcp_snippets=None,
+    use_rack_proxy=True,
+):
+    """Return the DHCPv4 and DHCPv6 `DHCPConfigurationFragment` for `vlan`.
+
+    Either is `None` when `vlan` has no managed subnets of that IP version.
+    """
+    subnets_v4, subnets_v6 = split_managed_ipv4_ipv6_subnets(
+        vlan.subnet_set.all()
+    )
+    fragments = []
+    for ip_version, subnets in ((4, subnets_v4), (6, subnets_v6)):
+        if len(subnets) == 0:
+            fragments.append(None)
+            continue
+        failover_peer, subnets, hosts, interface = get_dhcp_configure_for(
+            ip_version,
+            rack_controller,
+            vlan,
+            subnets,
+            ntp_servers,
+            domain,
+            search_list=search_list,
+            dhcp_snippets=dhcp_snippets,
+            use_rack_proxy=use_rack_proxy,
+        )
+        shared_network = {
+            "name": "vlan-%d" % vlan.id,
+            "mtu": vlan.mtu,
+            "subnets": subnets,
+        }
+        if interface is not None:
+            shared_network["interface"] = interface
+        digest = get_dhcp_configuration_digest(
+            [failover_peer, shared_network, hosts]
+        )
+        fragments.append(
+            DHCPConfigurationFragment(
+                failover_peer, shared_network, hosts, interface, digest
+            )
+        )
+    return tuple(fragments)
+
+
+class DHCPConfigurationCache:
+    """The DHCP configuration of the VLANs of the rack controllers that this
+    process manages.
+
+    The `RackControllerService` tracks a rack controller while it watches
+    it, and invalidates a VLAN when the database reports a change to it.
+    `get_dhcp_configuration` then only recomputes the configuration of the
+    VLANs that were invalidated, and `configure_dhcp` only sends the shared
+    networks whose configuration differs from what the rack controller was
+    last sent.
+
+    The configuration is computed in a database thread while invalidations
+    arrive in the reactor, hence the lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Rack controller ID -> {VLAN ID: (fragment_v4, fragment_v6)}
+        self._fragments = {}
+        # Rack controller ID -> set of VLAN IDs, or None for all VLANs.
+        self._invalid = {}
+        # Rack controller ID -> digest of the settings shared by all VLANs.
+        self._settings = {}
+        # (Rack controller ID, IP version) -> {shared network: digest}
+        self._sent = {}
+
+    def track(self, rack_id):
+        """Start caching the configuration of the rack controller."""
+        with self._lock:
+            self._forget(rack_id)
+            self._fragments[rack_id] = {}
+
+    def forget(self, rack_id):
+        """Stop caching the configuration of the rack controller."""
+        with self._lock:
+            self._forget(rack_id)
+
+    def _forget(self, rack_id):
+        self._fragments.pop(rack_id, None)
+        self._invalid.pop(rack_id, None)
+        self._settings.pop(rack_id, None)
+        self._sent.pop((rack_id, 4), None)
+        self._sent.pop((rack_id, 6), None)
+
+    def invalidate(self, rack_id, vlan_id=None):
+        """Invalidate the configuration of `vlan_id`, or of all VLANs."""
+        with self._lock:
+            if rack_id not in self._fragments:
+                return
+            elif vlan_id is None:
+                self._invalid[rack_id] = None
+            else:
+                invalid = self._invalid.setdefault(rack_id, set())
+                if invalid is not None:
+                    invalid.add(vlan_id)
+
+    def get_fragments(self, rack_id, settings_digest):
+        """Return the configuration of the VLANs of the rack controller that
+        is still valid.
+
+        :param settings_digest: The digest of the settings shared by all the
+            VLANs. The configuration of all the VLANs is invalid when it
+            changed.
+        :return: A dict mapping VLAN IDs to their DHCPv4 and DHCPv6
+            `DHCPConfigurationFragment`, to which the caller adds the
+            configuration of the VLANs it computes. `None` when the rack
+            controller is not tracked.
+        """
+        with self._lock:
+            fragments = self._fragments.get(rack_id)
+            if fragments is None:
+                return None
+            invalid = self._invalid.pop(rack_id, set())
+            if invalid is None or settings_digest != self._settings.get(
+                rack_id
+            ):
+                fragments.clear()
+            else:
+                for vlan_id in invalid:
+                    fragments.pop(vlan_id, None)
+            self._settings[rack_id] = settings_digest
+            return fragments
+
+    def get_sent(self, rack_id, ip_version):
+        """Return the digests of the shared networks that the rack controller
+        was last configured with, or `None` if not known."""
+        with self._lock:
+            return self._sent.get((rack_id, ip_version))
+
+    def set_sent(self, rack_id, ip_version, digests):
+        """Record the digests of the shared networks that the rack controller
+        was configured with."""
+        with self._lock:
+            if rack_id in self._fragments:
+                self._sent[rack_id, ip_version] = digests
+
+
+dhcp_configuration_cache = DHCPConfigurationCache()
+
+
 @synchronous
 @transactional
 def get_dhcp_configuration(rack_controller, test_dhcp_snippet=None):
     """Return tuple with IPv4 and IPv6 configurations for the
     rack controller."""
     # Get list of all vlans that are being managed by the rack controller.
-    vlans = gen_managed_vlans_for(rack_controller)
-
-    # Group the subnets on each VLAN into IPv4 and IPv6 subnets.
-    vlan_subnets = {
-        vlan: split_managed_ipv4_ipv6_subnets(vlan.subnet_set.all())
-        for vlan in vlans
-    }
+    vlans = list(gen_managed_vlans_for(rack_controller))
 
     # Get the list of all DHCP snippets so we only have to query the database
     # 1 + (the number of DHCP snippets used in this VLAN) instead of
@@ -730,10 +895,12 @@ def get_dhcp_configuration(rack_controller, test_dhcp_snippet=None):
     shared_networks_v4 = []
     hosts_v4 = []
     interfaces_v4 = set()
+    fragments_v4 = {}
     failover_peers_v6 = []
     shared_networks_v6 = []
     hosts_v6 = []
     interfaces_v6 = set()
+    fragments_v6 = {}
 
     # DNS can either go through the rack controller or directly to the
     # region controller.
@@ -753,65 +920,73 @@ def get_dhcp_configuration(rack_controller, test_dhcp_snippet=None):
         for name in sorted(get_dns_search_paths())
         if name != default_domain.name
     ]
-    for vlan, (subnets_v4, subnets_v6) in vlan_subnets.items():
-        # IPv4
-        if len(subnets_v4) > 0:
-            config = get_dhcp_configure_for(
-                4,
+
+    # Reuse the configuration of the VLANs that did not change since it was
+    # last computed, unless testing a DHCP snippet. It is recomputed for all
+    # the VLANs when any of the settings they share changed.
+    vlan_fragments = None
+    if test_dhcp_snippet is None:
+        vlan_fragments = dhcp_configuration_cache.get_fragments(
+            rack_controller.id,
+            get_dhcp_configuration_digest(
+                [
+                    use_rack_proxy,
+                    sorted(ntp_servers.items())
+                    if isinstance(ntp_servers, dict)
+                    else ntp_servers,
+                    search_list,
+                ]
+            ),
+        )
+    if vlan_fragments is None:
+        vlan_fragments = {}
+
+    managed_vlan_ids = set()
+    for vlan in vlans:
+        if vlan.id in managed_vlan_ids:
+            continue
+        managed_vlan_ids.add(vlan.id)
+        if vlan.id not in vlan_fragments:
+            vlan_fragments[vlan.id] = get_dhcp_configuration_fragments(
                 rack_controller,
                 vlan,
-                subnets_v4,
                 ntp_servers,
                 default_domain,
                 search_list=search_list,
                 dhcp_snippets=dhcp_snippets,
                 use_rack_proxy=use_rack_proxy,
             )
-            failover_peer, subnets, hosts, interface = config
-            if failover_peer is not None:
-                failover_peers_v4.append(failover_peer)
-            shared_network = {
-                "name": "vlan-%d" % vlan.id,
-                "mtu": vlan.mtu,
-                "subnets": subnets,
-            }
-            shared_networks_v4.append(shared_network)
-            hosts_v4.extend(hosts)
-            if interface is not None:
-                interfaces_v4.add(interface)
-                shared_network["interface"] = interface
+        fragment_v4, fragment_v6 = vlan_fragments[vlan.id]
+        # IPv4
+        if fragment_v4 is not None:
+            if fragment_v4.failover_peer is not None:
+                failover_peers_v4.append(fragment_v4.failover_peer)
+            shared_networks_v4.append(fragment_v4.shared_network)
+            hosts_v4.extend(fragment_v4.hosts)
+            if fragment_v4.interface is not None:
+                interfaces_v4.add(fragment_v4.interface)
+            fragments_v4[fragment_v4.shared_network["name"]] = fragment_v4
         # IPv6
-        if len(subnets_v6) > 0:
-            config = get_dhcp_configure_for(
-                6,
-                rack_controller,
-                vlan,
-                subnets_v6,
-                ntp_servers,
-                default_domain,
-                search_list=search_list,
-                dhcp_snippets=dhcp_snippets,
-                use_rack_proxy=use_rack_proxy,
-            )
-            failover_peer, subnets, hosts, interface = config
-            if failover_peer is not None:
-                failover_peers_v6.append(failover_peer)
-            shared_network = {
-                "name": "vlan-%d" % vlan.id,
-                "mtu": vlan.mtu,
-                "subnets": subnets,
-            }
-            shared_networks_v6.append(shared_network)
-            hosts_v6.extend(hosts)
-            if interface is not None:
-                interfaces_v6.add(interface)
-                shared_network["interface"] = interface
+        if fragment_v6 is not None:
+            if fragment_v6.failover_peer is not None:
+                failover_peers_v6.append(fragment_v6.failover_peer)
+            shared_networks_v6.append(fragment_v6.shared_network)
+            hosts_v6.extend(fragment_v6.hosts)
+            if fragment_v6.interface is not None:
+                interfaces_v6.add(fragment_v6.interface)
+            fragments_v6[fragment_v6.shared_network["name"]] = fragment_v6
+    # Forget the VLANs that are no longer managed by the rack controller.
+    for vlan_id in set(vlan_fragments) - managed_vlan_ids:
+        del vlan_fragments[vlan_id]
+
     # When no interfaces exist for each IP version clear the shared networks
     # as DHCP server cannot be started and needs to be stopped.
     if len(interfaces_v4) == 0:
         shared_networks_v4 = {}
+        fragments_v4 = {}
     if len(interfaces_v6) == 0:
         shared_networks_v6 = {}
+        fragments_v6 = {}
     return DHCPConfigurationForRack(
         failover_peers_v4,
         shared_networks_v4,
@@ -823,6 +998,8 @@ def get_dhcp_configuration(rack_controller, test_dhcp_snippet=None):
         interfaces_v6,
         get_omapi_key(),
         global_dhcp_snippets,
+        fragments_v4,
+        fragments_v6,
     )
 
 
@@ -839,6 +1016,10 @@ DHCPConfigurationForRack = namedtuple(
         "interfaces_v6",
         "omapi_key",
         "global_dhcp_snippets",
+        # Dicts mapping the names of the shared networks to their
+        # `DHCPConfigurationFragment`.
+        "fragments_v4",
+        "fragments_v6",
     ),
 )
 
@@ -874,10 +1055,12 @@ def configure_dhcp(rack_controller):
     ipv4_status, ipv6_status = SERVICE_STATUS.UNKNOWN, SERVICE_STATUS.UNKNOWN
 
     try:
-        yield _perform_dhcp_config(
+        yield _perform_dhcp_config_update(
             client,
-            ConfigureDHCPv4_V2,
-            ConfigureDHCPv4,
+            rack_controller,
+            4,
+            config.fragments_v4,
+            (ConfigureDHCPv4_V3, ConfigureDHCPv4_V2, ConfigureDHCPv4),
             failover_peers=config.failover_peers_v4,
             interfaces=interfaces_v4,
             shared_networks=config.shared_networks_v4,
@@ -904,10 +1087,12 @@ def configure_dhcp(rack_controller):
         )
 
     try:
-        yield _perform_dhcp_config(
+        yield _perform_dhcp_config_update(
             client,
-            ConfigureDHCPv6_V2,
-            ConfigureDHCPv6,
+            rack_controller,
+            6,
+            config.fragments_v6,
+            (ConfigureDHCPv6_V3, ConfigureDHCPv6_V2, ConfigureDHCPv6),
             failover_peers=config.failover_peers_v6,
             interfaces=interfaces_v6,
             shared_networks=config.shared_networks_v6,
@@ -1121,3 +1306,95 @@ def _perform_dhcp_config(
             return failure
 
     return call(v2_command).addErrback(maybeDowngrade)
+
+
+@asynchronous
+@inlineCallbacks
+def _perform_dhcp_config_update(
+    client,
+    rack_controller,
+    ip_version,
+    fragments,
+    commands,
+    *,
+    shared_networks,
+    hosts,
+    **args
+):
+    """Call the V3 command with the shared networks that changed...
+
+    ... since `rack_controller` was last configured, or with all of them if
+    that is not known or the rack controller has a different configuration.
+    This falls back to `_perform_dhcp_config` with the whole configuration if
+    the V3 command is not recognised.
+
+    :param client: An RPC client.
+    :param rack_controller: The rack controller `client` is connected to.
+    :param ip_version: The IP version of the DHCP server.
+    :param fragments: A dict mapping the names of the shared networks to
+        their `DHCPConfigurationFragment`.
+    :param commands: The V3, V2 and V1 RPC commands.
+    :param shared_networks: The shared networks argument for the V2 and V1
+        commands.
+    :param hosts: The hosts argument for the V2 and V1 commands.
+    :param args: Remaining arguments for all the commands.
+    """
+    v3_command, v2_command, v1_command = commands
+    digests = {name: fragment.digest for name, fragment in fragments.items()}
+    sent = dhcp_configuration_cache.get_sent(rack_controller.id, ip_version)
+    # The configuration of the rack controller is not known until it
+    # succeeds.
+    dhcp_configuration_cache.set_sent(rack_controller.id, ip_version, None)
+
+    def call(base):
+        if base is None:
+            changed, removed = sorted(digests), []
+        else:
+            changed = sorted(
+                name
+                for name, digest in digests.items()
+                if base.get(name) != digest
+            )
+            removed = sorted(set(base) - set(digests))
+        return client(
+            v3_command,
+            _timeout=DHCP_TIMEOUT + 5,
+            shared_networks=[
+                fragments[name].shared_network for name in changed
+            ],
+            hosts=[
+                dict(host, shared_network=name)
+                for name in changed
+                for host in fragments[name].hosts
+            ],
+            removed_shared_networks=removed,
+            base_digest=(
+                None if base is None else get_dhcp_configuration_digest(base)
+            ),
+            digest=get_dhcp_configuration_digest(digests),
+            **args
+        )
+
+    try:
+        if sent is None or len(digests) == 0:
+            yield call(None)
+        else:
+            try:
+                yield call(sent)
+            except DHCPConfigurationOutOfSync:
+                yield call(None)
+    except amp.UnhandledCommand:
+        # The shared networks are downgraded in place for the V1 command,
+        # and they are cached.
+        yield _perform_dhcp_config(
+            client,
+            v2_command,
+            v1_command,
+            shared_networks=deepcopy(shared_networks),
+            hosts=hosts,
+            **args
+        )
+    else:
+        dhcp_configuration_cache.set_sent(
+            rack_controller.id, ip_version, digests
+        )
@@ -5,11 +5,16 @@
 
 
 from collections import defaultdict
+from datetime import datetime
+from hashlib import sha256
+from time import time
 
 from django.conf import settings
 from netaddr import IPAddress
 
+from maasserver import locks
 from maasserver.dns.zonegenerator import (
+    get_dns_server_addresses,
     InternalDomain,
     InternalDomainResourse,
     InternalDomainResourseRecord,
@@ -18,23 +23,98 @@ from maasserver.dns.zonegenerator import (
 from maasserver.enum import IPADDRESS_TYPE, RDNS_MODE
 from maasserver.models.config import Config
 from maasserver.models.dnspublication import DNSPublication
+from maasserver.models.dnszonefile import DNSZoneFile
 from maasserver.models.domain import Domain
 from maasserver.models.node import RackController
 from maasserver.models.subnet import Subnet
+from maasserver.utils import synchronised
+from maasserver.utils.orm import transactional, with_connection
 from provisioningserver.dns.actions import (
+    bind_freeze_zones,
     bind_reload,
     bind_reload_with_retries,
+    bind_reload_zones,
+    bind_thaw_zones,
+    bind_update_zones,
     bind_write_configuration,
     bind_write_options,
     bind_write_zones,
 )
+from provisioningserver.dns.zoneconfig import (
+    DNSRenderedZoneConfig,
+    DomainInfo,
+    ZoneRecords,
+)
 from provisioningserver.logger import get_maas_logger
+from provisioningserver.prometheus.metrics import PROMETHEUS_METRICS
 
 maaslog = get_maas_logger("dns")
 
+# The source of the publication made by `dns_force_reload`.
+FORCE_RELOAD_SOURCE = "Force reload"
+
+
+class PublishedZones:
+    """Record of the DNS configuration last published by this process.
+
+    This lets `dns_update_all_zones` rewrite and reload only those zones
+    whose content changed since the previous publication, or send them a
+    dynamic update.
+    """
+
+    def __init__(self):
+        # Whether the zones were last published with dynamic updates enabled.
+        self.dynamic_updates = False
+        self.reset()
+
+    def reset(self):
+        """Forget what was published; the next update will be a full one."""
+        # Digest of everything other than zone content that ends up in BIND's
+        # configuration, i.e. the set of zones, the options and ACLs.
+        self.config_digest = None
+        # Digests of the content of each zone file, keyed by zone name.
+        self.zone_digests = {}
+        # The records of each zone as BIND serves them, keyed by zone name.
+        # Only kept when dynamic updates are enabled.
+        self.zone_records = {}
+
+
+_published_zones = PublishedZones()
+
 
-def current_zone_serial():
-    return "%0.10d" % DNSPublication.objects.get_most_recent().serial
+class StoredZoneConfig(DNSRenderedZoneConfig):
+    """A zone file stored by `render_zones`.
+
+    Its content and records are only loaded from the database when needed,
+    so that zones which have not changed are cheap to publish.
+    """
+
+    def __init__(self, zone_file):
+        """
+        :param zone_file: A `DNSZoneFile`, with its content and records
+            optionally deferred.
+        """
+        self.zone_info = [DomainInfo(None, zone_file.zone_name)]
+        self.digest = zone_file.digest
+        self.serial = zone_file.zone_serial
+        self._zone_file = zone_file
+        self._records = None
+
+    @property
+    def content(self):
+        return self._zone_file.content
+
+    @property
+    def records(self):
+        if self._records is None:
+            self._records = ZoneRecords.from_dict(self._zone_file.records)
+        return self._records
+
+
+def current_zone_serial(publication=None):
+    if publication is None:
+        publication = DNSPublication.objects.get_most_recent()
+    return "%0.10d" % publication.serial
 
 
 def is_dns_enabled():
@@ -44,34 +124,202 @@ def is_dns_enabled():
 
 def dns_force_reload():
     """Force the DNS to be regenerated."""
-    DNSPublication(source="Force reload").save()
+    DNSPublication(source=FORCE_RELOAD_SOURCE).save()
 
 
-def dns_update_all_zones(reload_retry=False, reload_timeout=2):
-    """Update all zone files for all domains.
+def get_servers_digest():
+    """Return a digest of the DNS server addresses that this region controller
+    renders into the zones, see `DNSZoneFile.servers_digest`."""
+    addresses = sorted(
+        str(address)
+        for address in get_dns_server_addresses(filter_allowed_dns=False)
+    )
+    return sha256(repr(addresses).encode("utf-8")).hexdigest()
 
-    Serving these zone files means updating BIND's configuration to include
-    them, then asking it to load the new configuration.
 
-    :param reload_retry: Should the DNS server reload be retried in case
-        of failure? Defaults to `False`.
-    :type reload_retry: bool
-    """
-    if not is_dns_enabled():
-        return
+def render_zones(serial, servers_digest):
+    """Generate and render the zones for all domains and subnets, and store
+    the zone files for `serial` in the database.
 
+    Only the zones that changed since they were last stored are rendered.
+    """
+    before = time()
     domains = Domain.objects.filter(authoritative=True)
     subnets = Subnet.objects.exclude(rdns_mode=RDNS_MODE.DISABLED)
     default_ttl = Config.objects.get_config("default_dns_ttl")
-    serial = current_zone_serial()
     zones = ZoneGenerator(
         domains,
         subnets,
         default_ttl,
-        serial,
+        "%0.10d" % serial,
         internal_domains=[get_internal_domain()],
     ).as_list()
-    bind_write_zones(zones)
+    zone_digests = DNSZoneFile.objects.get_digests(servers_digest)
+    rendered = []
+    for zone in zones:
+        rendered.extend(zone.render_config(zone_digests=zone_digests))
+    zone_names = [
+        zone_info.zone_name for zone in zones for zone_info in zone.zone_info
+    ]
+    DNSZoneFile.objects.store_rendered(
+        serial, servers_digest, zone_names, rendered
+    )
+    PROMETHEUS_METRICS.update(
+        "maas_dns_zone_render_latency", "observe", value=time() - before
+    )
+
+
+@with_connection  # Needed by the following lock.
+@synchronised(locks.dns_render)
+@transactional
+def render_published_zones():
+    """Render and store the zones of the most recent publication, unless
+    another region controller already did.
+
+    The lock is held around the whole transaction, rather than taken within
+    it, so that region controllers that waited for it see the zone files
+    stored by the one that held it.
+    """
+    if not is_dns_enabled():
+        return
+    try:
+        publication = DNSPublication.objects.get_most_recent()
+    except DNSPublication.DoesNotExist:
+        return
+    serial, servers_digest = publication.serial, get_servers_digest()
+    if not DNSZoneFile.objects.is_rendered(serial, servers_digest):
+        render_zones(serial, servers_digest)
+
+
+def get_rendered_zones(serial):
+    """Return the zones to publish with `serial`.
+
+    The zones are generated and rendered only by the first region controller
+    to publish `serial`, which stores them in the database, see
+    `render_published_zones`.  The others, and later updates with the same
+    serial, use the stored zone files.  The zones are rendered here only if
+    `serial` was published after they were stored.
+
+    :return: A list of `StoredZoneConfig`.
+    """
+    servers_digest = get_servers_digest()
+    if not DNSZoneFile.objects.is_rendered(serial, servers_digest):
+        render_zones(serial, servers_digest)
+    zone_files = DNSZoneFile.objects.filter(servers_digest=servers_digest)
+    zone_files = zone_files.defer("content", "records")
+    return [
+        StoredZoneConfig(zone_file)
+        for zone_file in zone_files.order_by("zone_name")
+    ]
+
+
+def get_config_digest(
+    zones,
+    upstream_dns,
+    dnssec_validation,
+    trusted_networks,
+    dynamic_updates=False,
+):
+    """Return a digest of BIND's configuration, excluding zone content."""
+    zone_names = sorted(
+        zone_info.zone_name for zone in zones for zone_info in zone.zone_info
+    )
+    config = (
+        zone_names,
+        list(upstream_dns),
+        dnssec_validation,
+        sorted(trusted_networks),
+        dynamic_updates,
+    )
+    return sha256(repr(config).encode("utf-8")).hexdigest()
+
+
+def dns_update_all_zones(
+    reload_retry=False, reload_timeout=2, incremental=False
+):
+    """Update all zone files for all domains.
+
+    Serving these zone files means updating BIND's configuration to include
+    them, then asking it to load the new configuration.  The zones themselves
+    are rendered once for all region controllers, see
+    `render_published_zones`, which should be called first in a separate
+    transaction.
+
+    :param reload_retry: Should the DNS server reload be retried in case
+        of failure? Defaults to `False`.
+    :type reload_retry: bool
+    :param incremental: Only rewrite and reload the zones whose content has
+        changed since the previous update made by this process. A full update
+        is still made if this process has not made one yet, if the set of
+        zones or BIND's options have changed, or if a reload was forced.
+        When the `dns_dynamic_updates` option is set, changed zones are sent
+        a dynamic update rather than being rewritten and reloaded.
+        Defaults to `False`.
+    :type incremental: bool
+    :return: A tuple of the serial, whether BIND reloaded successfully, and
+        the names of the domains that were published with that serial.
+        Domains whose zones have not changed since an earlier publication
+        are not included; they are still served with its serial.
+    """
+    if not is_dns_enabled():
+        return
+
+    publication = DNSPublication.objects.get_most_recent()
+    serial = current_zone_serial(publication)
+    zones = get_rendered_zones(publication.serial)
+    before = time()
+    # Zones that have not changed keep the serial of the publication they
+    # were rendered for, so only the others will be served with this serial.
+    rendered = {
+        zone.zone_info[0].zone_name
+        for zone in zones
+        if zone.serial == publication.serial
+    }
+    domains = [
+        domain
+        for domain in Domain.objects.filter(authoritative=True)
+        if domain.name in rendered
+    ]
+    upstream_dns = get_upstream_dns()
+    dnssec_validation = get_dnssec_validation()
+    trusted_networks = get_trusted_networks()
+    dynamic_updates = get_dns_dynamic_updates()
+    config_digest = get_config_digest(
+        zones,
+        upstream_dns,
+        dnssec_validation,
+        trusted_networks,
+        dynamic_updates,
+    )
+    if incremental:
+        incremental = (
+            config_digest == _published_zones.config_digest
+            and publication.source != FORCE_RELOAD_SOURCE
+        )
+    if incremental and dynamic_updates:
+        # BIND's configuration is unchanged, and it accepts dynamic updates
+        # to the zones, so there is nothing to rewrite or reload.
+        changed = set(bind_update_zones(zones, _published_zones.zone_records))
+        domain_names = [
+            domain.name for domain in domains if domain.name in changed
+        ]
+        record_publication_metrics(publication, before)
+        return serial, True, domain_names
+
+    if not incremental:
+        _published_zones.reset()
+    # BIND keeps the changes made to dynamic zones in a journal which it
+    # may write back to their zone files at any time, so freeze the zones
+    # while the files are rewritten.
+    freeze = dynamic_updates or _published_zones.dynamic_updates
+    if freeze:
+        bind_freeze_zones()
+    zone_records = _published_zones.zone_records if dynamic_updates else None
+    written = bind_write_zones(
+        zones,
+        zone_digests=_published_zones.zone_digests,
+        zone_records=zone_records,
+    )
 
     # We should not be calling bind_write_options() here; call-sites should be
     # making a separate call. It's a historical legacy, where many sites now
@@ -79,27 +327,69 @@ def dns_update_all_zones(reload_retry=False, reload_timeout=2):
     # some that call it for this side-effect alone. At present all it does is
     # set the upstream DNS servers, nothing to do with serving zones at all!
     bind_write_options(
-        upstream_dns=get_upstream_dns(),
-        dnssec_validation=get_dnssec_validation(),
+        upstream_dns=upstream_dns, dnssec_validation=dnssec_validation
     )
 
     # Nor should we be rewriting ACLs that are related only to allowing
     # recursive queries to the upstream DNS servers. Again, this is legacy,
     # where the "trusted" ACL ended up in the same configuration file as the
     # zone stanzas, and so both need to be rewritten at the same time.
-    bind_write_configuration(zones, trusted_networks=get_trusted_networks())
-
-    # Reloading with retries may be a legacy from Celery days, or it may be
-    # necessary to recover from races during start-up. We're not sure if it is
-    # actually needed but it seems safer to maintain this behaviour until we
-    # have a better understanding.
-    if reload_retry:
-        reloaded = bind_reload_with_retries(timeout=reload_timeout)
+    bind_write_configuration(
+        zones,
+        trusted_networks=trusted_networks,
+        dynamic_updates=dynamic_updates,
+    )
+
+    if incremental:
+        # BIND's configuration is unchanged so only the rewritten zones need
+        # to be reloaded; the others are still being served as they are.
+        reloaded = bind_reload_zones(written) if written else True
+        written = set(written)
+        domain_names = [
+            domain.name for domain in domains if domain.name in written
+        ]
     else:
-        reloaded = bind_reload(timeout=reload_timeout)
+        # Reloading with retries may be a legacy from Celery days, or it may
+        # be necessary to recover from races during start-up. We're not sure
+        # if it is actually needed but it seems safer to maintain this
+        # behaviour until we have a better understanding.
+        if reload_retry:
+            reloaded = bind_reload_with_retries(timeout=reload_timeout)
+        else:
+            reloaded = bind_reload(timeout=reload_timeout)
+        domain_names = [domain.name for domain in domains]
+    if freeze:
+        # Thawing reloads the zones and lets BIND accept updates again.
+        bind_thaw_zones()
+    _published_zones.dynamic_updates = dynamic_updates
+
+    if reloaded:
+        _published_zones.config_digest = config_digest
+        record_publication_metrics(publication, before)
+    else:
+        # BIND may not have picked up the zones that were written, so don't
+        # rely on what was published the next time around.
+        _published_zones.reset()
 
     # Return the current serial and list of domain names.
-    return serial, reloaded, [domain.name for domain in domains]
+    return serial, reloaded, domain_names
+
+
+def record_publication_metrics(publication, started):
+    """Record how long it took to publish `publication`.
+
+    :param publication: The `DNSPublication` that was published.
+    :param started: The time at which the zones started being written out.
+    """
+    PROMETHEUS_METRICS.update(
+        "maas_dns_zone_apply_latency", "observe", value=time() - started
+    )
+    lag = datetime.now() - publication.created
+    PROMETHEUS_METRICS.update(
+        "maas_dns_serial_propagation_lag",
+        "observe",
+        value=lag.total_seconds(),
+    )
 
 
 def get_upstream_dns():
@@ -119,6 +409,15 @@ def get_dnssec_validation():
     return Config.objects.get_config("dnssec_validation")
 
 
+def get_dns_dynamic_updates():
+    """Return the configuration option for dynamic DNS updates.
+
+    :return: True if changed zones are sent dynamic updates, False if they
+        are rewritten and reloaded.
+    """
+    return Config.objects.get_config("dns_dynamic_updates")
+
+
 def get_trusted_acls():
     """Return the configuration option for trusted ACLs.
 
@@ -13,6 +13,7 @@ from twisted.internet import reactor
 from twisted.internet.task import LoopingCall
 
 from maasserver.models.dnspublication import DNSPublication
+from maasserver.models.dnszonefile import DNSZoneFile
 from maasserver.utils.orm import transactional
 from maasserver.utils.threads import deferToDatabase
 from provisioningserver.logger import LegacyLogger
@@ -22,7 +23,8 @@ log = LegacyLogger()
 
 
 class DNSPublicationGarbageService(Service):
-    """Periodically delete DNS publications more than 7 days old."""
+    """Periodically delete DNS publications more than 7 days old, and the
+    zone files that are no longer published."""
 
     clock = None
 
@@ -66,4 +68,5 @@ class DNSPublicationGarbageService(Service):
 
     @transactional
     def _collectGarbage(self, cutoff):
-        return DNSPublication.objects.collect_garbage(cutoff)
+        DNSPublication.objects.collect_garbage(cutoff)
+        DNSZoneFile.objects.collect_garbage()
@@ -7,6 +7,7 @@
 from argparse import ArgumentParser
 import random
 import time
+from unittest.mock import ANY, Mock
 
 from django.conf import settings
 import dns.resolver
@@ -28,20 +29,24 @@ from maasserver.dns.config import (
     dns_force_reload,
     dns_update_all_zones,
     get_internal_domain,
+    get_rendered_zones,
     get_resource_name_for_subnet,
     get_trusted_acls,
     get_trusted_networks,
     get_upstream_dns,
+    PublishedZones,
+    render_published_zones,
 )
 from maasserver.dns.zonegenerator import InternalDomainResourseRecord
 from maasserver.enum import IPADDRESS_TYPE, NODE_STATUS
 from maasserver.listener import PostgresListenerService
 from maasserver.models import Config, Domain
 from maasserver.models.dnspublication import DNSPublication
+from maasserver.models.dnszonefile import DNSZoneFile
 from maasserver.testing.config import RegionConfigurationFixture
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
-from maastesting.matchers import MockCalledOnceWith
+from maastesting.matchers import MockCalledOnceWith, MockNotCalled
 from provisioningserver.dns.commands import get_named_conf, setup_dns
 from provisioningserver.dns.config import compose_config_path, DNSConfig
 from provisioningserver.dns.testing import (
@@ -404,6 +409,248 @@ class TestDNSConfigModifications(TestDNSServer):
             ),
         )
 
+    def test_dns_update_all_zones_incremental_first_update_is_full(self):
+        self.patch(settings, "DNS_CONNECT", True)
+        self.patch(dns_config_module, "_published_zones", PublishedZones())
+        bind_reload = self.patch_autospec(dns_config_module, "bind_reload")
+        bind_reload.return_value = True
+        domain = factory.make_Domain()
+        self.create_node_with_static_ip(domain=domain)
+        serial, reloaded, domains = dns_update_all_zones(incremental=True)
+        self.assertThat(bind_reload, MockCalledOnceWith(timeout=2))
+        self.assertIn(domain.name, domains)
+
+    def test_dns_update_all_zones_incremental_reloads_changed_zones(self):
+        self.patch(settings, "DNS_CONNECT", True)
+        self.patch(dns_config_module, "_published_zones", PublishedZones())
+        domain = factory.make_Domain()
+        subnet = factory.make_Subnet(cidr=str(factory.make_ipv4_network()))
+        dns_update_all_zones(incremental=True)
+        bind_reload = self.patch(dns_config_module, "bind_reload")
+        node, static = self.create_node_with_static_ip(
+            domain=domain, subnet=subnet
+        )
+        serial, reloaded, domains = dns_update_all_zones(incremental=True)
+        self.assertThat(bind_reload, MockNotCalled())
+        self.assertThat(reloaded, Is(True))
+        self.assertThat(domains, Equals([domain.name]))
+        self.assertDNSMatches(node.hostname, domain.name, static.ip)
+
+    def test_dns_update_all_zones_incremental_skips_unchanged_zones(self):
+        self.patch(settings, "DNS_CONNECT", True)
+        self.patch(dns_config_module, "_published_zones", PublishedZones())
+        self.create_node_with_static_ip()
+        dns_update_all_zones(incremental=True)
+        bind_reload = self.patch(dns_config_module, "bind_reload")
+        bind_reload_zones = self.patch(dns_config_module, "bind_reload_zones")
+        DNSPublication(source=factory.make_name("source")).save()
+        serial, reloaded, domains = dns_update_all_zones(incremental=True)
+        self.assertThat(bind_reload, MockNotCalled())
+        self.assertThat(bind_reload_zones, MockNotCalled())
+        self.assertThat(reloaded, Is(True))
+        self.assertThat(domains, Equals([]))
+
+    def test_dns_update_all_zones_incremental_full_on_force_reload(self):
+        self.patch(settings, "DNS_CONNECT", True)
+        self.patch(dns_config_module, "_published_zones", PublishedZones())
+        dns_update_all_zones(incremental=True)
+        bind_reload = self.patch_autospec(dns_config_module, "bind_reload")
+        bind_reload.return_value = True
+        dns_force_reload()
+        dns_update_all_zones(incremental=True)
+        self.assertThat(bind_reload, MockCalledOnceWith(timeout=2))
+
+    def test_dns_update_all_zones_incremental_full_on_config_change(self):
+        self.patch(settings, "DNS_CONNECT", True)
+        self.patch(dns_config_module, "_published_zones", PublishedZones())
+        dns_update_all_zones(incremental=True)
+        bind_reload = self.patch_autospec(dns_config_module, "bind_reload")
+        bind_reload.return_value = True
+        Config.objects.set_config("upstream_dns", factory.make_ipv4_address())
+        dns_update_all_zones(incremental=True)
+        self.assertThat(bind_reload, MockCalledOnceWith(timeout=2))
+
+    def test_dns_update_all_zones_full_after_failed_reload(self):
+        self.patch(settings, "DNS_CONNECT", True)
+        self.patch(dns_config_module, "_published_zones", PublishedZones())
+        bind_reload = self.patch_autospec(dns_config_module, "bind_reload")
+        bind_reload.return_value = False
+        dns_update_all_zones(incremental=True)
+        bind_reload.return_value = True
+        dns_update_all_zones(incremental=True)
+        self.assertEqual(2, bind_reload.call_count)
+
+    def test_dns_update_all_zones_dynamic_full_update_freezes_zones(self):
+        self.patch(settings, "DNS_CONNECT", True)
+        published_zones = PublishedZones()
+        self.patch(dns_config_module, "_published_zones", published_zones)
+        Config.objects.set_config("dns_dynamic_updates", True)
+        freeze = self.patch_autospec(dns_config_module, "bind_freeze_zones")
+        thaw = self.patch_autospec(dns_config_module, "bind_thaw_zones")
+        domain = factory.make_Domain()
+        dns_update_all_zones(incremental=True)
+        self.assertThat(freeze, MockCalledOnceWith())
+        self.assertThat(thaw, MockCalledOnceWith())
+        self.assertIn(domain.name, published_zones.zone_records)
+        self.assertThat(
+            compose_config_path(DNSConfig.target_file_name),
+            FileContains(matcher=Contains("update-policy")),
+        )
+
+    def test_dns_update_all_zones_dynamic_sends_updates(self):
+        self.patch(settings, "DNS_CONNECT", True)
+        published_zones = PublishedZones()
+        self.patch(dns_config_module, "_published_zones", published_zones)
+        Config.objects.set_config("dns_dynamic_updates", True)
+        self.patch_autospec(dns_config_module, "bind_freeze_zones")
+        self.patch_autospec(dns_config_module, "bind_thaw_zones")
+        domain = factory.make_Domain()
+        dns_update_all_zones(incremental=True)
+        bind_reload = self.patch(dns_config_module, "bind_reload")
+        bind_reload_zones = self.patch(dns_config_module, "bind_reload_zones")
+        bind_update_zones = self.patch_autospec(
+            dns_config_module, "bind_update_zones"
+        )
+        bind_update_zones.return_value = [domain.name]
+        self.create_node_with_static_ip(domain=domain)
+        serial, reloaded, domains = dns_update_all_zones(incremental=True)
+        self.assertThat(bind_reload, MockNotCalled())
+        self.assertThat(bind_reload_zones, MockNotCalled())
+        self.assertThat(
+            bind_update_zones,
+            MockCalledOnceWith(ANY, published_zones.zone_records),
+        )
+        self.assertThat(reloaded, Is(True))
+        self.assertThat(domains, Equals([domain.name]))
+
+    def test_dns_update_all_zones_records_metrics(self):
+        self.patch(settings, "DNS_CONNECT", True)
+        metrics = self.patch(dns_config_module, "PROMETHEUS_METRICS")
+        dns_update_all_zones()
+        self.assertCountEqual(
+            [
+                "maas_dns_zone_render_latency",
+                "maas_dns_zone_apply_latency",
+                "maas_dns_serial_propagation_lag",
+            ],
+            [args[0] for args, _ in metrics.update.call_args_list],
+        )
+
+    def test_dns_update_all_zones_without_dynamic_updates_does_not_freeze(
+        self,
+    ):
+        self.patch(settings, "DNS_CONNECT", True)
+        self.patch(dns_config_module, "_published_zones", PublishedZones())
+        freeze = self.patch_autospec(dns_config_module, "bind_freeze_zones")
+        dns_update_all_zones(incremental=True)
+        self.assertThat(freeze, MockNotCalled())
+
+
+class TestGetRenderedZones(MAASServerTestCase):
+    """Tests for `get_rendered_zones`."""
+
+    def setUp(self):
+        super().setUp()
+        DNSPublication(source="Initial").save()
+        self.useFixture(RegionConfigurationFixture())
+
+    def test_renders_zones_once_per_serial(self):
+        domain = factory.make_Domain()
+        serial = DNSPublication.objects.get_most_recent().serial
+        render_zones = self.patch(
+            dns_config_module,
+            "render_zones",
+            Mock(side_effect=dns_config_module.render_zones),
+        )
+        zones = get_rendered_zones(serial)
+        # Another region controller uses the stored zones.
+        other_zones = get_rendered_zones(serial)
+        self.assertThat(render_zones, MockCalledOnceWith(serial, ANY))
+        self.assertIn(
+            domain.name, [zone.zone_info[0].zone_name for zone in zones]
+        )
+        self.assertEqual(
+            [(zone.zone_info[0].zone_name, zone.content) for zone in zones],
+            [
+                (zone.zone_info[0].zone_name, zone.content)
+                for zone in other_zones
+            ],
+        )
+
+    def test_renders_zones_per_dns_server_addresses(self):
+        serial = DNSPublication.objects.get_most_recent().serial
+        render_zones = self.patch(
+            dns_config_module,
+            "render_zones",
+            Mock(side_effect=dns_config_module.render_zones),
+        )
+        get_rendered_zones(serial)
+        with RegionConfiguration.open_for_update() as config:
+            config.maas_url = "http://%s/" % factory.make_ipv4_address()
+        get_rendered_zones(serial)
+        self.assertEqual(2, render_zones.call_count)
+
+    def test_only_renders_changed_zones(self):
+        domain = factory.make_Domain()
+        other_domain = factory.make_Domain()
+        get_rendered_zones(DNSPublication.objects.get_most_recent().serial)
+        self.create_node(domain)
+        publication = DNSPublication.objects.get_most_recent()
+        zones = {
+            zone.zone_info[0].zone_name: zone
+            for zone in get_rendered_zones(publication.serial)
+        }
+        self.assertEqual(publication.serial, zones[domain.name].serial)
+        self.assertNotEqual(
+            publication.serial, zones[other_domain.name].serial
+        )
+
+    def create_node(self, domain):
+        subnet = factory.make_Subnet()
+        node = factory.make_Node_with_Interface_on_Subnet(
+            subnet=subnet, domain=domain
+        )
+        factory.make_StaticIPAddress(
+            alloc_type=IPADDRESS_TYPE.STICKY,
+            subnet=subnet,
+            interface=node.get_boot_interface(),
+        )
+        return node
+
+
+class TestRenderPublishedZones(MAASServerTestCase):
+    """Tests for `render_published_zones`."""
+
+    def setUp(self):
+        super().setUp()
+        self.patch(settings, "DNS_CONNECT", True)
+        self.useFixture(RegionConfigurationFixture())
+
+    def test_renders_most_recent_publication(self):
+        publication = DNSPublication(source="Test")
+        publication.save()
+        render_published_zones()
+        servers_digest = dns_config_module.get_servers_digest()
+        self.assertTrue(
+            DNSZoneFile.objects.is_rendered(
+                publication.serial, servers_digest
+            )
+        )
+
+    def test_renders_once_per_serial(self):
+        DNSPublication(source="Test").save()
+        render_published_zones()
+        render_zones = self.patch(dns_config_module, "render_zones")
+        render_published_zones()
+        self.assertThat(render_zones, MockNotCalled())
+
+    def test_does_nothing_when_dns_is_disabled(self):
+        self.patch(settings, "DNS_CONNECT", False)
+        DNSPublication(source="Test").save()
+        render_zones = self.patch(dns_config_module, "render_zones")
+        render_published_zones()
+        self.assertThat(render_zones, MockNotCalled())
+
 
 class TestDNSDynamicIPAddresses(TestDNSServer):
     """Allocated nodes with IP addresses in the dynamic range get a DNS
@@ -14,6 +14,7 @@ from twisted.internet.task import Clock
 
 from maasserver.dns import publication
 from maasserver.models.dnspublication import DNSPublication
+from maasserver.models.dnszonefile import DNSZoneFile
 from maasserver.testing.testcase import MAASTransactionServerTestCase
 from maastesting.factory import factory
 from maastesting.matchers import (
@@ -111,6 +112,7 @@ class TestDNSPublicationGarbageServiceWithDatabase(
 
         self.patch(dnsgc, "_getInterval").side_effect = [0, 999]
         self.patch(DNSPublication.objects, "collect_garbage")
+        self.patch(DNSZoneFile.objects, "collect_garbage")
 
         yield dnsgc.startService()
         yield pause(0.0)  # Let the reactor tick.
@@ -119,3 +121,6 @@ class TestDNSPublicationGarbageServiceWithDatabase(
         self.assertThat(
             DNSPublication.objects.collect_garbage, MockCalledOnceWith(cutoff)
         )
+        self.assertThat(
+            DNSZoneFile.objects.collect_garbage, MockCalledOnceWith()
+        )
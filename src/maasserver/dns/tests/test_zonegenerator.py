@@ -27,7 +27,9 @@ from maasserver.dns.zonegenerator import (
     get_dns_server_address,
     get_dns_server_addresses,
     get_hostname_dnsdata_mapping,
+    get_hostname_dnsdata_mappings,
     get_hostname_ip_mapping,
+    get_hostname_ip_mappings,
     InternalDomain,
     InternalDomainResourse,
     InternalDomainResourseRecord,
@@ -48,6 +50,7 @@ from maasserver.testing.testcase import (
     MAASTransactionServerTestCase,
 )
 from maasserver.utils.orm import transactional
+from maastesting.djangotestcase import count_queries
 from maastesting.factory import factory as maastesting_factory
 from maastesting.fakemethod import FakeMethod
 from maastesting.matchers import MockAnyCall, MockCalledOnceWith, MockNotCalled
@@ -297,6 +300,67 @@ class TestGetHostnameMapping(MAASServerTestCase):
         actual = get_hostname_dnsdata_mapping(node.domain)
         self.assertItemsEqual(expected_mapping.items(), actual.items())
 
+    def make_domains_with_nodes(self, count):
+        domains = [Domain.objects.get_default_domain()] + [
+            factory.make_Domain() for _ in range(count - 1)
+        ]
+        subnet = factory.make_Subnet()
+        for domain in domains:
+            node = factory.make_Node(interface=True, domain=domain)
+            factory.make_StaticIPAddress(
+                alloc_type=IPADDRESS_TYPE.AUTO,
+                ip=factory.pick_ip_in_Subnet(subnet),
+                subnet=subnet,
+                interface=node.get_boot_interface(),
+            )
+            factory.make_DNSResource(domain=domain, subnet=subnet)
+            factory.make_DNSData(
+                name=node.hostname, domain=domain, rrtype="MX"
+            )
+            factory.make_DNSData(domain=domain)
+        factory.make_StaticIPAddress(
+            alloc_type=IPADDRESS_TYPE.USER_RESERVED,
+            ip=factory.pick_ip_in_Subnet(subnet),
+            subnet=subnet,
+        )
+        return domains, [subnet]
+
+    def test_get_hostname_ip_mappings_matches_individual_mappings(self):
+        domains, subnets = self.make_domains_with_nodes(3)
+        mappings = get_hostname_ip_mappings(domains, subnets)
+        for domain in domains:
+            self.assertItemsEqual(
+                get_hostname_ip_mapping(domain).items(),
+                mappings[domain].items(),
+            )
+        self.assertItemsEqual(
+            get_hostname_ip_mapping(subnets[0]).items(),
+            mappings["reverse"].items(),
+        )
+
+    def test_get_hostname_ip_mappings_without_subnets_has_no_reverse(self):
+        domains, _ = self.make_domains_with_nodes(2)
+        self.assertNotIn("reverse", get_hostname_ip_mappings(domains, []))
+
+    def test_get_hostname_dnsdata_mappings_matches_individual_mappings(self):
+        domains, _ = self.make_domains_with_nodes(3)
+        mappings = get_hostname_dnsdata_mappings(domains)
+        for domain in domains:
+            self.assertItemsEqual(
+                get_hostname_dnsdata_mapping(domain).items(),
+                mappings[domain].items(),
+            )
+
+    def test_mapping_queries_are_independent_of_num_domains(self):
+        domains, subnets = self.make_domains_with_nodes(2)
+        count_2, _ = count_queries(get_hostname_ip_mappings, domains, subnets)
+        count_rr_2, _ = count_queries(get_hostname_dnsdata_mappings, domains)
+        domains, subnets = self.make_domains_with_nodes(6)
+        count_6, _ = count_queries(get_hostname_ip_mappings, domains, subnets)
+        count_rr_6, _ = count_queries(get_hostname_dnsdata_mappings, domains)
+        self.assertEqual(count_2, count_6)
+        self.assertEqual(count_rr_2, count_rr_6)
+
 
 def forward_zone(domain):
     """Create a matcher for a :class:`DNSForwardZoneConfig`.
@@ -19,6 +19,7 @@ from maasserver.models.config import Config
 from maasserver.models.dnsdata import DNSData, HostnameRRsetMapping
 from maasserver.models.dnsresource import separate_fqdn
 from maasserver.models.domain import Domain
+from maasserver.models.iprange import IPRange
 from maasserver.models.staticipaddress import StaticIPAddress
 from maasserver.models.subnet import Subnet
 from maasserver.server_address import get_maas_facing_server_addresses
@@ -76,6 +77,37 @@ def get_hostname_dnsdata_mapping(domain):
     return DNSData.objects.get_hostname_dnsdata_mapping(domain, with_ids=False)
 
 
+def get_hostname_ip_mappings(domains, subnets):
+    """Return a mapping {domain -> {hostnames -> info}} for the allocated
+    nodes in each of `domains`.
+
+    If there are any `subnets`, the mapping for all subnets is included
+    under the key "reverse".  All of this is fetched in a fixed number of
+    queries, however many domains and subnets there are.
+    """
+    domain_mappings = (
+        StaticIPAddress.objects.get_hostname_ip_mappings_for_domains(domains)
+    )
+    mappings = {domain: domain_mappings[domain.id] for domain in domains}
+    if len(subnets) > 0:
+        # Since get_hostname_ip_mapping(Subnet) ignores Subnet.id, so we can
+        # just do it once and be happy.  LP#1600259
+        mappings["reverse"] = get_hostname_ip_mapping(subnets[0])
+    return mappings
+
+
+def get_hostname_dnsdata_mappings(domains):
+    """Return a mapping {domain -> {hostnames -> info}} for the DNSData
+    records in each of `domains`, fetched in a single query.
+    """
+    domain_mappings = (
+        DNSData.objects.get_hostname_dnsdata_mappings_for_domains(
+            domains, with_ids=False
+        )
+    )
+    return {domain: domain_mappings[domain.id] for domain in domains}
+
+
 WARNING_MESSAGE = (
     "The DNS server will use the address '%s',  which is inside the "
     "loopback network.  This may not be a problem if you're not using "
@@ -217,15 +249,13 @@ class ZoneGenerator:
         if self.internal_domains is None:
             self.internal_domains = []
 
-    @staticmethod
-    def _get_mappings():
-        """Return a lazily evaluated mapping dict."""
-        return lazydict(get_hostname_ip_mapping)
+    def _get_mappings(self):
+        """Return the hostname to IP mappings for all domains and subnets."""
+        return get_hostname_ip_mappings(self.domains, self.subnets)
 
-    @staticmethod
-    def _get_rrset_mappings():
-        """Return a lazily evaluated mapping dict."""
-        return lazydict(get_hostname_dnsdata_mapping)
+    def _get_rrset_mappings(self):
+        """Return the hostname to RRset mappings for all domains."""
+        return get_hostname_dnsdata_mappings(self.domains)
 
     @staticmethod
     def _gen_forward_zones(
@@ -358,10 +388,14 @@ class ZoneGenerator:
                     )
                     rfc2317_glue.setdefault(basenet, set()).add(network)
 
-        # Since get_hostname_ip_mapping(Subnet) ignores Subnet.id, so we can
-        # just do it once and be happy.  LP#1600259
-        if len(subnets):
-            mappings["reverse"] = mappings[Subnet.objects.first()]
+        # Fetch the dynamic ranges of all of the subnets at once.
+        dynamic_ranges_by_subnet = defaultdict(list)
+        for ip_range in IPRange.objects.filter(
+            type=IPRANGE_TYPE.DYNAMIC, subnet__in=subnets
+        ):
+            dynamic_ranges_by_subnet[ip_range.subnet_id].append(
+                ip_range.netaddr_iprange
+            )
 
         # For each of the zones that we are generating (one or more per
         # subnet), compile the zone from:
@@ -387,16 +421,13 @@ class ZoneGenerator:
                 continue
 
             # 1. Figure out the dynamic ranges.
-            dynamic_ranges = [
-                ip_range.netaddr_iprange
-                for ip_range in subnet.get_dynamic_ranges()
-            ]
+            dynamic_ranges = dynamic_ranges_by_subnet[subnet.id]
 
             # 2. Start with the map of all of the nodes, including all
             # DNSResource-associated addresses.  We will prune this to just
             # entries for the subnet when we actually generate the zonefile.
-            # If we get here, then we have subnets, so we noticed that above
-            # and created mappings['reverse'].  LP#1600259
+            # If we get here, then we have subnets, so get_hostname_ip_mappings
+            # created mappings['reverse'].  LP#1600259
             mapping = mappings["reverse"]
 
             # Use the default_domain as the name for the NS host in the reverse
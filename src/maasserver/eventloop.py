@@ -101,6 +101,12 @@ def make_StatsService():
     return stats.StatsService()
 
 
+def make_SubnetStatisticsService():
+    from maasserver import stats
+
+    return stats.SubnetStatisticsService()
+
+
 def make_PrometheusService():
     from maasserver.prometheus import stats
 
@@ -294,6 +300,11 @@ class RegionEventLoop:
             "factory": make_StatsService,
             "requires": [],
         },
+        "subnet-statistics": {
+            "only_on_master": True,
+            "factory": make_SubnetStatisticsService,
+            "requires": [],
+        },
         "prometheus": {
             "only_on_master": True,
             "factory": make_PrometheusService,
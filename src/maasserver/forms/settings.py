@@ -429,6 +429,20 @@ CONFIG_ITEMS = {
             ),
         },
     },
+    "dns_dynamic_updates": {
+        "default": False,
+        "form": forms.BooleanField,
+        "form_kwargs": {
+            "label": "Update DNS zones with dynamic updates",
+            "required": False,
+            "help_text": (
+                "Only used when MAAS is running its own DNS server. When "
+                "enabled, changes to DNS records are sent to the DNS server "
+                "as dynamic updates, rather than rewriting and reloading the "
+                "zone files."
+            ),
+        },
+    },
     "ntp_servers": {
         "default": None,
         "form": HostListFormField,
@@ -0,0 +1,182 @@
+# Copyright 2020 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Storage of the content of `LargeFile`s.
+
+The content of boot resource files is either kept in the database, in the
+large object of their `LargeFile`, or on the region's filesystem, in a file
+named after its sha256. The `image_storage` option of the region's
+configuration selects where new content is written. Content is read from the
+filesystem when it's there and from the database otherwise, so content saved
+before the option changed stays available; the `migrate_image_storage`
+command moves it from the database to the filesystem.
+"""
+
+__all__ = [
+    "DatabaseStorage",
+    "FilesystemStorage",
+    "get_filesystem_storage",
+    "get_storage",
+]
+
+from contextlib import suppress
+import os
+
+from maasserver.config import RegionConfiguration
+from provisioningserver.path import get_maas_data_path
+
+
+class DatabaseStorage:
+    """Stores content in the large object of the `LargeFile`.
+
+    Must be used within a transaction, which the content is saved with.
+    """
+
+    name = "database"
+
+    def has_content(self, largefile):
+        """Return whether the large object holds all the content.
+
+        It's left empty when the content is saved on the filesystem.
+        """
+        with largefile.content.open("rb") as stream:
+            stream.seek(0, os.SEEK_END)
+            return stream.tell() == largefile.total_size
+
+    def read(self, largefile, offset, size):
+        """Return at most `size` bytes of the content saved at `offset`."""
+        with largefile.content.open("rb") as stream:
+            stream.seek(offset)
+            return stream.read(size)
+
+    def write(self, largefile, offset, data):
+        """Write `data` into the content at `offset`."""
+        with largefile.content.open("wb") as stream:
+            stream.seek(offset)
+            stream.write(data)
+
+    def truncate(self, largefile, size):
+        """Truncate the content saved so far to `size`."""
+        with largefile.content.open("wb") as stream:
+            stream.truncate(size)
+
+    def commit(self, largefile):
+        """Make the content saved so far the content of `largefile`.
+
+        The content is committed with the transaction, nothing to do.
+        """
+
+    def discard(self, largefile):
+        """Remove the content saved so far.
+
+        The large object is removed with the `LargeFile`, nothing to do.
+        """
+
+
+class FilesystemStorage:
+    """Stores content in files under `path`, named after its sha256.
+
+    Content is saved into a partial file, that is renamed once committed.
+    Committed content never changes, as it's addressed by its sha256, so
+    writing to it does nothing.
+    """
+
+    name = "filesystem"
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_path(self, largefile):
+        """Return the path to the committed content of `largefile`."""
+        return os.path.join(self.path, largefile.sha256)
+
+    def _get_partial_path(self, largefile):
+        return self.get_path(largefile) + ".partial"
+
+    def has_content(self, largefile):
+        """Return whether the content of `largefile` is committed."""
+        return os.path.exists(self.get_path(largefile))
+
+    def open(self, largefile):
+        """Open the committed content of `largefile` for reading."""
+        return open(self.get_path(largefile), "rb")
+
+    def read(self, largefile, offset, size):
+        """Return at most `size` bytes of the content saved at `offset`."""
+        paths = self.get_path(largefile), self._get_partial_path(largefile)
+        for path in paths:
+            with suppress(FileNotFoundError), open(path, "rb") as stream:
+                stream.seek(offset)
+                return stream.read(size)
+        return b""
+
+    def _open_partial(self, largefile):
+        os.makedirs(self.path, exist_ok=True)
+        return os.open(
+            self._get_partial_path(largefile), os.O_WRONLY | os.O_CREAT, 0o644
+        )
+
+    def write(self, largefile, offset, data):
+        """Write `data` into the content at `offset`."""
+        if self.has_content(largefile):
+            return
+        fd = self._open_partial(largefile)
+        try:
+            os.pwrite(fd, data, offset)
+        finally:
+            os.close(fd)
+
+    def truncate(self, largefile, size):
+        """Truncate the content saved so far to `size`."""
+        if self.has_content(largefile):
+            return
+        fd = self._open_partial(largefile)
+        try:
+            os.ftruncate(fd, size)
+        finally:
+            os.close(fd)
+
+    def commit(self, largefile):
+        """Make the content saved so far the content of `largefile`."""
+        if self.has_content(largefile):
+            return
+        fd = self._open_partial(largefile)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.rename(self._get_partial_path(largefile), self.get_path(largefile))
+
+    def discard(self, largefile):
+        """Remove the content saved so far, unless committed."""
+        with suppress(FileNotFoundError):
+            os.remove(self._get_partial_path(largefile))
+
+    def delete(self, largefile):
+        """Remove the content of `largefile`, committed or not."""
+        self.discard(largefile)
+        with suppress(FileNotFoundError):
+            os.remove(self.get_path(largefile))
+
+
+def get_filesystem_storage():
+    """Return the `FilesystemStorage` at the configured path.
+
+    This is returned whether or not new content is written to the
+    filesystem, as content may have been written to it before.
+    """
+    with RegionConfiguration.open() as config:
+        path = config.image_storage_path
+    if not path:
+        path = get_maas_data_path("image-storage")
+    return FilesystemStorage(path)
+
+
+def get_storage():
+    """Return the storage new content is written to, as configured."""
+    with RegionConfiguration.open() as config:
+        image_storage = config.image_storage
+    if image_storage == FilesystemStorage.name:
+        return get_filesystem_storage()
+    else:
+        return DatabaseStorage()
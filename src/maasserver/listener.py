@@ -7,6 +7,7 @@
 from collections import defaultdict
 from errno import ENOENT
 import threading
+from time import time
 
 from django.db import connections
 from django.db.utils import load_backend
@@ -15,7 +16,9 @@ from twisted.internet import defer, error, interfaces, reactor, task
 from twisted.internet.defer import (
     CancelledError,
     Deferred,
+    DeferredSemaphore,
     ensureDeferred,
+    inlineCallbacks,
     succeed,
 )
 from twisted.internet.task import deferLater
@@ -24,6 +27,7 @@ from twisted.logger import Logger
 from twisted.python.failure import Failure
 from zope.interface import implementer
 
+from provisioningserver.prometheus.metrics import PROMETHEUS_METRICS
 from provisioningserver.utils.enum import map_enum
 from provisioningserver.utils.events import EventGroup
 from provisioningserver.utils.twisted import callOut, suppress, synchronous
@@ -75,13 +79,22 @@ class PostgresListenerService(Service, object):
     HANDLE_NOTIFY_DELAY = 0.5
     CHANNEL_REGISTRAR_DELAY = 0.5
 
+    # The maximum number of notifications of a channel being handled at once.
+    HANDLE_NOTIFY_CONCURRENCY = 4
+
+    # The maximum number of notifications passed at once to a handler that
+    # receives them in batches.
+    HANDLE_NOTIFY_BATCH_SIZE = 100
+
     def __init__(self, alias="default"):
         self.alias = alias
         self.listeners = defaultdict(list)
+        self.batchListeners = defaultdict(list)
         self.autoReconnect = False
         self.connection = None
         self.connectionFileno = None
-        self.notifications = set()
+        # The notifications to handle, mapped to when they were received.
+        self.notifications = {}
         self.notifier = task.LoopingCall(self.handleNotifies)
         self.notifierDone = None
         self.connecting = None
@@ -173,11 +186,15 @@ class PostgresListenerService(Service, object):
         finally:
             self.connectionFileno = None
 
-    def register(self, channel, handler):
+    def register(self, channel, handler, batch=False):
         """Register listening for notifications from a channel.
 
         When a notification is received for that `channel` the `handler` will
         be called with the action and object id.
+
+        :param batch: If True, `handler` is instead called with a list of
+            `(action, object id)` tuples, for up to `HANDLE_NOTIFY_BATCH_SIZE`
+            notifications of that `channel` at once.
         """
         self.log.debug(f"Register on {channel} with handler {handler}")
         handlers = self.listeners[channel]
@@ -190,8 +207,14 @@ class PostgresListenerService(Service, object):
             raise PostgresListenerRegistrationError(
                 "System channel '%s' has already been registered." % channel
             )
+        elif self.isSystemChannel(channel) and batch:
+            raise PostgresListenerRegistrationError(
+                "System channel '%s' can't be handled in batches." % channel
+            )
         else:
             handlers.append(handler)
+            if batch:
+                self.batchListeners[channel].append(handler)
         self.runChannelRegistrar()
 
     def unregister(self, channel, handler):
@@ -211,6 +234,10 @@ class PostgresListenerService(Service, object):
             raise PostgresListenerUnregistrationError(
                 "Handler is not registered on that channel '%s'." % channel
             )
+        if handler in self.batchListeners.get(channel, ()):
+            self.batchListeners[channel].remove(handler)
+            if len(self.batchListeners[channel]) == 0:
+                del self.batchListeners[channel]
         if len(handlers) == 0:
             # Channels have already been registered. Unregister the channel.
             del self.listeners[channel]
@@ -430,19 +457,61 @@ class PostgresListenerService(Service, object):
             return succeed(None)
 
     def handleNotifies(self, clock=reactor):
-        """Process all notify message in the notifications set."""
-
-        def gen_notifications(notifications):
-            while len(notifications) != 0:
-                yield notifications.pop()
+        """Process all notify message in the notifications set.
 
-        return task.coiterate(
-            self.handleNotify(notification, clock=clock)
-            for notification in gen_notifications(self.notifications)
+        The notifications of each channel are handled concurrently with
+        those of other channels, but only `HANDLE_NOTIFY_CONCURRENCY` at a
+        time. Handlers registered for batches receive them in batches, one
+        batch at a time.
+        """
+        PROMETHEUS_METRICS.update(
+            "maas_db_notify_queue_depth",
+            "set",
+            value=len(self.notifications),
         )
+        if len(self.notifications) == 0:
+            return succeed(None)
+        notifications, self.notifications = self.notifications, {}
+
+        by_channel = defaultdict(list)
+        for notification, received in notifications.items():
+            try:
+                channel, action = self.convertChannel(notification[0])
+            except PostgresListenerNotifyError:
+                # Log the error and continue processing the remaining
+                # notifications.
+                self.log.failure(
+                    "Failed to convert channel {channel!r}.",
+                    channel=notification[0],
+                )
+            else:
+                by_channel[channel].append((notification, action, received))
+
+        defers = []
+        for channel, notifies in by_channel.items():
+            batch_handlers = list(self.batchListeners.get(channel, ()))
+            if len(self.listeners[channel]) > len(batch_handlers):
+                semaphore = DeferredSemaphore(self.HANDLE_NOTIFY_CONCURRENCY)
+                for notification, _, received in notifies:
+                    d = semaphore.run(
+                        self.handleNotify, notification, clock=clock
+                    )
+                    d.addCallback(
+                        callOut, self._recordNotifyLatency, channel, [received]
+                    )
+                    defers.append(d)
+            for handler in batch_handlers:
+                defers.append(
+                    self.handleNotifyBatches(channel, handler, notifies)
+                )
+        return defer.DeferredList(defers)
 
     def handleNotify(self, notification, clock=reactor):
-        """Process a notify message in the notifications set."""
+        """Process a notify message in the notifications set.
+
+        This calls the handlers of the channel that aren't registered for
+        batches.
+        """
         channel, payload = notification
         try:
             channel, action = self.convertChannel(channel)
@@ -454,9 +523,11 @@ class PostgresListenerService(Service, object):
             )
         else:
             defers = []
-            handlers = self.listeners[channel]
-            # XXX: There could be an arbitrary number of listeners. Should we
-            # limit concurrency here? Perhaps even do one at a time.
+            handlers = [
+                handler
+                for handler in self.listeners[channel]
+                if handler not in self.batchListeners.get(channel, ())
+            ]
             for handler in handlers:
                 d = defer.maybeDeferred(handler, action, payload)
                 d.addErrback(
@@ -471,9 +542,50 @@ class PostgresListenerService(Service, object):
                 defers.append(d)
             return defer.DeferredList(defers)
 
+    @inlineCallbacks
+    def handleNotifyBatches(self, channel, handler, notifies):
+        """Pass `notifies` for `channel` to `handler` in batches.
+
+        :param notifies: A list of `(notification, action, received)` tuples.
+        """
+        size = self.HANDLE_NOTIFY_BATCH_SIZE
+        for start in range(0, len(notifies), size):
+            batch = notifies[start : start + size]
+            try:
+                yield defer.maybeDeferred(
+                    handler,
+                    [
+                        (action, notification[1])
+                        for notification, action, _ in batch
+                    ],
+                )
+            except Exception:
+                self.log.failure(
+                    "Failure while handling {count} notifications to "
+                    "{channel!r}.",
+                    count=len(batch),
+                    channel=channel,
+                )
+            self._recordNotifyLatency(
+                channel, [received for _, _, received in batch]
+            )
+
+    def _recordNotifyLatency(self, channel, received):
+        handled = time()
+        for when in received:
+            PROMETHEUS_METRICS.update(
+                "maas_db_notify_latency",
+                "observe",
+                value=handled - when,
+                labels={"channel": channel},
+            )
+
     def _process_notifies(self):
         """Add each notify to to the notifications set.
 
+        Notifications are mapped to when they were first received, to
+        measure how long they take to be handled.
+
         This removes duplicate notifications when one entity in the database is
         updated multiple times in a short interval. Accumulating notifications
         and allowing the listener to pick them up in batches is imperfect but
@@ -502,7 +614,9 @@ class PostgresListenerService(Service, object):
             else:
                 # Place non-system messages into the queue to be
                 # processed.
-                self.notifications.add((notify.channel, notify.payload))
+                self.notifications.setdefault(
+                    (notify.channel, notify.payload), time()
+                )
         # Delete the contents of the connection's notifies list so
         # that we don't process them a second time.
         del notifies[:]
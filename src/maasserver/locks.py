@@ -6,6 +6,7 @@
 __all__ = [
     "address_allocation",
     "dns",
+    "dns_render",
     "eventloop",
     "import_images",
     "node_acquire",
@@ -51,3 +52,7 @@ try_active_discovery = DatabaseLock(10).TRY
 
 # Lock to sync information to RBAC.
 rbac_sync = DatabaseLock(11)
+
+# Lock to render DNS zones once for all region controllers. It's held across
+# the rendering transaction, so that waiters see the stored zone files.
+dns_render = DatabaseLock(12)
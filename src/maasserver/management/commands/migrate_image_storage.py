@@ -0,0 +1,83 @@
+# Copyright 2020 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Django command: move boot image files from the database to the
+filesystem."""
+
+
+from functools import partial
+import hashlib
+from textwrap import dedent
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+from maasserver.largefilestorage import FilesystemStorage, get_storage
+from maasserver.models import LargeFile
+from maasserver.utils.orm import transactional
+
+# Copy at 10MiB per chunk.
+CHUNK_SIZE = 1024 * 1024 * 10
+
+
+@transactional
+def move_to_filesystem(storage, largefile_id):
+    """Move the content of the `LargeFile` with `largefile_id` from its large
+    object to `storage`.
+
+    The content is only removed from the large object once it has been
+    committed to `storage` and its sha256 checked.
+
+    :return: Whether the content was moved.
+    """
+    largefile = LargeFile.objects.get(id=largefile_id)
+    if storage.has_content(largefile):
+        return True
+    sha256 = hashlib.sha256()
+    offset = 0
+    storage.truncate(largefile, 0)
+    with largefile.content.open("rb") as stream:
+        for data in iter(partial(stream.read, CHUNK_SIZE), b""):
+            storage.write(largefile, offset, data)
+            sha256.update(data)
+            offset += len(data)
+    if sha256.hexdigest() != largefile.sha256:
+        storage.discard(largefile)
+        return False
+    storage.commit(largefile)
+    with largefile.content.open("wb") as stream:
+        stream.truncate(0)
+    return True
+
+
+class Command(BaseCommand):
+    """Moves the boot image files stored in the database to the filesystem,
+    once `image_storage` is set to 'filesystem'."""
+
+    help = dedent(
+        "Moves the boot image files stored in the database to the directory "
+        "set by image_storage_path. Requires image_storage to be set to "
+        "'filesystem'. Run db_vacuum_lobjects afterwards to reclaim the "
+        "space the files used in the database."
+    )
+
+    def handle(self, **options):
+        storage = get_storage()
+        if storage.name != FilesystemStorage.name:
+            raise CommandError(
+                "Boot image files are stored in the %s; set image_storage "
+                "to 'filesystem' first." % storage.name
+            )
+        # Files that are still being written are left for the import to
+        # finish; they are written to the filesystem as it's configured.
+        largefile_ids = LargeFile.objects.filter(
+            size=F("total_size")
+        ).values_list("id", "sha256")
+        for largefile_id, sha256 in transactional(list)(largefile_ids):
+            if move_to_filesystem(storage, largefile_id):
+                self.stdout.write("Moved %s." % sha256)
+            else:
+                self.stderr.write(
+                    "Not moving %s, its content doesn't match its sha256."
+                    % sha256
+                )
@@ -91,7 +91,9 @@ class TestConfigurationReset(MAASTestCase):
         self.useFixture(RegionConfigurationFixture())
         with RegionConfiguration.open_for_update() as configuration:
             # Give the option a random value.
-            if isinstance(getattr(configuration, self.option), str):
+            if self.option == "image_storage":
+                value = "filesystem"
+            elif isinstance(getattr(configuration, self.option), str):
                 value = factory.make_name("foobar")
             else:
                 value = factory.pick_port()
@@ -125,7 +127,11 @@ class TestConfigurationSet(MAASTestCase):
             "database_keepalive_idle",
         ):
             value = random.randint(0, 60)
-        elif self.option == "num_workers":
+        elif self.option in (
+            "num_workers",
+            "image_write_threads",
+            "image_write_memory",
+        ):
             value = random.randint(1, 16)
         elif self.option in [
             "debug",
@@ -134,6 +140,8 @@ class TestConfigurationSet(MAASTestCase):
             "database_keepalive",
         ]:
             value = random.choice([True, False])
+        elif self.option == "image_storage":
+            value = random.choice(["database", "filesystem"])
         else:
             value = factory.make_name("foobar")
 
@@ -0,0 +1,50 @@
+# Generated by Django 2.2.12 on 2020-10-26 10:12
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maasserver", "0219_vm_nic_link"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DNSZoneFile",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "zone_name",
+                    models.CharField(editable=False, max_length=255),
+                ),
+                (
+                    "servers_digest",
+                    models.CharField(editable=False, max_length=64),
+                ),
+                ("serial", models.BigIntegerField(editable=False)),
+                ("zone_serial", models.BigIntegerField(editable=False)),
+                ("digest", models.CharField(editable=False, max_length=64)),
+                ("content", models.TextField(editable=False)),
+                (
+                    "records",
+                    django.contrib.postgres.fields.jsonb.JSONField(
+                        editable=False
+                    ),
+                ),
+                ("updated", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "unique_together": {("zone_name", "servers_digest")},
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 2.2.12 on 2020-11-02 09:41
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maasserver", "0220_dnszonefile"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SubnetStatistics",
+            fields=[
+                (
+                    "subnet",
+                    models.OneToOneField(
+                        db_constraint=False,
+                        editable=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        serialize=False,
+                        to="maasserver.Subnet",
+                    ),
+                ),
+                (
+                    "statistics",
+                    django.contrib.postgres.fields.jsonb.JSONField(
+                        editable=False
+                    ),
+                ),
+                (
+                    "utilisation",
+                    django.contrib.postgres.fields.jsonb.JSONField(
+                        editable=False
+                    ),
+                ),
+                ("updated", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 2.2.12 on 2020-11-09 14:03
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("maasserver", "0221_subnetstatistics"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NodeTagEvaluation",
+            fields=[
+                (
+                    "node",
+                    models.OneToOneField(
+                        editable=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to="maasserver.Node",
+                    ),
+                ),
+                (
+                    "details_digest",
+                    models.CharField(editable=False, max_length=64),
+                ),
+                (
+                    "tags_digest",
+                    models.CharField(editable=False, max_length=64),
+                ),
+                (
+                    "matching",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.IntegerField(),
+                        default=list,
+                        editable=False,
+                        size=None,
+                    ),
+                ),
+                ("updated", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
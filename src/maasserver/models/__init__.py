@@ -26,6 +26,7 @@ __all__ = [
     "DNSData",
     "DNSPublication",
     "DNSResource",
+    "DNSZoneFile",
     "Domain",
     "Event",
     "EventType",
@@ -47,6 +48,7 @@ __all__ = [
     "Neighbour",
     "Node",
     "NodeMetadata",
+    "NodeTagEvaluation",
     "NodeGroupToRackController",
     "Notification",
     "NUMANode",
@@ -79,6 +81,7 @@ __all__ = [
     "StaticIPAddress",
     "StaticRoute",
     "Subnet",
+    "SubnetStatistics",
     "Switch",
     "Tag",
     "Template",
@@ -123,6 +126,7 @@ from maasserver.models.discovery import Discovery
 from maasserver.models.dnsdata import DNSData
 from maasserver.models.dnspublication import DNSPublication
 from maasserver.models.dnsresource import DNSResource
+from maasserver.models.dnszonefile import DNSZoneFile
 from maasserver.models.domain import Domain
 from maasserver.models.event import Event
 from maasserver.models.eventtype import EventType
@@ -163,6 +167,7 @@ from maasserver.models.node import (
     RegionController,
 )
 from maasserver.models.nodemetadata import NodeMetadata
+from maasserver.models.nodetagevaluation import NodeTagEvaluation
 from maasserver.models.notification import Notification
 from maasserver.models.numa import NUMANode, NUMANodeHugepages
 from maasserver.models.ownerdata import OwnerData
@@ -188,6 +193,7 @@ from maasserver.models.sslkey import SSLKey
 from maasserver.models.staticipaddress import StaticIPAddress
 from maasserver.models.staticroute import StaticRoute
 from maasserver.models.subnet import Subnet
+from maasserver.models.subnetstatistics import SubnetStatistics
 from maasserver.models.switch import Switch
 from maasserver.models.tag import Tag
 from maasserver.models.template import Template
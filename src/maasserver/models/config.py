@@ -66,6 +66,7 @@ def get_default_config():
         "upstream_dns": None,
         "dnssec_validation": "auto",
         "dns_trusted_acl": None,
+        "dns_dynamic_updates": False,
         "maas_internal_domain": "maas-internal",
         # NTP settings
         "ntp_servers": "ntp.ubuntu.com",
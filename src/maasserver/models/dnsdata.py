@@ -146,6 +146,24 @@ class DNSDataManager(Manager, DNSDataQueriesMixin):
         self, domain, raw_ttl=False, with_ids=True
     ):
         """Return hostname to RRset mapping for this domain."""
+        mappings = self.get_hostname_dnsdata_mappings_for_domains(
+            [domain], raw_ttl=raw_ttl, with_ids=with_ids
+        )
+        return mappings[domain.id]
+
+    def get_hostname_dnsdata_mappings_for_domains(
+        self, domains, raw_ttl=False, with_ids=True
+    ):
+        """Return hostname to RRset mappings for each of `domains`.
+
+        This is equivalent to calling `get_hostname_dnsdata_mapping` for each
+        domain, but uses a single query however many domains there are.
+
+        :return: a dict of domain id: hostname to RRset mapping.
+        """
+        domains = {domain.id: domain for domain in domains}
+        if len(domains) == 0:
+            return {}
         cursor = connection.cursor()
         default_ttl = "%d" % Config.objects.get_config("default_dns_ttl")
         if raw_ttl:
@@ -173,7 +191,9 @@ class DNSDataManager(Manager, DNSDataQueriesMixin):
             + ttl_clause
             + """ AS ttl,
                 dnsdata.rrtype,
-                dnsdata.rrdata
+                dnsdata.rrdata,
+                dnsresource.domain_id,
+                node.fqdn IS NOT NULL AS has_node
             FROM maasserver_dnsdata AS dnsdata
             JOIN maasserver_dnsresource AS dnsresource ON
                 dnsdata.dnsresource_id = dnsresource.id
@@ -219,13 +239,16 @@ class DNSDataManager(Manager, DNSDataQueriesMixin):
                     )
                 )
             WHERE
-                /* The entries must be in this domain (though node.domain_id
+                /* The entries must be in these domains (though node.domain_id
                  * may be out-of-domain and that's OK.
                  * Additionally, if there is a CNAME and a node, then the node
                  * wins, and we drop the CNAME until the node no longer has the
                  * same name.
                  */
-                (dnsresource.domain_id = %s OR node.fqdn IS NOT NULL) AND
+                (
+                    dnsresource.domain_id = ANY(%s) OR
+                    node.fqdn IS NOT NULL
+                ) AND
                 (dnsdata.rrtype != 'CNAME' OR node.fqdn IS NULL)
             ORDER BY
                 dnsresource.name,
@@ -236,8 +259,11 @@ class DNSDataManager(Manager, DNSDataQueriesMixin):
         # N.B.: The "node.hostname IS NULL" above is actually checking that
         # no node exists with the same name, in order to make sure that we do
         # not spill CNAME and other data.
-        mapping = defaultdict(HostnameRRsetMapping)
-        cursor.execute(sql_query, (domain.id,))
+        mappings = {
+            domain_id: defaultdict(HostnameRRsetMapping)
+            for domain_id in domains
+        }
+        cursor.execute(sql_query, (list(domains),))
         for (
             dnsresource_id,
             name,
@@ -249,28 +275,39 @@ class DNSDataManager(Manager, DNSDataQueriesMixin):
             ttl,
             rrtype,
             rrdata,
+            dnsresource_domain_id,
+            has_node,
         ) in cursor.fetchall():
-            if name == "@" and d_name != domain.name:
-                name, d_name = d_name.split(".", 1)
-                # Since we don't allow more than one label in dnsresource
-                # names, we should never ever be wrong in this assertion.
-                assert (
-                    d_name == domain.name
-                ), "Invalid domain; expected '%s' == '%s'" % (
-                    d_name,
-                    domain.name,
-                )
-            entry = mapping[name]
-            entry.node_type = node_type
-            entry.system_id = system_id
-            entry.user_id = user_id
-            if with_ids:
-                entry.dnsresource_id = dnsresource_id
-                rrtuple = (ttl, rrtype, rrdata, dnsdata_id)
+            if has_node:
+                domain_ids = list(domains)
+            elif dnsresource_domain_id in domains:
+                domain_ids = [dnsresource_domain_id]
             else:
-                rrtuple = (ttl, rrtype, rrdata)
-            entry.rrset.add(rrtuple)
-        return mapping
+                domain_ids = []
+            for domain_id in domain_ids:
+                domain = domains[domain_id]
+                entry_name = name
+                if name == "@" and d_name != domain.name:
+                    entry_name, entry_d_name = d_name.split(".", 1)
+                    # Since we don't allow more than one label in dnsresource
+                    # names, we should never ever be wrong in this assertion.
+                    assert (
+                        entry_d_name == domain.name
+                    ), "Invalid domain; expected '%s' == '%s'" % (
+                        entry_d_name,
+                        domain.name,
+                    )
+                entry = mappings[domain_id][entry_name]
+                entry.node_type = node_type
+                entry.system_id = system_id
+                entry.user_id = user_id
+                if with_ids:
+                    entry.dnsresource_id = dnsresource_id
+                    rrtuple = (ttl, rrtype, rrdata, dnsdata_id)
+                else:
+                    rrtuple = (ttl, rrtype, rrdata)
+                entry.rrset.add(rrtuple)
+        return mappings
 
 
 class DNSData(CleanSave, TimestampedModel):
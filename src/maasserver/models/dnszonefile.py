@@ -0,0 +1,127 @@
+# Copyright 2020 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""DNS zone file model objects."""
+
+
+from django.contrib.postgres.fields import JSONField
+from django.db.models import Manager, Max, Model
+from django.db.models.fields import (
+    BigIntegerField,
+    CharField,
+    DateTimeField,
+    TextField,
+)
+
+from maasserver import DefaultMeta
+
+
+class DNSZoneFileManager(Manager):
+    """Manager for DNS zone file records."""
+
+    def is_rendered(self, serial, servers_digest):
+        """Have the zone files been rendered for `serial` yet?"""
+        return self.filter(
+            serial=serial, servers_digest=servers_digest
+        ).exists()
+
+    def get_digests(self, servers_digest):
+        """Return a dict mapping zone names to the digest of their content."""
+        return dict(
+            self.filter(servers_digest=servers_digest).values_list(
+                "zone_name", "digest"
+            )
+        )
+
+    def store_rendered(self, serial, servers_digest, zone_names, rendered):
+        """Store the zone files rendered for `serial`.
+
+        :param serial: The serial of the publication that was rendered.
+        :param servers_digest: The digest of the DNS server addresses the
+            zones were rendered with.
+        :param zone_names: The names of all the zones published with
+            `serial`.  The zone files of any other zones are deleted.
+        :param rendered: A list of `DNSRenderedZoneConfig` for the zones
+            whose content changed since they were last stored.
+        """
+        zone_files = self.filter(servers_digest=servers_digest)
+        zone_files.exclude(zone_name__in=zone_names).delete()
+        for zone in rendered:
+            self.update_or_create(
+                zone_name=zone.zone_info[0].zone_name,
+                servers_digest=servers_digest,
+                defaults={
+                    "serial": serial,
+                    "zone_serial": serial,
+                    "digest": zone.digest,
+                    "content": zone.content,
+                    "records": zone.records.to_dict(),
+                },
+            )
+        zone_files.update(serial=serial)
+
+    def collect_garbage(self):
+        """Delete the zone files that no region controller publishes.
+
+        The zone files rendered for DNS server addresses that are no longer
+        used, e.g. after a region controller's MAAS URL changed, stop being
+        updated.  They are deleted once the publication they were last
+        rendered for has been deleted in turn, see
+        `DNSPublicationManager.collect_garbage`.
+        """
+        # Circular imports.
+        from maasserver.models.dnspublication import DNSPublication
+
+        published = DNSPublication.objects.values_list("serial", flat=True)
+        published = set(published)
+        latest = self.values_list("servers_digest").annotate(Max("serial"))
+        stale = [
+            servers_digest
+            for servers_digest, serial in latest
+            if serial not in published
+        ]
+        if stale:
+            self.filter(servers_digest__in=stale).delete()
+
+
+class DNSZoneFile(Model):
+    """A zone file, rendered once for all region controllers.
+
+    A single region controller generates and renders the zones for each DNS
+    publication, see `maasserver.dns.config.get_rendered_zones`.  The others
+    only write out the zone files stored here and reload BIND.
+    """
+
+    class Meta(DefaultMeta):
+        """Needed for South to recognize this model."""
+
+        unique_together = ("zone_name", "servers_digest")
+
+    objects = DNSZoneFileManager()
+
+    zone_name = CharField(max_length=255, editable=False, null=False)
+
+    # The zones list the region controller's own addresses as name servers,
+    # and those depend on its MAAS URL. Region controllers that render the
+    # same addresses, whose digest this is, share their zone files.
+    servers_digest = CharField(max_length=64, editable=False, null=False)
+
+    # The serial of the most recent publication for which the zones were
+    # rendered. The content may have been rendered for an earlier serial, if
+    # the zone has not changed since.
+    serial = BigIntegerField(editable=False, null=False)
+
+    # The serial in the zone's SOA record, i.e. that of the publication for
+    # which the content was rendered.
+    zone_serial = BigIntegerField(editable=False, null=False)
+
+    # The digest of the content, see `get_zone_digest`.
+    digest = CharField(max_length=64, editable=False, null=False)
+
+    content = TextField(editable=False, null=False)
+
+    # The `ZoneRecords` of the zone, see `ZoneRecords.to_dict`.
+    records = JSONField(editable=False, null=False)
+
+    # This field is informational.
+    updated = DateTimeField(editable=False, null=False, auto_now=True)
@@ -339,6 +339,47 @@ class InterfaceManager(Manager, InterfaceQueriesMixin):
             )
         return self.filter(ip_addresses=static_ip_address)
 
+    def claim_auto_ips(
+        self, interfaces, temp_expires_after=None, exclude_addresses=None
+    ):
+        """Claim IP addresses for the AUTO IP addresses of `interfaces`.
+
+        The addresses for all of them are assigned together, with
+        `StaticIPAddressManager.assign_bulk`.
+
+        :param temp_expires_after: See `Interface.claim_auto_ips`.
+        :param exclude_addresses: See `Interface.claim_auto_ips`.
+        :return: A list of (interface, claimed `StaticIPAddress`) tuples.
+        """
+        claims = [
+            (interface, auto_ip)
+            for interface in interfaces
+            for auto_ip in interface._get_auto_ips_to_claim()
+        ]
+        if len(claims) == 0:
+            return []
+        # Set temp_expires_on when temp_expires_after is provided, meaning the
+        # IP assignments are only temporary until the IP addresses can be
+        # validated as free.
+        if temp_expires_after is not None:
+            temp_expires_on = datetime.utcnow() + temp_expires_after
+            for _, auto_ip in claims:
+                auto_ip.temp_expires_on = temp_expires_on
+        StaticIPAddress.objects.assign_bulk(
+            [auto_ip for _, auto_ip in claims],
+            exclude_addresses=exclude_addresses,
+        )
+        # Only log the allocations when the assignments are not temporary.
+        # Its the callers responsibility to log this information after the
+        # check is performed.
+        if temp_expires_after is None:
+            for interface, auto_ip in claims:
+                maaslog.info(
+                    "Allocated automatic IP address %s for %s."
+                    % (auto_ip.ip, interface.get_log_string())
+                )
+        return claims
+
     def get_all_interfaces_definition_for_node(self, node):
         """Returns the interfaces definition for the specified node.
 
@@ -1285,68 +1326,33 @@ class Interface(CleanSave, TimestampedModel):
             runs to identify available IP address does not include the already
             allocated IP addresses.
         """
-        if exclude_addresses is None:
-            exclude_addresses = set()
-        else:
-            exclude_addresses = set(exclude_addresses)
-        assigned_addresses = []
-        for auto_ip in self.ip_addresses.filter(
-            alloc_type=IPADDRESS_TYPE.AUTO
-        ):
-            if not auto_ip.ip:
-                assigned_ip = self._claim_auto_ip(
-                    auto_ip,
-                    temp_expires_after=temp_expires_after,
-                    exclude_addresses=exclude_addresses,
-                )
-                if assigned_ip is not None:
-                    assigned_addresses.append(assigned_ip)
-                    exclude_addresses.add(str(assigned_ip.ip))
-        return assigned_addresses
-
-    def _claim_auto_ip(
-        self, auto_ip, temp_expires_after=None, exclude_addresses=None
-    ):
-        """Claim an IP address for the `auto_ip`."""
-        subnet = auto_ip.subnet
-        if subnet is None:
-            maaslog.error(
-                "Could not find subnet for interface %s."
-                % (self.get_log_string())
-            )
-            raise StaticIPAddressUnavailable(
-                "Automatic IP address cannot be configured on interface %s "
-                "without an associated subnet." % self.get_name()
-            )
-
-        # Allocate a new IP address from the entire subnet, excluding already
-        # allocated addresses and ranges.
-        new_ip = StaticIPAddress.objects.allocate_new(
-            subnet=subnet,
-            alloc_type=IPADDRESS_TYPE.AUTO,
+        claims = Interface.objects.claim_auto_ips(
+            [self],
+            temp_expires_after=temp_expires_after,
             exclude_addresses=exclude_addresses,
         )
-        auto_ip.ip = new_ip.ip
-        # Throw away the newly-allocated address and assign it to the old AUTO
-        # address, so that the interface link IDs remain consistent.
-        new_ip.delete()
-
-        # Set temp_expires_on when temp_expires_after is provided, meaning the
-        # IP assignment is only temporary until the IP address can be
-        # validated as free.
-        if temp_expires_after is not None:
-            auto_ip.temp_expires_on = datetime.utcnow() + temp_expires_after
-        auto_ip.save()
-
-        # Only log the allocation when the assignment is not temporary. Its
-        # the callers responsibility to log this information after the check
-        # is performed.
-        if temp_expires_after is None:
-            maaslog.info(
-                "Allocated automatic IP address %s for %s."
-                % (auto_ip.ip, self.get_log_string())
+        return [auto_ip for _, auto_ip in claims]
+
+    def _get_auto_ips_to_claim(self):
+        """Return the AUTO IP addresses without an IP address assigned."""
+        auto_ips = [
+            auto_ip
+            for auto_ip in self.ip_addresses.filter(
+                alloc_type=IPADDRESS_TYPE.AUTO
             )
-        return auto_ip
+            if not auto_ip.ip
+        ]
+        for auto_ip in auto_ips:
+            if auto_ip.subnet is None:
+                maaslog.error(
+                    "Could not find subnet for interface %s."
+                    % (self.get_log_string())
+                )
+                raise StaticIPAddressUnavailable(
+                    "Automatic IP address cannot be configured on interface "
+                    "%s without an associated subnet." % self.get_name()
+                )
+        return auto_ips
 
     def release_auto_ips(self):
         """Release all AUTO IP address for this interface that have an IP
@@ -3,7 +3,7 @@
 
 """Large file storage."""
 
-
+from functools import partial
 import hashlib
 
 from django.db.models import BigIntegerField, CharField, Manager
@@ -11,6 +11,7 @@ from twisted.internet import reactor
 
 from maasserver import DefaultMeta
 from maasserver.fields import LargeObjectField, LargeObjectFile
+from maasserver.largefilestorage import get_filesystem_storage
 from maasserver.models.cleansave import CleanSave
 from maasserver.models.timestampedmodel import TimestampedModel
 from maasserver.utils.orm import get_one, transactional
@@ -119,9 +120,14 @@ class LargeFile(CleanSave, TimestampedModel):
         """
         if not self.complete:
             return False
+        storage = get_filesystem_storage()
+        if storage.has_content(self):
+            stream = storage.open(self)
+        else:
+            stream = self.content.open("rb")
         sha256 = hashlib.sha256()
-        with self.content.open("rb") as stream:
-            for data in stream:
+        with stream:
+            for data in iter(partial(stream.read, 1 << 16), b""):
                 sha256.update(data)
         hexdigest = sha256.hexdigest()
         return hexdigest == self.sha256
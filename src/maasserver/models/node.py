@@ -1123,8 +1123,8 @@ class Node(CleanSave, TimestampedModel):
         null=True, blank=False, default=None, editable=False
     )
 
-    # Set when a rack controller has actually checked this power state and
-    # the last time the power was updated.
+    # Set when a rack controller has checked this power state and found that
+    # it changed, i.e. the last time the power state was updated.
     power_state_updated = DateTimeField(
         null=True, blank=False, default=None, editable=False
     )
@@ -3901,8 +3901,12 @@ class Node(CleanSave, TimestampedModel):
         # Avoid circular imports.
         from maasserver.models.event import Event
 
-        self.power_state = power_state
-        self.power_state_updated = now()
+        if power_state != self.power_state:
+            # Only a change counts as an update, since nodes whose power
+            # state changed recently are queried more often, see
+            # `maasserver.rpc.nodes._get_power_query_due`.
+            self.power_state = power_state
+            self.power_state_updated = now()
         mark_ready = (
             self.status == NODE_STATUS.RELEASING
             and power_state == POWER_STATE.OFF
@@ -4363,24 +4367,22 @@ class Node(CleanSave, TimestampedModel):
 
     def claim_auto_ips(self, temp_expires_after=None):
         """Assign IP addresses to all interface links set to AUTO."""
-        exclude_addresses = set()
-        allocated_ips = set()
         # Query for the interfaces again here; if we use the cached
         # interface_set, we could skip a newly-created bridge if it was created
         # at deployment time.
-        for interface in Interface.objects.filter(node=self):
-            maaslog.debug(f"Claiming IP for {self.system_id}:{interface.name}")
-            claimed_ips = interface.claim_auto_ips(
-                temp_expires_after=temp_expires_after,
-                exclude_addresses=exclude_addresses,
-            )
-            for ip in claimed_ips:
-                maaslog.debug(
-                    f"Claimed IP for {self.system_id}:{interface.name}: "
-                    f"{ip.ip}"
-                )
-                exclude_addresses.add(str(ip.ip))
-                allocated_ips.add(ip)
+        interfaces = Interface.objects.filter(node=self)
+        maaslog.debug(f"Claiming IPs for {self.system_id}")
+        # Allocate the addresses for all the interfaces together, so that the
+        # free addresses of each subnet are found once.
+        claims = Interface.objects.claim_auto_ips(
+            interfaces, temp_expires_after=temp_expires_after
+        )
+        allocated_ips = set()
+        for interface, ip in claims:
+            maaslog.debug(
+                f"Claimed IP for {self.system_id}:{interface.name}: {ip.ip}"
+            )
+            allocated_ips.add(ip)
         return allocated_ips
 
     @inlineCallbacks
@@ -0,0 +1,50 @@
+# Copyright 2020 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""The outcome of the last evaluation of the tags against a node."""
+
+__all__ = ["NodeTagEvaluation"]
+
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import (
+    CASCADE,
+    CharField,
+    DateTimeField,
+    IntegerField,
+    Model,
+    OneToOneField,
+)
+
+from maasserver import DefaultMeta
+
+
+class NodeTagEvaluation(Model):
+    """The tags that matched a node's probed details when they were last
+    evaluated.
+
+    The tags only need to be evaluated again once the details or the tag
+    definitions change, see `populate_tags_for_single_node`.
+    """
+
+    class Meta(DefaultMeta):
+        """Needed for South to recognize this model."""
+
+    node = OneToOneField(
+        "Node", primary_key=True, on_delete=CASCADE, editable=False
+    )
+
+    # The digest of the probed details the tags were evaluated against, see
+    # `maasserver.populate_tags.get_details_digest`.
+    details_digest = CharField(max_length=64, editable=False, null=False)
+
+    # The digest of the definitions of the evaluated tags, see
+    # `maasserver.populate_tags.get_tags_digest`.
+    tags_digest = CharField(max_length=64, editable=False, null=False)
+
+    # The IDs of the evaluated tags that matched.
+    matching = ArrayField(
+        IntegerField(), editable=False, null=False, default=list
+    )
+
+    # This field is informational.
+    updated = DateTimeField(editable=False, null=False, auto_now=True)
@@ -6,6 +6,7 @@
 
 from django.db.models.signals import post_delete
 
+from maasserver.largefilestorage import get_filesystem_storage
 from maasserver.models.largefile import (
     delete_large_object_content_later,
     LargeFile,
@@ -17,13 +18,15 @@ signals = SignalsManager()
 
 
 def delete_large_object(sender, instance, **kwargs):
-    """Delete the large object when the `LargeFile` is deleted.
+    """Delete the large object, and the content on the filesystem, when the
+    `LargeFile` is deleted.
 
     This is done using the `post_delete` signal instead of overriding delete
     on `LargeFile`, so it works correctly for both the model and `QuerySet`.
     """
     if instance.content is not None:
         post_commit_do(delete_large_object_content_later, instance.content)
+    post_commit_do(get_filesystem_storage().delete, instance)
 
 
 signals.watch(post_delete, delete_large_object, LargeFile)
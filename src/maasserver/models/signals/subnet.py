@@ -1,13 +1,13 @@
 # Copyright 2019 Canonical Ltd.  This software is licensed under the
 # GNU Affero General Public License version 3 (see the file LICENSE).
 
-"""Respond to Subnet CIDR changes."""
+"""Respond to Subnet changes."""
 
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 
 from maasserver.enum import IPADDRESS_TYPE
-from maasserver.models import StaticIPAddress, Subnet
+from maasserver.models import StaticIPAddress, Subnet, SubnetStatistics
 from maasserver.utils.signals import SignalsManager
 
 signals = SignalsManager()
@@ -41,8 +41,25 @@ def updated_cidr(instance, old_values, **kwargs):
     update_referenced_ip_addresses(instance)
 
 
+def invalidate_statistics(instance, old_values, **kwargs):
+    # The statistics are computed again when they're next read, or by the
+    # subnet statistics service.
+    SubnetStatistics.objects.filter(subnet_id=instance.id).delete()
+
+
+def post_delete_remove_statistics(sender, instance, **kwargs):
+    SubnetStatistics.objects.filter(subnet_id=instance.id).delete()
+
+
 signals.watch(post_save, post_created, sender=Subnet)
 signals.watch_fields(updated_cidr, Subnet, ["cidr"], delete=False)
+signals.watch_fields(
+    invalidate_statistics,
+    Subnet,
+    ["cidr", "gateway_ip", "dns_servers"],
+    delete=False,
+)
+signals.watch(post_delete, post_delete_remove_statistics, sender=Subnet)
 
 # Enable all signals by default.
 signals.enable()
@@ -5,6 +5,7 @@
 
 
 from maasserver.enum import IPADDRESS_TYPE
+from maasserver.models import SubnetStatistics
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
 
@@ -62,3 +63,30 @@ class TestSubnetSignals(MAASServerTestCase):
         ip_address2.refresh_from_db()
         self.assertIsNone(ip_address1.subnet)
         self.assertEqual(subnet, ip_address2.subnet)
+
+
+class TestSubnetStatisticsSignals(MAASServerTestCase):
+    def test_changing_gateway_removes_statistics(self):
+        subnet = factory.make_Subnet(cidr="10.0.0.0/24", gateway_ip=None)
+        SubnetStatistics.objects.update_for_subnet(subnet)
+        self.assertTrue(
+            SubnetStatistics.objects.filter(subnet_id=subnet.id).exists()
+        )
+        subnet.gateway_ip = "10.0.0.1"
+        subnet.save()
+        self.assertFalse(
+            SubnetStatistics.objects.filter(subnet_id=subnet.id).exists()
+        )
+
+    def test_deleting_subnet_removes_statistics(self):
+        subnet = factory.make_Subnet()
+        factory.make_IPRange(subnet=subnet)
+        factory.make_StaticIPAddress(
+            alloc_type=IPADDRESS_TYPE.USER_RESERVED, subnet=subnet
+        )
+        SubnetStatistics.objects.update_for_subnet(subnet)
+        subnet_id = subnet.id
+        subnet.delete()
+        self.assertFalse(
+            SubnetStatistics.objects.filter(subnet_id=subnet_id).exists()
+        )
@@ -42,8 +42,12 @@ from maasserver.exceptions import (
 from maasserver.models.cleansave import CleanSave
 from maasserver.models.config import Config
 from maasserver.models.domain import Domain
-from maasserver.models.subnet import Subnet
-from maasserver.models.timestampedmodel import TimestampedModel
+from maasserver.models.subnet import (
+    free_ip_indexes,
+    get_free_ip_index,
+    Subnet,
+)
+from maasserver.models.timestampedmodel import now, TimestampedModel
 from maasserver.utils import orm
 from maasserver.utils.dns import get_ip_based_hostname
 from provisioningserver.utils.enum import map_enum_reverse
@@ -57,15 +61,31 @@ _mapping_base_fields = (
     "ip",
 )
 
-_special_mapping_result = _mapping_base_fields + ("dnsresource_id",)
+_special_mapping_result = _mapping_base_fields + (
+    "dnsresource_id",
+    "alloc_type",
+    "dnsrr_fqdn",
+    "dnsrr_domain_id",
+    "dnsrr_dom2_id",
+    "node_fqdn",
+    "node_domain_id",
+    "node_dom2_id",
+)
 
 _mapping_query_result = _mapping_base_fields + (
     "is_boot",
     "preference",
     "family",
+    "domain_id",
+    "domain2_id",
 )
 
-_interface_mapping_result = _mapping_base_fields + ("iface_name", "assigned")
+_interface_mapping_result = _mapping_base_fields + (
+    "iface_name",
+    "assigned",
+    "domain_id",
+    "domain2_id",
+)
 
 SpecialMappingQueryResult = namedtuple(
     "SpecialMappingQueryResult", _special_mapping_result
@@ -78,6 +98,21 @@ InterfaceMappingResult = namedtuple(
 )
 
 
+def _get_mapping_keys(mappings, domain_ids):
+    """Return the keys of `mappings` that a mapping query result belongs to.
+
+    :param mappings: A dict of mappings keyed by domain id, or with the single
+        key `None` when mapping all domains at once.
+    :param domain_ids: The ids of the domains the result belongs to.
+    """
+    if None in mappings:
+        return [None]
+    else:
+        return {
+            domain_id for domain_id in domain_ids if domain_id in mappings
+        }
+
+
 class HostnameIPMapping:
     """This is used to return address information for a host in a way that
     keeps life simple for the callers."""
@@ -269,7 +304,8 @@ class StaticIPAddressManager(Manager):
             to use instead of being allocated one at random.
         :param exclude_addresses: A list of addresses which MUST NOT be used.
 
-        All IP parameters can be strings or netaddr.IPAddress.
+        All IP parameters can be strings or netaddr.IPAddress. Use within
+        `free_ip_indexes` when allocating many addresses in one transaction.
         """
         # This check for `alloc_type` is important for later on. We rely on
         # detecting IntegrityError as a sign than an IP address is already
@@ -290,7 +326,7 @@ class StaticIPAddressManager(Manager):
             requested_address = subnet.get_next_ip_for_allocation(
                 exclude_addresses=exclude_addresses
             )
-            return self._attempt_allocation_of_free_address(
+            ipaddress = self._attempt_allocation_of_free_address(
                 requested_address, alloc_type, user=user, subnet=subnet
             )
         else:
@@ -309,13 +345,118 @@ class StaticIPAddressManager(Manager):
                 )
 
             subnet.validate_static_ip(requested_address)
-            return self._attempt_allocation(
+            ipaddress = self._attempt_allocation(
                 requested_address, alloc_type, user=user, subnet=subnet
             )
+        # Keep the subnet's free IP index, if it's being allocated with one,
+        # in step with the allocation.
+        free_ip_index = get_free_ip_index(subnet, create=False)
+        if free_ip_index is not None:
+            free_ip_index.remove(ipaddress.ip)
+        return ipaddress
+
+    def assign_bulk(self, ipaddresses, exclude_addresses=None):
+        """Assign free addresses to all of `ipaddresses`.
+
+        The free addresses of each subnet are found once, and the existing
+        `ipaddresses`, which have a subnet but no address, are updated
+        together, so this is much cheaper than allocating an address for
+        each of them. They stay linked to their interfaces. Their `ip`,
+        `temp_expires_on` and `updated` fields are saved.
+
+        :param ipaddresses: An iterable of `StaticIPAddress`.
+        :param exclude_addresses: A list of addresses which MUST NOT be used.
+        """
+        ipaddresses = list(ipaddresses)
+        if exclude_addresses is None:
+            exclude_addresses = []
+        with free_ip_indexes():
+            addresses = self._pick_free_addresses(
+                [ipaddress.subnet for ipaddress in ipaddresses],
+                exclude_addresses,
+            )
+        updated = now()
+        for ipaddress, address in zip(ipaddresses, addresses):
+            ipaddress.ip = address
+            ipaddress.updated = updated
+        self._save_bulk(
+            ipaddresses, update_fields=["ip", "temp_expires_on", "updated"]
+        )
+
+    def _pick_free_addresses(self, subnets, exclude_addresses):
+        """Return a free address in each of `subnets`, in order.
+
+        Use within `free_ip_indexes`. The same subnet can be given many times
+        to pick as many different addresses from it.
+        """
+        picked = defaultdict(list)
+        addresses = []
+        for subnet in subnets:
+            if subnet is None:
+                raise StaticIPAddressOutOfRange(
+                    "Could not find an appropriate subnet."
+                )
+            free_ip_index = get_free_ip_index(subnet)
+            if subnet.id not in picked:
+                for address in exclude_addresses:
+                    free_ip_index.remove(address)
+            address = free_ip_index.get_next_ip()
+            if address is None:
+                # The index is exhausted; the picked addresses aren't in the
+                # database yet, so exclude them when looking again.
+                address = subnet.get_next_ip_for_allocation(
+                    exclude_addresses=[*exclude_addresses, *picked[subnet.id]]
+                )
+            free_ip_index.remove(address)
+            picked[subnet.id].append(str(address))
+            addresses.append(str(address))
+        return addresses
+
+    def _save_bulk(self, ipaddresses, update_fields=None):
+        """Insert `ipaddresses` together, or update `update_fields` of them.
+
+        The addresses are saved without sending signals, so the allocation
+        notification of each of their subnets is updated once instead.
+        """
+        if len(ipaddresses) == 0:
+            return
+        try:
+            # Save the addresses in one statement, in a nested transaction so
+            # that the outer transaction can be retried.
+            with orm.savepoint():
+                if update_fields is None:
+                    self.bulk_create(ipaddresses)
+                else:
+                    self.bulk_update(ipaddresses, update_fields)
+        except IntegrityError as error:
+            if orm.is_unique_violation(error):
+                # Some of the addresses were taken; try again with the
+                # `address_allocation` lock, as `allocate_new` does.
+                orm.request_transaction_retry(locks.address_allocation)
+            else:
+                raise
+        subnets = {
+            ipaddress.subnet_id: ipaddress.subnet for ipaddress in ipaddresses
+        }
+        for subnet in subnets.values():
+            subnet.update_allocation_notification()
 
     def _get_special_mappings(self, domain, raw_ttl=False):
         """Get the special mappings, possibly limited to a single Domain.
 
+        See `_get_special_mappings_for_domains`.
+        """
+        if isinstance(domain, Domain):
+            mappings = self._get_special_mappings_for_domains(
+                [domain], raw_ttl
+            )
+            return mappings[domain.id]
+        else:
+            return self._get_special_mappings_for_domains(None, raw_ttl)[None]
+
+    def _get_special_mappings_for_domains(self, domains, raw_ttl=False):
+        """Get the special mappings, possibly limited to some Domains.
+
         This function is responsible for creating these mappings:
         - any USER_RESERVED IP that has no name (dnsrr or node),
         - any IP not associated with a Node,
@@ -333,13 +474,14 @@ class StaticIPAddressManager(Manager):
         to fetch ALL of the entries for subnets, but forward mappings are
         domain-specific.
 
-        :param domain: limit return to just the given Domain.  If anything
-            other than a Domain is passed in (e.g., a Subnet or None), we
-            return all of the reverse mappings.
+        :param domains: limit return to just the given Domains.  If None is
+            passed in, we return all of the reverse mappings.
         :param raw_ttl: Boolean, if True then just return the address_ttl,
             otherwise, coalesce the address_ttl to be the correct answer for
             zone generation.
-        :return: a (default) dict of hostname: HostnameIPMapping entries.
+        :return: a dict of domain id: (default) dict of hostname:
+            HostnameIPMapping entries.  The reverse mappings have the key
+            None.
         """
         default_ttl = "%d" % Config.objects.get_config("default_dns_ttl")
         # raw_ttl says that we don't coalesce, but we need to pick one, so we
@@ -372,7 +514,14 @@ class StaticIPAddressManager(Manager):
             + ttl_clause
             + """ AS ttl,
                 staticip.ip,
-                dnsrr.id AS dnsresource_id
+                dnsrr.id AS dnsresource_id,
+                staticip.alloc_type,
+                dnsrr.fqdn,
+                dnsrr.domain_id,
+                dnsrr.dom2_id,
+                node.fqdn,
+                node.domain_id,
+                node.dom2_id
             FROM
                 maasserver_staticipaddress AS staticip
             LEFT JOIN (
@@ -433,49 +582,44 @@ class StaticIPAddressManager(Manager):
                 """
         )
 
+        default_domain = Domain.objects.get_default_domain()
         query_parms = []
-        if isinstance(domain, Domain):
-            if domain.is_default():
-                # The default domain is extra special, since it needs to have
-                # A/AAAA RRs for any USER_RESERVED addresses that have no name
-                # otherwise attached to them.
-                # We need to get all of the entries that are:
-                # - in this domain and have a dnsrr associated, OR
-                # - are USER_RESERVED and have NO fqdn associated at all.
-                sql_query += """ ((
-                        staticip.alloc_type = %s AND
-                        dnsrr.fqdn IS NULL AND
-                        node.fqdn IS NULL
-                    ) OR (
-                        dnsrr.fqdn IS NOT NULL AND
-                        (
-                            dnsrr.dom2_id = %s OR
-                            node.dom2_id = %s OR
-                            dnsrr.domain_id = %s OR
-                            node.domain_id = %s)))"""
-                query_parms += [IPADDRESS_TYPE.USER_RESERVED]
-            else:
-                # For domains, we only need answers for the domain we were
-                # given.  These can can possibly come from either the child or
-                # the parent for glue.  Anything with a node associated will be
-                # found inside of get_hostname_ip_mapping() - we need any
-                # entries that are:
-                # - in this domain and have a dnsrr associated.
-                sql_query += """ (
+        if domains is not None:
+            # For domains, we only need answers for the domains we were
+            # given.  These can can possibly come from either the child or
+            # the parent for glue.  Anything with a node associated will be
+            # found inside of get_hostname_ip_mapping() - we need any
+            # entries that are:
+            # - in these domains and have a dnsrr associated.
+            domain_ids = [domain.id for domain in domains]
+            sql_query += """ ((
                     dnsrr.fqdn IS NOT NULL AND
                     (
-                        dnsrr.dom2_id = %s OR
-                        node.dom2_id = %s OR
-                        dnsrr.domain_id = %s OR
-                        node.domain_id = %s))"""
-            query_parms += [domain.id, domain.id, domain.id, domain.id]
+                        dnsrr.dom2_id = ANY(%s) OR
+                        node.dom2_id = ANY(%s) OR
+                        dnsrr.domain_id = ANY(%s) OR
+                        node.domain_id = ANY(%s)))"""
+            query_parms += [domain_ids, domain_ids, domain_ids, domain_ids]
+            if default_domain.id in domain_ids:
+                # The default domain is extra special, since it needs to
+                # have A/AAAA RRs for any USER_RESERVED addresses that have no
+                # name otherwise attached to them.
+                sql_query += """ OR (
+                    staticip.alloc_type = %s AND
+                    dnsrr.fqdn IS NULL AND
+                    node.fqdn IS NULL)"""
+                query_parms += [IPADDRESS_TYPE.USER_RESERVED]
+            sql_query += """)"""
+            mappings = {
+                domain_id: defaultdict(HostnameIPMapping)
+                for domain_id in domain_ids
+            }
         else:
             # In the subnet map, addresses attached to nodes only map back to
             # the node, since some things don't like multiple PTR RRs in
             # answers from the DNS.
             # Since that is handled in get_hostname_ip_mapping, we exclude
             # anything where the node also has a link to the address.
-            domain = None
             sql_query += """ ((
                     node.fqdn IS NULL AND dnsrr.fqdn IS NOT NULL
                 ) OR (
@@ -483,9 +627,8 @@ class StaticIPAddressManager(Manager):
                     dnsrr.fqdn IS NULL AND
                     node.fqdn IS NULL))"""
             query_parms += [IPADDRESS_TYPE.USER_RESERVED]
+            mappings = {None: defaultdict(HostnameIPMapping)}
 
-        default_domain = Domain.objects.get_default_domain()
-        mapping = defaultdict(HostnameIPMapping)
         cursor = connection.cursor()
         cursor.execute(sql_query, query_parms)
         for result in cursor.fetchall():
@@ -497,22 +640,33 @@ class StaticIPAddressManager(Manager):
                 )
             else:
                 fqdn = result.fqdn
-            # It is possible that there are both Node and DNSResource entries
-            # for this fqdn.  If we have any system_id, preserve it.  Ditto for
-            # TTL.  It is left as an exercise for the admin to make sure that
-            # the any non-default TTL applied to the Node and DNSResource are
-            # equal.
-            entry = mapping[fqdn]
-            if result.system_id is not None:
-                entry.node_type = result.node_type
-                entry.system_id = result.system_id
-            if result.ttl is not None:
-                entry.ttl = result.ttl
-            if result.user_id is not None:
-                entry.user_id = result.user_id
-            entry.ips.add(result.ip)
-            entry.dnsresource_id = result.dnsresource_id
-        return mapping
+            if result.dnsrr_fqdn is not None:
+                domain_ids = (
+                    result.dnsrr_dom2_id,
+                    result.node_dom2_id,
+                    result.dnsrr_domain_id,
+                    result.node_domain_id,
+                )
+            else:
+                # An unnamed USER_RESERVED address.
+                domain_ids = (default_domain.id,)
+            for key in _get_mapping_keys(mappings, domain_ids):
+                # It is possible that there are both Node and DNSResource
+                # entries for this fqdn.  If we have any system_id, preserve
+                # it.  Ditto for TTL.  It is left as an exercise for the admin
+                # to make sure that the any non-default TTL applied to the
+                # Node and DNSResource are equal.
+                entry = mappings[key][fqdn]
+                if result.system_id is not None:
+                    entry.node_type = result.node_type
+                    entry.system_id = result.system_id
+                if result.ttl is not None:
+                    entry.ttl = result.ttl
+                if result.user_id is not None:
+                    entry.user_id = result.user_id
+                entry.ips.add(result.ip)
+                entry.dnsresource_id = result.dnsresource_id
+        return mappings
 
     def get_hostname_ip_mapping(self, domain_or_subnet, raw_ttl=False):
         """Return hostname mappings for `StaticIPAddress` entries.
@@ -526,6 +680,36 @@ class StaticIPAddressManager(Manager):
 
         The returned name is an FQDN (no trailing dot.)
         """
+        if isinstance(domain_or_subnet, Domain):
+            mappings = self._get_hostname_ip_mappings(
+                [domain_or_subnet], raw_ttl
+            )
+            return mappings[domain_or_subnet.id]
+        else:
+            return self._get_hostname_ip_mappings(None, raw_ttl)[None]
+
+    def get_hostname_ip_mappings_for_domains(self, domains, raw_ttl=False):
+        """Return hostname mappings for the nodes in each of `domains`.
+
+        This is equivalent to calling `get_hostname_ip_mapping` for each
+        domain, but uses a fixed number of queries however many domains
+        there are.
+
+        :return: a dict of domain id: mapping `{hostnames -> (ttl, [ips])}`.
+        """
+        domains = list(domains)
+        if len(domains) == 0:
+            return {}
+        return self._get_hostname_ip_mappings(domains, raw_ttl)
+
+    def _get_hostname_ip_mappings(self, domains, raw_ttl=False):
+        """Return hostname mappings for the nodes in `domains`.
+
+        :param domains: A list of Domains, or None for the mapping of all
+            nodes, as needed for the reverse zones.
+        :return: a dict of domain id: mapping, or with the single key None
+            when `domains` is None.
+        """
         cursor = connection.cursor()
 
         # DISTINCT ON returns the first matching row for any given
@@ -543,6 +727,10 @@ class StaticIPAddressManager(Manager):
                     %s)"""
                 % default_ttl
             )
+        if domains is not None:
+            domain2_clause = """domain2.id"""
+        else:
+            domain2_clause = """NULL"""
         sql_query = (
             """
             SELECT DISTINCT ON (fqdn, is_boot, family)
@@ -579,7 +767,11 @@ class StaticIPAddressManager(Manager):
                     WHEN interface.type = 'unknown' THEN 9
                     ELSE 10
                 END AS preference,
-                family(staticip.ip) AS family
+                family(staticip.ip) AS family,
+                node.domain_id,
+                """
+            + domain2_clause
+            + """ AS domain2_id
             FROM
                 maasserver_interface AS interface
             LEFT OUTER JOIN maasserver_interfacerelationship AS rel ON
@@ -600,7 +792,7 @@ class StaticIPAddressManager(Manager):
                 staticip.id = link.staticipaddress_id
             """
         )
-        if isinstance(domain_or_subnet, Domain):
+        if domains is not None:
             # The model has nodes in the parent domain, but they actually live
             # in the child domain.  And the parent needs the glue.  So we
             # return such nodes addresses in _BOTH_ the parent and the child
@@ -612,9 +804,10 @@ class StaticIPAddressManager(Manager):
                  * nodes a the top of a domain.
                  */ domain2.name = CONCAT(node.hostname, '.', domain.name)
             WHERE
-                (domain2.id = %s OR node.domain_id = %s) AND
+                (domain2.id = ANY(%s) OR node.domain_id = ANY(%s)) AND
             """
-            query_parms = [domain_or_subnet.id, domain_or_subnet.id]
+            domain_ids = [domain.id for domain in domains]
+            query_parms = [domain_ids, domain_ids]
         else:
             # For subnets, we need ALL the names, so that we can correctly
             # identify which ones should have the FQDN.  dns/zonegenerator.py
@@ -665,7 +858,11 @@ class StaticIPAddressManager(Manager):
             + """ AS ttl,
                 staticip.ip,
                 interface.name,
-                alloc_type != 6 /* DISCOVERED */ AS assigned
+                alloc_type != 6 /* DISCOVERED */ AS assigned,
+                node.domain_id,
+                """
+            + domain2_clause
+            + """ AS domain2_id
             FROM
                 maasserver_interface AS interface
             JOIN maasserver_node AS node ON
@@ -678,7 +875,7 @@ class StaticIPAddressManager(Manager):
                 staticip.id = link.staticipaddress_id
             """
         )
-        if isinstance(domain_or_subnet, Domain):
+        if domains is not None:
             # This logic is similar to the logic in sql_query above.
             iface_sql_query += """
             LEFT JOIN maasserver_domain AS domain2 ON
@@ -688,7 +885,7 @@ class StaticIPAddressManager(Manager):
                 domain2.name = CONCAT(
                     interface.name, '.', node.hostname, '.', domain.name)
             WHERE
-                (domain2.id = %s OR node.domain_id = %s) AND
+                (domain2.id = ANY(%s) OR node.domain_id = ANY(%s)) AND
             """
         else:
             # For subnets, we need ALL the names, so that we can correctly
@@ -709,13 +906,16 @@ class StaticIPAddressManager(Manager):
             """
         # We get user reserved et al mappings first, so that we can overwrite
         # TTL as we process the return from the SQL horror above.
-        mapping = self._get_special_mappings(domain_or_subnet, raw_ttl)
+        mappings = self._get_special_mappings_for_domains(domains, raw_ttl)
         # All of the mappings that we got mean that we will only want to add
         # addresses for the boot interface (is_boot == True).
-        iface_is_boot = defaultdict(
-            bool, {hostname: True for hostname in mapping.keys()}
-        )
-        assigned_ips = defaultdict(bool)
+        iface_is_boot = {
+            key: defaultdict(
+                bool, {hostname: True for hostname in mapping.keys()}
+            )
+            for key, mapping in mappings.items()
+        }
+        assigned_ips = {key: defaultdict(bool) for key in mappings}
         cursor.execute(sql_query, query_parms)
         # The records from the query provide, for each hostname (after
         # stripping domain), the boot and non-boot interface ip address in ipv4
@@ -725,37 +925,46 @@ class StaticIPAddressManager(Manager):
         # interface IPs.  See Bug#1584850
         for result in cursor.fetchall():
             result = MappingQueryResult(*result)
-            entry = mapping[result.fqdn]
-            entry.node_type = result.node_type
-            entry.system_id = result.system_id
-            if result.user_id is not None:
-                entry.user_id = result.user_id
-            entry.ttl = result.ttl
-            if result.is_boot:
-                iface_is_boot[result.fqdn] = True
-            # If we have an IP on the right interface type, save it.
-            if result.is_boot == iface_is_boot[result.fqdn]:
-                entry.ips.add(result.ip)
+            for key in _get_mapping_keys(
+                mappings, (result.domain_id, result.domain2_id)
+            ):
+                entry = mappings[key][result.fqdn]
+                entry.node_type = result.node_type
+                entry.system_id = result.system_id
+                if result.user_id is not None:
+                    entry.user_id = result.user_id
+                entry.ttl = result.ttl
+                if result.is_boot:
+                    iface_is_boot[key][result.fqdn] = True
+                # If we have an IP on the right interface type, save it.
+                if result.is_boot == iface_is_boot[key][result.fqdn]:
+                    entry.ips.add(result.ip)
         # Next, get all the addresses, on all the interfaces, and add the ones
         # that are not already present on the FQDN as $IFACE.$FQDN.  Exclude
         # any discovered addresses once there are any non-discovered addresses.
         cursor.execute(iface_sql_query, query_parms)
         for result in cursor.fetchall():
             result = InterfaceMappingResult(*result)
-            if result.assigned:
-                assigned_ips[result.fqdn] = True
-            # If this is an assigned IP, or there are NO assigned IPs on the
-            # node, then consider adding the IP.
-            if result.assigned or not assigned_ips[result.fqdn]:
-                if result.ip not in mapping[result.fqdn].ips:
-                    entry = mapping["%s.%s" % (result.iface_name, result.fqdn)]
-                    entry.node_type = result.node_type
-                    entry.system_id = result.system_id
-                    if result.user_id is not None:
-                        entry.user_id = result.user_id
-                    entry.ttl = result.ttl
-                    entry.ips.add(result.ip)
-        return mapping
+            for key in _get_mapping_keys(
+                mappings, (result.domain_id, result.domain2_id)
+            ):
+                mapping = mappings[key]
+                if result.assigned:
+                    assigned_ips[key][result.fqdn] = True
+                # If this is an assigned IP, or there are NO assigned IPs on
+                # the node, then consider adding the IP.
+                if result.assigned or not assigned_ips[key][result.fqdn]:
+                    if result.ip not in mapping[result.fqdn].ips:
+                        entry = mapping[
+                            "%s.%s" % (result.iface_name, result.fqdn)
+                        ]
+                        entry.node_type = result.node_type
+                        entry.system_id = result.system_id
+                        if result.user_id is not None:
+                            entry.user_id = result.user_id
+                        entry.ttl = result.ttl
+                        entry.ips.add(result.ip)
+        return mappings
 
     def filter_by_ip_family(self, family):
         possible_families = map_enum_reverse(IPADDRESS_FAMILY)
@@ -4,7 +4,9 @@
 """Model for subnets."""
 
 
+from contextlib import contextmanager
 from operator import attrgetter
+import threading
 from typing import Iterable, Optional
 
 from django.contrib.postgres.fields import ArrayField
@@ -43,6 +45,7 @@ from maasserver.models.timestampedmodel import TimestampedModel
 from maasserver.utils.orm import MAASQueriesMixin
 from provisioningserver.logger import get_maas_logger
 from provisioningserver.utils.network import (
+    FreeIPIndex,
     IPRangeStatistics,
     MAASIPSet,
     make_ipaddress,
@@ -93,6 +96,55 @@ def create_cidr(network, subnet_mask=None):
     return str(cidr)
 
 
+# The free IP indexes of subnets, while allocating with them; see
+# `free_ip_indexes`.
+_free_ip_indexes = threading.local()
+
+
+@contextmanager
+def free_ip_indexes():
+    """Allocate IP addresses using a `FreeIPIndex` for each subnet.
+
+    Within this context, the free addresses of a subnet are computed once,
+    the first time an address is allocated from it, and each address
+    allocated after that is picked from, then removed from, its index.
+    Allocating many addresses from a subnet in one transaction no longer
+    computes its free addresses each time.
+
+    Addresses excluded from an allocation are treated as in use until the
+    end of the context. Subnets and their IP ranges, static routes and
+    neighbours must not be changed within it, and it must not outlive the
+    transaction it's used in. Nested contexts share their indexes.
+    """
+    if getattr(_free_ip_indexes, "indexes", None) is not None:
+        yield
+    else:
+        _free_ip_indexes.indexes = {}
+        try:
+            yield
+        finally:
+            _free_ip_indexes.indexes = None
+
+
+def get_free_ip_index(subnet, create=True) -> Optional[FreeIPIndex]:
+    """Return the `FreeIPIndex` for `subnet`, within `free_ip_indexes`.
+
+    :param create: Whether to create the index if it doesn't exist yet.
+    :return: The index, or `None` outside `free_ip_indexes`.
+    """
+    indexes = getattr(_free_ip_indexes, "indexes", None)
+    if indexes is None:
+        return None
+    index = indexes.get(subnet.id)
+    if index is None and create:
+        index = FreeIPIndex(
+            subnet.get_ipranges_not_in_use(with_neighbours=True),
+            subnet.get_ipnetwork().version,
+        )
+        indexes[subnet.id] = index
+    return index
+
+
 class SubnetQueriesMixin(MAASQueriesMixin):
 
     find_subnets_with_ip_query = """
@@ -710,13 +762,16 @@ class Subnet(CleanSave, TimestampedModel):
         }
         return MAASIPSet(neighbour_set)
 
-    def get_least_recently_seen_unknown_neighbour(self):
+    def get_least_recently_seen_unknown_neighbour(
+        self, exclude_addresses: IPAddressExcludeList = None
+    ):
         """
         Returns the least recently seen unknown neighbour or this subnet.
 
         Useful when allocating an IP address, to safeguard against assigning
         an address another host is still using.
 
+        :param exclude_addresses: Optional list of addresses to exclude.
         :return: a `maasserver.models.Discovery` object
         """
         # Circular imports.
@@ -726,7 +781,9 @@ class Subnet(CleanSave, TimestampedModel):
         # range (such as a router IP address or reserved range) makes it
         # "known". So we need to avoid those here in order to avoid stepping
         # on network infrastructure, reserved ranges, etc.
-        unused = self.get_ipranges_not_in_use(ignore_discovered_ips=True)
+        unused = self.get_ipranges_not_in_use(
+            exclude_addresses=exclude_addresses, ignore_discovered_ips=True
+        )
         least_recent_neighbours = (
             Discovery.objects.filter(subnet=self)
             .by_unknown_ip()
@@ -766,9 +823,22 @@ class Subnet(CleanSave, TimestampedModel):
             intended to be specified by a caller in production code; it is used
             internally to recursively call this method if the first allocation
             attempt fails.
+
+        Within `free_ip_indexes`, the address is picked from the subnet's
+        `FreeIPIndex` while it has free addresses.
         """
         if exclude_addresses is None:
             exclude_addresses = []
+        if avoid_observed_neighbours:
+            free_ip_index = get_free_ip_index(self)
+        else:
+            free_ip_index = None
+        if free_ip_index is not None:
+            for address in exclude_addresses:
+                free_ip_index.remove(address)
+            next_ip = free_ip_index.get_next_ip()
+            if next_ip is not None:
+                return str(next_ip)
         free_ranges = self.get_ipranges_not_in_use(
             exclude_addresses=exclude_addresses,
             with_neighbours=avoid_observed_neighbours,
@@ -791,7 +861,9 @@ class Subnet(CleanSave, TimestampedModel):
             # We tried considering neighbours as "in-use" addresses, but the
             # subnet is still full. So make an educated guess about which IP
             # address is least likely to be in-use.
-            discovery = self.get_least_recently_seen_unknown_neighbour()
+            discovery = self.get_least_recently_seen_unknown_neighbour(
+                exclude_addresses
+            )
             if discovery is not None:
                 maaslog.warning(
                     "Next IP address to allocate from '%s' has been observed "
@@ -959,8 +1031,16 @@ class Subnet(CleanSave, TimestampedModel):
             return
         ident = "ip_exhaustion__subnet_%d" % self.id
         # Circular imports.
-        from maasserver.models import Config, Notification
+        from maasserver.models import (
+            Config,
+            Notification,
+            SubnetStatistics,
+        )
 
+        # The stored statistics are now stale. They are computed again when
+        # they're next read, or by the subnet statistics service, rather than
+        # on every change to the subnet's addresses and ranges.
+        SubnetStatistics.objects.filter(subnet_id=self.id).delete()
         threshold = Config.objects.get_config(
             "subnet_ip_exhaustion_threshold_count"
         )
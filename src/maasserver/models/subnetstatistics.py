@@ -0,0 +1,187 @@
+# Copyright 2020 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Precomputed utilisation statistics of subnets."""
+
+__all__ = ["SubnetStatistics"]
+
+from collections import defaultdict
+
+from django.contrib.postgres.fields import JSONField
+from django.db.models import (
+    Count,
+    DateTimeField,
+    DO_NOTHING,
+    Manager,
+    Model,
+    OneToOneField,
+)
+
+from maasserver import DefaultMeta
+from maasserver.enum import IPADDRESS_TYPE, IPRANGE_TYPE
+from provisioningserver.utils.network import IPRangeStatistics
+
+
+def get_ipaddress_counts(subnet_ids=None):
+    """Count the allocated IP addresses of subnets, by allocation type.
+
+    :param subnet_ids: The subnets to count the addresses of; all of them if
+        not given.
+    :return: A dict mapping subnet IDs to dicts mapping `IPADDRESS_TYPE`s to
+        address counts.
+    """
+    # Circular imports.
+    from maasserver.models import StaticIPAddress
+
+    counts = defaultdict(lambda: defaultdict(int))
+    rows = StaticIPAddress.objects.filter(ip__isnull=False)
+    if subnet_ids is not None:
+        rows = rows.filter(subnet_id__in=subnet_ids)
+    rows = rows.values("subnet_id", "alloc_type").annotate(count=Count("ip"))
+    for row in rows:
+        counts[row["subnet_id"]][row["alloc_type"]] = row["count"]
+    return counts
+
+
+def get_utilisation(full_range, ip_counts):
+    """Return the utilisation details of a subnet.
+
+    :param full_range: The `MAASIPSet` returned by the subnet's
+        `get_iprange_usage`.
+    :param ip_counts: The counts of the subnet's allocated IP addresses, by
+        allocation type, see `get_ipaddress_counts`.
+    """
+    range_stats = IPRangeStatistics(full_range)
+    static = 0
+    reserved_available = 0
+    dynamic_available = 0
+    for rng in full_range.ranges:
+        if IPRANGE_TYPE.DYNAMIC in rng.purpose:
+            dynamic_available += rng.num_addresses
+        elif IPRANGE_TYPE.RESERVED in rng.purpose:
+            reserved_available += rng.num_addresses
+        elif "assigned-ip" in rng.purpose:
+            static += rng.num_addresses
+    reserved_used = ip_counts[IPADDRESS_TYPE.USER_RESERVED]
+    reserved_available -= reserved_used
+    dynamic_used = (
+        ip_counts[IPADDRESS_TYPE.AUTO]
+        + ip_counts[IPADDRESS_TYPE.DHCP]
+        + ip_counts[IPADDRESS_TYPE.DISCOVERED]
+    )
+    dynamic_available -= dynamic_used
+    return {
+        "available": range_stats.num_available,
+        "unavailable": range_stats.num_unavailable,
+        "dynamic_available": dynamic_available,
+        "dynamic_used": dynamic_used,
+        "static": static,
+        "reserved_available": reserved_available,
+        "reserved_used": reserved_used,
+    }
+
+
+class SubnetStatisticsManager(Manager):
+    """Manager for `SubnetStatistics` objects."""
+
+    def update_for_subnet(self, subnet, full_range=None, ip_counts=None):
+        """Compute and store the statistics of `subnet`.
+
+        :param full_range: The `MAASIPSet` returned by the subnet's
+            `get_iprange_usage`, if it was computed already.
+        :param ip_counts: The counts of the subnet's allocated IP addresses,
+            see `get_ipaddress_counts`, if they were counted already.
+        :return: The `SubnetStatistics` of `subnet`.
+        """
+        if full_range is None:
+            full_range = subnet.get_iprange_usage()
+        if ip_counts is None:
+            ip_counts = get_ipaddress_counts([subnet.id])[subnet.id]
+        statistics, _ = self.update_or_create(
+            subnet_id=subnet.id,
+            defaults={
+                "statistics": IPRangeStatistics(full_range).render_json(),
+                "utilisation": get_utilisation(full_range, ip_counts),
+            },
+        )
+        return statistics
+
+    def get_statistics(self, subnets):
+        """Return the `SubnetStatistics` of `subnets`, by subnet ID.
+
+        The statistics of subnets that don't have any stored yet are computed
+        and stored.
+        """
+        found = self.in_bulk([subnet.id for subnet in subnets])
+        missing = [subnet for subnet in subnets if subnet.id not in found]
+        if missing:
+            # Circular imports.
+            from maasserver.models import StaticRoute
+
+            ip_counts = get_ipaddress_counts(
+                [subnet.id for subnet in missing]
+            )
+            staticroutes = list(StaticRoute.objects.select_related("source"))
+            for subnet in missing:
+                found[subnet.id] = self.update_for_subnet(
+                    subnet,
+                    full_range=subnet.get_iprange_usage(
+                        cached_staticroutes=staticroutes
+                    ),
+                    ip_counts=ip_counts[subnet.id],
+                )
+        return found
+
+    def reconcile(self):
+        """Recompute and store the statistics of all subnets.
+
+        Stale statistics are discarded as addresses and ranges change, and
+        computed again when next read; this also corrects those made stale by
+        changes elsewhere, e.g. to static routes.
+        """
+        # Circular imports.
+        from maasserver.models import StaticRoute, Subnet
+
+        ip_counts = get_ipaddress_counts()
+        staticroutes = list(StaticRoute.objects.select_related("source"))
+        for subnet in Subnet.objects.all():
+            self.update_for_subnet(
+                subnet,
+                full_range=subnet.get_iprange_usage(
+                    cached_staticroutes=staticroutes
+                ),
+                ip_counts=ip_counts[subnet.id],
+            )
+
+
+class SubnetStatistics(Model):
+    """The utilisation statistics of a subnet, stored so that they aren't
+    computed every time they are read."""
+
+    class Meta(DefaultMeta):
+        """Needed for South to recognize this model."""
+
+    objects = SubnetStatisticsManager()
+
+    # The statistics are discarded by the signals of the subnet's addresses
+    # and ranges, which are also sent while the subnet is being deleted, after
+    # its related objects were collected. The statistics are thus removed by
+    # the subnet's post_delete signal rather than a cascading delete, and
+    # aren't constrained to refer to an existing subnet in the meantime.
+    subnet = OneToOneField(
+        "Subnet",
+        primary_key=True,
+        on_delete=DO_NOTHING,
+        db_constraint=False,
+        editable=False,
+    )
+
+    # The statistics rendered by `IPRangeStatistics.render_json`, without
+    # ranges or suggestions.
+    statistics = JSONField(editable=False, null=False)
+
+    # The utilisation details returned by `get_utilisation`.
+    utilisation = JSONField(editable=False, null=False)
+
+    # The time the statistics were computed.
+    updated = DateTimeField(editable=False, null=False, auto_now=True)
@@ -341,6 +341,34 @@ class TestDNSDataMapping(MAASServerTestCase):
         actual_parent = DNSData.objects.get_hostname_dnsdata_mapping(parent)
         self.assertEqual(expected_parent, actual_parent)
 
+    def test_get_hostname_dnsdata_mappings_for_domains_at_domain(self):
+        parent = Domain.objects.get_default_domain()
+        name = factory.make_name("node")
+        d_name = "%s.%s" % (name, parent.name)
+        domain = factory.make_Domain(name=d_name)
+        dnsrr = factory.make_DNSResource(
+            name="@", domain=domain, no_ip_addresses=True
+        )
+        factory.make_DNSData(dnsresource=dnsrr, ip_addresses=True)
+        factory.make_Node_with_Interface_on_Subnet(
+            hostname=name, domain=parent
+        )
+        expected_mapping = self.make_mapping(dnsrr)
+        actual = DNSData.objects.get_hostname_dnsdata_mappings_for_domains(
+            [domain, parent]
+        )
+        dnsrr.name = name
+        dnsrr.domain = parent
+        expected_parent = self.make_mapping(dnsrr)
+        self.assertEqual(
+            {domain.id: expected_mapping, parent.id: expected_parent}, actual
+        )
+
+    def test_get_hostname_dnsdata_mappings_for_domains_empty(self):
+        self.assertEqual(
+            {}, DNSData.objects.get_hostname_dnsdata_mappings_for_domains([])
+        )
+
     def test_get_hostname_dnsdata_mapping_handles_ttl(self):
         # We create 2 domains, one with a ttl, one withoout.
         # Within each domain, create an RRset with and without ttl.
@@ -0,0 +1,123 @@
+# Copyright 2020 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for the DNSZoneFile model."""
+
+
+from random import randint
+
+from testtools.matchers import MatchesStructure
+
+from maasserver.models.dnspublication import DNSPublication
+from maasserver.models.dnszonefile import DNSZoneFile
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+from provisioningserver.dns.zoneconfig import (
+    DNSRenderedZoneConfig,
+    ZoneRecords,
+)
+
+
+def make_rendered_zone(zone_name=None, serial=None):
+    if zone_name is None:
+        zone_name = factory.make_name("zone")
+    if serial is None:
+        serial = randint(1, 1000)
+    records = ZoneRecords(
+        origin=zone_name + ".",
+        serial=serial,
+        domain=zone_name,
+        ttl=30,
+        static=factory.make_name("static"),
+        records=[(zone_name + ".", 30, "A", factory.make_ipv4_address())],
+    )
+    return DNSRenderedZoneConfig(
+        zone_name,
+        digest=factory.make_name("digest"),
+        content=factory.make_name("content"),
+        records=records,
+    )
+
+
+class TestDNSZoneFileManager(MAASServerTestCase):
+    """Tests for `DNSZoneFileManager`."""
+
+    def test_store_rendered_creates_zone_files(self):
+        servers_digest = factory.make_name("servers")
+        zone = make_rendered_zone()
+        DNSZoneFile.objects.store_rendered(
+            10, servers_digest, [zone.zone_info[0].zone_name], [zone]
+        )
+        [zone_file] = DNSZoneFile.objects.all()
+        self.assertThat(
+            zone_file,
+            MatchesStructure.byEquality(
+                zone_name=zone.zone_info[0].zone_name,
+                servers_digest=servers_digest,
+                serial=10,
+                zone_serial=10,
+                digest=zone.digest,
+                content=zone.content,
+            ),
+        )
+        self.assertEqual(
+            zone.records, ZoneRecords.from_dict(zone_file.records)
+        )
+
+    def test_store_rendered_keeps_unchanged_zone_files(self):
+        servers_digest = factory.make_name("servers")
+        zone = make_rendered_zone()
+        zone_names = [zone.zone_info[0].zone_name]
+        DNSZoneFile.objects.store_rendered(
+            10, servers_digest, zone_names, [zone]
+        )
+        DNSZoneFile.objects.store_rendered(11, servers_digest, zone_names, [])
+        [zone_file] = DNSZoneFile.objects.all()
+        self.assertThat(
+            zone_file,
+            MatchesStructure.byEquality(
+                serial=11, zone_serial=10, content=zone.content
+            ),
+        )
+        self.assertTrue(DNSZoneFile.objects.is_rendered(11, servers_digest))
+        self.assertFalse(DNSZoneFile.objects.is_rendered(10, servers_digest))
+
+    def test_store_rendered_deletes_removed_zone_files(self):
+        servers_digest = factory.make_name("servers")
+        other_servers_digest = factory.make_name("servers")
+        zone = make_rendered_zone()
+        zone_names = [zone.zone_info[0].zone_name]
+        DNSZoneFile.objects.store_rendered(
+            10, servers_digest, zone_names, [zone]
+        )
+        DNSZoneFile.objects.store_rendered(
+            10, other_servers_digest, zone_names, [zone]
+        )
+        DNSZoneFile.objects.store_rendered(11, servers_digest, [], [])
+        self.assertEqual({}, DNSZoneFile.objects.get_digests(servers_digest))
+        self.assertEqual(
+            {zone.zone_info[0].zone_name: zone.digest},
+            DNSZoneFile.objects.get_digests(other_servers_digest),
+        )
+
+    def test_collect_garbage_deletes_unpublished_zone_files(self):
+        publication = DNSPublication(source="Test")
+        publication.save()
+        servers_digest = factory.make_name("servers")
+        stale_servers_digest = factory.make_name("servers")
+        zone = make_rendered_zone()
+        zone_names = [zone.zone_info[0].zone_name]
+        DNSZoneFile.objects.store_rendered(
+            publication.serial, servers_digest, zone_names, [zone]
+        )
+        DNSZoneFile.objects.store_rendered(
+            publication.serial + 1, stale_servers_digest, zone_names, [zone]
+        )
+        DNSZoneFile.objects.collect_garbage()
+        self.assertEqual(
+            {zone.zone_info[0].zone_name: zone.digest},
+            DNSZoneFile.objects.get_digests(servers_digest),
+        )
+        self.assertEqual(
+            {}, DNSZoneFile.objects.get_digests(stale_servers_digest)
+        )
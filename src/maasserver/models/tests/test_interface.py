@@ -8,7 +8,7 @@ from collections.abc import Iterable
 import datetime
 import random
 import threading
-from unittest.mock import call
+from unittest.mock import call, Mock
 
 from django.core.exceptions import PermissionDenied, ValidationError
 from django.db import transaction
@@ -3767,6 +3767,90 @@ class TestClaimAutoIPs(MAASTransactionServerTestCase):
         self.assertItemsEqual(assigned_addresses, observed)
 
 
+class TestInterfaceManagerClaimAutoIPs(MAASServerTestCase):
+    """Tests for `InterfaceManager.claim_auto_ips`."""
+
+    def make_auto_ips(self, interface, subnet, count=1):
+        return [
+            factory.make_StaticIPAddress(
+                alloc_type=IPADDRESS_TYPE.AUTO,
+                ip="",
+                subnet=subnet,
+                interface=interface,
+            )
+            for _ in range(count)
+        ]
+
+    def test_claims_auto_ips_of_all_interfaces(self):
+        node = factory.make_Node()
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/24", gateway_ip=None, dns_servers=None
+        )
+        interfaces = [
+            factory.make_Interface(
+                INTERFACE_TYPE.PHYSICAL, node=node, vlan=subnet.vlan
+            )
+            for _ in range(3)
+        ]
+        auto_ip_ids = {
+            auto_ip.id
+            for interface in interfaces
+            for auto_ip in self.make_auto_ips(interface, subnet, count=2)
+        }
+        claims = Interface.objects.claim_auto_ips(interfaces)
+        self.assertEqual(auto_ip_ids, {auto_ip.id for _, auto_ip in claims})
+        self.assertItemsEqual(
+            ["10.0.0.%d" % host for host in range(1, 7)],
+            [reload_object(auto_ip).ip for _, auto_ip in claims],
+        )
+        for interface, auto_ip in claims:
+            self.assertIn(auto_ip, interface.ip_addresses.all())
+
+    def test_assigns_addresses_together(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/24", gateway_ip=None, dns_servers=None
+        )
+        interfaces = [
+            factory.make_Interface(INTERFACE_TYPE.PHYSICAL, vlan=subnet.vlan)
+            for _ in range(3)
+        ]
+        auto_ips = [
+            auto_ip
+            for interface in interfaces
+            for auto_ip in self.make_auto_ips(interface, subnet)
+        ]
+        assign_bulk = self.patch(
+            StaticIPAddress.objects,
+            "assign_bulk",
+            Mock(wraps=StaticIPAddress.objects.assign_bulk),
+        )
+        Interface.objects.claim_auto_ips(interfaces)
+        [bulk_call] = assign_bulk.call_args_list
+        self.assertEqual(auto_ips, bulk_call[0][0])
+
+    def test_does_nothing_without_auto_ips_to_claim(self):
+        interface = factory.make_Interface(INTERFACE_TYPE.PHYSICAL)
+        assign_bulk = self.patch(StaticIPAddress.objects, "assign_bulk")
+        self.assertEqual([], Interface.objects.claim_auto_ips([interface]))
+        self.assertThat(assign_bulk, MockNotCalled())
+
+    def test_removes_allocated_addresses(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/24", gateway_ip=None, dns_servers=None
+        )
+        interface = factory.make_Interface(
+            INTERFACE_TYPE.PHYSICAL, vlan=subnet.vlan
+        )
+        [auto_ip] = self.make_auto_ips(interface, subnet)
+        Interface.objects.claim_auto_ips([interface])
+        self.assertItemsEqual(
+            [auto_ip.id],
+            StaticIPAddress.objects.filter(subnet=subnet).values_list(
+                "id", flat=True
+            ),
+        )
+
+
 class TestCreateAcquiredBridge(MAASServerTestCase):
     """Tests for `Interface.create_acquired_bridge`."""
 
@@ -4455,16 +4455,25 @@ class TestNode(MAASServerTestCase):
         self.assertEqual(state, reload_object(node).power_state)
 
     def test_update_power_state_sets_last_updated_field(self):
-        node = factory.make_Node(power_state_updated=None)
+        node = factory.make_Node(
+            power_state=POWER_STATE.OFF, power_state_updated=None
+        )
         self.assertIsNone(node.power_state_updated)
         previous_updated = node.power_state_updated = now()
         node.save()
-        state = factory.pick_enum(POWER_STATE)
-        node.update_power_state(state)
+        node.update_power_state(POWER_STATE.ON)
         self.assertNotEqual(
             previous_updated, reload_object(node).power_state_updated
         )
 
+    def test_update_power_state_keeps_last_updated_field_if_unchanged(self):
+        updated = now() - timedelta(hours=1)
+        node = factory.make_Node(
+            power_state=POWER_STATE.ON, power_state_updated=updated
+        )
+        node.update_power_state(POWER_STATE.ON)
+        self.assertEqual(updated, reload_object(node).power_state_updated)
+
     def test_update_power_state_readies_node_if_releasing(self):
         node = factory.make_Node(
             power_state=POWER_STATE.ON,
@@ -7053,28 +7062,31 @@ class TestNodeNetworking(MAASTransactionServerTestCase):
                 assigned_ips.add(str(auto_ip.ip))
         self.assertEqual(6, len(assigned_ips))
 
-    def test_claim_auto_ips_calls_claim_auto_ips_on_all_interfaces(self):
+    def test_claim_auto_ips_claims_auto_ips_of_all_interfaces(self):
         node = factory.make_Node()
         interfaces = [
             factory.make_Interface(INTERFACE_TYPE.PHYSICAL, node=node)
             for _ in range(3)
         ]
-        mock_claim_auto_ips = self.patch_autospec(Interface, "claim_auto_ips")
+        mock_claim_auto_ips = self.patch_autospec(
+            Interface.objects, "claim_auto_ips"
+        )
+        mock_claim_auto_ips.return_value = []
         node.claim_auto_ips()
-        # Since the interfaces are not ordered, which they dont need to be
-        # we extract the passed interface to each call.
-        observed_interfaces = [
-            call[0][0] for call in mock_claim_auto_ips.call_args_list
-        ]
-        self.assertItemsEqual(interfaces, observed_interfaces)
+        # The addresses of all the interfaces are claimed together.
+        [call] = mock_claim_auto_ips.call_args_list
+        self.assertItemsEqual(interfaces, call[0][0])
 
-    def test_claim_auto_ips_calls_claim_auto_ips_on_new_added_interface(self):
+    def test_claim_auto_ips_claims_auto_ips_of_new_added_interface(self):
         node = factory.make_Node()
         interfaces = [
             factory.make_Interface(INTERFACE_TYPE.PHYSICAL, node=node)
             for _ in range(2)
         ]
-        mock_claim_auto_ips = self.patch_autospec(Interface, "claim_auto_ips")
+        mock_claim_auto_ips = self.patch_autospec(
+            Interface.objects, "claim_auto_ips"
+        )
+        mock_claim_auto_ips.return_value = []
         node = (
             Node.objects.filter(id=node.id)
             .prefetch_related("interface_set")
@@ -7085,12 +7097,8 @@ class TestNodeNetworking(MAASTransactionServerTestCase):
         new_iface = factory.make_Interface(INTERFACE_TYPE.PHYSICAL, node=node)
         interfaces.append(new_iface)
         node.claim_auto_ips()
-        # Since the interfaces are not ordered, which they dont need to be
-        # we extract the passed interface to each call.
-        observed_interfaces = [
-            call[0][0] for call in mock_claim_auto_ips.call_args_list
-        ]
-        self.assertItemsEqual(interfaces, observed_interfaces)
+        [call] = mock_claim_auto_ips.call_args_list
+        self.assertItemsEqual(interfaces, call[0][0])
 
     def test_release_interface_config_calls_release_auto_ips_on_all(self):
         node = factory.make_Node()
@@ -4,7 +4,7 @@
 """:class:`StaticIPAddress` tests."""
 
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from random import randint, shuffle
 import threading
 from unittest.mock import sentinel
@@ -46,7 +46,11 @@ from maasserver.models.staticipaddress import (
     HostnameIPMapping,
     StaticIPAddress,
 )
-from maasserver.models.subnet import Subnet
+from maasserver.models.subnet import (
+    free_ip_indexes,
+    get_free_ip_index,
+    Subnet,
+)
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import (
     MAASServerTestCase,
@@ -56,6 +60,7 @@ from maasserver.utils import orm
 from maasserver.utils.dns import get_ip_based_hostname
 from maasserver.utils.orm import reload_object, transactional
 from maasserver.websockets.base import dehydrate_datetime
+from maastesting.djangotestcase import count_queries
 
 
 class TestStaticIPAddressManager(MAASServerTestCase):
@@ -191,6 +196,132 @@ class TestStaticIPAddressManager(MAASServerTestCase):
         ipaddress = StaticIPAddress.objects.allocate_new(subnet)
         self.assertEqual(ipaddress.ip, "10.0.0.98")
 
+    def test_allocate_new_with_free_ip_indexes_allocates_each_ip_once(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/29", gateway_ip=None, dns_servers=None
+        )
+        factory.make_StaticIPAddress("10.0.0.4", subnet=subnet)
+        with free_ip_indexes():
+            ips = [
+                StaticIPAddress.objects.allocate_new(subnet).ip
+                for _ in range(5)
+            ]
+            self.assertIsNone(get_free_ip_index(subnet).get_next_ip())
+        self.assertEqual(
+            ["10.0.0.5", "10.0.0.6", "10.0.0.1", "10.0.0.2", "10.0.0.3"], ips
+        )
+
+    def test_allocate_new_with_free_ip_indexes_removes_requested_ip(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/29", gateway_ip=None, dns_servers=None
+        )
+        with free_ip_indexes():
+            index = get_free_ip_index(subnet)
+            StaticIPAddress.objects.allocate_new(
+                subnet, requested_address="10.0.0.1"
+            )
+            self.assertNotIn("10.0.0.1", index)
+            ipaddress = StaticIPAddress.objects.allocate_new(subnet)
+        self.assertEqual("10.0.0.2", ipaddress.ip)
+
+    def test_assign_bulk_assigns_free_addresses(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/24", gateway_ip=None, dns_servers=None
+        )
+        ipaddresses = [
+            factory.make_StaticIPAddress(
+                alloc_type=IPADDRESS_TYPE.AUTO, ip="", subnet=subnet
+            )
+            for _ in range(3)
+        ]
+        StaticIPAddress.objects.assign_bulk(
+            ipaddresses, exclude_addresses=["10.0.0.1"]
+        )
+        self.assertEqual(
+            ["10.0.0.2", "10.0.0.3", "10.0.0.4"],
+            [reload_object(ipaddress).ip for ipaddress in ipaddresses],
+        )
+
+    def test_assign_bulk_updates_addresses_together(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/24", gateway_ip=None, dns_servers=None
+        )
+        ipaddresses = [
+            factory.make_StaticIPAddress(
+                alloc_type=IPADDRESS_TYPE.AUTO, ip="", subnet=subnet
+            )
+            for _ in range(6)
+        ]
+        count_one, _ = count_queries(
+            StaticIPAddress.objects.assign_bulk, ipaddresses[:1]
+        )
+        count_many, _ = count_queries(
+            StaticIPAddress.objects.assign_bulk, ipaddresses[1:]
+        )
+        self.assertEqual(count_one, count_many)
+
+    def test_assign_bulk_raises_when_addresses_exhausted(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/30", gateway_ip=None, dns_servers=None
+        )
+        ipaddresses = [
+            factory.make_StaticIPAddress(
+                alloc_type=IPADDRESS_TYPE.AUTO, ip="", subnet=subnet
+            )
+            for _ in range(3)
+        ]
+        self.assertRaises(
+            StaticIPAddressExhaustion,
+            StaticIPAddress.objects.assign_bulk,
+            ipaddresses,
+        )
+
+    def test_assign_bulk_assigns_different_neighbours_when_exhausted(self):
+        # Note: 10.0.0.0/30 --> 10.0.0.1 and 10.0.0.0.2 are usable.
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/30", gateway_ip=None, dns_servers=None
+        )
+        rackif = factory.make_Interface(vlan=subnet.vlan)
+        now = datetime.now()
+        yesterday = now - timedelta(days=1)
+        factory.make_Discovery(ip="10.0.0.1", interface=rackif, updated=now)
+        factory.make_Discovery(
+            ip="10.0.0.2", interface=rackif, updated=yesterday
+        )
+        ipaddresses = [
+            factory.make_StaticIPAddress(
+                alloc_type=IPADDRESS_TYPE.AUTO, ip="", subnet=subnet
+            )
+            for _ in range(2)
+        ]
+        StaticIPAddress.objects.assign_bulk(ipaddresses)
+        # The least recently seen neighbour first.
+        self.assertEqual(
+            ["10.0.0.2", "10.0.0.1"],
+            [reload_object(ipaddress).ip for ipaddress in ipaddresses],
+        )
+
+    def test_assign_bulk_requests_retry_when_free_address_taken(self):
+        bulk_update = self.patch(StaticIPAddress.objects, "bulk_update")
+        bulk_update.side_effect = orm.make_unique_violation()
+        ipaddress = factory.make_StaticIPAddress(
+            alloc_type=IPADDRESS_TYPE.AUTO,
+            ip="",
+            subnet=factory.make_managed_Subnet(),
+        )
+        with orm.retry_context:
+            # A retry has been requested.
+            self.assertRaises(
+                orm.RetryTransaction,
+                StaticIPAddress.objects.assign_bulk,
+                [ipaddress],
+            )
+            # Aquisition of `address_allocation` is pending.
+            self.assertThat(
+                list(orm.retry_context.stack._cm_pending),
+                Equals([locks.address_allocation]),
+            )
+
     def test_allocate_new_returns_requested_IP_if_available(self):
         subnet = factory.make_Subnet(cidr="10.0.0.0/24")
         ipaddress = StaticIPAddress.objects.allocate_new(
@@ -391,6 +522,53 @@ class TestStaticIPAddressManagerTransactional(MAASTransactionServerTestCase):
         )
 
 
+    def test_allocate_new_with_free_ip_indexes_works_under_concurrency(self):
+        ipv6 = self.ip_version == 6
+        subnet = factory.make_managed_Subnet(ipv6=ipv6)
+        count = 10  # Allocate this number of batches of IP addresses.
+        batch = 4  # Allocate this number of IP addresses in each batch.
+        concurrency = threading.Semaphore(8)
+        mutex = threading.Lock()
+        results = []
+
+        @transactional
+        def allocate():
+            with free_ip_indexes():
+                return [
+                    StaticIPAddress.objects.allocate_new(subnet)
+                    for _ in range(batch)
+                ]
+
+        def allocate_batch():
+            try:
+                with concurrency:
+                    sips = allocate()
+            except Exception:
+                failure = Failure()
+                with mutex:
+                    results.append(failure)
+            else:
+                with mutex:
+                    results.extend(sips)
+
+        threads = [
+            threading.Thread(target=allocate_batch) for _ in range(count)
+        ]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertThat(results, AllMatch(IsInstance(StaticIPAddress)))
+        ips = {sip.ip for sip in results}
+        self.assertThat(ips, HasLength(count * batch))
+        self.assertThat(
+            ips,
+            AllMatch(AfterPreprocessing(subnet.is_valid_static_ip, Is(True))),
+        )
+
+
 class TestStaticIPAddressManagerMapping(MAASServerTestCase):
     """Tests for get_hostname_ip_mapping()."""
 
@@ -1184,6 +1362,37 @@ class TestStaticIPAddressManagerMapping(MAASServerTestCase):
             mapping,
         )
 
+    def test_get_hostname_ip_mappings_for_domains_returns_domain_head_ips(
+        self,
+    ):
+        parent = factory.make_Domain()
+        name = factory.make_name()
+        child = factory.make_Domain(name="%s.%s" % (name, parent.name))
+        other = factory.make_Domain()
+        subnet = factory.make_Subnet()
+        node = factory.make_Node_with_Interface_on_Subnet(
+            subnet=subnet, domain=parent, hostname=name
+        )
+        sip1 = factory.make_StaticIPAddress(subnet=subnet)
+        node.interface_set.first().ip_addresses.add(sip1)
+        manager = StaticIPAddress.objects
+        mappings = manager.get_hostname_ip_mappings_for_domains(
+            [parent, child, other]
+        )
+        expected = {
+            node.fqdn: HostnameIPMapping(
+                node.system_id, 30, {sip1.ip}, node.node_type
+            )
+        }
+        self.assertEqual(
+            {parent.id: expected, child.id: expected, other.id: {}},
+            mappings,
+        )
+
+    def test_get_hostname_ip_mappings_for_domains_empty(self):
+        manager = StaticIPAddress.objects
+        self.assertEqual({}, manager.get_hostname_ip_mappings_for_domains([]))
+
     def test_get_hostname_ip_mapping_does_not_return_discovered_and_auto(self):
         # Create a situation where we have an AUTO ip on the pxeboot interface,
         # and a discovered IP of the other address family (v4/v6) on another
@@ -6,6 +6,7 @@
 
 from datetime import datetime, timedelta
 import random
+from unittest.mock import Mock
 
 from django.core.exceptions import PermissionDenied, ValidationError
 from fixtures import FakeLogger
@@ -31,7 +32,13 @@ from maasserver.enum import (
 )
 from maasserver.exceptions import StaticIPAddressExhaustion
 from maasserver.models import Config, Notification, Space
-from maasserver.models.subnet import create_cidr, get_allocated_ips, Subnet
+from maasserver.models.subnet import (
+    create_cidr,
+    free_ip_indexes,
+    get_allocated_ips,
+    get_free_ip_index,
+    Subnet,
+)
 from maasserver.models.timestampedmodel import now
 from maasserver.permissions import NodePermission
 from maasserver.testing.factory import factory, RANDOM, RANDOM_OR_NONE
@@ -40,7 +47,11 @@ from maasserver.testing.testcase import MAASServerTestCase
 from maasserver.utils.orm import get_one, reload_object
 from maastesting.djangotestcase import count_queries, CountQueries
 from maastesting.matchers import DocTestMatches
-from provisioningserver.utils.network import inet_ntop, MAASIPRange
+from provisioningserver.utils.network import (
+    FreeIPIndex,
+    inet_ntop,
+    MAASIPRange,
+)
 
 
 class TestSubnet(MAASServerTestCase):
@@ -1289,6 +1300,23 @@ class TestSubnetGetLeastRecentlySeenUnknownNeighbour(MAASServerTestCase):
         discovery = subnet.get_least_recently_seen_unknown_neighbour()
         self.assertThat(discovery.ip, Equals("10.0.0.1"))
 
+    def test_returns_least_recently_seen_neighbour_not_excluded(self):
+        # Note: 10.0.0.0/30 --> 10.0.0.1 and 10.0.0.0.2 are usable.
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/30", gateway_ip=None, dns_servers=None
+        )
+        rackif = factory.make_Interface(vlan=subnet.vlan)
+        now = datetime.now()
+        yesterday = now - timedelta(days=1)
+        factory.make_Discovery(ip="10.0.0.1", interface=rackif, updated=now)
+        factory.make_Discovery(
+            ip="10.0.0.2", interface=rackif, updated=yesterday
+        )
+        discovery = subnet.get_least_recently_seen_unknown_neighbour(
+            exclude_addresses=["10.0.0.2"]
+        )
+        self.assertThat(discovery.ip, Equals("10.0.0.1"))
+
     def test_returns_least_recently_seen_neighbour_handles_unmanaged(self):
         # Note: 10.0.0.0/29 --> 10.0.0.1 through 10.0.0.0.6 are usable.
         subnet = factory.make_Subnet(
@@ -1441,6 +1469,89 @@ class TestSubnetGetNextIPForAllocation(MAASServerTestCase):
         self.assertThat(ip, Equals("10.0.0.5"))
 
 
+class TestSubnetGetNextIPForAllocationWithIndex(MAASServerTestCase):
+
+    scenarios = (
+        ("managed", {"managed": True}),
+        ("unmanaged", {"managed": False}),
+    )
+
+    def make_Subnet(self):
+        # Note: 10.0.0.0/29 --> 10.0.0.1 through 10.0.0.0.6 are usable.
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/29",
+            gateway_ip=None,
+            dns_servers=None,
+            managed=self.managed,
+        )
+        if not self.managed:
+            factory.make_IPRange(
+                subnet,
+                start_ip="10.0.0.1",
+                end_ip="10.0.0.6",
+                alloc_type=IPRANGE_TYPE.RESERVED,
+            )
+            subnet = reload_object(subnet)
+        return subnet
+
+    def test_no_index_outside_free_ip_indexes(self):
+        subnet = self.make_Subnet()
+        self.assertIsNone(get_free_ip_index(subnet))
+
+    def test_index_holds_free_addresses(self):
+        subnet = self.make_Subnet()
+        factory.make_StaticIPAddress(ip="10.0.0.4", cidr="10.0.0.0/29")
+        with free_ip_indexes():
+            index = get_free_ip_index(subnet)
+            self.assertIsInstance(index, FreeIPIndex)
+            self.assertIs(index, get_free_ip_index(subnet))
+            self.assertNotIn("10.0.0.4", index)
+            self.assertIn("10.0.0.5", index)
+        self.assertIsNone(get_free_ip_index(subnet))
+
+    def test_nested_contexts_share_indexes(self):
+        subnet = self.make_Subnet()
+        with free_ip_indexes():
+            index = get_free_ip_index(subnet)
+            with free_ip_indexes():
+                self.assertIs(index, get_free_ip_index(subnet))
+            self.assertIs(index, get_free_ip_index(subnet))
+
+    def test_computes_free_addresses_once(self):
+        subnet = self.make_Subnet()
+        get_ipranges_not_in_use = self.patch(
+            subnet,
+            "get_ipranges_not_in_use",
+            Mock(wraps=subnet.get_ipranges_not_in_use),
+        )
+        with free_ip_indexes():
+            ips = [
+                subnet.get_next_ip_for_allocation(exclude_addresses=excluded)
+                for excluded in ([], ["10.0.0.1"], ["10.0.0.1", "10.0.0.2"])
+            ]
+        self.assertEqual(["10.0.0.1", "10.0.0.2", "10.0.0.3"], ips)
+        self.assertEqual(1, get_ipranges_not_in_use.call_count)
+
+    def test_uses_smallest_free_range(self):
+        subnet = self.make_Subnet()
+        factory.make_StaticIPAddress(ip="10.0.0.4", cidr="10.0.0.0/29")
+        with free_ip_indexes():
+            ip = subnet.get_next_ip_for_allocation()
+        self.assertEqual("10.0.0.5", ip)
+
+    def test_raises_if_no_free_addresses(self):
+        subnet = self.make_Subnet()
+        with free_ip_indexes():
+            get_free_ip_index(subnet)
+            self.assertRaises(
+                StaticIPAddressExhaustion,
+                subnet.get_next_ip_for_allocation,
+                exclude_addresses=[
+                    "10.0.0.%d" % host for host in range(1, 7)
+                ],
+            )
+
+
 class TestUnmanagedSubnets(MAASServerTestCase):
     def test_allocation_uses_reserved_range(self):
         # Note: 10.0.0.0/29 --> 10.0.0.1 through 10.0.0.0.6 are usable.
@@ -0,0 +1,202 @@
+# Copyright 2020 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `SubnetStatistics`."""
+
+
+from maasserver.enum import IPADDRESS_TYPE, IPRANGE_TYPE
+from maasserver.models import Config, Subnet, SubnetStatistics
+from maasserver.models.subnetstatistics import (
+    get_ipaddress_counts,
+    get_utilisation,
+)
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+from maastesting.djangotestcase import count_queries
+from provisioningserver.utils.network import IPRangeStatistics
+
+
+class TestGetIPAddressCounts(MAASServerTestCase):
+    def test_counts_addresses_by_alloc_type(self):
+        subnet = factory.make_Subnet(cidr="10.0.0.0/24")
+        for _ in range(2):
+            factory.make_StaticIPAddress(
+                alloc_type=IPADDRESS_TYPE.STICKY, subnet=subnet
+            )
+        factory.make_StaticIPAddress(
+            alloc_type=IPADDRESS_TYPE.USER_RESERVED, subnet=subnet
+        )
+        counts = get_ipaddress_counts()
+        self.assertEqual(2, counts[subnet.id][IPADDRESS_TYPE.STICKY])
+        self.assertEqual(1, counts[subnet.id][IPADDRESS_TYPE.USER_RESERVED])
+        self.assertEqual(0, counts[subnet.id][IPADDRESS_TYPE.AUTO])
+
+    def test_counts_addresses_of_given_subnets(self):
+        subnet = factory.make_Subnet(cidr="10.0.0.0/24")
+        other_subnet = factory.make_Subnet(cidr="10.0.1.0/24")
+        factory.make_StaticIPAddress(
+            alloc_type=IPADDRESS_TYPE.STICKY, subnet=subnet
+        )
+        factory.make_StaticIPAddress(
+            alloc_type=IPADDRESS_TYPE.STICKY, subnet=other_subnet
+        )
+        counts = get_ipaddress_counts([subnet.id])
+        self.assertEqual([subnet.id], list(counts))
+
+
+class TestGetUtilisation(MAASServerTestCase):
+    def test_returns_utilisation(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/24", gateway_ip="10.0.0.1", dns_servers=[]
+        )
+        factory.make_IPRange(
+            subnet=subnet,
+            start_ip="10.0.0.11",
+            end_ip="10.0.0.20",
+            alloc_type=IPRANGE_TYPE.DYNAMIC,
+        )
+        factory.make_StaticIPAddress(
+            ip="10.0.0.12", alloc_type=IPADDRESS_TYPE.DHCP, subnet=subnet
+        )
+        factory.make_StaticIPAddress(
+            ip="10.0.0.80", alloc_type=IPADDRESS_TYPE.STICKY, subnet=subnet
+        )
+        utilisation = get_utilisation(
+            subnet.get_iprange_usage(), get_ipaddress_counts()[subnet.id]
+        )
+        self.assertEqual(
+            {
+                "available": 242,
+                "unavailable": 12,
+                "dynamic_available": 9,
+                "dynamic_used": 1,
+                "static": 1,
+                "reserved_available": 0,
+                "reserved_used": 0,
+            },
+            utilisation,
+        )
+
+
+class TestSubnetStatisticsManager(MAASServerTestCase):
+    def test_update_for_subnet_stores_statistics(self):
+        subnet = factory.make_Subnet(cidr="10.0.0.0/24")
+        statistics = SubnetStatistics.objects.update_for_subnet(subnet)
+        full_range = subnet.get_iprange_usage()
+        self.assertEqual(
+            IPRangeStatistics(full_range).render_json(), statistics.statistics
+        )
+        self.assertEqual(
+            get_utilisation(full_range, get_ipaddress_counts()[subnet.id]),
+            statistics.utilisation,
+        )
+        self.assertEqual(
+            statistics, SubnetStatistics.objects.get(subnet=subnet)
+        )
+
+    def test_update_for_subnet_replaces_statistics(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/24", gateway_ip=None, dns_servers=[]
+        )
+        SubnetStatistics.objects.update_or_create(
+            subnet=subnet, defaults={"statistics": {}, "utilisation": {}}
+        )
+        SubnetStatistics.objects.update_for_subnet(subnet)
+        statistics = SubnetStatistics.objects.get(subnet=subnet)
+        self.assertEqual(254, statistics.statistics["num_available"])
+
+    def test_statistics_are_discarded_on_address_changes(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/24", gateway_ip=None, dns_servers=[]
+        )
+        SubnetStatistics.objects.update_for_subnet(subnet)
+        ip = factory.make_StaticIPAddress(
+            alloc_type=IPADDRESS_TYPE.STICKY, subnet=subnet
+        )
+        self.assertFalse(
+            SubnetStatistics.objects.filter(subnet=subnet).exists()
+        )
+        statistics = SubnetStatistics.objects.get_statistics([subnet])
+        self.assertEqual(
+            253, statistics[subnet.id].statistics["num_available"]
+        )
+        self.assertEqual(1, statistics[subnet.id].utilisation["static"])
+        ip.delete()
+        self.assertFalse(
+            SubnetStatistics.objects.filter(subnet=subnet).exists()
+        )
+
+    def test_statistics_are_discarded_on_range_changes(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/24", gateway_ip=None, dns_servers=[]
+        )
+        SubnetStatistics.objects.update_for_subnet(subnet)
+        factory.make_IPRange(
+            subnet=subnet,
+            start_ip="10.0.0.11",
+            end_ip="10.0.0.20",
+            alloc_type=IPRANGE_TYPE.RESERVED,
+        )
+        self.assertFalse(
+            SubnetStatistics.objects.filter(subnet=subnet).exists()
+        )
+        statistics = SubnetStatistics.objects.get_statistics([subnet])
+        self.assertEqual(
+            244, statistics[subnet.id].statistics["num_available"]
+        )
+        self.assertEqual(
+            10, statistics[subnet.id].utilisation["reserved_available"]
+        )
+
+    def test_usage_not_computed_on_changes_without_threshold(self):
+        Config.objects.set_config("subnet_ip_exhaustion_threshold_count", 0)
+        subnet = factory.make_Subnet(cidr="10.0.0.0/24")
+        get_iprange_usage = self.patch(Subnet, "get_iprange_usage")
+        factory.make_StaticIPAddress(
+            alloc_type=IPADDRESS_TYPE.STICKY, subnet=subnet
+        )
+        get_iprange_usage.assert_not_called()
+
+    def test_get_statistics_returns_stored_statistics(self):
+        subnet = factory.make_Subnet(cidr="10.0.0.0/24")
+        stored, _ = SubnetStatistics.objects.update_or_create(
+            subnet=subnet, defaults={"statistics": {}, "utilisation": {}}
+        )
+        self.assertEqual(
+            {subnet.id: stored},
+            SubnetStatistics.objects.get_statistics([subnet]),
+        )
+
+    def test_get_statistics_computes_missing_statistics(self):
+        subnets = [
+            factory.make_Subnet(
+                cidr="10.0.%d.0/24" % i, gateway_ip=None, dns_servers=[]
+            )
+            for i in range(3)
+        ]
+        found = SubnetStatistics.objects.get_statistics(subnets)
+        self.assertItemsEqual([subnet.id for subnet in subnets], found)
+        self.assertEqual(3, SubnetStatistics.objects.count())
+        self.assertEqual(254, found[subnets[0].id].statistics["num_available"])
+
+    def test_get_statistics_reads_stored_statistics_in_one_query(self):
+        subnets = [
+            factory.make_Subnet(cidr="10.0.%d.0/24" % i) for i in range(3)
+        ]
+        SubnetStatistics.objects.get_statistics(subnets)
+        count, _ = count_queries(
+            SubnetStatistics.objects.get_statistics, subnets
+        )
+        self.assertEqual(1, count)
+
+    def test_reconcile_updates_stale_statistics(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/24", gateway_ip=None, dns_servers=[]
+        )
+        SubnetStatistics.objects.update_or_create(
+            subnet=subnet, defaults={"statistics": {}, "utilisation": {}}
+        )
+        SubnetStatistics.objects.reconcile()
+        statistics = SubnetStatistics.objects.get(subnet=subnet)
+        self.assertEqual(254, statistics.statistics["num_available"])
+        self.assertEqual(254, statistics.utilisation["available"])
@@ -4,13 +4,22 @@
 """Populate what nodes are associated with a tag."""
 
 __all__ = [
+    "get_details_digest",
+    "get_tags_digest",
     "populate_tag_for_multiple_nodes",
+    "populate_tag_in_processes",
     "populate_tags",
     "populate_tags_for_single_node",
 ]
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from functools import partial
+from hashlib import sha256
 from math import ceil
+from multiprocessing import cpu_count, get_context
+from operator import attrgetter
+from time import time
 
 from django.db.transaction import TransactionManagementError
 from lxml import etree
@@ -24,6 +33,8 @@ from maasserver.models.nodeprobeddetails import (
     get_single_probed_details,
     script_output_nsmap,
 )
+from maasserver.models.nodetagevaluation import NodeTagEvaluation
+from maasserver.models.tag import Tag
 from maasserver.models.user import (
     create_auth_token,
     get_auth_tokens,
@@ -32,10 +43,12 @@ from maasserver.models.user import (
 from maasserver.rpc import getAllClients
 from maasserver.utils.orm import in_transaction, transactional
 from provisioningserver.logger import get_maas_logger, LegacyLogger
+from provisioningserver.prometheus.metrics import PROMETHEUS_METRICS
 from provisioningserver.rpc.cluster import EvaluateTag
 from provisioningserver.tags import (
     DEFAULT_BATCH_SIZE,
     gen_batches,
+    match_nodes,
     merge_details,
 )
 from provisioningserver.utils import classify
@@ -94,11 +107,7 @@ def populate_tags(tag):
     clients = getAllClients()
     if len(clients) == 0:
         # We have no clients so we need to do the work locally.
-        @transactional
-        def _populate_tag():
-            return populate_tag_for_multiple_nodes(tag, Node.objects.all())
-
-        return _populate_tag()
+        return populate_tag_in_processes(tag)
     else:
         # Split the work between the connected rack controllers.
         @transactional
@@ -194,6 +203,47 @@ def _do_populate_tags(clients):
     return [d]
 
 
+def get_details_digest(details):
+    """Return a digest of a node's probed `details`.
+
+    :param details: A dict of details, as returned by
+        `get_single_probed_details`.
+    """
+    digest = sha256()
+    for namespace, xmldata in sorted(details.items()):
+        digest.update(namespace.encode("ascii") + b"\0")
+        if xmldata is None:
+            digest.update(b"-")
+        else:
+            digest.update(b"%d\0" % len(xmldata))
+            digest.update(xmldata)
+    return digest.hexdigest()
+
+
+def get_tags_digest(tags):
+    """Return a digest of the definitions of `tags`."""
+    digest = sha256()
+    for tag in sorted(tags, key=attrgetter("id")):
+        definition = tag.definition.encode("utf-8")
+        digest.update(b"%d\0%d\0" % (tag.id, len(definition)))
+        digest.update(definition)
+    return digest.hexdigest()
+
+
+def _try_match_tag(tag, xpath, doc, logger):
+    """Like `try_match_xpath`, recording the time taken to evaluate `tag`."""
+    before = time()
+    try:
+        return try_match_xpath(xpath, doc, logger=logger)
+    finally:
+        PROMETHEUS_METRICS.update(
+            "maas_tag_evaluation_latency",
+            "observe",
+            value=time() - before,
+            labels={"tag": tag.name},
+        )
+
+
 @synchronous
 def populate_tags_for_single_node(tags, node):
     """Reevaluate all tags for a single node.
@@ -203,14 +253,45 @@ def populate_tags_for_single_node(tags, node):
     to which to farm-out work. Use `populate_tag_for_multiple_nodes` when many
     nodes need reevaluating locally, i.e. when there are no rack controllers
     connected.
+
+    The tags that matched are recorded along with digests of the details and
+    the tag definitions. When neither changed since, the recorded matches are
+    applied again without evaluating the tags.
     """
+    tags_defined = [tag for tag in tags if tag.is_defined]
     probed_details = get_single_probed_details(node)
-    probed_details_doc = merge_details(probed_details)
-    # Same document, many queries: use XPathEvaluator.
-    evaluator = etree.XPathEvaluator(probed_details_doc, namespaces=tag_nsmap)
-    evaluator = partial(try_match_xpath, doc=evaluator, logger=logger)
-    tags_defined = ((tag, tag.definition) for tag in tags if tag.is_defined)
-    tags_matching, tags_nonmatching = classify(evaluator, tags_defined)
+    details_digest = get_details_digest(probed_details)
+    tags_digest = get_tags_digest(tags_defined)
+    evaluation = NodeTagEvaluation.objects.filter(node=node).first()
+    if (
+        evaluation is not None
+        and evaluation.details_digest == details_digest
+        and evaluation.tags_digest == tags_digest
+    ):
+        matching_ids = set(evaluation.matching)
+    else:
+        probed_details_doc = merge_details(probed_details)
+        # Same document, many queries: use XPathEvaluator.
+        evaluator = etree.XPathEvaluator(
+            probed_details_doc, namespaces=tag_nsmap
+        )
+        matching_ids = {
+            tag.id
+            for tag in tags_defined
+            if _try_match_tag(tag, tag.definition, evaluator, logger)
+        }
+        NodeTagEvaluation.objects.update_or_create(
+            node=node,
+            defaults={
+                "details_digest": details_digest,
+                "tags_digest": tags_digest,
+                "matching": sorted(matching_ids),
+            },
+        )
+    tags_matching = [tag for tag in tags_defined if tag.id in matching_ids]
+    tags_nonmatching = [
+        tag for tag in tags_defined if tag.id not in matching_ids
+    ]
     node.tags.remove(*tags_nonmatching)
     node.tags.add(*tags_matching)
 
@@ -234,8 +315,85 @@ def populate_tag_for_multiple_nodes(tag, nodes, batch_size=DEFAULT_BATCH_SIZE):
             for node in batch
         }
         nodes_matching, nodes_nonmatching = classify(
-            partial(try_match_xpath, xpath, logger=maaslog),
+            partial(_try_match_tag, tag, xpath, logger=maaslog),
             probed_details_docs_by_node.items(),
         )
         tag.node_set.remove(*nodes_nonmatching)
         tag.node_set.add(*nodes_matching)
+
+
+@synchronous
+def populate_tag_in_processes(
+    tag, batch_size=DEFAULT_BATCH_SIZE, max_workers=None
+):
+    """Reevaluate a single tag for all nodes, in a pool of processes.
+
+    Use this when all nodes need reevaluating locally, i.e. when there are no
+    rack controllers connected. Unlike `populate_tag_for_multiple_nodes`, this
+    manages its own transactions: the nodes' details are read in batches, each
+    in a short transaction, then parsed and evaluated in parallel in other
+    processes. The tag's nodes are updated together at the end.
+
+    :param max_workers: The number of processes to evaluate the tag in; the
+        number of CPUs by default.
+    """
+    if max_workers is None:
+        max_workers = cpu_count()
+    nodes = transactional(list)(Node.objects.only("id", "system_id"))
+    evaluate = partial(match_nodes, tag.definition, tag_nsmap)
+    matched, unmatched = [], []
+
+    def collect(future):
+        batch_matched, batch_unmatched, latencies = future.result()
+        matched.extend(batch_matched)
+        unmatched.extend(batch_unmatched)
+        for latency in latencies:
+            PROMETHEUS_METRICS.update(
+                "maas_tag_evaluation_latency",
+                "observe",
+                value=latency,
+                labels={"tag": tag.name},
+            )
+
+    # The region is multi-threaded, so the processes are spawned rather than
+    # forked from it.
+    context = get_context("spawn")
+    with ProcessPoolExecutor(max_workers, mp_context=context) as pool:
+        # Only a few batches are in flight at once, since the details of a
+        # batch can take megabytes.
+        pending = deque()
+        for batch in gen_batches(nodes, batch_size):
+            details = transactional(get_probed_details)(batch)
+            pending.append(pool.submit(evaluate, details))
+            if len(pending) > max_workers * 2:
+                collect(pending.popleft())
+        while pending:
+            collect(pending.popleft())
+
+    node_ids = {node.system_id: node.id for node in nodes}
+    _update_tag_nodes(
+        tag.id,
+        tag.definition,
+        [node_ids[system_id] for system_id in matched],
+        [node_ids[system_id] for system_id in unmatched],
+    )
+
+
+@transactional
+def _update_tag_nodes(tag_id, tag_definition, matched, unmatched):
+    """Update the nodes of a tag evaluated with `tag_definition`.
+
+    Nothing is updated if the tag was deleted or its definition changed since;
+    the change causes it to be evaluated again.
+
+    :param matched: The IDs of the nodes that matched.
+    :param unmatched: The IDs of the nodes that didn't match.
+    """
+    tag = Tag.objects.filter(id=tag_id, definition=tag_definition).first()
+    if tag is None:
+        return
+    tag.node_set.remove(*unmatched)
+    # Nodes may have been deleted since their details were read.
+    tag.node_set.add(
+        *Node.objects.filter(id__in=matched).values_list("id", flat=True)
+    )
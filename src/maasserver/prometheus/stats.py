@@ -200,7 +200,7 @@ def update_prometheus_stats(metrics: PrometheusMetrics):
             )
 
     # Update metrics for subnets
-    for cidr, stats in get_subnets_utilisation_stats().items():
+    for cidr, stats in get_subnets_utilisation_stats(cached=True).items():
         for status in ("available", "unavailable"):
             metrics.update(
                 "maas_net_subnet_ip_count",
@@ -188,7 +188,7 @@ class TestPrometheus(MAASServerTestCase):
         self.assertThat(mock, MockCalledOnce())
         self.assertThat(mock_arches, MockCalledOnce())
         self.assertThat(mock_pods, MockCalledOnce())
-        self.assertThat(mock_subnet_stats, MockCalledOnce())
+        self.assertThat(mock_subnet_stats, MockCalledOnceWith(cached=True))
 
     def test_push_stats_to_prometheus(self):
         factory.make_RegionRackController()
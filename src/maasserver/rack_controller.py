@@ -30,6 +30,19 @@ DHCP:
     for messages on 'sys_dhcp_{id}' channel and set that rack controller as
     needing an update. Any time a message is received on this queue that rack
     controller is marked as needing an update.
+
+    The message is the ID of the VLAN whose DHCP configuration changed, or is
+    empty when it could have changed for all VLANs. The DHCP configuration of
+    the other VLANs is cached while the rack controller is watched, see
+    `maasserver.dhcp.DHCPConfigurationCache`.
+
+Boot configurations:
+    Rack controllers cache the boot configurations they get from the region,
+    see `provisioningserver.rpc.boot_configs`. Each regiond process listens
+    for changes to machines and devices, and tells the rack controllers it's
+    watching to invalidate the configurations of the changed nodes. Changes
+    are collected between two runs of the processor, every 0.1 seconds, and
+    sent together.
 """
 
 
@@ -42,6 +55,7 @@ from twisted.internet.defer import CancelledError, maybeDeferred
 from twisted.internet.task import LoopingCall
 
 from maasserver import dhcp
+from maasserver.clusterrpc.boot_configs import invalidate_boot_configs
 from maasserver.listener import PostgresListenerUnregistrationError
 from maasserver.models.node import RackController
 from maasserver.utils.orm import transactional
@@ -62,6 +76,10 @@ class RackControllerService(Service):
     See module documentation for more details.
     """
 
+    # The channel notified of changes to the nodes' boot configurations,
+    # see `maasserver.triggers.system`.
+    bootConfigChannel = "bootconfig"
+
     def __init__(self, ipcWorker, postgresListener, clock=reactor):
         """Initialise a new `RackControllerService`.
 
@@ -76,6 +94,8 @@ class RackControllerService(Service):
         self.processingDone = None
         self.watching = set()
         self.needsDHCPUpdate = set()
+        self.needsBootConfigsInvalidated = set()
+        self.needsUnknownBootConfigsInvalidated = False
         self.ipcWorker = ipcWorker
         self.postgresListener = postgresListener
 
@@ -90,6 +110,9 @@ class RackControllerService(Service):
             self.postgresListener.register(
                 "sys_core_%d" % self.processId, self.coreHandler
             )
+            self.postgresListener.register(
+                self.bootConfigChannel, self.bootConfigHandler, batch=True
+            )
             return self.postgresListener.channelRegistrarDone
 
         @transactional
@@ -145,9 +168,17 @@ class RackControllerService(Service):
             except PostgresListenerUnregistrationError:
                 # Error is acceptable as it might not have been called yet.
                 pass
+            try:
+                self.postgresListener.unregister(
+                    self.bootConfigChannel, self.bootConfigHandler
+                )
+            except PostgresListenerUnregistrationError:
+                # Error is acceptable as it might not have been called yet.
+                pass
 
             # Unregister all DHCP handling.
             for rack_id in self.watching:
+                dhcp.dhcp_configuration_cache.forget(rack_id)
                 try:
                     self.postgresListener.unregister(
                         "sys_dhcp_%s" % rack_id, self.dhcpHandler
@@ -158,6 +189,7 @@ class RackControllerService(Service):
 
             self.watching = set()
             self.needsDHCPUpdate = set()
+            self.needsBootConfigsInvalidated = set()
             self.starting = None
             if self.processing.running:
                 self.processing.stop()
@@ -196,6 +228,7 @@ class RackControllerService(Service):
                 )
             self.needsDHCPUpdate.discard(rack_id)
             self.watching.discard(rack_id)
+            dhcp.dhcp_configuration_cache.forget(rack_id)
         elif action == "watch":
             if rack_id not in self.watching:
                 self.postgresListener.register(
@@ -208,6 +241,8 @@ class RackControllerService(Service):
                     pid=os.getpid,
                     rack_id=rack_id,
                 )
+            # Changes may have been missed while not watching.
+            dhcp.dhcp_configuration_cache.track(rack_id)
             self.watching.add(rack_id)
             self.needsDHCPUpdate.add(rack_id)
             self.startProcessing()
@@ -234,6 +269,9 @@ class RackControllerService(Service):
         _, rack_id = channel.split("sys_dhcp_")
         rack_id = int(rack_id)
         if rack_id in self.watching:
+            dhcp.dhcp_configuration_cache.invalidate(
+                rack_id, int(message) if message else None
+            )
             self.needsDHCPUpdate.add(rack_id)
             self.startProcessing()
 
@@ -252,16 +290,49 @@ class RackControllerService(Service):
                 rack_id=rack_id,
             )
 
+    def bootConfigHandler(self, notifies):
+        """Called with the `(action, system_id)` notifications received for
+        the `bootConfigChannel`.
+
+        The creation of a node invalidates the configurations of unknown
+        machines, as one of them may be the new node.
+        """
+        if len(self.watching) > 0:
+            for action, system_id in notifies:
+                if action == "create":
+                    self.needsUnknownBootConfigsInvalidated = True
+                else:
+                    self.needsBootConfigsInvalidated.add(system_id)
+            self.startProcessing()
+
     def startProcessing(self):
         """Start the process looping call."""
         if not self.processing.running:
             self.processingDone = self.processing.start(0.1, now=False)
 
     def process(self):
-        """Process the next rack controller that needs an update."""
+        """Process the next rack controller that needs an update.
+
+        The boot configurations changed since the last run are invalidated
+        first, all at once.
+        """
         if not self.running:
             # We're shutting down.
             self.processing.stop()
+        elif (
+            len(self.needsBootConfigsInvalidated) > 0
+            or self.needsUnknownBootConfigsInvalidated
+        ):
+            system_ids = self.needsBootConfigsInvalidated
+            unknown = self.needsUnknownBootConfigsInvalidated
+            self.needsBootConfigsInvalidated = set()
+            self.needsUnknownBootConfigsInvalidated = False
+            d = maybeDeferred(self.processBootConfigs, system_ids, unknown)
+            d.addErrback(
+                log.err,
+                "Failed invalidating boot configurations on rack controllers.",
+            )
+            return d
         elif len(self.needsDHCPUpdate) == 0:
             # Nothing more to do.
             self.processing.stop()
@@ -295,3 +366,23 @@ class RackControllerService(Service):
         )
         d.addCallback(dhcp.configure_dhcp)
         return d
+
+    def processBootConfigs(self, system_ids, unknown=False):
+        """Invalidate the boot configurations of the nodes with `system_ids`
+        on the watched rack controllers, and those of unknown machines if
+        `unknown`."""
+
+        @transactional
+        def get_racks(rack_ids):
+            return set(
+                RackController.objects.filter(id__in=rack_ids).values_list(
+                    "system_id", flat=True
+                )
+            )
+
+        d = deferToDatabase(get_racks, set(self.watching))
+        d.addCallback(
+            partial(invalidate_boot_configs, sorted(system_ids)),
+            unknown=unknown,
+        )
+        return d
@@ -10,7 +10,9 @@ DNS:
     The regiond process listens for messages from Postgres on channel
     'sys_dns'. Any time a message is recieved on that channel the DNS is marked
     as requiring an update. Once marked for update the DNS configuration is
-    updated and bind9 is told to reload.
+    updated and bind9 is told to reload the zones that changed. The zones are
+    rendered by only one region controller per publication and stored in the
+    database; the others write out the stored zone files.
 
 Proxy:
     The regiond process listens for messages from Postgres on channel
@@ -35,7 +37,10 @@ from twisted.internet.task import LoopingCall
 from twisted.names.client import Resolver
 
 from maasserver import locks
-from maasserver.dns.config import dns_update_all_zones
+from maasserver.dns.config import (
+    dns_update_all_zones,
+    render_published_zones,
+)
 from maasserver.macaroon_auth import get_auth_info
 from maasserver.models.config import Config
 from maasserver.models.dnspublication import DNSPublication
@@ -177,7 +182,14 @@ class RegionControllerService(Service):
         defers = []
         if self.needsDNSUpdate:
             self.needsDNSUpdate = False
-            d = deferToDatabase(transactional(dns_update_all_zones))
+            # The zones are rendered in a transaction of their own, see
+            # `render_published_zones`.
+            d = deferToDatabase(render_published_zones)
+            d.addCallback(
+                lambda _: deferToDatabase(
+                    transactional(dns_update_all_zones), incremental=True
+                )
+            )
             d.addCallback(self._checkSerial)
             d.addCallback(self._logDNSReload)
             # Order here matters, first needsDNSUpdate is set then pass the
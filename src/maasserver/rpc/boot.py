@@ -8,19 +8,20 @@ import re
 import shlex
 
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
-from django.db.models import Q
+from django.db.models import Count, Q, Sum
+from netaddr import AddrFormatError, EUI
 
 from maasserver.compose_preseed import RSYSLOG_PORT
 from maasserver.dns.config import get_resource_name_for_subnet
 from maasserver.enum import BOOT_RESOURCE_FILE_TYPE, INTERFACE_TYPE
 from maasserver.models import (
     BootResource,
+    BootResourceSet,
     Config,
     Event,
     Node,
     RackController,
     Subnet,
-    VLAN,
 )
 from maasserver.node_status import NODE_STATUS
 from maasserver.preseed import (
@@ -65,10 +66,18 @@ def get_node_from_mac_or_hardware_uuid(mac=None, hardware_uuid=None):
         node = Node.objects.filter(hardware_uuid__iexact=hardware_uuid)
     else:
         return None
-    node = node.select_related("boot_interface", "domain")
+    node = node.select_related("boot_interface__vlan", "domain")
     return node.first()
 
 
+def _is_same_mac(mac, other):
+    """Return whether the MAC addresses `mac` and `other` are the same."""
+    try:
+        return EUI(str(mac)) == EUI(str(other))
+    except (AddrFormatError, TypeError, ValueError):
+        return False
+
+
 def event_log_pxe_request(machine, purpose):
     """Log PXE request to machines's event log."""
     options = {
@@ -121,22 +130,34 @@ def get_boot_filenames(
     else:
         boot_resource_subarch = subarch
 
-    try:
-        # Get the filename for the kernel, initrd, and boot_dtb the rack should
-        # use when booting.
-        boot_resource = BootResource.objects.get(
-            architecture="%s/%s" % (arch, boot_resource_subarch),
-            name="%s/%s" % (osystem, series),
+    # Get the filename for the kernel, initrd, and boot_dtb the rack should
+    # use when booting, from the latest complete set of the boot resource;
+    # see `BootResource.get_latest_complete_set`.
+    resource_sets = (
+        BootResourceSet.objects.filter(
+            resource__architecture="%s/%s" % (arch, boot_resource_subarch),
+            resource__name="%s/%s" % (osystem, series),
         )
-        boot_resource_set = boot_resource.get_latest_complete_set()
-        boot_resource_files = {
-            bfile.filetype: bfile.filename
-            for bfile in boot_resource_set.files.all()
-        }
-    except ObjectDoesNotExist:
+        .order_by("-id")
+        .annotate(
+            files_count=Count("files__id"),
+            files_size=Sum("files__largefile__size"),
+            files_total_size=Sum("files__largefile__total_size"),
+        )
+    )
+    for resource_set in resource_sets:
+        if (
+            resource_set.files_count > 0
+            and resource_set.files_size == resource_set.files_total_size
+        ):
+            break
+    else:
         # If a filename can not be found return None to allow the rack to
         # figure out what todo.
         return None, None, None
+    boot_resource_files = dict(
+        resource_set.files.values_list("filetype", "filename")
+    )
     kernel = boot_resource_files.get(BOOT_RESOURCE_FILE_TYPE.BOOT_KERNEL)
     initrd = boot_resource_files.get(BOOT_RESOURCE_FILE_TYPE.BOOT_INITRD)
     boot_dtb = boot_resource_files.get(BOOT_RESOURCE_FILE_TYPE.BOOT_DTB)
@@ -396,20 +417,28 @@ def get_config(
             machine.bios_boot_method = bios_boot_method
 
         try:
-            machine.boot_interface = machine.interface_set.get(
-                type=INTERFACE_TYPE.PHYSICAL, mac_address=mac
-            )
+            boot_interface = machine.boot_interface
+            if (
+                boot_interface is None
+                or boot_interface.type != INTERFACE_TYPE.PHYSICAL
+                or not _is_same_mac(boot_interface.mac_address, mac)
+            ):
+                # The machine is booting from another interface than the
+                # last time, if any.
+                machine.boot_interface = machine.interface_set.select_related(
+                    "vlan"
+                ).get(type=INTERFACE_TYPE.PHYSICAL, mac_address=mac)
         except ObjectDoesNotExist:
             # MAC is unknown or wasn't sent. Determine the boot_interface using
             # the boot_cluster_ip.
             subnet = Subnet.objects.get_best_subnet_for_ip(local_ip)
-            boot_vlan = getattr(machine.boot_interface, "vlan", None)
-            if subnet and subnet.vlan != boot_vlan:
+            boot_vlan_id = getattr(machine.boot_interface, "vlan_id", None)
+            if subnet and subnet.vlan_id != boot_vlan_id:
                 # This might choose the wrong interface, but we don't
                 # have enough information to decide which interface is
                 # the boot one.
                 machine.boot_interface = machine.interface_set.filter(
-                    vlan=subnet.vlan
+                    vlan_id=subnet.vlan_id
                 ).first()
         else:
             # Update the VLAN of the boot interface to be the same VLAN for the
@@ -427,10 +456,11 @@ def get_config(
                 # Rack controller and machine is not on the same VLAN, with
                 # DHCP relay this is possible. Lets ensure that the VLAN on the
                 # interface is setup to relay through the identified VLAN.
-                if not VLAN.objects.filter(
-                    id=machine.boot_interface.vlan_id,
-                    relay_vlan=rack_interface.vlan_id,
-                ).exists():
+                boot_vlan = machine.boot_interface.vlan
+                if (
+                    boot_vlan is None
+                    or boot_vlan.relay_vlan_id != rack_interface.vlan_id
+                ):
                     # DHCP relay is not being performed for that VLAN. Set the
                     # VLAN to the VLAN of the rack controller.
                     machine.boot_interface.vlan = rack_interface.vlan
@@ -499,6 +529,9 @@ def get_config(
                 "log_port": log_port,
                 "extra_opts": "",
                 "http_boot": True,
+                # The rack controller can cache this unless there's a
+                # status timeout to reset when the machine asks again.
+                "cacheable": machine.status_expires is None,
             }
 
         # Log the request into the event log for that machine.
@@ -636,6 +669,9 @@ def get_config(
         # As of MAAS 2.4 only HTTP boot is supported. This ensures MAAS 2.3
         # rack controllers use HTTP boot as well.
         "http_boot": True,
+        # The requests of known machines are logged, and their status
+        # timeouts reset, so the rack controller must ask every time.
+        "cacheable": machine is None,
     }
     if machine is not None:
         params["system_id"] = machine.system_id
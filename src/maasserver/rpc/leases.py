@@ -6,7 +6,8 @@
 
 from datetime import datetime
 
-from netaddr import IPAddress
+from django.db import transaction
+from netaddr import AddrFormatError, EUI, IPAddress
 
 from maasserver.enum import IPADDRESS_FAMILY, IPADDRESS_TYPE
 from maasserver.models import (
@@ -17,7 +18,7 @@ from maasserver.models import (
     Subnet,
     UnknownInterface,
 )
-from maasserver.utils.orm import transactional
+from maasserver.utils.orm import is_retryable_failure, transactional
 from provisioningserver.logger import LegacyLogger
 from provisioningserver.utils.network import coerce_to_valid_hostname
 from provisioningserver.utils.twisted import synchronous
@@ -38,6 +39,97 @@ def _is_valid_hostname(hostname):
     )
 
 
+def _get_mac_key(mac):
+    """Return a key by which to compare `mac`, or None if it's invalid."""
+    try:
+        return EUI(str(mac))
+    except (AddrFormatError, TypeError, ValueError):
+        return None
+
+
+class _LeaseUpdateCache:
+    """Cache the lookups made when updating DHCP leases.
+
+    Without `macs`, each lookup is a query, as it is for a single lease. With
+    `macs`, as for a batch of leases, all the subnets and the interfaces with
+    those MAC addresses are fetched up front, and the dynamic ranges once per
+    subnet; none of them change while the batch is updated, except for the
+    unknown interfaces it creates.
+    """
+
+    def __init__(self, macs=None):
+        self._subnets = None
+        self._dynamic_ranges = {}
+        self._interfaces = {}
+        if macs is not None:
+            self._subnets = list(Subnet.objects.select_related("vlan"))
+            keys = {_get_mac_key(mac): str(mac) for mac in macs}
+            keys.pop(None, None)
+            self._interfaces = {key: [] for key in keys}
+            if len(keys) > 0:
+                interfaces = Interface.objects.filter(
+                    mac_address__in=keys.values()
+                )
+                for interface in interfaces:
+                    key = _get_mac_key(interface.mac_address)
+                    self._interfaces.setdefault(key, []).append(interface)
+
+    def get_subnet(self, ip):
+        """Return the best subnet for `ip`.
+
+        See `SubnetManager.get_best_subnet_for_ip`.
+        """
+        if self._subnets is None:
+            return Subnet.objects.get_best_subnet_for_ip(ip)
+        ip = IPAddress(ip)
+        if ip.is_ipv4_mapped():
+            ip = ip.ipv4()
+        max_prefixlen = 32 if ip.version == 4 else 128
+        candidates = [
+            subnet
+            for subnet in self._subnets
+            if ip in subnet.get_ipnetwork()
+            and subnet.get_ipnetwork().prefixlen < max_prefixlen
+        ]
+        if len(candidates) == 0:
+            return None
+        return max(
+            candidates,
+            key=lambda subnet: (
+                subnet.vlan.dhcp_on,
+                subnet.get_ipnetwork().prefixlen,
+            ),
+        )
+
+    def get_dynamic_range(self, subnet, ip):
+        """Return the dynamic range of `subnet` that `ip` is in, if any."""
+        if subnet.id not in self._dynamic_ranges:
+            self._dynamic_ranges[subnet.id] = list(
+                subnet.get_dynamic_ranges()
+            )
+        for iprange in self._dynamic_ranges[subnet.id]:
+            if ip in iprange.netaddr_iprange:
+                return iprange
+        return None
+
+    def get_interfaces(self, mac):
+        """Return the interfaces with `mac`."""
+        key = _get_mac_key(mac)
+        if key not in self._interfaces:
+            return list(Interface.objects.filter(mac_address=mac))
+        return list(self._interfaces[key])
+
+    def add_interface(self, mac, interface):
+        """Record that `interface`, with `mac`, was created."""
+        key = _get_mac_key(mac)
+        if key in self._interfaces:
+            self._interfaces[key].append(interface)
+
+    def discard_interfaces(self, mac):
+        """Forget the interfaces with `mac`, to be queried again."""
+        self._interfaces.pop(_get_mac_key(mac), None)
+
+
 @synchronous
 @transactional
 def update_lease(
@@ -73,13 +165,65 @@ def update_lease(
     :raises NoSuchCluster: If the cluster identified by `cluster_uuid` does not
         exist.
     """
+    return _update_lease(
+        _LeaseUpdateCache(),
+        action,
+        mac,
+        ip_family,
+        ip,
+        timestamp,
+        lease_time,
+        hostname,
+    )
+
+
+@synchronous
+@transactional
+def update_leases(updates):
+    """Update a batch of DHCP leases from a cluster.
+
+    :param updates: A list of dicts with the arguments to `update_lease`,
+        as found in :py:class`~provisioningserver.rpc.region.UpdateLeases`.
+
+    The updates are applied in order in a single transaction. An update that
+    fails is logged and rolled back without affecting the others, as it
+    would be had it been sent on its own. Failures that call for the whole
+    transaction to be retried, e.g. serialization failures, are raised.
+    """
+    cache = _LeaseUpdateCache([update["mac"] for update in updates])
+    for update in updates:
+        try:
+            with transaction.atomic():
+                _update_lease(
+                    cache,
+                    update["action"],
+                    update["mac"],
+                    update["ip_family"],
+                    update["ip"],
+                    update["timestamp"],
+                    update.get("lease_time"),
+                    update.get("hostname"),
+                )
+        except Exception as error:
+            if is_retryable_failure(error):
+                raise
+            # Changes to the interfaces were rolled back.
+            cache.discard_interfaces(update["mac"])
+            log.err(None, "Unhandled failure in updating lease.")
+    return {}
+
+
+def _update_lease(
+    cache, action, mac, ip_family, ip, timestamp, lease_time, hostname
+):
+    """Update one DHCP lease using `cache`; see `update_lease`."""
     # Check for a valid action.
     if action not in ["commit", "expiry", "release"]:
         raise LeaseUpdateError("Unknown lease action: %s" % action)
 
     # Get the subnet for this IP address. If no subnet exists then something
     # is wrong as we should not be recieving message about unknown subnets.
-    subnet = Subnet.objects.get_best_subnet_for_ip(ip)
+    subnet = cache.get_subnet(ip)
     if subnet is None:
         raise LeaseUpdateError("No subnet exists for: %s" % ip)
 
@@ -113,12 +257,12 @@ def update_lease(
 
     # We will recieve actions on all addresses in the subnet. We only want
     # to update the addresses in the dynamic range.
-    dynamic_range = subnet.get_dynamic_range_for_ip(IPAddress(ip))
+    dynamic_range = cache.get_dynamic_range(subnet, IPAddress(ip))
     if dynamic_range is None:
         # Do nothing.
         return {}
 
-    interfaces = list(Interface.objects.filter(mac_address=mac))
+    interfaces = cache.get_interfaces(mac)
     if len(interfaces) == 0 and action == "commit":
         # A MAC address that is unknown to MAAS was given an IP address. Create
         # an unknown interface for this lease.
@@ -127,6 +271,7 @@ def update_lease(
         )
         unknown_interface.save()
         interfaces = [unknown_interface]
+        cache.add_interface(mac, unknown_interface)
     elif len(interfaces) == 0:
         # No interfaces and not commit action so nothing needs to be done.
         return {}
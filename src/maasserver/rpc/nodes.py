@@ -6,6 +6,7 @@
 __all__ = [
     "mark_node_failed",
     "update_node_power_state",
+    "update_node_power_states",
     "commission_node",
     "create_node",
 ]
@@ -19,12 +20,20 @@ from django.db.models import F, Q
 
 from maasserver import exceptions, ntp
 from maasserver.api.utils import get_overridden_query_dict
-from maasserver.enum import NODE_STATUS
+from maasserver.enum import NODE_STATUS, POWER_STATE
 from maasserver.forms import AdminMachineWithMACAddressesForm
-from maasserver.models import Node, PhysicalInterface, RackController
+from maasserver.models import (
+    Event,
+    EventType,
+    Node,
+    PhysicalInterface,
+    RackController,
+)
 from maasserver.models.timestampedmodel import now
+from maasserver.node_status import MONITORED_STATUSES
 from maasserver.utils.orm import transactional
 from provisioningserver.drivers.power.registry import PowerDriverRegistry
+from provisioningserver.events import EVENT_DETAILS, EVENT_TYPES
 from provisioningserver.rpc.exceptions import (
     CommissionNodeFailed,
     NodeAlreadyExists,
@@ -34,6 +43,19 @@ from provisioningserver.rpc.exceptions import (
 )
 from provisioningserver.utils.twisted import synchronous
 
+# How long until the power state of a node is queried again.
+POWER_QUERY_INTERVAL = timedelta(minutes=5)
+
+# How long until the power state of a node is queried again while it's in
+# transition, i.e. in a status where MAAS is waiting for it to power on or
+# off, or just after its power state changed.
+POWER_QUERY_INTERVAL_TRANSITIONING = timedelta(minutes=1)
+
+# How long until the power state of a node is queried again when it's been
+# off for at least POWER_STATE_STABLE_AFTER, outside of a transition.
+POWER_QUERY_INTERVAL_STABLE = timedelta(minutes=30)
+POWER_STATE_STABLE_AFTER = timedelta(hours=1)
+
 
 @synchronous
 @transactional
@@ -52,6 +74,41 @@ def mark_node_failed(system_id, error_description):
         raise NodeStateViolation(e)
 
 
+def _get_power_query_due(current_time):
+    """Return a filter for the nodes whose power state is due a query.
+
+    The power state of a node is queried every `POWER_QUERY_INTERVAL`, more
+    often while it's in transition, and less often once it's been off for a
+    while. See `POWER_QUERY_INTERVAL_TRANSITIONING` and
+    `POWER_QUERY_INTERVAL_STABLE`.
+    """
+    transitioning = Q(status__in=MONITORED_STATUSES) | Q(
+        power_state_updated__gt=current_time - POWER_QUERY_INTERVAL
+    )
+    stable = Q(
+        power_state=POWER_STATE.OFF,
+        power_state_updated__lte=current_time - POWER_STATE_STABLE_AFTER,
+    ) & ~Q(status__in=MONITORED_STATUSES)
+    return (
+        Q(power_state_queried=None)
+        | Q(
+            power_state_queried__lte=current_time
+            - POWER_QUERY_INTERVAL_STABLE
+        )
+        | (
+            Q(power_state_queried__lte=current_time - POWER_QUERY_INTERVAL)
+            & ~stable
+        )
+        | (
+            Q(
+                power_state_queried__lte=current_time
+                - POWER_QUERY_INTERVAL_TRANSITIONING
+            )
+            & transitioning
+        )
+    )
+
+
 def _gen_cluster_nodes_power_parameters(nodes, limit):
     """Generate power parameters for `nodes`.
 
@@ -60,7 +117,6 @@ def _gen_cluster_nodes_power_parameters(nodes, limit):
 
     :return: A generator yielding `dict`s.
     """
-    five_minutes_ago = now() - timedelta(minutes=5)
     queryable_power_types = [
         driver.name for _, driver in PowerDriverRegistry if driver.queryable
     ]
@@ -68,10 +124,7 @@ def _gen_cluster_nodes_power_parameters(nodes, limit):
     qs = (
         nodes.exclude(status=NODE_STATUS.BROKEN)
         .filter(bmc__power_type__in=queryable_power_types)
-        .filter(
-            Q(power_state_queried=None)
-            | Q(power_state_queried__lte=five_minutes_ago)
-        )
+        .filter(_get_power_query_due(now()))
         .order_by(F("power_state_queried").asc(nulls_first=True), "system_id")
         .distinct()
     )
@@ -166,6 +219,79 @@ def update_node_power_state(system_id, power_state):
     node.update_power_state(power_state)
 
 
+@synchronous
+@transactional
+def update_node_power_states(states):
+    """Update the power states of many nodes at once.
+
+    for :py:class:`~provisioningserver.rpc.region.UpdateNodePowerStates`.
+
+    Only the nodes whose power state changed are written, in one UPDATE per
+    power state. Nodes for which a change of power state means more than
+    that, e.g. releasing nodes that powered off, are updated one by one with
+    `Node.update_power_state`. The failures to query power states are
+    recorded as events in bulk.
+
+    :return: The system_ids of the nodes that don't exist.
+    """
+    reported = {state["system_id"]: state for state in states}
+    nodes = Node.objects.filter(system_id__in=reported.keys()).only(
+        "id", "system_id", "hostname", "power_state", "status"
+    )
+    nodes = list(nodes)
+    changed, individually = {}, []
+    for node in nodes:
+        power_state = reported[node.system_id]["power_state"]
+        if node.status in (
+            NODE_STATUS.RELEASING,
+            NODE_STATUS.EXITING_RESCUE_MODE,
+        ):
+            individually.append(node.id)
+        elif node.power_state == power_state:
+            continue
+        elif power_state == POWER_STATE.OFF:
+            # Powering off can release the node's auto IPs.
+            individually.append(node.id)
+        else:
+            changed.setdefault(power_state, []).append(node.id)
+
+    updated = now()
+    for power_state, node_ids in changed.items():
+        Node.objects.filter(id__in=node_ids).update(
+            power_state=power_state, power_state_updated=updated
+        )
+    for node in Node.objects.filter(id__in=individually):
+        node.update_power_state(reported[node.system_id]["power_state"])
+
+    errors = [
+        (node, reported[node.system_id]["error"])
+        for node in nodes
+        if reported[node.system_id].get("error") is not None
+    ]
+    if len(errors) > 0:
+        event_detail = EVENT_DETAILS[EVENT_TYPES.NODE_POWER_QUERY_FAILED]
+        event_type = EventType.objects.register(
+            EVENT_TYPES.NODE_POWER_QUERY_FAILED,
+            event_detail.description,
+            event_detail.level,
+        )
+        Event.objects.bulk_create(
+            Event(
+                type=event_type,
+                node=node,
+                node_system_id=node.system_id,
+                node_hostname=node.hostname,
+                description=error,
+                created=updated,
+                updated=updated,
+            )
+            for node, error in errors
+        )
+
+    found = {node.system_id for node in nodes}
+    return [system_id for system_id in reported if system_id not in found]
+
+
 @synchronous
 @transactional
 def create_node(
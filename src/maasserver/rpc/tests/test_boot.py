@@ -179,6 +179,28 @@ class TestGetConfig(MAASServerTestCase):
         )
         mock_get_third_party_driver.assert_called_with(node, series="focal")
 
+    def test_query_count_is_constant_for_known_node(self):
+        rack_controller = factory.make_RackController()
+        local_ip = factory.make_ip_address()
+        remote_ip = factory.make_ip_address()
+        node = self.make_node(status=NODE_STATUS.DEPLOYING)
+        node.boot_cluster_ip = local_ip
+        node.save()
+        mac = node.get_boot_interface().mac_address
+        # The first request registers the event types.
+        get_config(rack_controller.system_id, local_ip, remote_ip, mac=mac)
+        counts = [
+            count_queries(
+                orig_get_config,
+                rack_controller.system_id,
+                local_ip,
+                remote_ip,
+                mac=mac,
+            )[0]
+            for _ in range(3)
+        ]
+        self.assertEqual(1, len(set(counts)), counts)
+
     def test_returns_success_for_known_node_mac(self):
         rack_controller = factory.make_RackController()
         local_ip = factory.make_ip_address()
@@ -221,7 +243,7 @@ class TestGetConfig(MAASServerTestCase):
             local_ip,
             remote_ip,
             mac=mac,
-            query_count=9,
+            query_count=8,
         )
         self.assertEquals(
             {
@@ -242,6 +264,7 @@ class TestGetConfig(MAASServerTestCase):
                 "log_port": 5247,
                 "extra_opts": "",
                 "http_boot": True,
+                "cacheable": True,
             },
             config,
         )
@@ -266,7 +289,7 @@ class TestGetConfig(MAASServerTestCase):
             local_ip,
             remote_ip,
             mac=mac,
-            query_count=9,
+            query_count=8,
         )
         self.assertEquals(
             {
@@ -287,6 +310,7 @@ class TestGetConfig(MAASServerTestCase):
                 "log_port": syslog_port,
                 "extra_opts": "",
                 "http_boot": True,
+                "cacheable": True,
             },
             config,
         )
@@ -310,7 +334,7 @@ class TestGetConfig(MAASServerTestCase):
             local_ip,
             remote_ip,
             mac=mac,
-            query_count=8,
+            query_count=7,
         )
         self.assertEquals(
             {
@@ -331,6 +355,7 @@ class TestGetConfig(MAASServerTestCase):
                 "log_port": 5247,
                 "extra_opts": "",
                 "http_boot": True,
+                "cacheable": True,
             },
             config,
         )
@@ -1053,6 +1078,42 @@ class TestGetConfig(MAASServerTestCase):
             node.status_expires, expected_time + timedelta(minutes=1)
         )
 
+    def test_known_node_with_status_expires_is_not_cacheable(self):
+        rack_controller = factory.make_RackController()
+        local_ip = factory.make_ip_address()
+        remote_ip = factory.make_ip_address()
+        node = self.make_node(
+            status=NODE_STATUS.DEPLOYING,
+            status_expires=factory.make_date(),
+            netboot=False,
+        )
+        mac = node.get_boot_interface().mac_address
+        config = get_config(
+            rack_controller.system_id, local_ip, remote_ip, mac=mac
+        )
+        self.assertEqual("local", config["purpose"])
+        self.assertFalse(config["cacheable"])
+
+    def test_known_node_netbooting_is_not_cacheable(self):
+        rack_controller = factory.make_RackController()
+        local_ip = factory.make_ip_address()
+        remote_ip = factory.make_ip_address()
+        node = self.make_node()
+        mac = node.get_boot_interface().mac_address
+        self.patch_autospec(boot_module, "event_log_pxe_request")
+        config = get_config(
+            rack_controller.system_id, local_ip, remote_ip, mac=mac
+        )
+        self.assertFalse(config["cacheable"])
+
+    def test_unknown_machine_is_cacheable(self):
+        rack_controller = factory.make_RackController()
+        local_ip = factory.make_ip_address()
+        remote_ip = factory.make_ip_address()
+        make_usable_architecture(self)
+        config = get_config(rack_controller.system_id, local_ip, remote_ip)
+        self.assertTrue(config["cacheable"])
+
     def test_sets_boot_interface_vlan_to_match_rack_controller(self):
         rack_controller = factory.make_RackController()
         rack_fabric = factory.make_Fabric()
@@ -1454,6 +1515,28 @@ class TestGetBootFilenames(MAASServerTestCase):
             boot_dbt,
         )
 
+    def test_get_filenames_skips_incomplete_sets(self):
+        release = factory.make_default_ubuntu_release_bootable()
+        arch, subarch = release.architecture.split("/")
+        osystem, series = release.name.split("/")
+        boot_resource_set = release.get_latest_complete_set()
+        incomplete_set = factory.make_BootResourceSet(release)
+        factory.make_boot_resource_file_with_content(
+            incomplete_set,
+            filetype=BOOT_RESOURCE_FILE_TYPE.BOOT_KERNEL,
+            content=factory.make_bytes(size=256),
+            size=512,
+        )
+
+        kernel, _, _ = get_boot_filenames(arch, subarch, osystem, series)
+
+        self.assertEquals(
+            boot_resource_set.files.get(
+                filetype=BOOT_RESOURCE_FILE_TYPE.BOOT_KERNEL
+            ).filename,
+            kernel,
+        )
+
     def test_returns_all_none_when_not_found(self):
         self.assertItemsEqual(
             (None, None, None),
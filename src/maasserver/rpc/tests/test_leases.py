@@ -13,13 +13,22 @@ from netaddr import IPAddress
 from testtools.matchers import Contains, Equals, MatchesStructure, Not
 
 from maasserver.enum import INTERFACE_TYPE, IPADDRESS_FAMILY, IPADDRESS_TYPE
-from maasserver.models import DNSResource
+from maasserver.models import DNSResource, Subnet
 from maasserver.models.interface import UnknownInterface
 from maasserver.models.staticipaddress import StaticIPAddress
-from maasserver.rpc.leases import LeaseUpdateError, update_lease
+from maasserver.rpc import leases as leases_module
+from maasserver.rpc.leases import (
+    _LeaseUpdateCache,
+    LeaseUpdateError,
+    update_lease,
+    update_leases,
+)
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
+from maasserver.utils import orm
 from maasserver.utils.orm import get_one, reload_object
+from maastesting.djangotestcase import count_queries
+from maastesting.twisted import TwistedLoggerFixture
 
 
 class TestUpdateLease(MAASServerTestCase):
@@ -507,3 +516,123 @@ class TestUpdateLease(MAASServerTestCase):
         self.assertEqual(1, ip_address2.interface_set.count())
         self.assertEqual(1, boot_interface1.ip_addresses.count())
         self.assertEqual(1, boot_interface2.ip_addresses.count())
+
+
+class TestUpdateLeases(MAASServerTestCase):
+    def make_update(self, action, mac, ip, **kwargs):
+        update = {
+            "action": action,
+            "mac": str(mac),
+            "ip_family": "ipv4",
+            "ip": ip,
+            "timestamp": int(time.time()),
+        }
+        if action == "commit":
+            update["lease_time"] = random.randint(30, 1000)
+        update.update(kwargs)
+        return update
+
+    def make_managed_subnet_ip(self):
+        subnet = factory.make_ipv4_Subnet_with_IPRanges(
+            with_static_range=False, dhcp_on=True
+        )
+        dynamic_range = subnet.get_dynamic_ranges()[0]
+        return subnet, factory.pick_ip_in_IPRange(dynamic_range)
+
+    def test_applies_updates_in_order(self):
+        subnet, ip = self.make_managed_subnet_ip()
+        node = factory.make_Node_with_Interface_on_Subnet(subnet=subnet)
+        boot_interface = node.get_boot_interface()
+        update_leases(
+            [
+                self.make_update("commit", boot_interface.mac_address, ip),
+                self.make_update("release", boot_interface.mac_address, ip),
+            ]
+        )
+        self.assertFalse(
+            StaticIPAddress.objects.filter(
+                alloc_type=IPADDRESS_TYPE.DISCOVERED, ip=ip
+            ).exists()
+        )
+        self.assertIsNotNone(
+            boot_interface.ip_addresses.filter(
+                alloc_type=IPADDRESS_TYPE.DISCOVERED, ip=None, subnet=subnet
+            ).first()
+        )
+
+    def test_creates_one_unknown_interface_per_mac(self):
+        subnet, ip = self.make_managed_subnet_ip()
+        other_ip = factory.pick_ip_in_IPRange(subnet.get_dynamic_ranges()[0])
+        mac = factory.make_mac_address()
+        update_leases(
+            [
+                self.make_update("commit", mac, ip),
+                self.make_update("commit", mac, other_ip),
+            ]
+        )
+        [unknown_interface] = UnknownInterface.objects.filter(
+            mac_address=mac
+        )
+        self.assertEqual(
+            [other_ip],
+            [sip.ip for sip in unknown_interface.ip_addresses.all()],
+        )
+
+    def test_failed_update_does_not_affect_others(self):
+        subnet, ip = self.make_managed_subnet_ip()
+        mac = factory.make_mac_address()
+        with TwistedLoggerFixture() as logger:
+            update_leases(
+                [
+                    self.make_update("unknown", mac, ip),
+                    self.make_update("commit", mac, ip),
+                ]
+            )
+        [failure] = logger.failures
+        self.assertIsInstance(failure.value, LeaseUpdateError)
+        [unknown_interface] = UnknownInterface.objects.filter(
+            mac_address=mac
+        )
+        self.assertEqual(
+            [ip], [sip.ip for sip in unknown_interface.ip_addresses.all()]
+        )
+
+    def test_raises_retryable_failures(self):
+        subnet, ip = self.make_managed_subnet_ip()
+        exception = factory.make_exception()
+        exception.__cause__ = orm.SerializationFailure()
+        self.patch(leases_module, "_update_lease").side_effect = exception
+        with TwistedLoggerFixture() as logger:
+            error = self.assertRaises(
+                type(exception),
+                update_leases,
+                [self.make_update("commit", factory.make_mac_address(), ip)],
+            )
+        self.assertIs(exception, error)
+        self.assertEqual([], logger.failures)
+
+    def test_finds_same_subnets_as_get_best_subnet_for_ip(self):
+        vlan = factory.make_VLAN(dhcp_on=True)
+        outer = factory.make_Subnet(cidr="10.0.0.0/16")
+        inner = factory.make_Subnet(cidr="10.0.1.0/24")
+        managed = factory.make_Subnet(cidr="10.0.2.0/24", vlan=vlan)
+        cache = _LeaseUpdateCache([])
+        for ip in ["10.0.0.1", "10.0.1.1", "10.0.2.1", "10.1.0.1"]:
+            self.assertEqual(
+                Subnet.objects.get_best_subnet_for_ip(ip),
+                cache.get_subnet(ip),
+            )
+        self.assertEqual(outer, cache.get_subnet("10.0.0.1"))
+        self.assertEqual(inner, cache.get_subnet("10.0.1.1"))
+        self.assertEqual(managed, cache.get_subnet("10.0.2.1"))
+
+    def test_queries_per_update_are_only_its_savepoint(self):
+        subnet, ip = self.make_managed_subnet_ip()
+        updates = [
+            self.make_update("expiry", factory.make_mac_address(), ip)
+            for _ in range(10)
+        ]
+        count_one, _ = count_queries(update_leases, updates[:1])
+        count_all, _ = count_queries(update_leases, updates)
+        # Each update beyond the first costs a SAVEPOINT and a RELEASE.
+        self.assertEqual(count_one + 2 * 9, count_all)
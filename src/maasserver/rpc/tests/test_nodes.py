@@ -24,6 +24,7 @@ from testtools.matchers import (
 
 from maasserver import ntp
 from maasserver.enum import INTERFACE_TYPE, NODE_STATUS, NODE_TYPE, POWER_STATE
+from maasserver.models.event import Event
 from maasserver.models.node import Node
 from maasserver.models.timestampedmodel import now
 from maasserver.rpc.nodes import (
@@ -35,6 +36,7 @@ from maasserver.rpc.nodes import (
     mark_node_failed,
     request_node_info_by_mac_address,
     update_node_power_state,
+    update_node_power_states,
 )
 from maasserver.rpc.testing.fixtures import MockLiveRegionToClusterRPCFixture
 from maasserver.testing.architecture import make_usable_architecture
@@ -48,9 +50,11 @@ from maasserver.testing.testcase import (
     MAASTransactionServerTestCase,
 )
 from maasserver.utils.orm import post_commit_hooks, reload_object
+from maastesting.djangotestcase import count_queries
 from maastesting.twisted import always_succeed_with
 from metadataserver.builtin_scripts import load_builtin_scripts
 from provisioningserver.drivers.power.registry import PowerDriverRegistry
+from provisioningserver.events import EVENT_TYPES
 from provisioningserver.rpc.cluster import DescribePowerTypes
 from provisioningserver.rpc.exceptions import (
     CommissionNodeFailed,
@@ -430,6 +434,101 @@ class TestListClusterNodesPowerParameters(MAASServerTestCase):
             system_ids,
         )
 
+    def test_queries_transitioning_nodes_more_often(self):
+        rack = factory.make_RackController(power_type="")
+        two_minutes_ago = now() - timedelta(minutes=2)
+        two_hours_ago = now() - timedelta(hours=2)
+        node_deploying = self.make_Node(
+            status=NODE_STATUS.DEPLOYING,
+            power_state=POWER_STATE.OFF,
+            power_state_updated=two_hours_ago,
+            power_state_queried=two_minutes_ago,
+            bmc_connected_to=rack,
+        )
+        node_changed = self.make_Node(
+            status=NODE_STATUS.DEPLOYED,
+            power_state=POWER_STATE.ON,
+            power_state_updated=two_minutes_ago,
+            power_state_queried=two_minutes_ago,
+            bmc_connected_to=rack,
+        )
+        self.make_Node(
+            status=NODE_STATUS.DEPLOYED,
+            power_state=POWER_STATE.ON,
+            power_state_updated=two_hours_ago,
+            power_state_queried=two_minutes_ago,
+            bmc_connected_to=rack,
+        )
+
+        power_parameters = list_cluster_nodes_power_parameters(rack.system_id)
+        system_ids = [params["system_id"] for params in power_parameters]
+
+        self.assertItemsEqual(
+            [node_deploying.system_id, node_changed.system_id], system_ids
+        )
+
+    def test_does_not_query_nodes_reporting_same_state_more_often(self):
+        rack = factory.make_RackController(power_type="")
+        two_minutes_ago = now() - timedelta(minutes=2)
+        node = self.make_Node(
+            status=NODE_STATUS.DEPLOYED,
+            power_state=POWER_STATE.ON,
+            power_state_updated=now() - timedelta(hours=2),
+            power_state_queried=two_minutes_ago,
+            bmc_connected_to=rack,
+        )
+        update_node_power_state(node.system_id, POWER_STATE.ON)
+
+        power_parameters = list_cluster_nodes_power_parameters(rack.system_id)
+
+        self.assertEqual([], power_parameters)
+
+    def test_queries_nodes_powered_off_for_a_while_less_often(self):
+        rack = factory.make_RackController(power_type="")
+        two_hours_ago = now() - timedelta(hours=2)
+        ten_minutes_ago = now() - timedelta(minutes=10)
+        # Off for a while, queried recently enough.
+        self.make_Node(
+            status=NODE_STATUS.READY,
+            power_state=POWER_STATE.OFF,
+            power_state_updated=two_hours_ago,
+            power_state_queried=ten_minutes_ago,
+            bmc_connected_to=rack,
+        )
+        node_off_unqueried = self.make_Node(
+            status=NODE_STATUS.READY,
+            power_state=POWER_STATE.OFF,
+            power_state_updated=two_hours_ago,
+            power_state_queried=now() - timedelta(minutes=31),
+            bmc_connected_to=rack,
+        )
+        node_on = self.make_Node(
+            status=NODE_STATUS.DEPLOYED,
+            power_state=POWER_STATE.ON,
+            power_state_updated=two_hours_ago,
+            power_state_queried=ten_minutes_ago,
+            bmc_connected_to=rack,
+        )
+        node_releasing = self.make_Node(
+            status=NODE_STATUS.RELEASING,
+            power_state=POWER_STATE.OFF,
+            power_state_updated=two_hours_ago,
+            power_state_queried=ten_minutes_ago,
+            bmc_connected_to=rack,
+        )
+
+        power_parameters = list_cluster_nodes_power_parameters(rack.system_id)
+        system_ids = [params["system_id"] for params in power_parameters]
+
+        self.assertItemsEqual(
+            [
+                node_off_unqueried.system_id,
+                node_on.system_id,
+                node_releasing.system_id,
+            ],
+            system_ids,
+        )
+
     def test_excludes_broken_nodes(self):
         rack = factory.make_RackController(power_type="")
         node_queryable = self.make_Node(bmc_connected_to=rack)
@@ -551,6 +650,88 @@ class TestUpdateNodePowerState(MAASServerTestCase):
         self.assertEqual(reload_object(node).power_state, POWER_STATE.ON)
 
 
+class TestUpdateNodePowerStates(MAASServerTestCase):
+    def test_returns_missing_nodes(self):
+        node = factory.make_Node(power_state=POWER_STATE.OFF)
+        system_id = factory.make_name("system_id")
+        missing = update_node_power_states(
+            [
+                {"system_id": node.system_id, "power_state": POWER_STATE.ON},
+                {"system_id": system_id, "power_state": POWER_STATE.ON},
+            ]
+        )
+        self.assertEqual([system_id], missing)
+
+    def test_updates_changed_node_power_states(self):
+        node = factory.make_Node(power_state=POWER_STATE.OFF)
+        update_node_power_states(
+            [{"system_id": node.system_id, "power_state": POWER_STATE.ON}]
+        )
+        node = reload_object(node)
+        self.assertEqual(POWER_STATE.ON, node.power_state)
+        self.assertIsNotNone(node.power_state_updated)
+
+    def test_does_not_write_unchanged_node_power_states(self):
+        updated = now() - timedelta(minutes=5)
+        node = factory.make_Node(
+            power_state=POWER_STATE.ON, power_state_updated=updated
+        )
+        update_node_power_states(
+            [{"system_id": node.system_id, "power_state": POWER_STATE.ON}]
+        )
+        self.assertEqual(updated, reload_object(node).power_state_updated)
+
+    def test_updates_releasing_node_individually(self):
+        node = factory.make_Node(
+            status=NODE_STATUS.RELEASING, power_state=POWER_STATE.ON
+        )
+        update_node_power_states(
+            [{"system_id": node.system_id, "power_state": POWER_STATE.OFF}]
+        )
+        node = reload_object(node)
+        self.assertEqual(POWER_STATE.OFF, node.power_state)
+        self.assertNotEqual(NODE_STATUS.RELEASING, node.status)
+
+    def test_records_query_errors_as_events(self):
+        node = factory.make_Node(power_state=POWER_STATE.ON)
+        error = factory.make_name("error")
+        update_node_power_states(
+            [
+                {
+                    "system_id": node.system_id,
+                    "power_state": POWER_STATE.ERROR,
+                    "error": error,
+                }
+            ]
+        )
+        [event] = Event.objects.filter(node=node)
+        self.assertEqual(EVENT_TYPES.NODE_POWER_QUERY_FAILED, event.type.name)
+        self.assertEqual(error, event.description)
+        self.assertEqual(POWER_STATE.ERROR, reload_object(node).power_state)
+
+    def test_query_count_is_independent_of_number_of_nodes(self):
+        def make_states(count):
+            nodes = [
+                factory.make_Node(power_state=POWER_STATE.OFF)
+                for _ in range(count)
+            ]
+            return [
+                {
+                    "system_id": node.system_id,
+                    "power_state": POWER_STATE.ON,
+                    "error": factory.make_name("error"),
+                }
+                for node in nodes
+            ]
+
+        update_node_power_states(make_states(1))  # Registers the event type.
+        count_one, _ = count_queries(update_node_power_states, make_states(1))
+        count_many, _ = count_queries(
+            update_node_power_states, make_states(10)
+        )
+        self.assertEqual(count_one, count_many)
+
+
 class TestGetControllerType(MAASServerTestCase):
     """Tests for `get_controller_type`."""
 
@@ -7,25 +7,21 @@ __all__ = [
     "get_subnets_utilisation_stats",
     "StatsService",
     "STATS_SERVICE_PERIOD",
+    "SubnetStatisticsService",
+    "SUBNET_STATISTICS_SERVICE_PERIOD",
 ]
 
 import base64
-from collections import Counter, defaultdict
+from collections import Counter
 from datetime import timedelta
 import json
 
-from django.db.models import Count, Sum, Value
+from django.db.models import Sum, Value
 from django.db.models.functions import Coalesce
 import requests
 from twisted.application.internet import TimerService
 
-from maasserver.enum import (
-    BMC_TYPE,
-    IPADDRESS_TYPE,
-    IPRANGE_TYPE,
-    NODE_STATUS,
-    NODE_TYPE,
-)
+from maasserver.enum import BMC_TYPE, NODE_STATUS, NODE_TYPE
 from maasserver.models import (
     BMC,
     Config,
@@ -34,15 +30,19 @@ from maasserver.models import (
     Node,
     Pod,
     Space,
-    StaticIPAddress,
+    StaticRoute,
     Subnet,
+    SubnetStatistics,
     VLAN,
 )
+from maasserver.models.subnetstatistics import (
+    get_ipaddress_counts,
+    get_utilisation,
+)
 from maasserver.utils import get_maas_user_agent
 from maasserver.utils.orm import transactional
 from maasserver.utils.threads import deferToDatabase
 from provisioningserver.logger import LegacyLogger
-from provisioningserver.utils.network import IPRangeStatistics
 
 log = LegacyLogger()
 
@@ -145,58 +145,28 @@ def get_subnets_stats():
     }
 
 
-def get_subnets_utilisation_stats():
-    """Return a dict mapping subnet CIDRs to their utilisation details."""
-    ips_count = _get_subnets_ipaddress_count()
-
-    stats = {}
-    for subnet in Subnet.objects.all():
-        full_range = subnet.get_iprange_usage()
-        range_stats = IPRangeStatistics(subnet.get_iprange_usage())
-        static = 0
-        reserved_available = 0
-        reserved_used = 0
-        dynamic_available = 0
-        dynamic_used = 0
-        for rng in full_range.ranges:
-            if IPRANGE_TYPE.DYNAMIC in rng.purpose:
-                dynamic_available += rng.num_addresses
-            elif IPRANGE_TYPE.RESERVED in rng.purpose:
-                reserved_available += rng.num_addresses
-            elif "assigned-ip" in rng.purpose:
-                static += rng.num_addresses
-        # allocated IPs
-        subnet_ips = ips_count[subnet.id]
-        reserved_used += subnet_ips[IPADDRESS_TYPE.USER_RESERVED]
-        reserved_available -= reserved_used
-        dynamic_used += (
-            subnet_ips[IPADDRESS_TYPE.AUTO]
-            + subnet_ips[IPADDRESS_TYPE.DHCP]
-            + subnet_ips[IPADDRESS_TYPE.DISCOVERED]
-        )
-        dynamic_available -= dynamic_used
-        stats[subnet.cidr] = {
-            "available": range_stats.num_available,
-            "unavailable": range_stats.num_unavailable,
-            "dynamic_available": dynamic_available,
-            "dynamic_used": dynamic_used,
-            "static": static,
-            "reserved_available": reserved_available,
-            "reserved_used": reserved_used,
-        }
-    return stats
-
+def get_subnets_utilisation_stats(cached=False):
+    """Return a dict mapping subnet CIDRs to their utilisation details.
 
-def _get_subnets_ipaddress_count():
-    counts = defaultdict(lambda: defaultdict(int))
-    rows = (
-        StaticIPAddress.objects.values("subnet_id", "alloc_type")
-        .filter(ip__isnull=False)
-        .annotate(count=Count("ip"))
-    )
-    for row in rows:
-        counts[row["subnet_id"]][row["alloc_type"]] = row["count"]
-    return counts
+    :param cached: Whether to return the stored `SubnetStatistics` of the
+        subnets, rather than computing their utilisation.
+    """
+    subnets = list(Subnet.objects.all())
+    if cached:
+        statistics = SubnetStatistics.objects.get_statistics(subnets)
+        return {
+            subnet.cidr: statistics[subnet.id].utilisation
+            for subnet in subnets
+        }
+    ips_count = get_ipaddress_counts()
+    staticroutes = list(StaticRoute.objects.select_related("source"))
+    return {
+        subnet.cidr: get_utilisation(
+            subnet.get_iprange_usage(cached_staticroutes=staticroutes),
+            ips_count[subnet.id],
+        )
+        for subnet in subnets
+    }
 
 
 def get_maas_stats():
@@ -278,3 +248,26 @@ class StatsService(TimerService, object):
         d = deferToDatabase(transactional(determine_stats_request))
         d.addErrback(log.err, "Failure performing user agent request.")
         return d
+
+
+# How often the stored subnet statistics are reconciled.
+SUBNET_STATISTICS_SERVICE_PERIOD = timedelta(minutes=30)
+
+
+class SubnetStatisticsService(TimerService, object):
+    """Service to periodically recompute the stored subnet statistics.
+
+    The statistics are discarded as the addresses and ranges of the subnets
+    change, and computed again when next read; this also corrects those that
+    other changes made stale.
+    """
+
+    def __init__(self, interval=SUBNET_STATISTICS_SERVICE_PERIOD):
+        super().__init__(interval.total_seconds(), self.reconcile_statistics)
+
+    def reconcile_statistics(self):
+        d = deferToDatabase(
+            transactional(SubnetStatistics.objects.reconcile)
+        )
+        d.addErrback(log.err, "Failure reconciling subnet statistics.")
+        return d
@@ -0,0 +1,60 @@
+# Copyright 2020 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for the `migrate_image_storage` management command."""
+
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from maasserver.largefilestorage import get_filesystem_storage
+from maasserver.testing.config import RegionConfigurationFixture
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+
+
+class TestMigrateImageStorage(MAASServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.useFixture(
+            RegionConfigurationFixture(
+                image_storage="filesystem", image_storage_path=self.make_dir()
+            )
+        )
+
+    def test_requires_filesystem_storage(self):
+        self.useFixture(RegionConfigurationFixture(image_storage="database"))
+        self.assertRaises(CommandError, call_command, "migrate_image_storage")
+
+    def test_moves_content_to_filesystem(self):
+        content = factory.make_bytes(size=1024)
+        largefile = factory.make_LargeFile(content)
+        stdout = StringIO()
+        call_command("migrate_image_storage", stdout=stdout)
+        storage = get_filesystem_storage()
+        with storage.open(largefile) as stream:
+            self.assertEqual(content, stream.read())
+        with largefile.content.open("rb") as stream:
+            self.assertEqual(b"", stream.read())
+        self.assertIn("Moved %s." % largefile.sha256, stdout.getvalue())
+
+    def test_skips_incomplete_files(self):
+        largefile = factory.make_LargeFile(
+            content=factory.make_bytes(size=256), size=512
+        )
+        call_command("migrate_image_storage", stdout=StringIO())
+        self.assertFalse(get_filesystem_storage().has_content(largefile))
+
+    def test_keeps_content_not_matching_sha256(self):
+        largefile = factory.make_LargeFile()
+        content = factory.make_bytes(size=largefile.total_size)
+        with largefile.content.open("wb") as stream:
+            stream.write(content)
+        stderr = StringIO()
+        call_command("migrate_image_storage", stdout=StringIO(), stderr=stderr)
+        self.assertFalse(get_filesystem_storage().has_content(largefile))
+        with largefile.content.open("rb") as stream:
+            self.assertEqual(content, stream.read())
+        self.assertIn(largefile.sha256, stderr.getvalue())
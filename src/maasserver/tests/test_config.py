@@ -152,3 +152,57 @@ class TestRegionConfigurationDebugOptions(MAASTestCase):
         self.assertTrue(getattr(config, self.option))
         # It's also stored in the configuration database.
         self.assertEqual({self.option: True}, config.store)
+
+
+class TestRegionConfigurationImageOptions(MAASTestCase):
+    """Tests for the boot image options in `RegionConfiguration`."""
+
+    options_and_defaults = {
+        "image_write_threads": 2,
+        "image_write_memory": 64,
+    }
+
+    scenarios = tuple(
+        (name, {"option": name, "default": default})
+        for name, default in options_and_defaults.items()
+    )
+
+    def test_default(self):
+        config = RegionConfiguration({})
+        self.assertEqual(self.default, getattr(config, self.option))
+
+    def test_set_and_get(self):
+        config = RegionConfiguration({})
+        example_value = random.randint(1, 100)
+        setattr(config, self.option, str(example_value))
+        self.assertEqual(example_value, getattr(config, self.option))
+        # It's also stored in the configuration database.
+        self.assertEqual({self.option: example_value}, config.store)
+
+    def test_rejects_zero(self):
+        config = RegionConfiguration({})
+        with ExpectedException(formencode.api.Invalid):
+            setattr(config, self.option, "0")
+
+
+class TestRegionConfigurationImageStorageOptions(MAASTestCase):
+    """Tests for the boot image storage options in `RegionConfiguration`."""
+
+    def test_default_image_storage(self):
+        config = RegionConfiguration({})
+        self.assertEqual("database", config.image_storage)
+
+    def test_set_and_get_image_storage(self):
+        config = RegionConfiguration({})
+        config.image_storage = "filesystem"
+        self.assertEqual("filesystem", config.image_storage)
+        self.assertEqual({"image_storage": "filesystem"}, config.store)
+
+    def test_rejects_unknown_image_storage(self):
+        config = RegionConfiguration({})
+        with ExpectedException(formencode.api.Invalid):
+            config.image_storage = factory.make_name("storage")
+
+    def test_default_image_storage_path(self):
+        config = RegionConfiguration({})
+        self.assertEqual("", config.image_storage_path)
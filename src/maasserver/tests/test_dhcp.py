@@ -7,7 +7,7 @@
 from datetime import datetime
 from operator import itemgetter
 import random
-from unittest.mock import ANY
+from unittest.mock import ANY, call, Mock, sentinel
 
 from crochet import wait_for
 from django.core.exceptions import ValidationError
@@ -27,6 +27,7 @@ from testtools.matchers import (
 from twisted.internet import defer
 from twisted.internet.defer import inlineCallbacks
 from twisted.internet.threads import deferToThread
+from twisted.protocols import amp
 
 from maasserver import dhcp
 from maasserver import server_address as server_address_module
@@ -57,6 +58,7 @@ from maastesting.twisted import always_fail_with, always_succeed_with
 from provisioningserver.rpc.cluster import (
     ConfigureDHCPv4,
     ConfigureDHCPv4_V2,
+    ConfigureDHCPv4_V3,
     ConfigureDHCPv6,
     ConfigureDHCPv6_V2,
     ValidateDHCPv4Config,
@@ -65,7 +67,10 @@ from provisioningserver.rpc.cluster import (
     ValidateDHCPv6Config_V2,
 )
 from provisioningserver.rpc.dhcp import downgrade_shared_networks
-from provisioningserver.rpc.exceptions import CannotConfigureDHCP
+from provisioningserver.rpc.exceptions import (
+    CannotConfigureDHCP,
+    DHCPConfigurationOutOfSync,
+)
 from provisioningserver.utils.twisted import synchronous
 
 wait_for_reactor = wait_for(30)  # 30 seconds.
@@ -2378,6 +2383,49 @@ class TestGetDHCPConfigureFor(MAASServerTestCase):
         self.assertEqual(primary_interface.name, observed_interface)
 
 
+class TestDHCPConfigurationCache(MAASServerTestCase):
+    """Tests for `DHCPConfigurationCache`."""
+
+    def test_get_fragments_returns_None_when_not_tracked(self):
+        cache = dhcp.DHCPConfigurationCache()
+        self.assertIsNone(cache.get_fragments(random.randint(1, 100), "s"))
+
+    def test_get_fragments_keeps_valid_vlans(self):
+        cache = dhcp.DHCPConfigurationCache()
+        cache.track(1)
+        cache.get_fragments(1, "s").update({10: sentinel.a, 11: sentinel.b})
+        cache.invalidate(1, 10)
+        self.assertEqual({11: sentinel.b}, cache.get_fragments(1, "s"))
+
+    def test_get_fragments_drops_all_vlans_when_all_invalidated(self):
+        cache = dhcp.DHCPConfigurationCache()
+        cache.track(1)
+        cache.get_fragments(1, "s").update({10: sentinel.a})
+        cache.invalidate(1)
+        cache.invalidate(1, 11)
+        self.assertEqual({}, cache.get_fragments(1, "s"))
+
+    def test_get_fragments_drops_all_vlans_when_settings_changed(self):
+        cache = dhcp.DHCPConfigurationCache()
+        cache.track(1)
+        cache.get_fragments(1, "s").update({10: sentinel.a})
+        self.assertEqual({}, cache.get_fragments(1, "other"))
+
+    def test_forget_drops_everything(self):
+        cache = dhcp.DHCPConfigurationCache()
+        cache.track(1)
+        cache.get_fragments(1, "s").update({10: sentinel.a})
+        cache.set_sent(1, 4, {"vlan-10": "digest"})
+        cache.forget(1)
+        self.assertIsNone(cache.get_fragments(1, "s"))
+        self.assertIsNone(cache.get_sent(1, 4))
+
+    def test_set_sent_ignores_untracked_rack_controller(self):
+        cache = dhcp.DHCPConfigurationCache()
+        cache.set_sent(1, 4, {"vlan-10": "digest"})
+        self.assertIsNone(cache.get_sent(1, 4))
+
+
 class TestGetDHCPConfiguration(MAASServerTestCase):
     """Tests for `get_dhcp_configuration`."""
 
@@ -2462,6 +2510,95 @@ class TestGetDHCPConfiguration(MAASServerTestCase):
             config.shared_networks_v6, addr6.subnet, [addr6.ip]
         )
 
+    def make_RackController_with_VLANs(self, count):
+        rack = factory.make_RackController()
+        vlans = []
+        for _ in range(count):
+            vlan = factory.make_VLAN(dhcp_on=True, primary_rack=rack)
+            subnet = factory.make_Subnet(vlan=vlan, version=4)
+            interface = factory.make_Interface(
+                INTERFACE_TYPE.PHYSICAL, node=rack, vlan=vlan
+            )
+            factory.make_StaticIPAddress(
+                alloc_type=IPADDRESS_TYPE.STICKY,
+                subnet=subnet,
+                interface=interface,
+            )
+            self.make_host(subnet)
+            vlans.append(vlan)
+        return rack, vlans
+
+    def make_host(self, subnet):
+        interface = factory.make_Interface(
+            INTERFACE_TYPE.PHYSICAL, node=factory.make_Node(), vlan=subnet.vlan
+        )
+        return factory.make_StaticIPAddress(
+            alloc_type=IPADDRESS_TYPE.STICKY,
+            subnet=subnet,
+            interface=interface,
+        )
+
+    def test_reuses_configuration_of_valid_vlans(self):
+        self.patch(
+            dhcp, "dhcp_configuration_cache", dhcp.DHCPConfigurationCache()
+        )
+        rack, vlans = self.make_RackController_with_VLANs(2)
+        dhcp.dhcp_configuration_cache.track(rack.id)
+        config = dhcp.get_dhcp_configuration(rack)
+        # Not invalidated, so the new host is not seen.
+        self.make_host(vlans[0].subnet_set.first())
+        self.assertEqual(
+            config.hosts_v4, dhcp.get_dhcp_configuration(rack).hosts_v4
+        )
+
+    def test_recomputes_configuration_of_invalidated_vlan(self):
+        self.patch(
+            dhcp, "dhcp_configuration_cache", dhcp.DHCPConfigurationCache()
+        )
+        rack, vlans = self.make_RackController_with_VLANs(2)
+        dhcp.dhcp_configuration_cache.track(rack.id)
+        config = dhcp.get_dhcp_configuration(rack)
+        host = self.make_host(vlans[0].subnet_set.first())
+        dhcp.dhcp_configuration_cache.invalidate(rack.id, vlans[0].id)
+        new_config = dhcp.get_dhcp_configuration(rack)
+        self.assertEqual(len(config.hosts_v4) + 1, len(new_config.hosts_v4))
+        self.assertIn(host.ip, [entry["ip"] for entry in new_config.hosts_v4])
+        name = "vlan-%d" % vlans[1].id
+        self.assertIs(config.fragments_v4[name], new_config.fragments_v4[name])
+
+    def test_cached_configuration_matches_computed_configuration(self):
+        self.patch(
+            dhcp, "dhcp_configuration_cache", dhcp.DHCPConfigurationCache()
+        )
+        rack, vlans = self.make_RackController_with_VLANs(3)
+        dhcp.dhcp_configuration_cache.track(rack.id)
+        dhcp.get_dhcp_configuration(rack)
+        self.make_host(vlans[1].subnet_set.first())
+        dhcp.dhcp_configuration_cache.invalidate(rack.id, vlans[1].id)
+        cached = dhcp.get_dhcp_configuration(rack)
+        dhcp.dhcp_configuration_cache.forget(rack.id)
+        self.assertEqual(dhcp.get_dhcp_configuration(rack), cached)
+
+    def test_query_count_is_independent_of_unchanged_vlans(self):
+        self.patch(
+            dhcp, "dhcp_configuration_cache", dhcp.DHCPConfigurationCache()
+        )
+        rack_few, vlans_few = self.make_RackController_with_VLANs(2)
+        rack_many, vlans_many = self.make_RackController_with_VLANs(6)
+        counts = []
+        for rack, vlans in ((rack_few, vlans_few), (rack_many, vlans_many)):
+            dhcp.dhcp_configuration_cache.track(rack.id)
+            dhcp.get_dhcp_configuration(rack)
+            self.make_host(vlans[0].subnet_set.first())
+            dhcp.dhcp_configuration_cache.invalidate(rack.id, vlans[0].id)
+            count, _ = count_queries(dhcp.get_dhcp_configuration, rack)
+            counts.append(count)
+        self.assertEqual(
+            counts[0],
+            counts[1],
+            "Number of queries depends on the number of unchanged VLANs.",
+        )
+
 
 class TestConfigureDHCP(MAASTransactionServerTestCase):
     """Tests for `configure_dhcp`."""
@@ -2797,6 +2934,144 @@ class TestConfigureDHCP(MAASTransactionServerTestCase):
         yield deferToDatabase(service_status_updated)
 
 
+class TestPerformDHCPConfigUpdate(MAASServerTestCase):
+    """Tests for `_perform_dhcp_config_update`."""
+
+    commands = (ConfigureDHCPv4_V3, ConfigureDHCPv4_V2, ConfigureDHCPv4)
+
+    def setUp(self):
+        super().setUp()
+        self.cache = dhcp.DHCPConfigurationCache()
+        self.patch(dhcp, "dhcp_configuration_cache", self.cache)
+        self.rack_id = random.randint(1, 1000)
+        self.cache.track(self.rack_id)
+
+    def make_fragment(self, name, digest=None):
+        if digest is None:
+            digest = factory.make_name("digest")
+        return dhcp.DHCPConfigurationFragment(
+            None,
+            {"name": name, "mtu": 1500, "subnets": []},
+            [{"host": factory.make_name("host"), "mac": "", "ip": ""}],
+            factory.make_name("eth"),
+            digest,
+        )
+
+    @wait_for_reactor
+    def perform(self, client, fragments):
+        shared_networks = [
+            fragment.shared_network for fragment in fragments.values()
+        ]
+        hosts = [
+            host for fragment in fragments.values() for host in fragment.hosts
+        ]
+        return dhcp._perform_dhcp_config_update(
+            client,
+            Mock(id=self.rack_id),
+            4,
+            fragments,
+            self.commands,
+            shared_networks=shared_networks,
+            hosts=hosts,
+            omapi_key=sentinel.omapi_key,
+        )
+
+    def test_sends_all_shared_networks_when_not_known(self):
+        fragments = {name: self.make_fragment(name) for name in ("a", "b")}
+        client = Mock(return_value=defer.succeed({}))
+        self.perform(client, fragments)
+        self.assertThat(
+            client,
+            MockCalledOnceWith(
+                ConfigureDHCPv4_V3,
+                _timeout=ANY,
+                shared_networks=[
+                    fragments["a"].shared_network,
+                    fragments["b"].shared_network,
+                ],
+                hosts=[
+                    dict(fragments["a"].hosts[0], shared_network="a"),
+                    dict(fragments["b"].hosts[0], shared_network="b"),
+                ],
+                removed_shared_networks=[],
+                base_digest=None,
+                digest=ANY,
+                omapi_key=sentinel.omapi_key,
+            ),
+        )
+        self.assertEqual(
+            {"a": fragments["a"].digest, "b": fragments["b"].digest},
+            self.cache.get_sent(self.rack_id, 4),
+        )
+
+    def test_sends_shared_networks_that_changed(self):
+        sent = {"a": "old", "b": "same", "c": "removed"}
+        self.cache.set_sent(self.rack_id, 4, sent)
+        fragments = {
+            "a": self.make_fragment("a"),
+            "b": self.make_fragment("b", "same"),
+        }
+        client = Mock(return_value=defer.succeed({}))
+        self.perform(client, fragments)
+        self.assertThat(
+            client,
+            MockCalledOnceWith(
+                ConfigureDHCPv4_V3,
+                _timeout=ANY,
+                shared_networks=[fragments["a"].shared_network],
+                hosts=[dict(fragments["a"].hosts[0], shared_network="a")],
+                removed_shared_networks=["c"],
+                base_digest=dhcp.get_dhcp_configuration_digest(sent),
+                digest=dhcp.get_dhcp_configuration_digest(
+                    {"a": fragments["a"].digest, "b": "same"}
+                ),
+                omapi_key=sentinel.omapi_key,
+            ),
+        )
+
+    def test_sends_all_shared_networks_when_out_of_sync(self):
+        self.cache.set_sent(self.rack_id, 4, {"a": "old"})
+        fragments = {"a": self.make_fragment("a")}
+        client = Mock(
+            side_effect=[
+                defer.fail(DHCPConfigurationOutOfSync()),
+                defer.succeed({}),
+            ]
+        )
+        self.perform(client, fragments)
+        self.assertEqual(2, client.call_count)
+        self.assertIsNone(client.call_args[1]["base_digest"])
+        self.assertEqual(
+            {"a": fragments["a"].digest}, self.cache.get_sent(self.rack_id, 4)
+        )
+
+    def test_falls_back_to_v2_when_v3_not_handled(self):
+        self.cache.set_sent(self.rack_id, 4, {"a": "old"})
+        fragments = {"a": self.make_fragment("a")}
+        client = Mock(
+            side_effect=[
+                defer.fail(amp.UnhandledCommand()),
+                defer.succeed({}),
+            ]
+        )
+        self.perform(client, fragments)
+        self.assertEqual(
+            [ConfigureDHCPv4_V3, ConfigureDHCPv4_V2],
+            [args[0] for args, _ in client.call_args_list],
+        )
+        self.assertEqual(
+            call(
+                ConfigureDHCPv4_V2,
+                _timeout=ANY,
+                shared_networks=[fragments["a"].shared_network],
+                hosts=fragments["a"].hosts,
+                omapi_key=sentinel.omapi_key,
+            ),
+            client.call_args,
+        )
+        self.assertIsNone(self.cache.get_sent(self.rack_id, 4))
+
+
 class TestValidateDHCPConfig(MAASTransactionServerTestCase):
     """Tests for `validate_dhcp_config`."""
 
@@ -398,6 +398,18 @@ class TestFactories(MAASServerTestCase):
         )
         self.assertTrue(eventloop.loop.factories["stats"]["only_on_master"])
 
+    def test_make_SubnetStatisticsService(self):
+        service = eventloop.make_SubnetStatisticsService()
+        self.assertThat(service, IsInstance(stats.SubnetStatisticsService))
+        # It is registered as a factory in RegionEventLoop.
+        self.assertIs(
+            eventloop.make_SubnetStatisticsService,
+            eventloop.loop.factories["subnet-statistics"]["factory"],
+        )
+        self.assertTrue(
+            eventloop.loop.factories["subnet-statistics"]["only_on_master"]
+        )
+
     def test_make_PrometheusService(self):
         service = eventloop.make_PrometheusService()
         self.assertThat(service, IsInstance(PrometheusService))
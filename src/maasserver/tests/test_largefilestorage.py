@@ -0,0 +1,161 @@
+# Copyright 2020 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `maasserver.largefilestorage`."""
+
+
+import os
+from unittest.mock import Mock
+
+from fixtures import EnvironmentVariableFixture
+
+from maasserver.largefilestorage import (
+    DatabaseStorage,
+    FilesystemStorage,
+    get_filesystem_storage,
+    get_storage,
+)
+from maasserver.testing.config import RegionConfigurationFixture
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+from maastesting.testcase import MAASTestCase
+
+
+def make_largefile():
+    return Mock(sha256=factory.make_name("sha256"))
+
+
+class TestDatabaseStorage(MAASServerTestCase):
+    def test_has_content(self):
+        largefile = factory.make_LargeFile(factory.make_bytes(size=512))
+        self.assertTrue(DatabaseStorage().has_content(largefile))
+
+    def test_has_no_content_when_large_object_is_short(self):
+        largefile = factory.make_LargeFile(factory.make_bytes(size=512))
+        DatabaseStorage().truncate(largefile, 0)
+        self.assertFalse(DatabaseStorage().has_content(largefile))
+
+    def test_reads_content(self):
+        content = factory.make_bytes(size=512)
+        largefile = factory.make_LargeFile(content)
+        self.assertEqual(
+            content[100:200], DatabaseStorage().read(largefile, 100, 100)
+        )
+
+    def test_writes_content(self):
+        content = factory.make_bytes(size=512)
+        largefile = factory.make_LargeFile(content)
+        data = factory.make_bytes(size=100)
+        DatabaseStorage().write(largefile, 100, data)
+        with largefile.content.open("rb") as stream:
+            self.assertEqual(
+                content[:100] + data + content[200:], stream.read()
+            )
+
+    def test_truncates_content(self):
+        content = factory.make_bytes(size=512)
+        largefile = factory.make_LargeFile(content)
+        DatabaseStorage().truncate(largefile, 100)
+        with largefile.content.open("rb") as stream:
+            self.assertEqual(content[:100], stream.read())
+
+
+class TestFilesystemStorage(MAASTestCase):
+    def make_storage(self):
+        return FilesystemStorage(os.path.join(self.make_dir(), "storage"))
+
+    def test_writes_content_to_partial_file(self):
+        storage = self.make_storage()
+        largefile = make_largefile()
+        data = factory.make_bytes()
+        storage.write(largefile, 0, data)
+        self.assertFalse(storage.has_content(largefile))
+        self.assertEqual(data, storage.read(largefile, 0, len(data)))
+
+    def test_writes_content_at_offset(self):
+        storage = self.make_storage()
+        largefile = make_largefile()
+        storage.write(largefile, 0, b"abcdef")
+        storage.write(largefile, 2, b"xy")
+        self.assertEqual(b"abxyef", storage.read(largefile, 0, 10))
+
+    def test_reads_nothing_without_content(self):
+        storage = self.make_storage()
+        self.assertEqual(b"", storage.read(make_largefile(), 0, 10))
+
+    def test_truncates_content(self):
+        storage = self.make_storage()
+        largefile = make_largefile()
+        storage.write(largefile, 0, b"abcdef")
+        storage.truncate(largefile, 2)
+        self.assertEqual(b"ab", storage.read(largefile, 0, 10))
+
+    def test_commit_names_file_after_sha256(self):
+        storage = self.make_storage()
+        largefile = make_largefile()
+        data = factory.make_bytes()
+        storage.write(largefile, 0, data)
+        storage.commit(largefile)
+        self.assertTrue(storage.has_content(largefile))
+        self.assertEqual(
+            os.path.join(storage.path, largefile.sha256),
+            storage.get_path(largefile),
+        )
+        with storage.open(largefile) as stream:
+            self.assertEqual(data, stream.read())
+
+    def test_committed_content_does_not_change(self):
+        storage = self.make_storage()
+        largefile = make_largefile()
+        storage.write(largefile, 0, b"abcdef")
+        storage.commit(largefile)
+        storage.truncate(largefile, 0)
+        storage.write(largefile, 0, b"xy")
+        storage.commit(largefile)
+        self.assertEqual(b"abcdef", storage.read(largefile, 0, 10))
+
+    def test_discard_removes_partial_content(self):
+        storage = self.make_storage()
+        largefile = make_largefile()
+        storage.write(largefile, 0, b"abcdef")
+        storage.discard(largefile)
+        self.assertEqual(b"", storage.read(largefile, 0, 10))
+
+    def test_delete_removes_committed_content(self):
+        storage = self.make_storage()
+        largefile = make_largefile()
+        storage.write(largefile, 0, b"abcdef")
+        storage.commit(largefile)
+        storage.delete(largefile)
+        self.assertFalse(storage.has_content(largefile))
+
+    def test_delete_ignores_missing_content(self):
+        storage = self.make_storage()
+        # No exception is raised.
+        storage.delete(make_largefile())
+
+
+class TestGetStorage(MAASTestCase):
+    def test_returns_database_storage_by_default(self):
+        self.useFixture(RegionConfigurationFixture())
+        self.assertIsInstance(get_storage(), DatabaseStorage)
+
+    def test_returns_filesystem_storage_when_configured(self):
+        path = self.make_dir()
+        self.useFixture(
+            RegionConfigurationFixture(
+                image_storage="filesystem", image_storage_path=path
+            )
+        )
+        storage = get_storage()
+        self.assertIsInstance(storage, FilesystemStorage)
+        self.assertEqual(path, storage.path)
+
+    def test_filesystem_storage_defaults_to_data_path(self):
+        data_path = self.make_dir()
+        self.useFixture(RegionConfigurationFixture())
+        self.useFixture(EnvironmentVariableFixture("MAAS_DATA", data_path))
+        self.assertEqual(
+            os.path.join(data_path, "image-storage"),
+            get_filesystem_storage().path,
+        )
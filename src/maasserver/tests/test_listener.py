@@ -27,6 +27,7 @@ from twisted.internet.defer import (
     DeferredQueue,
     inlineCallbacks,
     returnValue,
+    succeed,
 )
 from twisted.logger import LogLevel
 from twisted.python.failure import Failure
@@ -49,7 +50,7 @@ from maastesting.matchers import (
     MockCallsMatch,
     MockNotCalled,
 )
-from maastesting.twisted import TwistedLoggerFixture
+from maastesting.twisted import extract_result, TwistedLoggerFixture
 from provisioningserver.utils.twisted import DeferredValue
 
 wait_for_reactor = wait_for(30)  # 30 seconds.
@@ -517,6 +518,114 @@ class TestPostgresListenerService(MAASServerTestCase):
         listener.doRead()
         self.assertItemsEqual(listener.notifications, set(notifications))
 
+    def make_notifications(self, channel, action, count):
+        received = listener_module.time()
+        return {
+            ("%s_%s" % (channel, action), str(obj_id)): received
+            for obj_id in range(count)
+        }
+
+    def test_register_raises_error_for_batch_system_channel(self):
+        listener = PostgresListenerService()
+        with ExpectedException(PostgresListenerRegistrationError):
+            listener.register("sys_test", lambda *args: None, batch=True)
+
+    def test_unregister_removes_batch_handler(self):
+        listener = PostgresListenerService()
+        handler = Mock()
+        listener.register("test", handler, batch=True)
+        listener.unregister("test", handler)
+        self.assertEqual({}, listener.batchListeners)
+        self.assertNotIn("test", listener.listeners)
+
+    def test_handleNotifies_calls_handlers_for_each_notification(self):
+        listener = PostgresListenerService()
+        handler = Mock(return_value=None)
+        listener.register("test", handler)
+        listener.notifications = self.make_notifications("test", "update", 3)
+        extract_result(listener.handleNotifies())
+        self.assertItemsEqual(
+            [call("update", str(obj_id)) for obj_id in range(3)],
+            handler.call_args_list,
+        )
+        self.assertEqual({}, listener.notifications)
+
+    def test_handleNotifies_limits_concurrency_per_channel(self):
+        listener = PostgresListenerService()
+        self.patch(listener, "HANDLE_NOTIFY_CONCURRENCY", 2)
+        handling = []
+        listener.register("test", lambda *args: handling.append(Deferred()))
+        listener.register("other", lambda *args: succeed(None))
+        listener.notifications = self.make_notifications("test", "update", 3)
+        listener.notifications.update(
+            self.make_notifications("other", "update", 3)
+        )
+        d = listener.handleNotifies()
+        self.assertThat(handling, HasLength(2))
+        handling[0].callback(None)
+        self.assertThat(handling, HasLength(3))
+        for handled in handling[1:]:
+            handled.callback(None)
+        extract_result(d)
+
+    def test_handleNotifies_calls_batch_handlers_with_batches(self):
+        listener = PostgresListenerService()
+        self.patch(listener, "HANDLE_NOTIFY_BATCH_SIZE", 2)
+        handler = Mock(return_value=None)
+        batch_handler = Mock(return_value=None)
+        listener.register("test", handler)
+        listener.register("test", batch_handler, batch=True)
+        listener.notifications = self.make_notifications("test", "create", 3)
+        extract_result(listener.handleNotifies())
+        self.assertThat(handler.call_args_list, HasLength(3))
+        self.assertEqual(
+            [2, 1], [len(args[0]) for args, _ in batch_handler.call_args_list]
+        )
+        self.assertItemsEqual(
+            [("create", str(obj_id)) for obj_id in range(3)],
+            [
+                notify
+                for args, _ in batch_handler.call_args_list
+                for notify in args[0]
+            ],
+        )
+
+    def test_handleNotifies_logs_batch_handler_failures(self):
+        listener = PostgresListenerService()
+        self.patch(listener, "HANDLE_NOTIFY_BATCH_SIZE", 1)
+        batch_handler = Mock(side_effect=ZeroDivisionError())
+        listener.register("test", batch_handler, batch=True)
+        listener.notifications = self.make_notifications("test", "create", 2)
+        with TwistedLoggerFixture() as logger:
+            extract_result(listener.handleNotifies())
+        self.assertThat(batch_handler.call_args_list, HasLength(2))
+        self.assertThat(logger.failures, HasLength(2))
+
+    def test_handleNotifies_records_metrics(self):
+        metrics = self.patch(listener_module, "PROMETHEUS_METRICS")
+        listener = PostgresListenerService()
+        listener.register("test", lambda *args: None)
+        listener.notifications = self.make_notifications("test", "update", 2)
+        extract_result(listener.handleNotifies())
+        self.assertThat(
+            metrics.update,
+            MockCallsMatch(
+                call("maas_db_notify_queue_depth", "set", value=2),
+                call(
+                    "maas_db_notify_latency",
+                    "observe",
+                    value=ANY,
+                    labels={"channel": "test"},
+                ),
+                call(
+                    "maas_db_notify_latency",
+                    "observe",
+                    value=ANY,
+                    labels={"channel": "test"},
+                ),
+            ),
+        )
+
     @wait_for_reactor
     @inlineCallbacks
     def test_listener_ignores_ENOENT_when_removing_itself_from_reactor(self):
@@ -248,6 +248,7 @@ class TestRegionMasterServiceMaker(TestServiceMaker):
             "service-monitor",
             "status-monitor",
             "stats",
+            "subnet-statistics",
             "prometheus",
             "prometheus-exporter",
             "postgres-listener-master",
@@ -370,6 +371,7 @@ class TestRegionAllInOneServiceMaker(TestServiceMaker):
             "dns-publication-cleanup",
             "status-monitor",
             "stats",
+            "subnet-statistics",
             "prometheus",
             "prometheus-exporter",
             "import-resources",
@@ -22,8 +22,9 @@ from twisted.internet.threads import blockingCallFromThread
 from apiclient.creds import convert_tuple_to_string
 from maasserver import populate_tags as populate_tags_module
 from maasserver import rpc as rpc_module
-from maasserver.models import Node, Tag
+from maasserver.models import Node, NodeTagEvaluation, Tag
 from maasserver.models import tag as tag_module
+from maasserver.models.nodeprobeddetails import get_single_probed_details
 from maasserver.models.user import (
     create_auth_token,
     get_auth_tokens,
@@ -31,7 +32,10 @@ from maasserver.models.user import (
 )
 from maasserver.populate_tags import (
     _do_populate_tags,
+    get_details_digest,
+    get_tags_digest,
     populate_tag_for_multiple_nodes,
+    populate_tag_in_processes,
     populate_tags,
     populate_tags_for_single_node,
 )
@@ -47,13 +51,19 @@ from maasserver.testing.testcase import (
 )
 from maasserver.utils.orm import post_commit_hooks
 from maasserver.utils.threads import deferToDatabase
-from maastesting.matchers import MockCalledOnceWith, MockCallsMatch
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockCallsMatch,
+    MockNotCalled,
+)
+from maastesting.testcase import MAASTestCase
 from maastesting.twisted import (
     always_fail_with,
     always_succeed_with,
     extract_result,
 )
 from metadataserver.enum import RESULT_TYPE, SCRIPT_STATUS
+from metadataserver.fields import Bin
 from provisioningserver.refresh.node_info_scripts import (
     LLDP_OUTPUT_NAME,
     LSHW_OUTPUT_NAME,
@@ -358,6 +368,63 @@ class TestPopulateTagsInRegion(MAASTransactionServerTestCase):
         self.assertItemsEqual([node], tag.node_set.all())
 
 
+class TestPopulateTagInProcesses(MAASTransactionServerTestCase):
+    """Tests for `populate_tag_in_processes`."""
+
+    def test_updates_nodes_with_tag(self):
+        with transaction.atomic():
+            nodes = [factory.make_Node() for _ in range(5)]
+            for node in nodes[0:2]:
+                make_lldp_result(node, b"<bar/>")
+            tag = factory.make_Tag("bar", "//lldp:bar", populate=False)
+            tag.node_set.add(nodes[4])
+        populate_tag_in_processes(tag, batch_size=2, max_workers=2)
+        with transaction.atomic():
+            self.assertItemsEqual(nodes[0:2], tag.node_set.all())
+
+    def test_does_not_update_nodes_of_changed_tag(self):
+        with transaction.atomic():
+            node = factory.make_Node()
+            make_lldp_result(node, b"<bar/>")
+            tag = factory.make_Tag("bar", "//lldp:foo", populate=False)
+        tag.definition = "//lldp:bar"
+        populate_tag_in_processes(tag, max_workers=1)
+        with transaction.atomic():
+            self.assertFalse(tag.node_set.exists())
+
+    def test_records_evaluation_latency(self):
+        metrics = self.patch(populate_tags_module, "PROMETHEUS_METRICS")
+        with transaction.atomic():
+            for _ in range(3):
+                make_lldp_result(factory.make_Node(), b"<bar/>")
+            tag = factory.make_Tag("bar", "//lldp:bar", populate=False)
+        populate_tag_in_processes(tag, batch_size=2, max_workers=1)
+        self.assertThat(
+            metrics.update,
+            MockCallsMatch(
+                *[
+                    call(
+                        "maas_tag_evaluation_latency",
+                        "observe",
+                        value=ANY,
+                        labels={"tag": "bar"},
+                    )
+                ]
+                * 3
+            ),
+        )
+
+    def test_populate_tags_uses_processes_when_no_clients(self):
+        self.patch(populate_tags_module, "getAllClients").return_value = []
+        populate_in_processes = self.patch(
+            populate_tags_module, "populate_tag_in_processes"
+        )
+        with transaction.atomic():
+            tag = factory.make_Tag(populate=False)
+        populate_tags(tag)
+        self.assertThat(populate_in_processes, MockCalledOnceWith(tag))
+
+
 class TestPopulateTagsForSingleNode(MAASServerTestCase):
     def test_updates_node_with_all_applicable_tags(self):
         node = factory.make_Node()
@@ -398,6 +465,131 @@ class TestPopulateTagsForSingleNode(MAASServerTestCase):
             ["foo"], [tag.name for tag in node.tags.all()]
         )
 
+    def test_records_evaluation(self):
+        node = factory.make_Node()
+        make_lshw_result(node, b"<foo/>")
+        tags = [
+            factory.make_Tag("foo", "/foo", populate=False),
+            factory.make_Tag("baz", "/foo/bar", populate=False),
+        ]
+        populate_tags_for_single_node(tags, node)
+        evaluation = NodeTagEvaluation.objects.get(node=node)
+        self.assertEqual(
+            get_details_digest(get_single_probed_details(node)),
+            evaluation.details_digest,
+        )
+        self.assertEqual(get_tags_digest(tags), evaluation.tags_digest)
+        self.assertEqual([tags[0].id], evaluation.matching)
+
+    def test_reapplies_recorded_matches_without_evaluating(self):
+        node = factory.make_Node()
+        make_lshw_result(node, b"<foo/>")
+        tags = [
+            factory.make_Tag("foo", "/foo", populate=False),
+            factory.make_Tag("baz", "/foo/bar", populate=False),
+        ]
+        populate_tags_for_single_node(tags, node)
+        node.tags.clear()
+        node.tags.add(tags[1])
+        merge_details = self.patch(populate_tags_module, "merge_details")
+        populate_tags_for_single_node(tags, node)
+        self.assertThat(merge_details, MockNotCalled())
+        self.assertSequenceEqual(
+            ["foo"], [tag.name for tag in node.tags.all()]
+        )
+
+    def test_evaluates_again_when_details_change(self):
+        node = factory.make_Node()
+        script_result = make_lshw_result(node, b"<foo/>")
+        tags = [
+            factory.make_Tag("foo", "/foo", populate=False),
+            factory.make_Tag("bar", "/bar", populate=False),
+        ]
+        populate_tags_for_single_node(tags, node)
+        script_result.stdout = Bin(b"<bar/>")
+        script_result.save()
+        populate_tags_for_single_node(tags, node)
+        self.assertSequenceEqual(
+            ["bar"], [tag.name for tag in node.tags.all()]
+        )
+
+    def test_evaluates_again_when_tag_definitions_change(self):
+        node = factory.make_Node()
+        make_lshw_result(node, b"<foo/>")
+        tag = factory.make_Tag("foo", "/bar", populate=False)
+        populate_tags_for_single_node([tag], node)
+        self.assertFalse(node.tags.exists())
+        tag.definition = "/foo"
+        tag.save(populate=False)
+        populate_tags_for_single_node([tag], node)
+        self.assertSequenceEqual(
+            ["foo"], [tag.name for tag in node.tags.all()]
+        )
+
+    def test_records_evaluation_latency_per_tag(self):
+        metrics = self.patch(populate_tags_module, "PROMETHEUS_METRICS")
+        node = factory.make_Node()
+        make_lshw_result(node, b"<foo/>")
+        tags = [
+            factory.make_Tag("foo", "/foo", populate=False),
+            factory.make_Tag("bar", "/bar", populate=False),
+        ]
+        populate_tags_for_single_node(tags, node)
+        self.assertThat(
+            metrics.update,
+            MockCallsMatch(
+                call(
+                    "maas_tag_evaluation_latency",
+                    "observe",
+                    value=ANY,
+                    labels={"tag": "foo"},
+                ),
+                call(
+                    "maas_tag_evaluation_latency",
+                    "observe",
+                    value=ANY,
+                    labels={"tag": "bar"},
+                ),
+            ),
+        )
+
+
+class TestGetDetailsDigest(MAASTestCase):
+    def test_digest_depends_on_details(self):
+        self.assertNotEqual(
+            get_details_digest({"lshw": b"<foo/>", "lldp": None}),
+            get_details_digest({"lshw": b"<bar/>", "lldp": None}),
+        )
+
+    def test_digest_depends_on_namespaces(self):
+        self.assertNotEqual(
+            get_details_digest({"lshw": b"<foo/>", "lldp": None}),
+            get_details_digest({"lshw": None, "lldp": b"<foo/>"}),
+        )
+
+    def test_digest_distinguishes_missing_from_empty_details(self):
+        self.assertNotEqual(
+            get_details_digest({"lshw": None}),
+            get_details_digest({"lshw": b""}),
+        )
+
+
+class TestGetTagsDigest(MAASServerTestCase):
+    def test_digest_does_not_depend_on_order(self):
+        tags = [
+            factory.make_Tag(definition="//node", populate=False)
+            for _ in range(3)
+        ]
+        self.assertEqual(
+            get_tags_digest(tags), get_tags_digest(reversed(tags))
+        )
+
+    def test_digest_depends_on_definitions(self):
+        tag = factory.make_Tag(definition="//node", populate=False)
+        digest = get_tags_digest([tag])
+        tag.definition = "//other"
+        self.assertNotEqual(digest, get_tags_digest([tag]))
+
 
 class TestPopulateTagForMultipleNodes(MAASServerTestCase):
     def test_updates_nodes_with_tag(self):
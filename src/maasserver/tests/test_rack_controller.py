@@ -42,6 +42,7 @@ class TestRackControllerService(MAASTransactionServerTestCase):
                 starting=None,
                 watching=set(),
                 needsDHCPUpdate=set(),
+                needsBootConfigsInvalidated=set(),
                 ipcWorker=sentinel.ipcWorker,
                 postgresListener=sentinel.listener,
             ),
@@ -75,6 +76,12 @@ class TestRackControllerService(MAASTransactionServerTestCase):
         self.assertIn(sys_channel, listener.registeredChannels)
         self.assertIn(service.coreHandler, listener.listeners[sys_channel])
         self.assertEqual(regionProcessId, service.processId)
+        self.assertIn(
+            service.bootConfigHandler, listener.listeners["bootconfig"]
+        )
+        self.assertIn(
+            service.bootConfigHandler, listener.batchListeners["bootconfig"]
+        )
         yield listener.stopService()
 
     @wait_for_reactor
@@ -195,6 +202,20 @@ class TestRackControllerService(MAASTransactionServerTestCase):
         for watch_id in watching:
             self.assertNotIn(f"sys_dhcp_{watch_id}", listener.listeners)
 
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_stopService_calls_unregister_for_boot_config_channel(self):
+        listener = PostgresListenerService()
+        service = RackControllerService(sentinel.ipcWorker, listener)
+        service.processId = random.randint(0, 100)
+        listener.register(
+            service.bootConfigChannel, service.bootConfigHandler, batch=True
+        )
+
+        yield service.stopService()
+
+        self.assertNotIn(service.bootConfigChannel, listener.listeners)
+
     def test_coreHandler_unwatch_calls_unregister(self):
         processId = random.randint(0, 100)
         rack_id = random.randint(0, 100)
@@ -275,6 +296,38 @@ class TestRackControllerService(MAASTransactionServerTestCase):
         self.assertEquals(set([rack_id]), service.needsDHCPUpdate)
         self.assertThat(mock_startProcessing, MockCalledOnceWith())
 
+    def test_dhcpHandler_invalidates_vlan_configuration(self):
+        rack_id = random.randint(0, 100)
+        vlan_id = random.randint(0, 100)
+        listener = PostgresListenerService()
+        service = RackControllerService(sentinel.ipcWorker, listener)
+        service.watching = set([rack_id])
+        self.patch(service, "startProcessing")
+        invalidate = self.patch(
+            rack_controller.dhcp.dhcp_configuration_cache, "invalidate"
+        )
+        service.dhcpHandler("sys_dhcp_%d" % rack_id, str(vlan_id))
+        service.dhcpHandler("sys_dhcp_%d" % rack_id, "")
+        self.assertThat(
+            invalidate,
+            MockCallsMatch(call(rack_id, vlan_id), call(rack_id, None)),
+        )
+
+    def test_coreHandler_tracks_and_forgets_dhcp_configuration(self):
+        processId = random.randint(0, 100)
+        rack_id = random.randint(0, 100)
+        listener = PostgresListenerService()
+        service = RackControllerService(sentinel.ipcWorker, listener)
+        service.processId = processId
+        self.patch(service, "startProcessing")
+        cache = rack_controller.dhcp.dhcp_configuration_cache
+        track = self.patch(cache, "track")
+        forget = self.patch(cache, "forget")
+        service.coreHandler("sys_core_%d" % processId, "watch_%d" % rack_id)
+        self.assertThat(track, MockCalledOnceWith(rack_id))
+        service.coreHandler("sys_core_%d" % processId, "unwatch_%d" % rack_id)
+        self.assertThat(forget, MockCalledOnceWith(rack_id))
+
     def test_dhcpHandler_doesnt_add_to_needsDHCPUpdate(self):
         rack_id = random.randint(0, 100)
         listener = PostgresListenerService()
@@ -284,6 +337,38 @@ class TestRackControllerService(MAASTransactionServerTestCase):
         self.assertEquals(set(), service.needsDHCPUpdate)
         self.assertThat(mock_startProcessing, MockNotCalled())
 
+    def test_bootConfigHandler_adds_to_needsBootConfigsInvalidated(self):
+        service = RackControllerService(sentinel.ipcWorker, sentinel.listener)
+        service.watching = {random.randint(0, 100)}
+        mock_startProcessing = self.patch(service, "startProcessing")
+        system_ids = [factory.make_name("system_id") for _ in range(3)]
+        service.bootConfigHandler(
+            [("update", system_ids[0]), ("delete", system_ids[1])]
+            + [("update", system_id) for system_id in system_ids]
+        )
+        self.assertEqual(set(system_ids), service.needsBootConfigsInvalidated)
+        self.assertFalse(service.needsUnknownBootConfigsInvalidated)
+        self.assertThat(mock_startProcessing, MockCalledOnceWith())
+
+    def test_bootConfigHandler_invalidates_unknown_on_create(self):
+        service = RackControllerService(sentinel.ipcWorker, sentinel.listener)
+        service.watching = {random.randint(0, 100)}
+        self.patch(service, "startProcessing")
+        service.bootConfigHandler(
+            [("create", factory.make_name("system_id"))]
+        )
+        self.assertEqual(set(), service.needsBootConfigsInvalidated)
+        self.assertTrue(service.needsUnknownBootConfigsInvalidated)
+
+    def test_bootConfigHandler_doesnt_add_when_not_watching(self):
+        service = RackControllerService(sentinel.ipcWorker, sentinel.listener)
+        mock_startProcessing = self.patch(service, "startProcessing")
+        service.bootConfigHandler(
+            [("update", factory.make_name("system_id"))]
+        )
+        self.assertEqual(set(), service.needsBootConfigsInvalidated)
+        self.assertThat(mock_startProcessing, MockNotCalled())
+
     def test_startProcessing_doesnt_call_start_when_looping_call_running(self):
         service = RackControllerService(sentinel.ipcWorker, sentinel.listener)
         mock_start = self.patch(service.processing, "start")
@@ -371,6 +456,64 @@ class TestRackControllerService(MAASTransactionServerTestCase):
             mock_processDHCP, MockCallsMatch(call(rack_id), call(rack_id))
         )
 
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_process_calls_processBootConfigs_before_processDHCP(self):
+        rack_id = random.randint(0, 100)
+        system_ids = {factory.make_name("system_id") for _ in range(3)}
+        service = RackControllerService(sentinel.ipcWorker, sentinel.listener)
+        service.watching = set([rack_id])
+        service.needsDHCPUpdate = set([rack_id])
+        service.needsBootConfigsInvalidated = set(system_ids)
+        service.running = True
+        mock_processBootConfigs = self.patch(service, "processBootConfigs")
+        mock_processDHCP = self.patch(service, "processDHCP")
+        service.startProcessing()
+        yield service.processingDone
+        self.assertThat(
+            mock_processBootConfigs, MockCalledOnceWith(system_ids, False)
+        )
+        self.assertThat(mock_processDHCP, MockCalledOnceWith(rack_id))
+        self.assertEqual(set(), service.needsBootConfigsInvalidated)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_process_calls_processBootConfigs_for_unknown_machines(self):
+        service = RackControllerService(sentinel.ipcWorker, sentinel.listener)
+        service.watching = set([random.randint(0, 100)])
+        service.needsUnknownBootConfigsInvalidated = True
+        service.running = True
+        mock_processBootConfigs = self.patch(service, "processBootConfigs")
+        service.startProcessing()
+        yield service.processingDone
+        self.assertThat(
+            mock_processBootConfigs, MockCalledOnceWith(set(), True)
+        )
+        self.assertFalse(service.needsUnknownBootConfigsInvalidated)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_processBootConfigs_invalidates_on_watched_racks(self):
+        @transactional
+        def create_racks():
+            return [factory.make_RackController() for _ in range(2)]
+
+        rack, other_rack = yield deferToDatabase(create_racks)
+        service = RackControllerService(sentinel.ipcWorker, sentinel.listener)
+        service.watching = set([rack.id])
+        mock_invalidate_boot_configs = self.patch(
+            rack_controller, "invalidate_boot_configs"
+        )
+        mock_invalidate_boot_configs.return_value = succeed(None)
+        system_ids = {factory.make_name("system_id") for _ in range(3)}
+        yield service.processBootConfigs(system_ids, True)
+        self.assertThat(
+            mock_invalidate_boot_configs,
+            MockCalledOnceWith(
+                sorted(system_ids), {rack.system_id}, unknown=True
+            ),
+        )
+
     @wait_for_reactor
     @inlineCallbacks
     def test_processDHCP_calls_configure_dhcp(self):
@@ -154,6 +154,7 @@ class TestRegionControllerService(MAASServerTestCase):
         mock_dns_update_all_zones = self.patch(
             region_controller, "dns_update_all_zones"
         )
+        self.patch(region_controller, "render_published_zones")
         service.startProcessing()
         yield service.processingDefer
         self.assertThat(mock_dns_update_all_zones, MockNotCalled())
@@ -202,13 +203,19 @@ class TestRegionControllerService(MAASServerTestCase):
         mock_dns_update_all_zones = self.patch(
             region_controller, "dns_update_all_zones"
         )
+        mock_render_published_zones = self.patch(
+            region_controller, "render_published_zones"
+        )
         mock_dns_update_all_zones.return_value = dns_result
         mock_check_serial = self.patch(service, "_checkSerial")
         mock_check_serial.return_value = succeed(dns_result)
         mock_msg = self.patch(region_controller.log, "msg")
         service.startProcessing()
         yield service.processingDefer
-        self.assertThat(mock_dns_update_all_zones, MockCalledOnceWith())
+        self.assertThat(mock_render_published_zones, MockCalledOnceWith())
+        self.assertThat(
+            mock_dns_update_all_zones, MockCalledOnceWith(incremental=True)
+        )
         self.assertThat(mock_check_serial, MockCalledOnceWith(dns_result))
         self.assertThat(
             mock_msg,
@@ -230,6 +237,7 @@ class TestRegionControllerService(MAASServerTestCase):
         mock_dns_update_all_zones = self.patch(
             region_controller, "dns_update_all_zones"
         )
+        self.patch(region_controller, "render_published_zones")
         mock_dns_update_all_zones.side_effect = [dns_result_0, dns_result_1]
 
         service._checkSerialCalled = False
@@ -250,7 +258,8 @@ class TestRegionControllerService(MAASServerTestCase):
         service.startProcessing()
         yield service.processingDefer
         self.assertThat(
-            mock_dns_update_all_zones, MockCallsMatch(call(), call())
+            mock_dns_update_all_zones,
+            MockCallsMatch(call(incremental=True), call(incremental=True)),
         )
         self.assertThat(
             mock_check_serial,
@@ -301,11 +310,14 @@ class TestRegionControllerService(MAASServerTestCase):
         mock_dns_update_all_zones = self.patch(
             region_controller, "dns_update_all_zones"
         )
+        self.patch(region_controller, "render_published_zones")
         mock_dns_update_all_zones.side_effect = factory.make_exception()
         mock_err = self.patch(region_controller.log, "err")
         service.startProcessing()
         yield service.processingDefer
-        self.assertThat(mock_dns_update_all_zones, MockCalledOnceWith())
+        self.assertThat(
+            mock_dns_update_all_zones, MockCalledOnceWith(incremental=True)
+        )
         self.assertThat(
             mock_err, MockCalledOnceWith(ANY, "Failed configuring DNS.")
         )
@@ -381,6 +393,7 @@ class TestRegionControllerService(MAASServerTestCase):
         mock_dns_update_all_zones = self.patch(
             region_controller, "dns_update_all_zones"
         )
+        self.patch(region_controller, "render_published_zones")
         mock_dns_update_all_zones.return_value = dns_result
         mock_check_serial = self.patch(service, "_checkSerial")
         mock_check_serial.return_value = succeed(dns_result)
@@ -392,7 +405,9 @@ class TestRegionControllerService(MAASServerTestCase):
         mock_rbacSync.return_value = None
         service.startProcessing()
         yield service.processingDefer
-        self.assertThat(mock_dns_update_all_zones, MockCalledOnceWith())
+        self.assertThat(
+            mock_dns_update_all_zones, MockCalledOnceWith(incremental=True)
+        )
         self.assertThat(mock_check_serial, MockCalledOnceWith(dns_result))
         self.assertThat(
             mock_proxy_update_config, MockCalledOnceWith(reload_proxy=True)
@@ -604,13 +619,16 @@ class TestRegionControllerServiceTransactional(MAASTransactionServerTestCase):
         mock_dns_update_all_zones = self.patch(
             region_controller, "dns_update_all_zones"
         )
+        self.patch(region_controller, "render_published_zones")
         mock_dns_update_all_zones.return_value = dns_result
         mock_check_serial = self.patch(service, "_checkSerial")
         mock_check_serial.return_value = succeed(dns_result)
         mock_msg = self.patch(region_controller.log, "msg")
         service.startProcessing()
         yield service.processingDefer
-        self.assertThat(mock_dns_update_all_zones, MockCalledOnceWith())
+        self.assertThat(
+            mock_dns_update_all_zones, MockCalledOnceWith(incremental=True)
+        )
         self.assertThat(mock_check_serial, MockCalledOnceWith(dns_result))
         self.assertThat(
             mock_msg,
@@ -643,6 +661,7 @@ class TestRegionControllerServiceTransactional(MAASTransactionServerTestCase):
         mock_dns_update_all_zones = self.patch(
             region_controller, "dns_update_all_zones"
         )
+        self.patch(region_controller, "render_published_zones")
         mock_dns_update_all_zones.return_value = dns_result
         mock_check_serial = self.patch(service, "_checkSerial")
         mock_check_serial.return_value = succeed(dns_result)
@@ -654,7 +673,9 @@ class TestRegionControllerServiceTransactional(MAASTransactionServerTestCase):
             " * %s" % publication.source
             for publication in reversed(publications[1:])
         )
-        self.assertThat(mock_dns_update_all_zones, MockCalledOnceWith())
+        self.assertThat(
+            mock_dns_update_all_zones, MockCalledOnceWith(incremental=True)
+        )
         self.assertThat(mock_check_serial, MockCalledOnceWith(dns_result))
         self.assertThat(mock_msg, MockCalledOnceWith(expected_msg))
 
@@ -14,7 +14,14 @@ from twisted.internet.defer import fail
 
 from maasserver import stats
 from maasserver.enum import IPADDRESS_TYPE, IPRANGE_TYPE, NODE_STATUS
-from maasserver.models import Config, Fabric, Space, Subnet, VLAN
+from maasserver.models import (
+    Config,
+    Fabric,
+    Space,
+    Subnet,
+    SubnetStatistics,
+    VLAN,
+)
 from maasserver.stats import (
     get_kvm_pods_stats,
     get_maas_stats,
@@ -397,6 +404,36 @@ class TestGetSubnetsUtilisationStats(MAASServerTestCase):
             },
         )
 
+    def test_stats_cached_matches_computed(self):
+        subnet = factory.make_Subnet(cidr="1.2.0.0/16", gateway_ip="1.2.0.254")
+        factory.make_IPRange(
+            subnet=subnet,
+            start_ip="1.2.0.11",
+            end_ip="1.2.0.20",
+            alloc_type=IPRANGE_TYPE.DYNAMIC,
+        )
+        factory.make_StaticIPAddress(
+            ip="1.2.0.12", alloc_type=IPADDRESS_TYPE.DHCP, subnet=subnet
+        )
+        factory.make_StaticIPAddress(
+            ip="1.2.0.80", alloc_type=IPADDRESS_TYPE.STICKY, subnet=subnet
+        )
+        self.assertEqual(
+            stats.get_subnets_utilisation_stats(),
+            stats.get_subnets_utilisation_stats(cached=True),
+        )
+
+    def test_stats_cached_reads_stored_statistics(self):
+        subnet = factory.make_Subnet(cidr="1.2.0.0/16", gateway_ip="1.2.0.254")
+        SubnetStatistics.objects.update_or_create(
+            subnet=subnet,
+            defaults={"statistics": {}, "utilisation": {"available": 1}},
+        )
+        self.assertEqual(
+            stats.get_subnets_utilisation_stats(cached=True),
+            {"1.2.0.0/16": {"available": 1}},
+        )
+
 
 class TestStatsService(MAASTestCase):
     """Tests for `ImportStatsService`."""
@@ -424,6 +461,30 @@ class TestStatsService(MAASTestCase):
         self.assertIsNone(extract_result(d))
 
 
+class TestSubnetStatisticsService(MAASTestCase):
+    """Tests for `SubnetStatisticsService`."""
+
+    def test_is_a_TimerService(self):
+        service = stats.SubnetStatisticsService()
+        self.assertIsInstance(service, TimerService)
+
+    def test_runs_every_half_hour(self):
+        service = stats.SubnetStatisticsService()
+        self.assertEqual(1800, service.step)
+
+    def test_calls_reconcile_statistics(self):
+        service = stats.SubnetStatisticsService()
+        self.assertEqual((service.reconcile_statistics, (), {}), service.call)
+
+    def test_reconcile_statistics_does_not_error(self):
+        service = stats.SubnetStatisticsService()
+        deferToDatabase = self.patch(stats, "deferToDatabase")
+        exception_type = factory.make_exception_type()
+        deferToDatabase.return_value = fail(exception_type())
+        d = service.reconcile_statistics()
+        self.assertIsNone(extract_result(d))
+
+
 class TestStatsServiceAsync(MAASTransactionServerTestCase):
     """Tests for the async parts of `StatsService`."""
 
@@ -396,7 +396,8 @@ DHCP_VLAN_UPDATE = dedent(
     """
 )
 
-# Helper that alerts the primary and secondary rack controller for a VLAN.
+# Helper that alerts the primary and secondary rack controller for a VLAN. The
+# message is the ID of the VLAN, so only its DHCP configuration is recomputed.
 DHCP_ALERT = dedent(
     """\
     CREATE OR REPLACE FUNCTION sys_dhcp_alert(vlan maasserver_vlan)
@@ -405,9 +406,11 @@ DHCP_ALERT = dedent(
       relay_vlan maasserver_vlan;
     BEGIN
       IF vlan.dhcp_on THEN
-        PERFORM pg_notify(CONCAT('sys_dhcp_', vlan.primary_rack_id), '');
+        PERFORM pg_notify(
+          CONCAT('sys_dhcp_', vlan.primary_rack_id), vlan.id::text);
         IF vlan.secondary_rack_id IS NOT NULL THEN
-          PERFORM pg_notify(CONCAT('sys_dhcp_', vlan.secondary_rack_id), '');
+          PERFORM pg_notify(
+            CONCAT('sys_dhcp_', vlan.secondary_rack_id), vlan.id::text);
         END IF;
       END IF;
       IF vlan.relay_vlan_id IS NOT NULL THEN
@@ -416,10 +419,10 @@ DHCP_ALERT = dedent(
         WHERE maasserver_vlan.id = vlan.relay_vlan_id;
         IF relay_vlan.dhcp_on THEN
           PERFORM pg_notify(CONCAT(
-            'sys_dhcp_', relay_vlan.primary_rack_id), '');
+            'sys_dhcp_', relay_vlan.primary_rack_id), vlan.id::text);
           IF relay_vlan.secondary_rack_id IS NOT NULL THEN
             PERFORM pg_notify(CONCAT(
-              'sys_dhcp_', relay_vlan.secondary_rack_id), '');
+              'sys_dhcp_', relay_vlan.secondary_rack_id), vlan.id::text);
           END IF;
         END IF;
       END IF;
@@ -1443,7 +1446,7 @@ DNS_INTERFACE_UPDATE = dedent(
 # Triggered when a config is inserted. Increments the zone serial and notifies
 # that DNS needs to be updated. Only watches for inserts on config
 # upstream_dns, dnssec_validation, default_dns_ttl, windows_kms_host,
-# dns_trusted_acls and maas_internal_domain.
+# dns_trusted_acls, dns_dynamic_updates and maas_internal_domain.
 DNS_CONFIG_INSERT = dedent(
     """\
     CREATE OR REPLACE FUNCTION sys_dns_config_insert()
@@ -1453,6 +1456,7 @@ DNS_CONFIG_INSERT = dedent(
       IF (NEW.name = 'upstream_dns' OR
           NEW.name = 'dnssec_validation' OR
           NEW.name = 'dns_trusted_acl' OR
+          NEW.name = 'dns_dynamic_updates' OR
           NEW.name = 'default_dns_ttl' OR
           NEW.name = 'windows_kms_host' OR
           NEW.name = 'maas_internal_domain')
@@ -1470,18 +1474,19 @@ DNS_CONFIG_INSERT = dedent(
 # Triggered when a config is updated. Increments the zone serial and notifies
 # that DNS needs to be updated. Only watches for updates on config
 # upstream_dns, dnssec_validation, dns_trusted_acl, default_dns_ttl,
-# and windows_kms_host.
+# windows_kms_host, dns_dynamic_updates and maas_internal_domain.
 DNS_CONFIG_UPDATE = dedent(
     """\
     CREATE OR REPLACE FUNCTION sys_dns_config_update()
     RETURNS trigger as $$
     BEGIN
       -- Only care about the upstream_dns, default_dns_ttl,
-      -- dns_trusted_acl and windows_kms_host.
+      -- dns_trusted_acl, windows_kms_host and dns_dynamic_updates.
       IF (OLD.value != NEW.value AND (
           NEW.name = 'upstream_dns' OR
           NEW.name = 'dnssec_validation' OR
           NEW.name = 'dns_trusted_acl' OR
+          NEW.name = 'dns_dynamic_updates' OR
           NEW.name = 'default_dns_ttl' OR
           NEW.name = 'windows_kms_host' OR
           NEW.name = 'maas_internal_domain'))
@@ -1781,6 +1786,112 @@ PEER_PROXY_CONFIG_UPDATE = dedent(
 )
 
 
+# Triggered when a node is created. Notifies that the boot configurations
+# cached for unknown machines need to be invalidated, as the node may be one
+# of them.
+BOOT_CONFIG_NODE_INSERT = dedent(
+    """\
+    CREATE OR REPLACE FUNCTION sys_boot_config_node_insert()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM pg_notify('bootconfig_create', CAST(NEW.system_id AS text));
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """
+)
+
+
+# Triggered when a node is updated. Notifies that the boot configuration
+# cached for the node needs to be invalidated. Only watches changes on the
+# fields that the boot configuration is rendered from, so that the updates
+# made while the node boots (e.g. to `status_expires`) don't invalidate it.
+BOOT_CONFIG_NODE_UPDATE = dedent(
+    """\
+    CREATE OR REPLACE FUNCTION sys_boot_config_node_update()
+    RETURNS trigger as $$
+    BEGIN
+      IF (OLD.status IS DISTINCT FROM NEW.status OR
+          OLD.previous_status IS DISTINCT FROM NEW.previous_status OR
+          OLD.node_type IS DISTINCT FROM NEW.node_type OR
+          OLD.hostname IS DISTINCT FROM NEW.hostname OR
+          OLD.domain_id IS DISTINCT FROM NEW.domain_id OR
+          OLD.architecture IS DISTINCT FROM NEW.architecture OR
+          OLD.osystem IS DISTINCT FROM NEW.osystem OR
+          OLD.distro_series IS DISTINCT FROM NEW.distro_series OR
+          OLD.hwe_kernel IS DISTINCT FROM NEW.hwe_kernel OR
+          OLD.min_hwe_kernel IS DISTINCT FROM NEW.min_hwe_kernel OR
+          OLD.boot_interface_id IS DISTINCT FROM NEW.boot_interface_id OR
+          OLD.boot_cluster_ip IS DISTINCT FROM NEW.boot_cluster_ip OR
+          OLD.bios_boot_method IS DISTINCT FROM NEW.bios_boot_method OR
+          OLD.netboot IS DISTINCT FROM NEW.netboot OR
+          OLD.ephemeral_deploy IS DISTINCT FROM NEW.ephemeral_deploy) THEN
+        PERFORM pg_notify('bootconfig_update', CAST(NEW.system_id AS text));
+      END IF;
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """
+)
+
+
+# Triggered when a node is deleted. Notifies that the boot configuration
+# cached for the node needs to be invalidated.
+BOOT_CONFIG_NODE_DELETE = dedent(
+    """\
+    CREATE OR REPLACE FUNCTION sys_boot_config_node_delete()
+    RETURNS trigger as $$
+    BEGIN
+      PERFORM pg_notify('bootconfig_delete', CAST(OLD.system_id AS text));
+      RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql;
+    """
+)
+
+
+# Triggered when a tag is added to or removed from a node. Notifies that the
+# boot configuration cached for the node needs to be invalidated, as the
+# kernel options of its tags are part of it.
+BOOT_CONFIG_NODE_TAG_LINK = dedent(
+    """\
+    CREATE OR REPLACE FUNCTION sys_boot_config_node_tag_link()
+    RETURNS trigger as $$
+    DECLARE
+      node RECORD;
+    BEGIN
+      SELECT system_id INTO node
+      FROM maasserver_node
+      WHERE id = NEW.node_id;
+      PERFORM pg_notify('bootconfig_update', CAST(node.system_id AS text));
+      RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql;
+    """
+)
+
+
+BOOT_CONFIG_NODE_TAG_UNLINK = dedent(
+    """\
+    CREATE OR REPLACE FUNCTION sys_boot_config_node_tag_unlink()
+    RETURNS trigger as $$
+    DECLARE
+      node RECORD;
+    BEGIN
+      SELECT system_id INTO node
+      FROM maasserver_node
+      WHERE id = OLD.node_id;
+      IF FOUND THEN
+        PERFORM pg_notify(
+          'bootconfig_update', CAST(node.system_id AS text));
+      END IF;
+      RETURN OLD;
+    END;
+    $$ LANGUAGE plpgsql;
+    """
+)
+
+
 # Triggered when RBAC need to be synced. In essense this means on
 # insert into maasserver_rbacsync.
 RBAC_SYNC = dedent(
@@ -2163,6 +2274,34 @@ def register_system_triggers():
         "maasserver_config", "sys_proxy_config_use_peer_proxy_update", "update"
     )
 
+    # Boot configurations
+
+    # - Node
+    register_procedure(BOOT_CONFIG_NODE_INSERT)
+    register_trigger(
+        "maasserver_node", "sys_boot_config_node_insert", "insert"
+    )
+    register_procedure(BOOT_CONFIG_NODE_UPDATE)
+    register_trigger(
+        "maasserver_node", "sys_boot_config_node_update", "update"
+    )
+    register_procedure(BOOT_CONFIG_NODE_DELETE)
+    register_trigger(
+        "maasserver_node", "sys_boot_config_node_delete", "delete"
+    )
+
+    # - Node -> Tag
+    register_procedure(BOOT_CONFIG_NODE_TAG_LINK)
+    register_trigger(
+        "maasserver_node_tags", "sys_boot_config_node_tag_link", "insert"
+    )
+    register_procedure(BOOT_CONFIG_NODE_TAG_UNLINK)
+    register_trigger(
+        "maasserver_node_tags", "sys_boot_config_node_tag_unlink", "delete"
+    )
+
+    # RBAC
+
     # - RBACSync
     register_procedure(RBAC_SYNC)
     register_trigger("maasserver_rbacsync", "sys_rbac_sync", "insert")
@@ -110,6 +110,11 @@ class TestTriggersUsed(MAASServerTestCase):
         "resourcepool_sys_rbac_rpool_delete",
         "config_sys_rbac_config_insert",
         "config_sys_rbac_config_update",
+        "node_sys_boot_config_node_insert",
+        "node_sys_boot_config_node_update",
+        "node_sys_boot_config_node_delete",
+        "node_tags_sys_boot_config_node_tag_link",
+        "node_tags_sys_boot_config_node_tag_unlink",
     }
 
     triggers_websocket = {
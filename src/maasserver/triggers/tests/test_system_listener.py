@@ -5309,6 +5309,151 @@ class TestProxyListener(
             yield listener.stopService()
 
 
+class TestBootConfigListener(
+    MAASTransactionServerTestCase, TransactionalHelpersMixin
+):
+    """End-to-end test for the boot configuration triggers code."""
+
+    def make_boot_config_listener(self, action):
+        dv = DeferredValue()
+        listener = self.make_listener_without_delay()
+
+        def handler(notified, payload):
+            if notified == action and not dv.isSet:
+                dv.set(payload)
+
+        listener.register("bootconfig", handler)
+        return listener, dv
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_message_for_node_insert(self):
+        yield deferToDatabase(register_system_triggers)
+        listener, dv = self.make_boot_config_listener("create")
+        yield listener.startService()
+        try:
+            node = yield deferToDatabase(self.create_node)
+            yield dv.get(timeout=2)
+        finally:
+            yield listener.stopService()
+        self.assertEqual(node.system_id, dv.value)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_message_for_node_update_osystem(self):
+        yield deferToDatabase(register_system_triggers)
+        node = yield deferToDatabase(self.create_node)
+        listener, dv = self.make_boot_config_listener("update")
+        yield listener.startService()
+        try:
+            yield deferToDatabase(
+                self.update_node,
+                node.system_id,
+                {"osystem": factory.make_name("osystem")},
+            )
+            yield dv.get(timeout=2)
+        finally:
+            yield listener.stopService()
+        self.assertEqual(node.system_id, dv.value)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_message_for_node_update_netboot(self):
+        yield deferToDatabase(register_system_triggers)
+        node = yield deferToDatabase(self.create_node, {"netboot": True})
+        listener, dv = self.make_boot_config_listener("update")
+        yield listener.startService()
+        try:
+            yield deferToDatabase(
+                self.update_node, node.system_id, {"netboot": False}
+            )
+            yield dv.get(timeout=2)
+        finally:
+            yield listener.stopService()
+        self.assertEqual(node.system_id, dv.value)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_message_for_node_update_ephemeral_deploy(self):
+        yield deferToDatabase(register_system_triggers)
+        node = yield deferToDatabase(
+            self.create_node, {"ephemeral_deploy": False}
+        )
+        listener, dv = self.make_boot_config_listener("update")
+        yield listener.startService()
+        try:
+            yield deferToDatabase(
+                self.update_node, node.system_id, {"ephemeral_deploy": True}
+            )
+            yield dv.get(timeout=2)
+        finally:
+            yield listener.stopService()
+        self.assertEqual(node.system_id, dv.value)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_doesnt_send_message_for_node_update_status_expires(self):
+        yield deferToDatabase(register_system_triggers)
+        node = yield deferToDatabase(self.create_node)
+        listener, dv = self.make_boot_config_listener("update")
+        yield listener.startService()
+        try:
+            yield deferToDatabase(
+                self.update_node,
+                node.system_id,
+                {"status_expires": datetime.now() + timedelta(minutes=5)},
+            )
+            with ExpectedException(CancelledError):
+                yield dv.get(timeout=1)
+        finally:
+            yield listener.stopService()
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_message_for_node_delete(self):
+        yield deferToDatabase(register_system_triggers)
+        node = yield deferToDatabase(self.create_node)
+        listener, dv = self.make_boot_config_listener("delete")
+        yield listener.startService()
+        try:
+            yield deferToDatabase(self.delete_node, node.system_id)
+            yield dv.get(timeout=2)
+        finally:
+            yield listener.stopService()
+        self.assertEqual(node.system_id, dv.value)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_message_for_node_tag_link(self):
+        yield deferToDatabase(register_system_triggers)
+        node = yield deferToDatabase(self.create_node)
+        tag = yield deferToDatabase(self.create_tag)
+        listener, dv = self.make_boot_config_listener("update")
+        yield listener.startService()
+        try:
+            yield deferToDatabase(self.add_node_to_tag, node, tag)
+            yield dv.get(timeout=2)
+        finally:
+            yield listener.stopService()
+        self.assertEqual(node.system_id, dv.value)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_message_for_node_tag_unlink(self):
+        yield deferToDatabase(register_system_triggers)
+        node = yield deferToDatabase(self.create_node)
+        tag = yield deferToDatabase(self.create_tag)
+        yield deferToDatabase(self.add_node_to_tag, node, tag)
+        listener, dv = self.make_boot_config_listener("update")
+        yield listener.startService()
+        try:
+            yield deferToDatabase(self.remove_node_from_tag, node, tag)
+            yield dv.get(timeout=2)
+        finally:
+            yield listener.stopService()
+        self.assertEqual(node.system_id, dv.value)
+
+
 class TestRBACResourcePoolListener(
     MAASTransactionServerTestCase, TransactionalHelpersMixin, RBACHelpersMixin
 ):
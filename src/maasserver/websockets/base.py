@@ -163,6 +163,11 @@ class Handler(metaclass=HandlerMetaclass):
 
     """
 
+    # A dict shared by the handlers of all the clients processing the same
+    # notification, set by `WebSocketFactory`. The handlers of clients with
+    # the same user fetch and dehydrate the object once between them.
+    notify_cache = None
+
     def __init__(self, user, cache, request):
         self.user = user
         self.cache = cache
@@ -172,6 +177,20 @@ class Handler(metaclass=HandlerMetaclass):
         # correct notifications based on what items the client has.
         if "loaded_pks" not in self.cache:
             self.cache["loaded_pks"] = set()
+        # The fields the client asked for in the list being dehydrated, or
+        # None when it wants all of them.
+        self.projection = None
+
+    def wants_field(self, *names):
+        """Return whether any of the fields `names` is to be dehydrated.
+
+        The fields of the model are always dehydrated, as `dehydrate` may
+        read them; use this to skip computing the extra fields that nothing
+        else reads.
+        """
+        return self.projection is None or not self.projection.isdisjoint(
+            names
+        )
 
     def full_dehydrate(self, obj, for_list=False):
         """Convert the given object into a dictionary.
@@ -447,6 +466,9 @@ class Handler(metaclass=HandlerMetaclass):
         getpk = attrgetter(self._meta.pk)
         self.cache["loaded_pks"].update(getpk(obj) for obj in objs)
 
+    def _prefetch_list(self, objs):
+        """Precompute the data shared by the listed objects `objs`."""
+
     def list(self, params):
         """List objects.
 
@@ -455,6 +477,10 @@ class Handler(metaclass=HandlerMetaclass):
             also understands this distinction.
         :param offset: Offset into the queryset to return.
         :param limit: Maximum number of objects to return.
+        :param fields: Names of the fields to return for each object. The
+            `pk` and `batch_key` are always returned. Handlers can skip
+            computing the extra fields that aren't asked for, which makes
+            listing cheaper.
         """
         queryset = self.get_queryset(for_list=True)
         queryset = queryset.order_by(self._meta.batch_key)
@@ -464,9 +490,28 @@ class Handler(metaclass=HandlerMetaclass):
             )
         if "limit" in params:
             queryset = queryset[: params["limit"]]
-        objs = list(queryset)
-        self._cache_pks(objs)
-        return [self.full_dehydrate(obj, for_list=True) for obj in objs]
+        projection = None
+        if params.get("fields") is not None:
+            projection = {self._meta.pk, self._meta.batch_key}
+            projection.update(params["fields"])
+        self.projection = projection
+        try:
+            objs = list(queryset)
+            self._cache_pks(objs)
+            self._prefetch_list(objs)
+            data = [self.full_dehydrate(obj, for_list=True) for obj in objs]
+        finally:
+            self.projection = None
+        if projection is not None:
+            data = [
+                {
+                    field: value
+                    for field, value in obj_data.items()
+                    if field in projection
+                }
+                for obj_data in data
+            ]
+        return data
 
     def get(self, params):
         """Get object.
@@ -596,19 +641,15 @@ class Handler(metaclass=HandlerMetaclass):
             else:
                 return None
 
-        self.user.refresh_from_db()
-        try:
-            obj = self.listen(channel, action, pk)
-        except HandlerDoesNotExistError:
-            obj = None
+        obj = self._listen_shared(channel, action, pk)
         if action == "create" and obj is not None:
             if pk in self.cache["loaded_pks"]:
                 # The user already knows about this node, so its not a create
                 # to the user but an update.
-                return self.on_listen_for_active_pk("update", pk, obj)
+                return self._on_listen_for_active_pk_shared("update", pk, obj)
             else:
                 self.cache["loaded_pks"].add(pk)
-                return self.on_listen_for_active_pk(action, pk, obj)
+                return self._on_listen_for_active_pk_shared(action, pk, obj)
         elif action == "update":
             if pk in self.cache["loaded_pks"]:
                 if obj is None:
@@ -618,12 +659,14 @@ class Handler(metaclass=HandlerMetaclass):
                     return (self._meta.handler_name, "delete", pk)
                 else:
                     # Just a normal update to the client.
-                    return self.on_listen_for_active_pk(action, pk, obj)
+                    return self._on_listen_for_active_pk_shared(
+                        action, pk, obj
+                    )
             elif obj is not None:
                 # User just got access to this new object. Send the message to
                 # the client as a create action instead of an update.
                 self.cache["loaded_pks"].add(pk)
-                return self.on_listen_for_active_pk("create", pk, obj)
+                return self._on_listen_for_active_pk_shared("create", pk, obj)
             else:
                 # User doesn't have access to this object, so do nothing.
                 pass
@@ -633,6 +676,37 @@ class Handler(metaclass=HandlerMetaclass):
             pass
         return None
 
+    def _listen_shared(self, channel, action, pk):
+        """Return `listen` for the user, or None if the object doesn't exist.
+
+        The result is shared through `notify_cache`.
+        """
+        key = ("listen", self.user.id, channel, action, pk)
+        if self.notify_cache is not None and key in self.notify_cache:
+            return self.notify_cache[key]
+        self.user.refresh_from_db()
+        try:
+            obj = self.listen(channel, action, pk)
+        except HandlerDoesNotExistError:
+            obj = None
+        if self.notify_cache is not None:
+            self.notify_cache[key] = obj
+        return obj
+
+    def _on_listen_for_active_pk_shared(self, action, pk, obj):
+        """Return `on_listen_for_active_pk` for the user.
+
+        The dehydrated object is shared through `notify_cache`.
+        """
+        active = "active_pk" in self.cache and pk == self.cache["active_pk"]
+        key = ("dehydrate", self.user.id, pk, active)
+        if self.notify_cache is not None and key in self.notify_cache:
+            return (self._meta.handler_name, action, self.notify_cache[key])
+        result = self.on_listen_for_active_pk(action, pk, obj)
+        if self.notify_cache is not None:
+            self.notify_cache[key] = result[2]
+        return result
+
     def on_listen_for_active_pk(self, action, pk, obj):
         """Return the correct data for `obj` depending on if its the
         active primary key."""
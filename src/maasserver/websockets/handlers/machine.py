@@ -101,23 +101,10 @@ class MachineHandler(NodeHandler):
                 "partitiontable_set__partitions"
             )
         )
+        # The storage of the listed machines is aggregated by
+        # `_prefetch_list`, so their block devices aren't prefetched.
         list_queryset = (
             Machine.objects.select_related("owner", "zone", "domain", "bmc")
-            .prefetch_related(
-                "blockdevice_set__iscsiblockdevice__"
-                "partitiontable_set__partitions"
-            )
-            .prefetch_related(
-                "blockdevice_set__physicalblockdevice__"
-                "partitiontable_set__partitions"
-            )
-            .prefetch_related(
-                "blockdevice_set__physicalblockdevice__numa_node"
-            )
-            .prefetch_related(
-                "blockdevice_set__virtualblockdevice__"
-                "partitiontable_set__partitions"
-            )
             .prefetch_related(
                 "interface_set__ip_addresses__subnet__vlan__space"
             )
@@ -246,6 +233,15 @@ class MachineHandler(NodeHandler):
         edit_permission = NodePermission.admin
         delete_permission = NodePermission.admin
 
+    script_result_fields = NodeHandler.script_result_fields + (
+        "cpu_test_status",
+        "memory_test_status",
+        "network_test_status",
+        "storage_test_status",
+        "interface_test_status",
+        "other_test_status",
+    )
+
     def get_queryset(self, for_list=False):
         """Return `QuerySet` for devices only viewable by `user`."""
         return Machine.objects.get_nodes(
@@ -274,7 +270,9 @@ class MachineHandler(NodeHandler):
         else:
             data["status_message"] = obj.status_message()
 
-        if obj.is_machine or not for_list:
+        if (obj.is_machine or not for_list) and self.wants_field(
+            "pxe_mac", "pxe_mac_vendor", "power_type", "vlan", "ip_addresses"
+        ):
             boot_interface = obj.get_boot_interface()
             if boot_interface is not None:
                 data["pxe_mac"] = "%s" % boot_interface.mac_address
@@ -9,7 +9,7 @@ from itertools import chain
 import logging
 from operator import attrgetter, itemgetter
 
-from django.db.models import Prefetch
+from django.db.models import Count, Prefetch, Sum
 from lxml import etree
 
 from maasserver.enum import (
@@ -21,6 +21,7 @@ from maasserver.enum import (
     NODE_TYPE,
     POWER_STATE,
 )
+from maasserver.models.blockdevice import BlockDevice
 from maasserver.models.cacheset import CacheSet
 from maasserver.models.config import Config
 from maasserver.models.event import Event
@@ -28,6 +29,7 @@ from maasserver.models.filesystemgroup import VolumeGroup
 from maasserver.models.interface import Interface
 from maasserver.models.nodeprobeddetails import script_output_nsmap
 from maasserver.models.numa import NUMANode
+from maasserver.models.partition import Partition
 from maasserver.models.physicalblockdevice import PhysicalBlockDevice
 from maasserver.models.tag import Tag
 from maasserver.models.virtualblockdevice import VirtualBlockDevice
@@ -107,9 +109,26 @@ class NodeHandler(TimestampedModelHandler):
         pk = "system_id"
         pk_type = str
 
+    # The fields computed from the cached script results.
+    script_result_fields = (
+        "commissioning_status",
+        "testing_status",
+        "has_logs",
+    )
+
+    # The fields used to filter the listing.
+    filter_fields = (
+        "subnets",
+        "fabrics",
+        "spaces",
+        "extra_macs",
+        "link_speeds",
+    )
+
     def __init__(self, user, cache, request):
         super().__init__(user, cache, request)
         self._script_results = {}
+        self._storage = {}
 
     def dehydrate_owner(self, user):
         """Return owners username."""
@@ -197,7 +216,10 @@ class NodeHandler(TimestampedModelHandler):
     def dehydrate(self, obj, data, for_list=False):
         """Add extra fields to `data`."""
         data["fqdn"] = obj.fqdn
-        data["actions"] = list(compile_node_actions(obj, self.user).keys())
+        if self.wants_field("actions"):
+            data["actions"] = list(
+                compile_node_actions(obj, self.user).keys()
+            )
         data["node_type_display"] = obj.get_node_type_display()
         data["link_type"] = NODE_TYPE_TO_LINK_TYPE[obj.node_type]
         data["tags"] = [tag.name for tag in obj.tags.all()]
@@ -206,19 +228,29 @@ class NodeHandler(TimestampedModelHandler):
         ):
             # Disk count and storage amount is shown on the machine listing
             # page and the machine and controllers details page.
-            blockdevices = self.get_blockdevices_for(obj)
-            physical_blockdevices = [
-                blockdevice
-                for blockdevice in blockdevices
-                if isinstance(blockdevice, PhysicalBlockDevice)
-            ]
-            data["physical_disk_count"] = len(physical_blockdevices)
-            data["storage"] = round(
-                sum(blockdevice.size for blockdevice in physical_blockdevices)
-                / (1000 ** 3),
-                1,
-            )
-            data["storage_tags"] = self.get_all_storage_tags(blockdevices)
+            if obj.id in self._storage:
+                # Aggregated for the whole list by `_prefetch_list`.
+                data.update(self._storage[obj.id])
+                blockdevices = physical_blockdevices = []
+            else:
+                blockdevices = self.get_blockdevices_for(obj)
+                physical_blockdevices = [
+                    blockdevice
+                    for blockdevice in blockdevices
+                    if isinstance(blockdevice, PhysicalBlockDevice)
+                ]
+                data["physical_disk_count"] = len(physical_blockdevices)
+                data["storage"] = round(
+                    sum(
+                        blockdevice.size
+                        for blockdevice in physical_blockdevices
+                    )
+                    / (1000 ** 3),
+                    1,
+                )
+                data["storage_tags"] = self.get_all_storage_tags(
+                    blockdevices
+                )
             commissioning_script_results = []
             testing_script_results = []
             log_results = set()
@@ -278,7 +310,7 @@ class NodeHandler(TimestampedModelHandler):
                     data[attr] = value
 
         # Filters are only available on machines and devices.
-        if not obj.is_controller:
+        if not obj.is_controller and self.wants_field(*self.filter_fields):
             # For filters
             subnets = self.get_all_subnets(obj)
             data["subnets"] = sorted(subnet.cidr for subnet in subnets)
@@ -499,7 +531,54 @@ class NodeHandler(TimestampedModelHandler):
 
     def _cache_pks(self, nodes):
         super()._cache_pks(nodes)
-        self._cache_script_results(nodes)
+        if self.wants_field(*self.script_result_fields):
+            self._cache_script_results(nodes)
+
+    def _prefetch_list(self, nodes):
+        """Aggregate the storage of the listed machines.
+
+        The disk count, storage size and storage tags of all the machines are
+        computed with a few grouped queries, rather than by walking the block
+        devices and partitions of each machine.
+        """
+        super()._prefetch_list(nodes)
+        storage = {
+            node.id: {
+                "physical_disk_count": 0,
+                "storage": 0.0,
+                "storage_tags": [],
+            }
+            for node in nodes
+            if node.node_type == NODE_TYPE.MACHINE
+        }
+        if len(storage) == 0:
+            return
+        if self.wants_field("physical_disk_count", "storage"):
+            disks = (
+                PhysicalBlockDevice.objects.filter(node_id__in=storage)
+                .order_by()
+                .values("node_id")
+                .annotate(count=Count("id"), size=Sum("size"))
+            )
+            for disk in disks:
+                storage[disk["node_id"]].update(
+                    physical_disk_count=disk["count"],
+                    storage=round(disk["size"] / (1000 ** 3), 1),
+                )
+        if self.wants_field("storage_tags"):
+            tags = {node_id: set() for node_id in storage}
+            blockdevice_tags = BlockDevice.objects.filter(
+                node_id__in=storage, tags__len__gt=0
+            ).values_list("node_id", "tags")
+            partition_tags = Partition.objects.filter(
+                partition_table__block_device__node_id__in=storage,
+                tags__len__gt=0,
+            ).values_list("partition_table__block_device__node_id", "tags")
+            for node_id, node_tags in chain(blockdevice_tags, partition_tags):
+                tags[node_id].update(node_tags)
+            for node_id, node_tags in tags.items():
+                storage[node_id]["storage_tags"] = list(node_tags)
+        self._storage = storage
 
     def on_listen_for_active_pk(self, action, pk, obj):
         self._cache_script_results([obj])
@@ -126,6 +126,20 @@ class TestDomainHandler(MAASServerTestCase):
         ]
         self.assertItemsEqual(expected_domains, handler.list({}))
 
+    def test_list_fields_not_read_by_dehydrate(self):
+        user = factory.make_User()
+        handler = DomainHandler(user, {}, None)
+        domain = Domain.objects.get_default_domain()
+        self.assertEqual(
+            [
+                {
+                    "id": domain.id,
+                    "displayname": "%s (default)" % domain.name,
+                }
+            ],
+            handler.list({"fields": ["displayname"]}),
+        )
+
     def test_prevents_unauthorized_creation(self):
         user = factory.make_User()
         handler = DomainHandler(user, {}, None)
@@ -579,12 +579,12 @@ class TestMachineHandler(MAASServerTestCase):
         # and slowing down the client waiting for the response.
         self.assertEqual(
             queries_one,
-            23,
+            19,
             "Number of queries has changed; make sure this is expected.",
         )
         self.assertEqual(
             queries_total,
-            23,
+            19,
             "Number of queries has changed; make sure this is expected.",
         )
 
@@ -629,7 +629,7 @@ class TestMachineHandler(MAASServerTestCase):
         # It is important to keep this number as low as possible. A larger
         # number means regiond has to do more work slowing down its process
         # and slowing down the client waiting for the response.
-        expected_query_count = 23
+        expected_query_count = 19
         self.assertEqual(
             queries_one,
             expected_query_count,
@@ -2143,6 +2143,57 @@ class TestMachineHandler(MAASServerTestCase):
         [result] = handler.list({})
         self.assertTrue(result["sriov_support"])
 
+    def test_list_aggregates_storage(self):
+        user = factory.make_User()
+        machine = factory.make_Machine(owner=user, with_boot_disk=False)
+        factory.make_PhysicalBlockDevice(
+            node=machine, size=2 * 1000 ** 3, tags=["ssd"]
+        )
+        blockdevice = factory.make_PhysicalBlockDevice(
+            node=machine, size=3 * 1000 ** 3, tags=[]
+        )
+        partition_table = factory.make_PartitionTable(block_device=blockdevice)
+        factory.make_Partition(partition_table=partition_table, tags=["fast"])
+        handler = MachineHandler(user, {}, None)
+        [result] = handler.list({})
+        self.assertEqual(2, result["physical_disk_count"])
+        self.assertEqual(5.0, result["storage"])
+        self.assertItemsEqual(["ssd", "fast"], result["storage_tags"])
+
+    def test_list_aggregates_storage_without_disks(self):
+        user = factory.make_User()
+        factory.make_Machine(owner=user, with_boot_disk=False)
+        handler = MachineHandler(user, {}, None)
+        [result] = handler.list({})
+        self.assertEqual(0, result["physical_disk_count"])
+        self.assertEqual(0.0, result["storage"])
+        self.assertEqual([], result["storage_tags"])
+
+    def test_list_fields(self):
+        user = factory.make_User()
+        machine = factory.make_Machine(owner=user)
+        handler = MachineHandler(user, {}, None)
+        self.assertEqual(
+            [
+                {
+                    "id": machine.id,
+                    "system_id": machine.system_id,
+                    "hostname": machine.hostname,
+                }
+            ],
+            handler.list({"fields": ["hostname"]}),
+        )
+
+    def test_list_fields_skips_caching_script_results(self):
+        user = factory.make_User()
+        factory.make_Machine(owner=user)
+        handler = MachineHandler(user, {}, None)
+        mock_cache = self.patch(handler, "_cache_script_results")
+        handler.list({"fields": ["hostname", "storage"]})
+        self.assertThat(mock_cache, MockNotCalled())
+        handler.list({"fields": ["hostname", "cpu_test_status"]})
+        self.assertThat(mock_cache, MockCalledOnceWith(ANY))
+
     def test_list_ignores_devices(self):
         owner = factory.make_User()
         handler = MachineHandler(owner, {}, None)
@@ -15,10 +15,12 @@ from django.conf import settings
 from django.contrib.auth import BACKEND_SESSION_KEY, load_backend, SESSION_KEY
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.http import HttpRequest
-from twisted.internet import defer
+from twisted.internet import defer, reactor
 from twisted.internet.defer import fail, inlineCallbacks
 from twisted.internet.protocol import Factory, Protocol
+from twisted.python.failure import Failure
 from twisted.python.modules import getModule
 from twisted.web.server import NOT_DONE_YET
 
@@ -26,14 +28,20 @@ from maasserver.eventloop import services
 from maasserver.utils.orm import transactional
 from maasserver.utils.threads import deferToDatabase
 from maasserver.websockets import handlers
+from maasserver.websockets.base import Handler, HandlerError
 from maasserver.websockets.websockets import STATUSES
 from provisioningserver.logger import LegacyLogger
+from provisioningserver.prometheus.metrics import PROMETHEUS_METRICS
 from provisioningserver.utils import typed
 from provisioningserver.utils.twisted import deferred, synchronous
 from provisioningserver.utils.url import splithost
 
 log = LegacyLogger()
 
+# The number of seconds notify messages are held for, to coalesce the updates
+# of the same object and send them all in a single write.
+NOTIFY_COALESCE_WINDOW = 0.1
+
 
 class MSG_TYPE:
     #: Request made from client.
@@ -82,6 +90,11 @@ class WebSocketProtocol(Protocol):
         self.request = None
         self.cache = {}
         self.sequence_number = 0
+        self.clock = reactor
+        # The notify messages waiting to be sent, keyed by handler name and
+        # object pk, and the delayed call that sends them.
+        self.notifies = {}
+        self.notifies_flush = None
 
     def connectionMade(self):
         """Connection has been made to client."""
@@ -147,6 +160,11 @@ class WebSocketProtocol(Protocol):
         # 'client' will not have been added to the list.
         if self in self.factory.clients:
             self.factory.clients.remove(self)
+        if self.notifies_flush is not None:
+            if self.notifies_flush.active():
+                self.notifies_flush.cancel()
+            self.notifies_flush = None
+        self.notifies.clear()
 
     def loseConnection(self, status, reason):
         """Close connection with status and reason."""
@@ -320,13 +338,56 @@ class WebSocketProtocol(Protocol):
             return None
 
         handler = self.buildHandler(handler_class)
-        d = handler.execute(method, message.get("params", {}))
+        params = message.get("params", {})
+        if method == "list" and params.get("chunk_size"):
+            if handler_class.list is not Handler.list:
+                # Only the base list starts after a given batch key, which
+                # streaming the list in chunks relies on.
+                error = HandlerError(
+                    "%s.list can't be sent in chunks." % handler_name
+                )
+                self.sendError(request_id, handler, method, Failure(error))
+                return None
+            return self.streamList(request_id, handler, params)
+        d = handler.execute(method, params)
         d.addCallbacks(
             partial(self.sendResult, request_id),
             partial(self.sendError, request_id, handler, method),
         )
         return d
 
+    @inlineCallbacks
+    def streamList(self, request_id, handler, params):
+        """Send the list of `handler` in chunks of `chunk_size` objects.
+
+        Each chunk is listed in its own transaction, starting after the last
+        object of the previous chunk, and sent in its own response with
+        `more` set. The last chunk is sent as the final response.
+
+        Only handlers that use the base `Handler.list` can be streamed.
+        """
+        params = dict(params)
+        chunk_size = params.pop("chunk_size")
+        remaining = params.pop("limit", None)
+        batch_key = handler._meta.batch_key
+        try:
+            while True:
+                limit = chunk_size
+                if remaining is not None:
+                    limit = min(limit, remaining)
+                objs = yield handler.execute(
+                    "list", dict(params, limit=limit)
+                )
+                if remaining is not None:
+                    remaining -= len(objs)
+                if len(objs) < chunk_size or remaining == 0:
+                    return self.sendResult(request_id, objs)
+                self.sendResult(request_id, objs, more=True)
+                params["start"] = objs[-1][batch_key]
+        except Exception:
+            self.sendError(request_id, handler, "list", Failure())
+            return None
+
     def _json_encode(self, obj):
         """Allow byte strings embedded in the 'result' object passed to
         `sendResult` to be seamlessly decoded.
@@ -336,14 +397,21 @@ class WebSocketProtocol(Protocol):
         else:
             raise TypeError("Could not convert object to JSON: %r" % obj)
 
-    def sendResult(self, request_id, result, msg_type=MSG_TYPE.RESPONSE):
-        """Send final result to client."""
+    def sendResult(
+        self, request_id, result, msg_type=MSG_TYPE.RESPONSE, more=False
+    ):
+        """Send final result to client.
+
+        :param more: Whether more results follow for the request.
+        """
         result_msg = {
             "type": msg_type,
             "request_id": request_id,
             "rtype": RESPONSE_TYPE.SUCCESS,
             "result": result,
         }
+        if more:
+            result_msg["more"] = True
         self.transport.write(
             json.dumps(result_msg, default=self._json_encode).encode("ascii")
         )
@@ -392,6 +460,70 @@ class WebSocketProtocol(Protocol):
             json.dumps(notify_msg, default=self._json_encode).encode("ascii")
         )
 
+    def queueNotify(self, name, action, data, pk):
+        """Queue the notify message for object `pk` of handler `name`.
+
+        The queued messages are sent together `NOTIFY_COALESCE_WINDOW`
+        seconds after the first one is queued. Only the last state of an
+        object is sent: an update to an object whose creation is queued is
+        sent as its creation, and the deletion of such an object cancels
+        both messages.
+        """
+        key = (name, pk)
+        queued = self.notifies.pop(key, None)
+        if queued is not None:
+            queued_action, _ = queued
+            if queued_action == "create" and action == "delete":
+                PROMETHEUS_METRICS.update(
+                    "maas_websocket_notify_coalesced", "inc", value=2
+                )
+                return
+            PROMETHEUS_METRICS.update(
+                "maas_websocket_notify_coalesced", "inc"
+            )
+            if queued_action == "create":
+                action = "create"
+        self.notifies[key] = (action, data)
+        if self.notifies_flush is None:
+            self.notifies_flush = self.clock.callLater(
+                NOTIFY_COALESCE_WINDOW, self.flushNotifies
+            )
+
+    def flushNotifies(self):
+        """Send the queued notify messages."""
+        self.notifies_flush = None
+        notifies, self.notifies = self.notifies, {}
+        if len(notifies) == 1:
+            [((name, _), (action, data))] = notifies.items()
+            self.sendNotify(name, action, data)
+        elif len(notifies) > 1:
+            self.sendNotifies(
+                [
+                    (name, action, data)
+                    for (name, _), (action, data) in notifies.items()
+                ]
+            )
+
+    def sendNotifies(self, notifies):
+        """Send the `(name, action, data)` notify messages in one write.
+
+        Each message is sent in a frame of its own, as by `sendNotify`.
+        """
+        self.transport.writeSequence(
+            [
+                json.dumps(
+                    {
+                        "type": MSG_TYPE.NOTIFY,
+                        "name": name,
+                        "action": action,
+                        "data": data,
+                    },
+                    default=self._json_encode,
+                ).encode("ascii")
+                for name, action, data in notifies
+            ]
+        )
+
     def buildHandler(self, handler_class):
         """Return an initialised instance of `handler_class`."""
         handler_name = handler_class._meta.handler_name
@@ -457,23 +589,63 @@ class WebSocketFactory(Factory):
         for handler in self.handlers.values():
             for channel in handler._meta.listen_channels:
                 self.listener.register(
-                    channel, partial(self.onNotify, handler, channel)
+                    channel,
+                    partial(self.onNotifies, handler, channel),
+                    batch=True,
                 )
 
-    @inlineCallbacks
     def onNotify(self, handler_class, channel, action, obj_id):
-        for client in self.clients:
-            handler = client.buildHandler(handler_class)
-            data = yield deferToDatabase(
-                self.processNotify, handler, channel, action, obj_id
-            )
-            if data is not None:
-                (name, client_action, data) = data
-                client.sendNotify(name, client_action, data)
+        return self.onNotifies(handler_class, channel, [(action, obj_id)])
+
+    @inlineCallbacks
+    def onNotifies(self, handler_class, channel, notifies):
+        clients = list(self.clients)
+        if len(clients) == 0:
+            return
+        handlers = [client.buildHandler(handler_class) for client in clients]
+        results = yield deferToDatabase(
+            self.processNotifies, handlers, channel, notifies
+        )
+        for client, client_results in zip(clients, results):
+            for (_, obj_id), data in zip(notifies, client_results):
+                if data is not None:
+                    (name, client_action, data) = data
+                    client.queueNotify(name, client_action, data, obj_id)
 
     @transactional
-    def processNotify(self, handler, channel, action, obj_id):
-        return handler.on_listen(channel, action, obj_id)
+    def processNotifies(self, handlers, channel, notifies):
+        """Process the `(action, obj_id)` notifications in `notifies` for the
+        handlers of all the clients.
+
+        This is done in a single transaction, and the handlers share a
+        `notify_cache`, so that each object is fetched and dehydrated once
+        per user rather than once per client. A notification that fails to
+        be processed is logged and rolled back without affecting the others.
+
+        :return: A list of the results of each handler, with a result for
+            each notification, None for those that failed.
+        """
+        notify_cache = {}
+        for handler in handlers:
+            handler.notify_cache = notify_cache
+        results = [[] for _ in handlers]
+        for index, (action, obj_id) in enumerate(notifies):
+            try:
+                with transaction.atomic():
+                    for handler, handler_results in zip(handlers, results):
+                        handler_results.append(
+                            handler.on_listen(channel, action, obj_id)
+                        )
+            except Exception:
+                log.err(
+                    None,
+                    "Failed to process '%s' notification for %s: %s"
+                    % (action, channel, obj_id),
+                )
+                for handler_results in results:
+                    del handler_results[index:]
+                    handler_results.append(None)
+        return results
 
     def registerRPCEvents(self):
         """Register for connected and disconnected events from the RPC
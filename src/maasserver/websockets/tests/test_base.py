@@ -476,6 +476,27 @@ class TestHandler(MAASServerTestCase, FakeNodesHandlerMixin):
             output, handler.list({"start": nodes[2].id, "limit": 3})
         )
 
+    def test_list_fields(self):
+        nodes = [factory.make_Node() for _ in range(3)]
+        output = [
+            {"id": node.id, "system_id": node.system_id, "domain": ANY}
+            for node in nodes
+        ]
+        handler = self.make_nodes_handler(
+            fields=["id", "system_id", "hostname", "domain"]
+        )
+        self.assertItemsEqual(output, handler.list({"fields": ["domain"]}))
+        self.assertIsNone(handler.projection)
+
+    def test_list_fields_dehydrates_with_all_fields(self):
+        node = factory.make_Node()
+        handler = self.make_nodes_handler(fields=["hostname", "domain"])
+        mock_dehydrate = self.patch(handler, "dehydrate")
+        mock_dehydrate.side_effect = lambda obj, data, for_list: data
+        handler.list({"fields": ["domain"]})
+        [call] = mock_dehydrate.call_args_list
+        self.assertEqual(node.hostname, call[0][1]["hostname"])
+
     def test_list_adds_to_loaded_pks(self):
         pks = [factory.make_Node().system_id for _ in range(3)]
         handler = self.make_nodes_handler(fields=["hostname"])
@@ -853,6 +874,70 @@ class TestHandler(MAASServerTestCase, FakeNodesHandlerMixin):
             mock_dehydrate, MockCalledOnceWith(node, for_list=False)
         )
 
+    def test_on_listen_shares_object_between_handlers_of_user(self):
+        node = factory.make_Node()
+        handler = self.make_nodes_handler(fields=["hostname"])
+        other_handler = type(handler)(handler.user, {}, handler.request)
+        handler.notify_cache = other_handler.notify_cache = {}
+        listen = self.patch(handler, "listen")
+        listen.return_value = node
+        other_listen = self.patch(other_handler, "listen")
+        full_dehydrate = self.patch(other_handler, "full_dehydrate")
+        expected = (
+            handler._meta.handler_name,
+            "create",
+            {"hostname": node.hostname},
+        )
+        self.assertEqual(
+            expected,
+            handler.on_listen(sentinel.channel, "update", node.system_id),
+        )
+        self.assertEqual(
+            expected,
+            other_handler.on_listen(
+                sentinel.channel, "update", node.system_id
+            ),
+        )
+        self.assertThat(listen, MockCalledOnceWith(ANY, ANY, ANY))
+        self.assertThat(other_listen, MockNotCalled())
+        self.assertThat(full_dehydrate, MockNotCalled())
+        self.assertIn(node.system_id, other_handler.cache["loaded_pks"])
+
+    def test_on_listen_does_not_share_object_between_users(self):
+        node = factory.make_Node()
+        handler = self.make_nodes_handler(fields=["hostname"])
+        other_handler = self.make_nodes_handler(fields=["hostname"])
+        handler.notify_cache = other_handler.notify_cache = {}
+        handler.on_listen(sentinel.channel, "update", node.system_id)
+        other_listen = self.patch(other_handler, "listen")
+        other_listen.return_value = None
+        self.assertIsNone(
+            other_handler.on_listen(sentinel.channel, "update", node.system_id)
+        )
+        self.assertThat(
+            other_listen,
+            MockCalledOnceWith(sentinel.channel, "update", node.system_id),
+        )
+
+    def test_on_listen_shares_dehydrated_object_only_if_same_active(self):
+        node = factory.make_Node()
+        handler = self.make_nodes_handler(fields=["hostname"])
+        other_handler = type(handler)(handler.user, {}, handler.request)
+        other_handler.cache["active_pk"] = node.system_id
+        handler.notify_cache = other_handler.notify_cache = {}
+        handler.on_listen(sentinel.channel, "update", node.system_id)
+        full_dehydrate = self.patch(other_handler, "full_dehydrate")
+        full_dehydrate.return_value = sentinel.data
+        self.assertEqual(
+            (handler._meta.handler_name, "create", sentinel.data),
+            other_handler.on_listen(
+                sentinel.channel, "update", node.system_id
+            ),
+        )
+        self.assertThat(
+            full_dehydrate, MockCalledOnceWith(node, for_list=False)
+        )
+
     def test_listen_calls_get_object_with_pk_on_other_actions(self):
         handler = self.make_nodes_handler()
         mock_get_object = self.patch(handler, "get_object")
@@ -7,7 +7,7 @@
 from collections import deque
 import json
 import random
-from unittest.mock import MagicMock, sentinel
+from unittest.mock import call, MagicMock, sentinel
 
 from crochet import wait_for
 from django.core.exceptions import ValidationError
@@ -15,6 +15,7 @@ from django.http import HttpRequest
 from testtools.matchers import Equals, Is
 from twisted.internet import defer
 from twisted.internet.defer import fail, inlineCallbacks, succeed
+from twisted.internet.task import Clock
 from twisted.web.server import NOT_DONE_YET
 
 from apiclient.utils import ascii_url
@@ -29,6 +30,7 @@ from maasserver.websockets.base import Handler
 from maasserver.websockets.handlers import DeviceHandler, MachineHandler
 from maasserver.websockets.protocol import (
     MSG_TYPE,
+    NOTIFY_COALESCE_WINDOW,
     RESPONSE_TYPE,
     WebSocketFactory,
     WebSocketProtocol,
@@ -39,6 +41,8 @@ from maastesting.matchers import (
     IsFiredDeferred,
     MockCalledOnceWith,
     MockCalledWith,
+    MockCallsMatch,
+    MockNotCalled,
 )
 from maastesting.testcase import MAASTestCase
 from maastesting.twisted import TwistedLoggerFixture
@@ -707,6 +711,134 @@ class TestWebSocketProtocol(MAASTransactionServerTestCase):
         self.expectThat(sent_obj["rtype"], Equals(RESPONSE_TYPE.ERROR))
         self.expectThat(sent_obj["error"], Equals("error"))
 
+    def make_list_handler(self, factory, objs):
+        handler_class = MagicMock()
+        handler_name = maas_factory.make_name("handler")
+        handler_class._meta.handler_name = handler_name
+        handler_class._meta.batch_key = "id"
+        handler_class.list = Handler.list
+        handler = handler_class.return_value
+
+        def execute(method, params):
+            start = params.get("start", 0)
+            listed = [obj for obj in objs if obj["id"] > start]
+            return succeed(listed[: params["limit"]])
+
+        handler.execute.side_effect = execute
+        factory.handlers[handler_name] = handler_class
+        return handler_name, handler
+
+    def get_written_transport_messages(self, protocol):
+        return [
+            json.loads(call[0][0].decode("ascii"))
+            for call in protocol.transport.write.call_args_list
+        ]
+
+    def test_handleRequest_streams_list_in_chunks(self):
+        protocol, factory = self.make_protocol()
+        protocol.user = sentinel.user
+        objs = [{"id": obj_id} for obj_id in range(1, 6)]
+        handler_name, handler = self.make_list_handler(factory, objs)
+
+        d = protocol.handleRequest(
+            {
+                "type": MSG_TYPE.REQUEST,
+                "request_id": 1,
+                "method": "%s.list" % handler_name,
+                "params": {"chunk_size": 2, "fields": ["id"]},
+            }
+        )
+
+        self.assertThat(d, IsFiredDeferred())
+        sent = self.get_written_transport_messages(protocol)
+        self.assertEqual(
+            [objs[:2], objs[2:4], objs[4:]],
+            [msg["result"] for msg in sent],
+        )
+        self.assertEqual(
+            [True, True, None], [msg.get("more") for msg in sent]
+        )
+        self.assertEqual({1}, {msg["request_id"] for msg in sent})
+        self.assertEqual(
+            [
+                call("list", {"fields": ["id"], "limit": 2}),
+                call("list", {"fields": ["id"], "limit": 2, "start": 2}),
+                call("list", {"fields": ["id"], "limit": 2, "start": 4}),
+            ],
+            handler.execute.call_args_list,
+        )
+
+    def test_handleRequest_streams_list_up_to_limit(self):
+        protocol, factory = self.make_protocol()
+        protocol.user = sentinel.user
+        objs = [{"id": obj_id} for obj_id in range(1, 6)]
+        handler_name, handler = self.make_list_handler(factory, objs)
+
+        protocol.handleRequest(
+            {
+                "type": MSG_TYPE.REQUEST,
+                "request_id": 1,
+                "method": "%s.list" % handler_name,
+                "params": {"chunk_size": 2, "limit": 4},
+            }
+        )
+
+        sent = self.get_written_transport_messages(protocol)
+        self.assertEqual(
+            [objs[:2], objs[2:4]], [msg["result"] for msg in sent]
+        )
+        self.assertEqual([True, None], [msg.get("more") for msg in sent])
+
+    def test_handleRequest_streams_list_sends_error(self):
+        protocol, factory = self.make_protocol()
+        protocol.user = sentinel.user
+        objs = [{"id": obj_id} for obj_id in range(1, 6)]
+        handler_name, handler = self.make_list_handler(factory, objs)
+        handler.execute.side_effect = [
+            succeed(objs[:2]),
+            fail(maas_factory.make_exception("error")),
+        ]
+
+        with TwistedLoggerFixture():
+            protocol.handleRequest(
+                {
+                    "type": MSG_TYPE.REQUEST,
+                    "request_id": 1,
+                    "method": "%s.list" % handler_name,
+                    "params": {"chunk_size": 2},
+                }
+            )
+
+        sent = self.get_written_transport_messages(protocol)
+        self.assertEqual(
+            [RESPONSE_TYPE.SUCCESS, RESPONSE_TYPE.ERROR],
+            [msg["rtype"] for msg in sent],
+        )
+        self.assertEqual("error", sent[-1]["error"])
+
+    def test_handleRequest_doesnt_stream_overridden_list(self):
+        protocol, factory = self.make_protocol()
+        protocol.user = sentinel.user
+        handler_name, handler = self.make_list_handler(factory, [])
+        factory.handlers[handler_name].list = lambda self, params: []
+
+        with TwistedLoggerFixture():
+            protocol.handleRequest(
+                {
+                    "type": MSG_TYPE.REQUEST,
+                    "request_id": 1,
+                    "method": "%s.list" % handler_name,
+                    "params": {"chunk_size": 2},
+                }
+            )
+
+        [sent] = self.get_written_transport_messages(protocol)
+        self.assertEqual(RESPONSE_TYPE.ERROR, sent["rtype"])
+        self.assertEqual(
+            "%s.list can't be sent in chunks." % handler_name, sent["error"]
+        )
+        self.assertThat(handler.execute, MockNotCalled())
+
     @wait_for_reactor
     @inlineCallbacks
     def test_handleRequest_sends_ping_reply_on_ping(self):
@@ -741,6 +873,107 @@ class TestWebSocketProtocol(MAASTransactionServerTestCase):
             message, self.get_written_transport_message(protocol)
         )
 
+    def test_queueNotify_sends_notify_after_window(self):
+        protocol, factory = self.make_protocol()
+        protocol.clock = Clock()
+        mock_sendNotify = self.patch(protocol, "sendNotify")
+        protocol.queueNotify("machine", "update", {"id": 1}, 1)
+        self.assertThat(mock_sendNotify, MockNotCalled())
+        protocol.clock.advance(NOTIFY_COALESCE_WINDOW)
+        self.assertThat(
+            mock_sendNotify, MockCalledOnceWith("machine", "update", {"id": 1})
+        )
+        self.assertEqual({}, protocol.notifies)
+        self.assertIsNone(protocol.notifies_flush)
+
+    def test_queueNotify_sends_notifies_in_one_write(self):
+        protocol, factory = self.make_protocol()
+        protocol.clock = Clock()
+        protocol.queueNotify("machine", "update", {"id": 1}, 1)
+        protocol.queueNotify("machine", "delete", 2, 2)
+        protocol.queueNotify("event", "create", {"id": 1}, 1)
+        protocol.clock.advance(NOTIFY_COALESCE_WINDOW)
+        [call] = protocol.transport.writeSequence.call_args_list
+        self.assertEqual(
+            [
+                {
+                    "type": MSG_TYPE.NOTIFY,
+                    "name": "machine",
+                    "action": "update",
+                    "data": {"id": 1},
+                },
+                {
+                    "type": MSG_TYPE.NOTIFY,
+                    "name": "machine",
+                    "action": "delete",
+                    "data": 2,
+                },
+                {
+                    "type": MSG_TYPE.NOTIFY,
+                    "name": "event",
+                    "action": "create",
+                    "data": {"id": 1},
+                },
+            ],
+            [json.loads(message.decode("ascii")) for message in call[0][0]],
+        )
+        self.assertEqual([], protocol.transport.write.call_args_list)
+
+    def test_queueNotify_coalesces_updates(self):
+        protocol, factory = self.make_protocol()
+        protocol.clock = Clock()
+        mock_metrics = self.patch(protocol_module, "PROMETHEUS_METRICS")
+        mock_sendNotify = self.patch(protocol, "sendNotify")
+        for state in range(3):
+            protocol.queueNotify("machine", "update", {"state": state}, 1)
+        protocol.clock.advance(NOTIFY_COALESCE_WINDOW)
+        self.assertThat(
+            mock_sendNotify,
+            MockCalledOnceWith("machine", "update", {"state": 2}),
+        )
+        self.assertThat(
+            mock_metrics.update,
+            MockCallsMatch(
+                call("maas_websocket_notify_coalesced", "inc"),
+                call("maas_websocket_notify_coalesced", "inc"),
+            ),
+        )
+
+    def test_queueNotify_keeps_create_of_updated_object(self):
+        protocol, factory = self.make_protocol()
+        protocol.clock = Clock()
+        mock_sendNotify = self.patch(protocol, "sendNotify")
+        protocol.queueNotify("machine", "create", {"state": 0}, 1)
+        protocol.queueNotify("machine", "update", {"state": 1}, 1)
+        protocol.clock.advance(NOTIFY_COALESCE_WINDOW)
+        self.assertThat(
+            mock_sendNotify,
+            MockCalledOnceWith("machine", "create", {"state": 1}),
+        )
+
+    def test_queueNotify_drops_created_then_deleted_object(self):
+        protocol, factory = self.make_protocol()
+        protocol.clock = Clock()
+        mock_metrics = self.patch(protocol_module, "PROMETHEUS_METRICS")
+        protocol.queueNotify("machine", "create", {"state": 0}, 1)
+        protocol.queueNotify("machine", "delete", 1, 1)
+        protocol.clock.advance(NOTIFY_COALESCE_WINDOW)
+        self.assertThat(protocol.transport.write, MockNotCalled())
+        self.assertThat(
+            mock_metrics.update,
+            MockCalledOnceWith(
+                "maas_websocket_notify_coalesced", "inc", value=2
+            ),
+        )
+
+    def test_connectionLost_cancels_queued_notifies(self):
+        protocol, factory = self.make_protocol()
+        protocol.clock = Clock()
+        protocol.queueNotify("machine", "update", {"id": 1}, 1)
+        protocol.connectionLost("")
+        self.assertEqual([], protocol.clock.getDelayedCalls())
+        self.assertEqual({}, protocol.notifies)
+
 
 class MakeProtocolFactoryMixin:
     def make_factory(self, rpc_service=None):
@@ -968,6 +1201,7 @@ class TestWebSocketFactoryTransactional(
     def test_onNotify_calls_sendNotify_on_protocol(self):
         user = yield deferToDatabase(self.make_user)
         protocol, factory = self.make_protocol_with_factory(user=user)
+        protocol.clock = Clock()
         name = maas_factory.make_name("name")
         action = maas_factory.make_name("action")
         data = maas_factory.make_name("data")
@@ -977,8 +1211,36 @@ class TestWebSocketFactoryTransactional(
         yield factory.onNotify(
             mock_class, sentinel.channel, action, sentinel.obj_id
         )
+        self.assertThat(mock_sendNotify, MockNotCalled())
+        protocol.clock.advance(NOTIFY_COALESCE_WINDOW)
         self.assertThat(mock_sendNotify, MockCalledWith(name, action, data))
 
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_onNotify_shares_notify_cache_between_clients(self):
+        user = yield deferToDatabase(self.make_user)
+        protocol, factory = self.make_protocol_with_factory(user=user)
+        handler_class = MagicMock()
+        handler_class._meta.handler_name = maas_factory.make_name("handler")
+        handler = handler_class.return_value
+        handler.on_listen.return_value = None
+        other_protocol = MagicMock()
+        other_handler = other_protocol.buildHandler.return_value
+        other_handler.on_listen.return_value = None
+        factory.clients.append(other_protocol)
+        yield factory.onNotify(
+            handler_class, sentinel.channel, sentinel.action, sentinel.obj_id
+        )
+        for client_handler in (handler, other_handler):
+            self.assertThat(
+                client_handler.on_listen,
+                MockCalledOnceWith(
+                    sentinel.channel, sentinel.action, sentinel.obj_id
+                ),
+            )
+        self.assertEqual({}, handler.notify_cache)
+        self.assertIs(handler.notify_cache, other_handler.notify_cache)
+
     @wait_for_reactor
     @inlineCallbacks
     def test_updateRackController_calls_onNotify_for_controller_update(self):
@@ -509,6 +509,15 @@ class WebSocketsProtocolWrapperTest(MAASTestCase):
         self.accumulatingProtocol.transport.writeSequence([b"Hello", b"World"])
         self.assertEqual(b"\x81\x05Hello\x81\x05World", self.transport.value())
 
+    def test_writeSequence_writes_once(self):
+        """
+        L{WebSocketsProtocolWrapper.writeSequence} writes all the frames to
+        the underlying transport at once.
+        """
+        write = self.patch(self.transport, "write")
+        self.accumulatingProtocol.transport.writeSequence([b"Hello", b"World"])
+        write.assert_called_once_with(b"\x81\x05Hello\x81\x05World")
+
     def test_getHost(self):
         """
         L{WebSocketsProtocolWrapper.getHost} returns the transport C{getHost}.
@@ -340,6 +340,21 @@ class WebSocketsTransport:
         packet = _makeFrame(data, opcode, fin)
         self._transport.write(packet)
 
+    @typed
+    def sendFrames(self, opcode, data: Sequence):
+        """
+        Build a final frame packet for each chunk of data and send them over
+        the wire in a single write.
+
+        @type opcode: C{CONTROLS}
+        @param opcode: The type of frames to send.
+
+        @type data: C{list} of C{bytes}
+        @param data: The content of the frames to send.
+        """
+        packets = b"".join(_makeFrame(chunk, opcode, True) for chunk in data)
+        self._transport.write(packets)
+
     @typed
     def loseConnection(self, code=STATUSES.NORMAL, reason: bytes = b""):
         """
@@ -536,13 +551,13 @@ class WebSocketsProtocolWrapper(WebSocketsProtocol):
     @typed
     def writeSequence(self, data: Sequence):
         """
-        Send all chunks from C{data} using C{write}.
+        Send a frame for each chunk from C{data}, all in a single write to
+        the underlying transport.
 
         @type data: C{list} of C{bytes}
         @param data: Data buffers used for the frames content.
         """
-        for chunk in data:
-            self.write(chunk)
+        self._receiver._transport.sendFrames(self.defaultOpcode, data)
 
     def loseConnection(self):
         """
@@ -20,6 +20,12 @@ DHCPv6_CONFIG_FILE = "dhcpd6.conf"
 # Name of the DHCPv6 interfaces file.
 DHCPv6_INTERFACES_FILE = "dhcpd6-interfaces"
 
+# Name of the DHCPv4 state file.
+DHCPv4_STATE_FILE = "dhcpd.state"
+
+# Name of the DHCPv6 state file.
+DHCPv6_STATE_FILE = "dhcpd6.state"
+
 # Message to put in the DHCP config file when the DHCP server gets stopped.
 DISABLED_DHCP_SERVER = "# DHCP server stopped and disabled."
 
@@ -35,6 +41,8 @@ class DHCPServer(metaclass=ABCMeta):
         interfaces file.
     :cvar config_filename: The full path and filename for the server's
         configuration file.
+    :cvar state_filename: The full path and filename for the file in which
+        the state of the server, as last configured, is saved.
     :ivar omapi_key: The OMAPI secret key for the server.
     """
 
@@ -42,6 +50,7 @@ class DHCPServer(metaclass=ABCMeta):
     template_basename = abstractproperty()
     interfaces_filename = abstractproperty()
     config_filename = abstractproperty()
+    state_filename = abstractproperty()
     dhcp_service = abstractproperty()
     ipv6 = abstractproperty()
 
@@ -63,6 +72,11 @@ class DHCPv4Server(DHCPServer):
     dhcp_service = "dhcpd"
     ipv6 = False
 
+    @property
+    def state_filename(self):
+        # Looked up on use so that it follows MAAS_DATA, which tests change.
+        return get_maas_data_path(DHCPv4_STATE_FILE)
+
 
 class DHCPv6Server(DHCPServer):
     """Represents the settings for a DHCPv6 server.
@@ -76,3 +90,8 @@ class DHCPv6Server(DHCPServer):
     config_filename = get_maas_data_path(DHCPv6_CONFIG_FILE)
     dhcp_service = "dhcpd6"
     ipv6 = True
+
+    @property
+    def state_filename(self):
+        # Looked up on use so that it follows MAAS_DATA, which tests change.
+        return get_maas_data_path(DHCPv6_STATE_FILE)
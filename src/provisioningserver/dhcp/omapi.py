@@ -1,5 +1,6 @@
 import base64
 import secrets
+import struct
 
 from pypureomapi import (
     Omapi,
@@ -8,8 +9,14 @@ from pypureomapi import (
     OmapiError,
     OmapiMessage,
     pack_ip,
+    pack_mac,
 )
 
+# The number of OMAPI messages sent before reading their responses. dhcpd
+# answers the messages of a connection in order, but stops reading them when
+# it can't send its responses, so they are read before its buffers fill up.
+PIPELINE_WINDOW = 100
+
 
 def generate_omapi_key() -> str:
     """Generate a base64-encoded key to use for OMAPI access."""
@@ -52,5 +59,84 @@ class OmapiClient:
                 f"Updating IP for host {name.decode('ascii')} to {ip} failed"
             )
 
+    def add_hosts(self, hosts):
+        """Add host mappings for `(mac, ip)` pairs, pipelining the requests."""
+        # These are the messages `Omapi.add_host_supersede` sends.
+        messages = []
+        for mac, ip in hosts:
+            name = self._name_from_mac(mac)
+            statements = 'supersede host-name "%s";' % name.decode("ascii")
+            msg = OmapiMessage.open(b"host")
+            msg.message.append((b"create", struct.pack("!I", 1)))
+            msg.message.append((b"exclusive", struct.pack("!I", 1)))
+            msg.obj.append((b"hardware-address", pack_mac(mac)))
+            msg.obj.append((b"hardware-type", struct.pack("!I", 1)))
+            msg.obj.append((b"ip-address", pack_ip(ip)))
+            msg.obj.append((b"name", name))
+            msg.obj.append((b"statements", statements.encode("ascii")))
+            messages.append(msg)
+        for (mac, ip), resp in zip(hosts, self._pipeline(messages)):
+            if resp.opcode != OMAPI_OP_UPDATE:
+                raise OmapiError(f"Adding host {mac} with IP {ip} failed")
+
+    def del_hosts(self, macs):
+        """Remove the host mappings for MACs, pipelining the requests."""
+        # These are the messages `Omapi.del_host` sends.
+        messages = []
+        for mac in macs:
+            msg = OmapiMessage.open(b"host")
+            msg.obj.append((b"hardware-address", pack_mac(mac)))
+            msg.obj.append((b"hardware-type", struct.pack("!I", 1)))
+            messages.append(msg)
+        handles = []
+        for mac, resp in zip(macs, self._pipeline(messages)):
+            if resp.opcode != OMAPI_OP_UPDATE or resp.handle == 0:
+                raise OmapiError(f"Host not found: {mac}")
+            handles.append(resp.handle)
+        messages = [OmapiMessage.delete(handle) for handle in handles]
+        for mac, resp in zip(macs, self._pipeline(messages)):
+            if resp.opcode != OMAPI_OP_STATUS:
+                raise OmapiError(f"Removing host {mac} failed")
+
+    def update_hosts(self, hosts):
+        """Update the host mappings for `(mac, ip)` pairs, pipelining the
+        requests."""
+        names = [self._name_from_mac(mac) for mac, _ in hosts]
+        messages = []
+        for name in names:
+            msg = OmapiMessage.open(b"host")
+            msg.update_object({b"name": name})
+            messages.append(msg)
+        messages_update = []
+        for name, resp in zip(names, self._pipeline(messages)):
+            if resp.opcode != OMAPI_OP_UPDATE:
+                raise OmapiError(f"Host not found: {name.decode('ascii')}")
+            messages_update.append(OmapiMessage.update(resp.handle))
+        for msg, (_, ip) in zip(messages_update, hosts):
+            msg.update_object({b"ip-address": pack_ip(ip)})
+        resps = self._pipeline(messages_update)
+        for name, (_, ip), resp in zip(names, hosts, resps):
+            if resp.opcode != OMAPI_OP_STATUS:
+                raise OmapiError(
+                    f"Updating IP for host {name.decode('ascii')} to {ip} "
+                    "failed"
+                )
+
+    def _pipeline(self, messages):
+        """Send `messages` over the OMAPI session, and return their responses.
+
+        Messages are sent in batches of `PIPELINE_WINDOW`, reading the
+        responses to a batch once it's sent, so that a batch takes a single
+        round trip rather than one per message.
+        """
+        responses = []
+        for start in range(0, len(messages), PIPELINE_WINDOW):
+            batch = messages[start : start + PIPELINE_WINDOW]
+            for msg in batch:
+                self._omapi.send_message(msg)
+            for msg in batch:
+                responses.append(self._omapi.receive_response(msg))
+        return responses
+
     def _name_from_mac(self, mac: str) -> bytes:
         return mac.replace(":", "-").encode("ascii")
@@ -0,0 +1,95 @@
+# Copyright 2020 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Test helpers related to the DHCP OMAPI."""
+
+from collections import deque
+from itertools import count
+
+from pypureomapi import (
+    OMAPI_OP_DELETE,
+    OMAPI_OP_OPEN,
+    OMAPI_OP_STATUS,
+    OMAPI_OP_UPDATE,
+    OmapiMessage,
+)
+
+
+class FakeOmapi:
+    """A fake `pypureomapi.Omapi` connection to a DHCP server.
+
+    It keeps the host maps of the server in `hosts`, keyed by name, and
+    answers the messages `OmapiClient` sends as dhcpd would. Like dhcpd, it
+    answers the messages of a connection in the order they were sent.
+
+    :ivar round_trips: The number of times the client waited for responses
+        after sending messages.
+    """
+
+    def __init__(self):
+        self.hosts = {}
+        self.round_trips = 0
+        self._handles = {}
+        self._next_handle = count(1)
+        self._responses = deque()
+        self._sending = False
+
+    def send_message(self, message, sign=True):
+        self._sending = True
+        self._responses.append(self._handle(message))
+
+    def receive_response(self, message, insecure=False):
+        if self._sending:
+            self._sending = False
+            self.round_trips += 1
+        response = self._responses.popleft()
+        assert response.rid == message.tid, "Response is out of order."
+        return response
+
+    def _handle(self, message):
+        if message.opcode == OMAPI_OP_OPEN:
+            return self._open(message)
+        elif message.opcode == OMAPI_OP_UPDATE:
+            host = self.hosts.get(self._handles.get(message.handle))
+            if host is None:
+                return self._status(message)
+            host.update(message.obj)
+            return self._status(message)
+        elif message.opcode == OMAPI_OP_DELETE:
+            self.hosts.pop(self._handles.pop(message.handle, None), None)
+            return self._status(message)
+        else:
+            raise AssertionError("Unexpected opcode: %d" % message.opcode)
+
+    def _open(self, message):
+        flags = dict(message.message)
+        obj = dict(message.obj)
+        if b"create" in flags:
+            name = obj[b"name"]
+            if name in self.hosts and b"exclusive" in flags:
+                return self._status(message)
+            self.hosts[name] = obj
+        elif b"name" in obj:
+            name = obj[b"name"]
+        else:
+            name = next(
+                (
+                    name
+                    for name, host in self.hosts.items()
+                    if host[b"hardware-address"] == obj[b"hardware-address"]
+                ),
+                None,
+            )
+        if name not in self.hosts:
+            return self._status(message)
+        handle = next(self._next_handle)
+        self._handles[handle] = name
+        return OmapiMessage(
+            opcode=OMAPI_OP_UPDATE,
+            handle=handle,
+            rid=message.tid,
+            obj=list(self.hosts[name].items()),
+        )
+
+    def _status(self, message):
+        return OmapiMessage(opcode=OMAPI_OP_STATUS, rid=message.tid)
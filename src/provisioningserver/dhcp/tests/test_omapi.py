@@ -10,7 +10,9 @@ from provisioningserver.dhcp.omapi import (
     OmapiClient,
     OmapiError,
     OmapiMessage,
+    PIPELINE_WINDOW,
 )
+from provisioningserver.dhcp.testing.omapi import FakeOmapi
 
 
 class TestGenerateOmapiKey(MAASTestCase):
@@ -92,3 +94,99 @@ class TestOmapiClient(MAASTestCase):
             str(err),
             "Updating IP for host aa-bb-cc-dd-ee-ff to 1.2.3.4 failed",
         )
+
+
+class TestOmapiClientPipelining(MAASTestCase):
+    def setUp(self):
+        super().setUp()
+        self.fake_omapi = FakeOmapi()
+        self.patch(omapi, "Omapi").return_value = self.fake_omapi
+
+    def make_hosts(self, count):
+        return [
+            (
+                "02:00:00:%02x:%02x:%02x"
+                % (i >> 16, (i >> 8) & 0xFF, i & 0xFF),
+                "10.%d.%d.%d" % (i >> 16, (i >> 8) & 0xFF, i & 0xFF),
+            )
+            for i in range(count)
+        ]
+
+    def test_add_hosts(self):
+        cli = OmapiClient("shared-key")
+        cli.add_hosts([("aa:bb:cc:dd:ee:ff", "1.2.3.4")])
+        host = self.fake_omapi.hosts[b"aa-bb-cc-dd-ee-ff"]
+        self.assertEqual(host[b"ip-address"], b"\x01\x02\x03\x04")
+        self.assertEqual(
+            host[b"statements"], b'supersede host-name "aa-bb-cc-dd-ee-ff";'
+        )
+
+    def test_add_hosts_error(self):
+        cli = OmapiClient("shared-key")
+        cli.add_hosts([("aa:bb:cc:dd:ee:ff", "1.2.3.4")])
+        err = self.assertRaises(
+            OmapiError,
+            cli.add_hosts,
+            [("aa:bb:cc:dd:ee:ff", "1.2.3.5")],
+        )
+        self.assertEqual(
+            str(err), "Adding host aa:bb:cc:dd:ee:ff with IP 1.2.3.5 failed"
+        )
+
+    def test_del_hosts(self):
+        cli = OmapiClient("shared-key")
+        cli.add_hosts(
+            [
+                ("aa:bb:cc:dd:ee:ff", "1.2.3.4"),
+                ("aa:bb:cc:dd:ee:00", "1.2.3.5"),
+            ]
+        )
+        cli.del_hosts(["aa:bb:cc:dd:ee:ff"])
+        self.assertEqual([b"aa-bb-cc-dd-ee-00"], list(self.fake_omapi.hosts))
+
+    def test_del_hosts_not_found(self):
+        cli = OmapiClient("shared-key")
+        err = self.assertRaises(
+            OmapiError, cli.del_hosts, ["aa:bb:cc:dd:ee:ff"]
+        )
+        self.assertEqual(str(err), "Host not found: aa:bb:cc:dd:ee:ff")
+
+    def test_update_hosts(self):
+        cli = OmapiClient("shared-key")
+        cli.add_hosts([("aa:bb:cc:dd:ee:ff", "1.2.3.4")])
+        cli.update_hosts([("aa:bb:cc:dd:ee:ff", "1.2.3.5")])
+        self.assertEqual(
+            self.fake_omapi.hosts[b"aa-bb-cc-dd-ee-ff"][b"ip-address"],
+            b"\x01\x02\x03\x05",
+        )
+
+    def test_update_hosts_not_found(self):
+        cli = OmapiClient("shared-key")
+        err = self.assertRaises(
+            OmapiError,
+            cli.update_hosts,
+            [("aa:bb:cc:dd:ee:ff", "1.2.3.4")],
+        )
+        self.assertEqual(str(err), "Host not found: aa-bb-cc-dd-ee-ff")
+
+    def test_pipelines_many_host_changes(self):
+        # 10k host changes take a round trip per batch of messages, rather
+        # than one or two per host.
+        hosts = self.make_hosts(10000)
+        rounds = len(hosts) // PIPELINE_WINDOW
+        cli = OmapiClient("shared-key")
+        cli.add_hosts(hosts)
+        self.assertEqual(rounds, self.fake_omapi.round_trips)
+        self.assertEqual(len(hosts), len(self.fake_omapi.hosts))
+        self.fake_omapi.round_trips = 0
+        cli.update_hosts(
+            [
+                (mac, "172.16.%d.%d" % divmod(i, 256))
+                for i, (mac, _) in enumerate(hosts)
+            ]
+        )
+        self.assertEqual(rounds * 2, self.fake_omapi.round_trips)
+        self.fake_omapi.round_trips = 0
+        cli.del_hosts([mac for mac, _ in hosts])
+        self.assertEqual(rounds * 2, self.fake_omapi.round_trips)
+        self.assertEqual({}, self.fake_omapi.hosts)
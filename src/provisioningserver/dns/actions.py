@@ -9,6 +9,7 @@ from time import sleep
 
 from provisioningserver.dns.config import (
     DNSConfig,
+    execute_nsupdate,
     execute_rndc_command,
     set_up_options_conf,
 )
@@ -61,14 +62,16 @@ def bind_reload_with_retries(attempts=10, interval=2, timeout=2):
 
     :param attempts: The number of attempts.
     :param interval: The time in seconds to sleep between each attempt.
+    :return: True if success, False otherwise.
     """
     for countdown in range(attempts - 1, -1, -1):
         if bind_reload(timeout=timeout):
-            break
+            return True
         if countdown == 0:
             break
         else:
             sleep(interval)
+    return False
 
 
 def bind_reload_zones(zone_list):
@@ -92,7 +95,129 @@ def bind_reload_zones(zone_list):
     return ret
 
 
-def bind_write_configuration(zones, trusted_networks):
+def bind_freeze_zones(zone_list=None):
+    """Ask BIND to stop accepting dynamic updates to the given zones, so that
+    their zone files can be rewritten.  This operation is 'best effort' (with
+    logging), like `bind_reload_zones`.
+
+    :param zone_list: A list of zone names to freeze, or a single name as a
+        string.  If None, all zones are frozen.
+    :return: True if success, False otherwise.
+    """
+    return _execute_rndc_zone_command("freeze", zone_list)
+
+
+def bind_thaw_zones(zone_list=None):
+    """Ask BIND to reload the files of the given frozen zones, and to accept
+    dynamic updates to them again.  This operation is 'best effort' (with
+    logging), like `bind_reload_zones`.
+
+    :param zone_list: A list of zone names to thaw, or a single name as a
+        string.  If None, all zones are thawed.
+    :return: True if success, False otherwise.
+    """
+    return _execute_rndc_zone_command("thaw", zone_list)
+
+
+def _execute_rndc_zone_command(command, zone_list):
+    if zone_list is None:
+        try:
+            execute_rndc_command((command,))
+        except CalledProcessError as exc:
+            maaslog.error(
+                "Running BIND %s failed (is it running?): %s", command, exc
+            )
+            return False
+        return True
+    ret = True
+    if not isinstance(zone_list, list):
+        zone_list = [zone_list]
+    for name in zone_list:
+        try:
+            execute_rndc_command((command, name))
+        except CalledProcessError as exc:
+            maaslog.error(
+                "Running BIND %s for zone %r failed (is it running?): %s",
+                command,
+                name,
+                exc,
+            )
+            ret = False
+    return ret
+
+
+def compose_nsupdate_commands(previous, current):
+    """Return the `nsupdate` commands that turn one publication of a zone
+    into the next.
+
+    The update only applies if BIND is still serving `previous`, so that an
+    update which was lost, or a zone file which was rewritten behind our
+    back, is not papered over.
+
+    :param previous: The `ZoneRecords` of the zone as BIND serves it.
+    :param current: The `ZoneRecords` of the zone as it should be.
+    :return: A list of commands, or None if the change cannot be made with a
+        dynamic update and the zone file must be rewritten instead.
+    """
+    if previous.origin != current.origin or previous.static != current.static:
+        return None
+    commands = [
+        "zone %s" % current.origin,
+        "prereq yxrrset %s SOA %s" % (previous.origin, previous.soa),
+    ]
+    for name, _, rrtype, rrdata in sorted(
+        previous.records - current.records, key=str
+    ):
+        commands.append("update delete %s IN %s %s" % (name, rrtype, rrdata))
+    for name, ttl, rrtype, rrdata in sorted(
+        current.records - previous.records, key=str
+    ):
+        if ttl is None:
+            ttl = current.ttl
+        commands.append(
+            "update add %s %s IN %s %s" % (name, ttl, rrtype, rrdata)
+        )
+    commands.append(
+        "update add %s %s IN SOA %s"
+        % (current.origin, current.ttl, current.soa)
+    )
+    commands.append("send")
+    return commands
+
+
+def bind_update_zone(previous, current, timeout=2):
+    """Ask BIND to apply the changes between two publications of a zone with
+    a dynamic update.  This operation is 'best effort' (with logging); the
+    caller should rewrite the zone file if it fails.
+
+    :param previous: The `ZoneRecords` of the zone as BIND serves it.
+    :param current: The `ZoneRecords` of the zone as it should be.
+    :return: True if success, False otherwise.
+    """
+    commands = compose_nsupdate_commands(previous, current)
+    if commands is None:
+        return False
+    try:
+        execute_nsupdate(commands, timeout=timeout)
+    except CalledProcessError as exc:
+        maaslog.error("Updating BIND zone %r failed: %s", current.origin, exc)
+        return False
+    except TimeoutExpired as exc:
+        maaslog.error(
+            "Updating BIND zone %r timed out: %s", current.origin, exc
+        )
+        return False
+    except OSError as exc:
+        maaslog.error(
+            "Updating BIND zone %r failed (is nsupdate installed?): %s",
+            current.origin,
+            exc,
+        )
+        return False
+    return True
+
+
+def bind_write_configuration(zones, trusted_networks, dynamic_updates=False):
     """Write BIND's configuration.
 
     :param zones: Those zones to include in main config.
@@ -100,6 +225,9 @@ def bind_write_configuration(zones, trusted_networks):
 
     :param trusted_networks: A sequence of CIDR network specifications that
         are permitted to use the DNS server as a forwarder.
+
+    :param dynamic_updates: Whether MAAS may update the zones with dynamic
+        updates, see `bind_update_zones`.
     """
     # trusted_networks was formerly specified as a single IP address with
     # netmask. These assertions are here to prevent code that assumes that
@@ -108,7 +236,9 @@ def bind_write_configuration(zones, trusted_networks):
     assert isinstance(trusted_networks, Sequence)
 
     dns_config = DNSConfig(zones=zones)
-    dns_config.write_config(trusted_networks=trusted_networks)
+    dns_config.write_config(
+        trusted_networks=trusted_networks, dynamic_updates=dynamic_updates
+    )
 
 
 def bind_write_options(upstream_dns, dnssec_validation):
@@ -127,11 +257,68 @@ def bind_write_options(upstream_dns, dnssec_validation):
     )
 
 
-def bind_write_zones(zones):
+def bind_write_zones(zones, zone_digests=None, zone_records=None):
     """Write out DNS zones.
 
     :param zones: Those zones to write.
     :type zones: Sequence of :py:class:`DomainData`.
+    :param zone_digests: Optional dict of the digests of previously written
+        zones, keyed by zone name.  When given, only zones whose content has
+        changed are written, and the dict is updated accordingly.
+    :param zone_records: Optional dict which is updated to map the name of
+        each written zone to its `ZoneRecords`.
+    :return: A list of the names of the zones that were written.
+    """
+    written = []
+    for zone in zones:
+        written.extend(
+            zone.write_config(
+                zone_digests=zone_digests, zone_records=zone_records
+            )
+        )
+    return written
+
+
+def bind_update_zones(zones, zone_records, timeout=2):
+    """Bring DNS zones that BIND already serves up to date, using dynamic
+    updates where possible.
+
+    Zones whose records have changed are sent a dynamic update.  If that is
+    not possible, or fails, the zone is frozen and its zone file rewritten
+    and reloaded instead.  The zones must have been configured to accept
+    dynamic updates, see `bind_write_configuration`.
+
+    :param zones: Those zones to update.
+    :type zones: Sequence of :py:class:`DomainData`.
+    :param zone_records: Dict of the `ZoneRecords` that BIND serves, keyed by
+        zone name.  It is updated accordingly.
+    :return: A list of the names of the zones that were changed.
     """
+    changed = []
     for zone in zones:
-        zone.write_config()
+        rewrite = []
+        for zone_name, current in zone.get_zone_records().items():
+            previous = zone_records.get(zone_name)
+            if previous is not None and (
+                previous.static == current.static
+                and previous.records == current.records
+            ):
+                continue
+            changed.append(zone_name)
+            if previous is not None and bind_update_zone(
+                previous, current, timeout=timeout
+            ):
+                zone_records[zone_name] = current
+            else:
+                rewrite.append(zone_name)
+        if len(rewrite) > 0:
+            # BIND must not write its journal to a zone file that is being
+            # rewritten, so freeze those zones first.  Thawing them reloads
+            # the new zone files.
+            bind_freeze_zones(rewrite)
+            zone.write_config(zone_records=zone_records, zone_names=rewrite)
+            if not bind_thaw_zones(rewrite):
+                # Rewrite them again next time.
+                for zone_name in rewrite:
+                    zone_records.pop(zone_name, None)
+    return changed
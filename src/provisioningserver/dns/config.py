@@ -12,6 +12,7 @@ import os
 import os.path
 import re
 import sys
+from tempfile import NamedTemporaryFile
 
 from provisioningserver.logger import get_maas_logger
 from provisioningserver.utils import load_template, locate_config
@@ -58,6 +59,12 @@ def get_dns_rndc_port():
     return int(setting)
 
 
+def get_dns_server_port():
+    """Port on which BIND answers queries and dynamic updates for MAAS."""
+    setting = os.getenv("MAAS_DNS_SERVER_PORT", "53")
+    return int(setting)
+
+
 def get_dns_default_controls():
     """Include the default RNDC controls (default RNDC key on port 953)?"""
     if running_in_snap():
@@ -181,6 +188,46 @@ def execute_rndc_command(arguments, timeout=None):
     call_and_check(rndc_cmd, timeout=timeout)
 
 
+def get_rndc_key():
+    """Return the key with which MAAS controls BIND.
+
+    The same key is allowed to make dynamic updates to MAAS' zones.
+
+    :return: A `(algorithm, name, secret)` tuple.
+    """
+    with open(get_rndc_conf_path(), "r", encoding="ascii") as fd:
+        rndc_content = fd.read()
+    match = re.search(
+        r'key\s+"([^"]+)"\s*{\s*algorithm\s+([\w-]+)\s*;'
+        r'\s*secret\s+"([^"]+)"\s*;',
+        rndc_content,
+    )
+    if match is None:
+        raise ValueError("No key found in %s." % get_rndc_conf_path())
+    name, algorithm, secret = match.groups()
+    return algorithm, name, secret
+
+
+def execute_nsupdate(commands, timeout=None):
+    """Send a dynamic update to the local BIND server with `nsupdate`.
+
+    :param commands: A sequence of `nsupdate` commands, one per line,
+        without the `server` and `key` commands, which are added here.
+    """
+    algorithm, name, secret = get_rndc_key()
+    lines = [
+        "server 127.0.0.1 %d" % get_dns_server_port(),
+        "key %s:%s %s" % (algorithm, name, secret),
+    ]
+    lines.extend(commands)
+    # The script holds the key's secret so it must not be passed on the
+    # command line; NamedTemporaryFile creates it readable only by us.
+    with NamedTemporaryFile("w", encoding="ascii", suffix=".nsupdate") as fd:
+        fd.write("\n".join(lines) + "\n")
+        fd.flush()
+        call_and_check(["nsupdate", fd.name], timeout=timeout)
+
+
 def set_up_options_conf(overwrite=True, **kwargs):
     """Write out the named.conf.options.inside.maas file.
 
@@ -301,13 +348,19 @@ class DNSConfig:
             does not exist.
         """
         trusted_networks = kwargs.pop("trusted_networks", "")
+        dynamic_updates = kwargs.pop("dynamic_updates", False)
         context = {
             "zones": self.zones,
             "DNS_CONFIG_DIR": get_dns_config_dir(),
             "named_rndc_conf_path": get_named_rndc_conf_path(),
             "trusted_networks": trusted_networks,
+            "dynamic_updates": dynamic_updates,
             "modified": str(datetime.today()),
         }
+        if dynamic_updates:
+            # Dynamic updates are made with the key that controls BIND, see
+            # `execute_nsupdate`.
+            _, context["rndc_key_name"], _ = get_rndc_key()
         content = render_dns_template(self.template_file_name, kwargs, context)
         # The rendered configuration is Unicode text but should contain only
         # ASCII characters. Non-ASCII records should have been treated using
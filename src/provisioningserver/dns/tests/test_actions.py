@@ -12,12 +12,27 @@ from subprocess import CalledProcessError
 from textwrap import dedent
 from unittest.mock import call, sentinel
 
+import dns.name
+import dns.rdata
+import dns.rdataclass
+import dns.rdatatype
+import dns.zone
 from fixtures import FakeLogger
-from netaddr import IPNetwork
-from testtools.matchers import AllMatch, Contains, FileContains, FileExists
+from netaddr import IPNetwork, IPRange
+from testtools.matchers import (
+    AllMatch,
+    Contains,
+    FileContains,
+    FileExists,
+    HasLength,
+)
 
 from maastesting.factory import factory
-from maastesting.matchers import MockCalledOnceWith, MockCallsMatch
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockCallsMatch,
+    MockNotCalled,
+)
 from maastesting.testcase import MAASTestCase
 from provisioningserver.dns import actions
 from provisioningserver.dns.config import (
@@ -25,10 +40,14 @@ from provisioningserver.dns.config import (
     MAAS_NAMED_CONF_OPTIONS_INSIDE_NAME,
 )
 from provisioningserver.dns.testing import patch_dns_config_path
-from provisioningserver.dns.tests.test_zoneconfig import HostnameIPMapping
+from provisioningserver.dns.tests.test_zoneconfig import (
+    HostnameIPMapping,
+    HostnameRRsetMapping,
+)
 from provisioningserver.dns.zoneconfig import (
     DNSForwardZoneConfig,
     DNSReverseZoneConfig,
+    ZoneRecords,
 )
 from provisioningserver.utils.shell import ExternalProcessError
 
@@ -108,10 +127,16 @@ class TestReloadWithRetries(MAASTestCase):
             bind_reload_return_values.pop(0)
         )
 
-        actions.bind_reload_with_retries(attempts=5)
+        self.assertTrue(actions.bind_reload_with_retries(attempts=5))
         expected_calls = [call(timeout=2), call(timeout=2), call(timeout=2)]
         self.assertThat(actions.bind_reload, MockCallsMatch(*expected_calls))
 
+    def test_returns_false_on_failure(self):
+        self.patch_autospec(actions, "sleep")  # Disable.
+        bind_reload = self.patch_autospec(actions, "bind_reload")
+        bind_reload.return_value = False
+        self.assertFalse(actions.bind_reload_with_retries(attempts=3))
+
     def test_sleeps_interval_seconds_between_attempts(self):
         self.patch_autospec(actions, "sleep")  # Disable.
         bind_reload = self.patch_autospec(actions, "bind_reload")
@@ -152,6 +177,345 @@ class TestReloadZone(MAASTestCase):
         self.assertFalse(actions.bind_reload_zones(sentinel.zone))
 
 
+class TestFreezeThawZones(MAASTestCase):
+    """Tests for `actions.bind_freeze_zones` and `actions.bind_thaw_zones`."""
+
+    scenarios = (
+        ("freeze", {"command": "freeze", "func": "bind_freeze_zones"}),
+        ("thaw", {"command": "thaw", "func": "bind_thaw_zones"}),
+    )
+
+    def test_executes_rndc_command_for_all_zones(self):
+        self.patch_autospec(actions, "execute_rndc_command")
+        self.assertTrue(getattr(actions, self.func)())
+        self.assertThat(
+            actions.execute_rndc_command, MockCalledOnceWith((self.command,))
+        )
+
+    def test_executes_rndc_command_for_each_zone(self):
+        self.patch_autospec(actions, "execute_rndc_command")
+        self.assertTrue(
+            getattr(actions, self.func)([sentinel.zone1, sentinel.zone2])
+        )
+        self.assertThat(
+            actions.execute_rndc_command,
+            MockCallsMatch(
+                call((self.command, sentinel.zone1)),
+                call((self.command, sentinel.zone2)),
+            ),
+        )
+
+    def test_logs_subprocess_error(self):
+        erc = self.patch_autospec(actions, "execute_rndc_command")
+        erc.side_effect = factory.make_CalledProcessError()
+        with FakeLogger("maas") as logger:
+            self.assertFalse(getattr(actions, self.func)(sentinel.zone))
+        self.assertDocTestMatches(
+            "Running BIND %s for zone ... failed (is it running?): "
+            "Command ... returned non-zero exit status ..." % self.command,
+            logger.output,
+        )
+
+
+def make_zone_records(records=(), serial=None, static="static"):
+    return ZoneRecords(
+        origin="example.com.",
+        serial=randint(1, 100) if serial is None else serial,
+        domain="example.com",
+        ttl=30,
+        static=static,
+        records=records,
+    )
+
+
+def apply_nsupdate_commands(records, commands):
+    """Apply the record changes in `nsupdate` commands to a set of records."""
+    records = set(records)
+    for command in commands:
+        if command.startswith("update delete "):
+            name, _, rrtype, rrdata = command.split(None, 5)[2:]
+            records = {
+                record
+                for record in records
+                if (record[0], record[2], record[3]) != (name, rrtype, rrdata)
+            }
+        elif command.startswith("update add ") and " SOA " not in command:
+            name, ttl, _, rrtype, rrdata = command.split(None, 6)[2:]
+            records.add((name, int(ttl), rrtype, rrdata))
+    return records
+
+
+class TestComposeNsupdateCommands(MAASTestCase):
+    """Tests for `actions.compose_nsupdate_commands`."""
+
+    def make_record(self, rrtype="A"):
+        name = "%s.example.com." % factory.make_name("host")
+        if rrtype == "A":
+            rrdata = factory.make_ipv4_address()
+        else:
+            rrdata = '"%s"' % factory.make_name("text")
+        return name, randint(10, 100), rrtype, rrdata
+
+    def test_returns_none_if_static_content_changed(self):
+        self.assertIsNone(
+            actions.compose_nsupdate_commands(
+                make_zone_records(static="old"),
+                make_zone_records(static="new"),
+            )
+        )
+
+    def test_requires_previous_soa_and_updates_soa(self):
+        previous = make_zone_records(serial=1)
+        current = make_zone_records(serial=2)
+        commands = actions.compose_nsupdate_commands(previous, current)
+        self.assertEqual(
+            [
+                "zone example.com.",
+                "prereq yxrrset example.com. SOA %s" % previous.soa,
+                "update add example.com. 30 IN SOA %s" % current.soa,
+                "send",
+            ],
+            commands,
+        )
+
+    def test_turns_previous_records_into_current(self):
+        kept = {self.make_record() for _ in range(3)}
+        removed = {self.make_record("TXT") for _ in range(3)}
+        added = {self.make_record() for _ in range(3)}
+        previous = make_zone_records(kept | removed)
+        current = make_zone_records(kept | added)
+        commands = actions.compose_nsupdate_commands(previous, current)
+        self.assertEqual(
+            kept | added, apply_nsupdate_commands(previous.records, commands)
+        )
+        # Only the changes are sent.
+        self.assertThat(commands, HasLength(2 + 3 + 3 + 2))
+
+
+def load_zone_file(path, zone_name):
+    """Parse a zone file with dnspython.
+
+    Names are kept relative to the zone's origin, whether they were written
+    fully qualified or not.
+    """
+    with open(path, "r") as stream:
+        return dns.zone.from_text(stream.read(), origin=zone_name)
+
+
+def get_zone_rrs(zone):
+    """Return the resource records of a parsed zone, as text."""
+    return {
+        (
+            name.derelativize(zone.origin).to_text(),
+            ttl,
+            dns.rdatatype.to_text(rdata.rdtype),
+            rdata.to_text(origin=zone.origin, relativize=False),
+        )
+        for name, ttl, rdata in zone.iterate_rdatas()
+    }
+
+
+def apply_nsupdate_commands_to_zone(zone, commands):
+    """Apply `nsupdate` commands to a parsed zone, as BIND would.
+
+    Fails if the zone doesn't meet the update's prerequisites.
+    """
+
+    def parse(name, rrtype, rrdata):
+        # Relative to the zone's origin, like the parsed zone.
+        name = dns.name.from_text(name).relativize(zone.origin)
+        rdtype = dns.rdatatype.from_text(rrtype)
+        rdata = dns.rdata.from_text(
+            dns.rdataclass.IN,
+            rdtype,
+            " ".join(rrdata),
+            origin=zone.origin,
+            relativize=True,
+        )
+        return name, rdtype, rdata
+
+    for command in commands:
+        words = command.split()
+        if words[0] == "zone":
+            assert dns.name.from_text(words[1]) == zone.origin, command
+        elif words[:2] == ["prereq", "yxrrset"]:
+            name, rdtype, rdata = parse(words[2], words[3], words[4:])
+            rdataset = zone.get_rdataset(name, rdtype)
+            assert rdataset is not None, command
+            assert set(rdataset) == {rdata}, command
+        elif words[:2] == ["update", "delete"]:
+            name, rdtype, rdata = parse(words[2], words[4], words[5:])
+            rdataset = zone.get_rdataset(name, rdtype)
+            if rdataset is not None:
+                rdataset.discard(rdata)
+                if len(rdataset) == 0:
+                    zone.delete_rdataset(name, rdtype)
+        elif words[:2] == ["update", "add"]:
+            name, rdtype, rdata = parse(words[2], words[5], words[6:])
+            if rdtype == dns.rdatatype.SOA:
+                # The SOA record is replaced, not added to.
+                zone.delete_rdataset(name, rdtype)
+            rdataset = zone.find_rdataset(name, rdtype, create=True)
+            rdataset.add(rdata)
+            # The TTL of an RRset follows that of the last record added.
+            rdataset.ttl = int(words[3])
+        else:
+            assert words == ["send"], command
+
+
+class TestNsupdateEquivalence(MAASTestCase):
+    """Tests that applying the output of `actions.compose_nsupdate_commands`
+    to a zone file gives the same zone as rewriting it.
+
+    The zone files are parsed with dnspython, so this catches differences in
+    how records and the SOA are written, not only in which records change.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.dns_conf_dir = self.make_dir()
+        patch_dns_config_path(self, self.dns_conf_dir)
+
+    def write_zone(self, zone, zone_name):
+        """Write `zone`, returning its parsed zone file and `ZoneRecords`."""
+        zone_records = {}
+        actions.bind_write_zones([zone], zone_records=zone_records)
+        parsed = load_zone_file(
+            join(self.dns_conf_dir, "zone.%s" % zone_name), zone_name
+        )
+        return parsed, zone_records[zone_name]
+
+    def assertUpdateMatchesRewrite(self, previous_zone, current_zone, name):
+        previous, previous_records = self.write_zone(previous_zone, name)
+        current, current_records = self.write_zone(current_zone, name)
+        commands = actions.compose_nsupdate_commands(
+            previous_records, current_records
+        )
+        self.assertIsNotNone(commands)
+        apply_nsupdate_commands_to_zone(previous, commands)
+        self.assertEqual(get_zone_rrs(current), get_zone_rrs(previous))
+
+    def test_forward_zone(self):
+        domain = "%s.example.com" % factory.make_name("domain")
+        hostnames = [factory.make_name("host") for _ in range(4)]
+        ips = [factory.make_ipv4_address() for _ in range(4)]
+        mapping = {
+            hostnames[0]: HostnameIPMapping(None, 30, {ips[0]}),
+            hostnames[1]: HostnameIPMapping(None, 30, {ips[1]}),
+            hostnames[2]: HostnameIPMapping(None, None, {ips[2]}),
+        }
+        other_mapping = {
+            hostnames[0]: HostnameRRsetMapping(
+                None, {(None, "MX", "10 %s" % hostnames[1])}
+            ),
+            hostnames[1]: HostnameRRsetMapping(
+                None, {(60, "TXT", '"%s"' % factory.make_name("text"))}
+            ),
+        }
+        previous_zone = DNSForwardZoneConfig(
+            domain,
+            serial=random.randint(1, 100),
+            mapping=mapping,
+            other_mapping=other_mapping,
+        )
+        # One address is removed, one gets a new TTL and one is added.
+        # One MX record is replaced and a CNAME added.
+        mapping = {
+            hostnames[0]: HostnameIPMapping(None, 30, {ips[0]}),
+            hostnames[1]: HostnameIPMapping(None, 60, {ips[1]}),
+            hostnames[3]: HostnameIPMapping(None, None, {ips[3]}),
+        }
+        other_mapping = {
+            hostnames[0]: HostnameRRsetMapping(
+                None, {(None, "MX", "20 %s" % hostnames[3])}
+            ),
+            hostnames[1]: other_mapping[hostnames[1]],
+            factory.make_name("alias"): HostnameRRsetMapping(
+                None, {(None, "CNAME", hostnames[0])}
+            ),
+        }
+        current_zone = DNSForwardZoneConfig(
+            domain,
+            serial=random.randint(101, 200),
+            mapping=mapping,
+            other_mapping=other_mapping,
+        )
+        self.assertUpdateMatchesRewrite(previous_zone, current_zone, domain)
+
+    def test_reverse_zone_with_generate_directives(self):
+        domain = "%s.example.com" % factory.make_name("domain")
+        network = IPNetwork("192.168.0.0/24")
+        dynamic_ranges = [IPRange("192.168.0.200", "192.168.0.250")]
+        hostnames = [factory.make_name("host") for _ in range(3)]
+        mapping = {
+            hostnames[0]: HostnameIPMapping(None, 30, {"192.168.0.10"}),
+            hostnames[1]: HostnameIPMapping(None, 30, {"192.168.0.11"}),
+        }
+        previous_zone = DNSReverseZoneConfig(
+            domain,
+            serial=random.randint(1, 100),
+            network=network,
+            dynamic_ranges=dynamic_ranges,
+            mapping=mapping,
+        )
+        mapping = {
+            hostnames[0]: HostnameIPMapping(None, 30, {"192.168.0.10"}),
+            hostnames[2]: HostnameIPMapping(None, 30, {"192.168.0.11"}),
+        }
+        current_zone = DNSReverseZoneConfig(
+            domain,
+            serial=random.randint(101, 200),
+            network=network,
+            dynamic_ranges=dynamic_ranges,
+            mapping=mapping,
+        )
+        self.assertUpdateMatchesRewrite(
+            previous_zone, current_zone, "0.168.192.in-addr.arpa"
+        )
+
+
+class TestUpdateZone(MAASTestCase):
+    """Tests for `actions.bind_update_zone`."""
+
+    def test_executes_nsupdate(self):
+        self.patch_autospec(actions, "execute_nsupdate")
+        previous = make_zone_records(serial=1)
+        current = make_zone_records(serial=2)
+        self.assertTrue(actions.bind_update_zone(previous, current))
+        self.assertThat(
+            actions.execute_nsupdate,
+            MockCalledOnceWith(
+                actions.compose_nsupdate_commands(previous, current),
+                timeout=2,
+            ),
+        )
+
+    def test_false_if_update_not_possible(self):
+        self.patch_autospec(actions, "execute_nsupdate")
+        self.assertFalse(
+            actions.bind_update_zone(
+                make_zone_records(static="old"),
+                make_zone_records(static="new"),
+            )
+        )
+        self.assertThat(actions.execute_nsupdate, MockNotCalled())
+
+    def test_logs_subprocess_error(self):
+        execute_nsupdate = self.patch_autospec(actions, "execute_nsupdate")
+        execute_nsupdate.side_effect = factory.make_CalledProcessError()
+        with FakeLogger("maas") as logger:
+            self.assertFalse(
+                actions.bind_update_zone(
+                    make_zone_records(), make_zone_records()
+                )
+            )
+        self.assertDocTestMatches(
+            "Updating BIND zone 'example.com.' failed: "
+            "Command ... returned non-zero exit status ...",
+            logger.output,
+        )
+
+
 class TestConfiguration(MAASTestCase):
     """Tests for the `bind_write_*` functions."""
 
@@ -234,6 +598,130 @@ class TestConfiguration(MAASTestCase):
         ]
         self.assertThat(expected_files, AllMatch(FileExists()))
 
+    def test_bind_write_zones_skips_unchanged_zones(self):
+        domain = factory.make_string()
+        network = IPNetwork("192.168.0.3/24")
+        ip = factory.pick_ip_in_network(network)
+        ttl = random.randint(10, 1000)
+        mapping = {factory.make_string(): HostnameIPMapping(None, ttl, {ip})}
+        forward_zone = DNSForwardZoneConfig(
+            domain, serial=random.randint(1, 100), mapping=mapping
+        )
+        reverse_zone = DNSReverseZoneConfig(
+            domain, serial=random.randint(1, 100), network=network
+        )
+        zone_digests = {}
+        written = actions.bind_write_zones(
+            zones=[forward_zone, reverse_zone], zone_digests=zone_digests
+        )
+        self.assertEqual([domain, "0.168.192.in-addr.arpa"], written)
+        self.assertCountEqual(written, zone_digests)
+
+        mapping[factory.make_string()] = HostnameIPMapping(
+            None, ttl, {factory.pick_ip_in_network(network)}
+        )
+        forward_zone = DNSForwardZoneConfig(
+            domain, serial=random.randint(101, 200), mapping=mapping
+        )
+        reverse_zone = DNSReverseZoneConfig(
+            domain, serial=random.randint(101, 200), network=network
+        )
+        written = actions.bind_write_zones(
+            zones=[forward_zone, reverse_zone], zone_digests=zone_digests
+        )
+        self.assertEqual([domain], written)
+
+    def test_bind_write_configuration_allows_dynamic_updates(self):
+        domain = factory.make_string()
+        zones = [DNSForwardZoneConfig(domain, serial=random.randint(1, 100))]
+        actions.bind_write_configuration(
+            zones=zones, trusted_networks=[], dynamic_updates=True
+        )
+        self.assertThat(
+            os.path.join(self.dns_conf_dir, MAAS_NAMED_CONF_NAME),
+            FileContains(matcher=Contains("update-policy")),
+        )
+
+    def test_bind_update_zones_sends_dynamic_updates(self):
+        self.patch_autospec(actions, "bind_update_zone").return_value = True
+        domain = factory.make_string()
+        ttl = random.randint(10, 1000)
+        mapping = {
+            factory.make_string(): HostnameIPMapping(
+                None, ttl, {factory.make_ipv4_address()}
+            )
+        }
+        zone_records = {}
+        forward_zone = DNSForwardZoneConfig(
+            domain, serial=random.randint(1, 100), mapping=mapping
+        )
+        actions.bind_write_zones([forward_zone], zone_records=zone_records)
+        previous = zone_records[domain]
+
+        mapping[factory.make_string()] = HostnameIPMapping(
+            None, ttl, {factory.make_ipv4_address()}
+        )
+        forward_zone = DNSForwardZoneConfig(
+            domain, serial=random.randint(101, 200), mapping=mapping
+        )
+        write_zone_file = self.patch(forward_zone, "write_zone_file")
+        self.assertEqual(
+            [domain], actions.bind_update_zones([forward_zone], zone_records)
+        )
+        current = forward_zone.get_zone_records()[domain]
+        self.assertThat(
+            actions.bind_update_zone,
+            MockCalledOnceWith(previous, current, timeout=2),
+        )
+        self.assertEqual({domain: current}, zone_records)
+        self.assertThat(write_zone_file, MockNotCalled())
+
+    def test_bind_update_zones_skips_unchanged_zones(self):
+        self.patch_autospec(actions, "bind_update_zone")
+        domain = factory.make_string()
+        zone_records = {}
+        forward_zone = DNSForwardZoneConfig(
+            domain, serial=random.randint(1, 100)
+        )
+        actions.bind_write_zones([forward_zone], zone_records=zone_records)
+        forward_zone = DNSForwardZoneConfig(
+            domain, serial=random.randint(101, 200)
+        )
+        self.assertEqual(
+            [], actions.bind_update_zones([forward_zone], zone_records)
+        )
+        self.assertThat(actions.bind_update_zone, MockNotCalled())
+
+    def test_bind_update_zones_rewrites_frozen_zone_if_update_fails(self):
+        self.patch_autospec(actions, "bind_update_zone").return_value = False
+        network = IPNetwork("192.168.0.0/24")
+        domain = factory.make_string()
+        zone_records = {}
+        reverse_zone = DNSReverseZoneConfig(
+            domain, serial=random.randint(1, 100), network=network
+        )
+        actions.bind_write_zones([reverse_zone], zone_records=zone_records)
+        reverse_zone = DNSReverseZoneConfig(
+            domain,
+            serial=random.randint(101, 200),
+            network=network,
+            mapping={
+                factory.make_string(): HostnameIPMapping(
+                    None, 30, {factory.pick_ip_in_network(network)}
+                )
+            },
+        )
+        zone_name = "0.168.192.in-addr.arpa"
+        changed = actions.bind_update_zones([reverse_zone], zone_records)
+        self.assertEqual([zone_name], changed)
+        self.assertThat(
+            actions.execute_rndc_command,
+            MockCallsMatch(
+                call(("freeze", zone_name)), call(("thaw", zone_name))
+            ),
+        )
+        self.assertEqual(reverse_zone.get_zone_records(), zone_records)
+
     def test_bind_write_options_sets_up_config(self):
         # bind_write_configuration_and_zones writes the config file, writes
         # the zone files, and reloads the dns service.
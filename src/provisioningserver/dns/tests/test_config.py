@@ -40,9 +40,11 @@ from provisioningserver.dns.config import (
     DNSConfig,
     DNSConfigDirectoryMissing,
     DNSConfigFail,
+    execute_nsupdate,
     execute_rndc_command,
     extract_suggested_named_conf,
     generate_rndc,
+    get_rndc_key,
     MAAS_NAMED_CONF_NAME,
     MAAS_NAMED_CONF_OPTIONS_INSIDE_NAME,
     MAAS_NAMED_RNDC_CONF_NAME,
@@ -154,6 +156,17 @@ class TestHelpers(MAASTestCase):
         self.useFixture(EnvironmentVariable("MAAS_DNS_RNDC_PORT", "%d" % port))
         self.assertEqual(port, config.get_dns_rndc_port())
 
+    def test_get_dns_server_port_defaults_to_53(self):
+        self.useFixture(EnvironmentVariable("MAAS_DNS_SERVER_PORT"))
+        self.assertEqual(53, config.get_dns_server_port())
+
+    def test_get_dns_server_port_checks_environ_first(self):
+        port = factory.pick_port()
+        self.useFixture(
+            EnvironmentVariable("MAAS_DNS_SERVER_PORT", "%d" % port)
+        )
+        self.assertEqual(port, config.get_dns_server_port())
+
     def test_get_dns_default_controls_defaults_to_affirmative(self):
         self.useFixture(EnvironmentVariable("MAAS_DNS_DEFAULT_CONTROLS"))
         self.assertTrue(config.get_dns_default_controls())
@@ -309,6 +322,49 @@ class TestRNDCUtilities(MAASTestCase):
         self.assertEqual((expected_command,), recorder.calls[0][0])
         self.assertEqual({"timeout": sentinel.timeout}, recorder.calls[0][1])
 
+    def test_get_rndc_key_reads_key_from_rndc_conf(self):
+        patch_dns_config_path(self)
+        set_up_rndc()
+        algorithm, name, secret = get_rndc_key()
+        self.assertEqual("hmac-sha256", algorithm)
+        self.assertEqual("rndc-maas-key", name)
+        with open(config.get_rndc_conf_path(), encoding="ascii") as fd:
+            self.assertIn('secret "%s";' % secret, fd.read())
+
+    def test_get_rndc_key_fails_if_no_key(self):
+        fake_dir = patch_dns_config_path(self)
+        factory.make_file(fake_dir, MAAS_RNDC_CONF_NAME, contents=b"")
+        self.assertRaises(ValueError, get_rndc_key)
+
+    def test_execute_nsupdate_executes_command(self):
+        patch_dns_config_path(self)
+        self.useFixture(EnvironmentVariable("MAAS_DNS_SERVER_PORT", "5353"))
+        self.patch(config, "get_rndc_key").return_value = (
+            "hmac-sha256",
+            "rndc-maas-key",
+            "secret",
+        )
+        calls = []
+
+        def call_and_check(command, timeout=None):
+            with open(command[1], encoding="ascii") as fd:
+                calls.append((command, timeout, fd.read()))
+
+        self.patch(config, "call_and_check", call_and_check)
+        update = factory.make_string()
+        execute_nsupdate([update], timeout=sentinel.timeout)
+        [(command, timeout, script)] = calls
+        self.assertEqual("nsupdate", command[0])
+        self.assertEqual(sentinel.timeout, timeout)
+        self.assertEqual(
+            "server 127.0.0.1 5353\n"
+            "key hmac-sha256:rndc-maas-key secret\n"
+            "%s\n" % update,
+            script,
+        )
+        # The script holds the key's secret so it is removed afterwards.
+        self.assertFalse(os.path.exists(command[1]))
+
     def test_extract_suggested_named_conf_extracts_section(self):
         named_part = factory.make_string()
         # Actual rndc-confgen output, mildly mangled for testing purposes.
@@ -547,6 +603,28 @@ class TestDNSConfig(MAASTestCase):
             ),
         )
 
+    def test_write_config_allows_dynamic_updates(self):
+        target_dir = patch_dns_config_path(self)
+        domain = factory.make_string()
+        forward_zone = DNSForwardZoneConfig(domain)
+        key_name = factory.make_name("key")
+        self.patch(config, "get_rndc_key").return_value = (
+            "hmac-sha256",
+            key_name,
+            "secret",
+        )
+        policy = "update-policy { grant %s zonesub ANY; };" % key_name
+        DNSConfig((forward_zone,)).write_config()
+        self.assertThat(
+            os.path.join(target_dir, MAAS_NAMED_CONF_NAME),
+            FileContains(matcher=Not(Contains(policy))),
+        )
+        DNSConfig((forward_zone,)).write_config(dynamic_updates=True)
+        self.assertThat(
+            os.path.join(target_dir, MAAS_NAMED_CONF_NAME),
+            FileContains(matcher=Contains(policy)),
+        )
+
     def test_write_config_makes_config_world_readable(self):
         target_dir = patch_dns_config_path(self)
         DNSConfig().write_config()
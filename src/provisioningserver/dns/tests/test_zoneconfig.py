@@ -26,8 +26,12 @@ from provisioningserver.dns.config import get_dns_config_dir
 from provisioningserver.dns.testing import patch_dns_config_path
 from provisioningserver.dns.zoneconfig import (
     DNSForwardZoneConfig,
+    DNSRenderedZoneConfig,
     DNSReverseZoneConfig,
     DomainInfo,
+    get_zone_digest,
+    get_zone_records,
+    ZoneRecords,
 )
 
 
@@ -322,6 +326,253 @@ class TestDNSForwardZoneConfig(MAASTestCase):
         filepath = FilePath(dns_zone_config.zone_info[0].target_path)
         self.assertTrue(filepath.getPermissions().other.read)
 
+    def test_write_config_returns_written_zone_names(self):
+        patch_dns_config_path(self)
+        domain = factory.make_string()
+        dns_zone_config = DNSForwardZoneConfig(
+            domain, serial=random.randint(1, 100)
+        )
+        self.assertEqual([domain], dns_zone_config.write_config())
+
+    def test_write_config_skips_zone_with_unchanged_digest(self):
+        patch_dns_config_path(self)
+        domain = factory.make_string()
+        ttl = random.randint(10, 300)
+        mapping = {
+            factory.make_name("host"): HostnameIPMapping(
+                None, ttl, {factory.make_ipv4_address()}
+            )
+        }
+        zone_digests = {}
+        dns_zone_config = DNSForwardZoneConfig(
+            domain, serial=random.randint(1, 100), mapping=mapping
+        )
+        self.assertEqual(
+            [domain], dns_zone_config.write_config(zone_digests=zone_digests)
+        )
+        self.assertThat(zone_digests, HasLength(1))
+        # Only the serial differs, so the zone is not written again.
+        dns_zone_config = DNSForwardZoneConfig(
+            domain, serial=random.randint(101, 200), mapping=mapping
+        )
+        write_zone_file = self.patch(dns_zone_config, "write_zone_file")
+        self.assertEqual(
+            [], dns_zone_config.write_config(zone_digests=zone_digests)
+        )
+        self.assertThat(write_zone_file, MockNotCalled())
+
+    def test_write_config_records_zone_records(self):
+        patch_dns_config_path(self)
+        domain = factory.make_string()
+        dns_zone_config = DNSForwardZoneConfig(
+            domain, serial=random.randint(1, 100)
+        )
+        zone_records = {}
+        dns_zone_config.write_config(zone_records=zone_records)
+        self.assertEqual(dns_zone_config.get_zone_records(), zone_records)
+
+    def test_write_config_only_writes_given_zones(self):
+        patch_dns_config_path(self)
+        domain = factory.make_string()
+        dns_zone_config = DNSReverseZoneConfig(
+            domain,
+            serial=random.randint(1, 100),
+            network=IPNetwork("192.168.0.0/23"),
+        )
+        self.assertEqual(
+            ["1.168.192.in-addr.arpa"],
+            dns_zone_config.write_config(
+                zone_names=["1.168.192.in-addr.arpa"]
+            ),
+        )
+
+
+    def test_render_config_renders_zone_file(self):
+        domain = factory.make_string()
+        serial = random.randint(1, 100)
+        dns_zone_config = DNSForwardZoneConfig(domain, serial=serial)
+        [rendered] = dns_zone_config.render_config()
+        self.assertEqual(domain, rendered.zone_info[0].zone_name)
+        self.assertIn("%d ; serial" % serial, rendered.content)
+        self.assertEqual(
+            dns_zone_config.get_zone_records()[domain], rendered.records
+        )
+
+    def test_render_config_skips_zone_with_unchanged_digest(self):
+        domain = factory.make_string()
+        dns_zone_config = DNSForwardZoneConfig(
+            domain, serial=random.randint(1, 100)
+        )
+        [rendered] = dns_zone_config.render_config()
+        dns_zone_config = DNSForwardZoneConfig(
+            domain, serial=random.randint(101, 200)
+        )
+        self.assertEqual(
+            [],
+            dns_zone_config.render_config(
+                zone_digests={domain: rendered.digest}
+            ),
+        )
+
+
+class TestDNSRenderedZoneConfig(MAASTestCase):
+    """Tests for DNSRenderedZoneConfig."""
+
+    def make_rendered_zone(self):
+        dns_zone_config = DNSForwardZoneConfig(
+            factory.make_string(), serial=random.randint(1, 100)
+        )
+        [rendered] = dns_zone_config.render_config()
+        return rendered
+
+    def test_write_config_writes_content(self):
+        target_dir = patch_dns_config_path(self)
+        rendered = self.make_rendered_zone()
+        zone_name = rendered.zone_info[0].zone_name
+        zone_digests = {}
+        zone_records = {}
+        self.assertEqual(
+            [zone_name],
+            rendered.write_config(
+                zone_digests=zone_digests, zone_records=zone_records
+            ),
+        )
+        self.assertThat(
+            os.path.join(target_dir, "zone.%s" % zone_name),
+            FileContains(rendered.content),
+        )
+        self.assertEqual({zone_name: rendered.digest}, zone_digests)
+        self.assertEqual({zone_name: rendered.records}, zone_records)
+
+    def test_write_config_skips_zone_with_unchanged_digest(self):
+        patch_dns_config_path(self)
+        rendered = self.make_rendered_zone()
+        zone_name = rendered.zone_info[0].zone_name
+        self.assertEqual(
+            [],
+            rendered.write_config(zone_digests={zone_name: rendered.digest}),
+        )
+
+    def test_write_config_skips_zone_not_in_zone_names(self):
+        patch_dns_config_path(self)
+        rendered = self.make_rendered_zone()
+        self.assertEqual([], rendered.write_config(zone_names=[]))
+
+
+class TestGetZoneRecords(MAASTestCase):
+    """Tests for `get_zone_records`."""
+
+    def make_parameters(self, **parameters):
+        defaults = {
+            "domain": factory.make_name("domain"),
+            "serial": random.randint(1, 100),
+            "modified": factory.make_string(),
+            "ttl": random.randint(10, 300),
+            "ns_ttl": random.randint(10, 300),
+            "ns_host_name": factory.make_name("ns"),
+            "mappings": {},
+            "other_mapping": [],
+            "generate_directives": {},
+        }
+        defaults.update(parameters)
+        return defaults
+
+    def test_qualifies_names(self):
+        ip = factory.make_ipv4_address()
+        parameters = self.make_parameters(
+            mappings={"A": [("@", 30, ip), ("host", 30, ip)]},
+            other_mapping=[
+                ("alias", 30, "CNAME", "host"),
+                ("mx", 30, "MX", "10 host.example.com."),
+                ("ns", 30, "NS", "@"),
+            ],
+        )
+        records = get_zone_records("zone.example.com", parameters)
+        self.assertEqual("zone.example.com.", records.origin)
+        self.assertCountEqual(
+            [
+                ("zone.example.com.", 30, "A", ip),
+                ("host.zone.example.com.", 30, "A", ip),
+                (
+                    "alias.zone.example.com.",
+                    30,
+                    "CNAME",
+                    "host.zone.example.com.",
+                ),
+                ("mx.zone.example.com.", 30, "MX", "10 host.example.com."),
+                ("ns.zone.example.com.", 30, "NS", "zone.example.com."),
+            ],
+            records.records,
+        )
+
+    def test_soa_matches_template(self):
+        parameters = self.make_parameters()
+        records = get_zone_records("zone", parameters)
+        self.assertEqual(
+            "%s. nobody.example.com. %d 600 1800 604800 %d"
+            % (parameters["domain"], parameters["serial"], parameters["ttl"]),
+            records.soa,
+        )
+
+    def test_static_ignores_records_and_serial(self):
+        parameters = self.make_parameters()
+        records = get_zone_records("zone", parameters)
+        other_records = get_zone_records(
+            "zone",
+            parameters,
+            {
+                "serial": parameters["serial"] + 1,
+                "other_mapping": [("host", 30, "TXT", "text")],
+            },
+        )
+        self.assertEqual(records.static, other_records.static)
+        self.assertNotEqual(records.records, other_records.records)
+
+    def test_round_trips_through_dict(self):
+        parameters = self.make_parameters(
+            other_mapping=[("host", 30, "TXT", "text")]
+        )
+        records = get_zone_records("zone", parameters)
+        self.assertEqual(records, ZoneRecords.from_dict(records.to_dict()))
+
+    def test_static_changes_with_generate_directives(self):
+        parameters = self.make_parameters()
+        records = get_zone_records("zone", parameters)
+        other_records = get_zone_records(
+            "zone",
+            parameters,
+            {"generate_directives": {"A": [("0-1", "h-$", "10.0.0.$")]}},
+        )
+        self.assertNotEqual(records.static, other_records.static)
+
+
+class TestGetZoneDigest(MAASTestCase):
+    """Tests for `get_zone_digest`."""
+
+    def test_ignores_serial_and_modified(self):
+        parameters = {"domain": factory.make_name("domain"), "ttl": 30}
+        self.assertEqual(
+            get_zone_digest(parameters, {"serial": 1, "modified": "then"}),
+            get_zone_digest(parameters, {"serial": 2, "modified": "now"}),
+        )
+
+    def test_ignores_record_order(self):
+        records = [
+            (factory.make_name("host"), 30, factory.make_ipv4_address())
+            for _ in range(5)
+        ]
+        self.assertEqual(
+            get_zone_digest({"mappings": {"A": records}}),
+            get_zone_digest({"mappings": {"A": list(reversed(records))}}),
+        )
+
+    def test_changes_with_records(self):
+        record = (factory.make_name("host"), 30, factory.make_ipv4_address())
+        self.assertNotEqual(
+            get_zone_digest({"mappings": {"A": [record]}}),
+            get_zone_digest({"mappings": {"A": []}}),
+        )
+
 
 class TestDNSReverseZoneConfig(MAASTestCase):
     """Tests for DNSReverseZoneConfig."""
@@ -5,8 +5,10 @@
 
 
 from datetime import datetime
+from hashlib import sha256
 from itertools import chain
 
+import attr
 from netaddr import IPAddress, IPNetwork, spanning_cidr
 from netaddr.core import AddrFormatError
 
@@ -53,6 +55,150 @@ def enumerate_rrset_mapping(mapping):
             yield hostname, value[0], value[1], value[2]
 
 
+def get_zone_digest(*parameters):
+    """Return a digest of the content of a zone file.
+
+    The serial and modification time are ignored, so that a zone whose
+    records have not changed has the same digest across publications.
+
+    :param parameters: One or more dicts of template parameters, as passed to
+        `DomainConfigBase.write_zone_file`.  Any iterables within them must
+        already have been materialised, e.g. into lists.
+    """
+    combined_params = {}
+    for params_dict in parameters:
+        combined_params.update(params_dict)
+    combined_params.pop("serial", None)
+    combined_params.pop("modified", None)
+
+    def normalise(value):
+        # Records come from unordered mappings so compare them as sets.
+        if isinstance(value, dict):
+            return sorted(
+                ((key, normalise(item)) for key, item in value.items()),
+                key=repr,
+            )
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            return sorted((normalise(item) for item in value), key=repr)
+        else:
+            return value
+
+    return sha256(
+        repr(normalise(combined_params)).encode("utf-8")
+    ).hexdigest()
+
+
+# Record types whose data ends with a domain name, which is relative to the
+# zone's origin unless it is fully qualified.
+NAME_RDATA_TYPES = frozenset(("CNAME", "DNAME", "MX", "NS", "PTR", "SRV"))
+
+
+@attr.s(frozen=True)
+class ZoneRecords:
+    """The records of a zone file as it was published.
+
+    This is what is needed to work out the dynamic update that turns one
+    publication of a zone into the next, see `get_zone_records`.
+    """
+
+    # The fully-qualified name of the zone, with a trailing dot.
+    origin = attr.ib()
+    serial = attr.ib()
+    # The name server and default TTL from the SOA record.
+    domain = attr.ib()
+    ttl = attr.ib()
+    # A digest of everything in the zone file that cannot be changed with a
+    # dynamic update, e.g. $GENERATE directives and the NS record.
+    static = attr.ib()
+    # `(name, ttl, rrtype, rrdata)` tuples, with all names fully qualified.
+    records = attr.ib(converter=frozenset)
+
+    @property
+    def soa(self):
+        """The data of the zone's SOA record, as written by `zone.template`."""
+        return "%s. nobody.example.com. %s 600 1800 604800 %s" % (
+            self.domain,
+            self.serial,
+            self.ttl,
+        )
+
+    def to_dict(self):
+        """Return a JSON-serialisable dict, see `from_dict`."""
+        return attr.asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Return the `ZoneRecords` serialised by `to_dict`."""
+        return cls(
+            origin=data["origin"],
+            serial=data["serial"],
+            domain=data["domain"],
+            ttl=data["ttl"],
+            static=data["static"],
+            records=(tuple(record) for record in data["records"]),
+        )
+
+
+def get_zone_records(zone_name, *parameters):
+    """Return the `ZoneRecords` that a zone file is rendered with.
+
+    :param zone_name: The name of the zone.
+    :param parameters: One or more dicts of template parameters, as passed to
+        `DomainConfigBase.write_zone_file`.  Any iterables within them must
+        already have been materialised, e.g. into lists.
+    """
+    combined_params = {}
+    for params_dict in parameters:
+        combined_params.update(params_dict)
+    origin = zone_name.rstrip(".") + "."
+
+    def qualify(name):
+        name = str(name)
+        if name == "@":
+            return origin
+        elif name.endswith("."):
+            return name
+        else:
+            return "%s.%s" % (name, origin)
+
+    def qualify_rdata(rrtype, rrdata):
+        rrdata = str(rrdata)
+        if rrtype not in NAME_RDATA_TYPES:
+            return rrdata
+        # The domain name is the last field of MX and SRV records.
+        fields = rrdata.split()
+        if len(fields) == 0:
+            return rrdata
+        fields[-1] = qualify(fields[-1])
+        return " ".join(fields)
+
+    records = set()
+    for rrtype, mapping in combined_params["mappings"].items():
+        for name, ttl, rrdata in mapping:
+            records.add(
+                (qualify(name), ttl, rrtype, qualify_rdata(rrtype, rrdata))
+            )
+    for name, ttl, rrtype, rrdata in combined_params["other_mapping"]:
+        records.add(
+            (qualify(name), ttl, rrtype, qualify_rdata(rrtype, rrdata))
+        )
+    static = get_zone_digest(
+        {
+            key: value
+            for key, value in combined_params.items()
+            if key not in ("mappings", "other_mapping")
+        }
+    )
+    return ZoneRecords(
+        origin=origin,
+        serial=combined_params["serial"],
+        domain=combined_params["domain"],
+        ttl=combined_params["ttl"],
+        static=static,
+        records=records,
+    )
+
+
 def get_details_for_ip_range(ip_range):
     """For a given IPRange, return all subnets, a useable prefix and the
     reverse DNS suffix calculated from that IP range.
@@ -167,11 +313,138 @@ class DomainConfigBase:
         if not isinstance(output_file, list):
             output_file = [output_file]
         for outfile in output_file:
-            content = render_dns_template(cls.template_file_name, *parameters)
+            content = cls.render_zone_file(*parameters)
             with report_missing_config_dir():
                 incremental_write(content.encode("utf-8"), outfile, mode=0o644)
         pass
 
+    @classmethod
+    def render_zone_file(cls, *parameters):
+        """Return the content of a zone file based on its template."""
+        return render_dns_template(cls.template_file_name, *parameters)
+
+    def get_zone_parameters(self, zone_info):
+        """Return a dict of the template parameters for one zone file.
+
+        :param zone_info: The `DomainInfo` for the zone file.
+        """
+        raise NotImplementedError()
+
+    def write_config(
+        self, zone_digests=None, zone_records=None, zone_names=None
+    ):
+        """Write the zone files.
+
+        :param zone_digests: Optional dict mapping zone names to the digest
+            of their last written content, see `get_zone_digest`.  When
+            given, zone files whose content has not changed are not
+            rewritten, and the dict is updated for those that are.
+        :param zone_records: Optional dict which is updated to map the name
+            of each written zone to its `ZoneRecords`.
+        :param zone_names: Optional collection of zone names.  When given,
+            only the files of those zones are written.
+        :return: A list of the names of the zones that were written.
+        """
+        written = []
+        for zi in self.zone_info:
+            if zone_names is not None and zi.zone_name not in zone_names:
+                continue
+            parameters = self.make_parameters(), self.get_zone_parameters(zi)
+            if zone_digests is not None:
+                digest = get_zone_digest(*parameters)
+                if zone_digests.get(zi.zone_name) == digest:
+                    continue
+            self.write_zone_file(zi.target_path, *parameters)
+            if zone_digests is not None:
+                zone_digests[zi.zone_name] = digest
+            if zone_records is not None:
+                zone_records[zi.zone_name] = get_zone_records(
+                    zi.zone_name, *parameters
+                )
+            written.append(zi.zone_name)
+        return written
+
+    def render_config(self, zone_digests=None):
+        """Render the zone files, without writing them.
+
+        :param zone_digests: Optional dict mapping zone names to the digest
+            of their content, like for `write_config`.  When given, zones
+            whose content has not changed are not rendered.
+        :return: A list of `DNSRenderedZoneConfig`, one per rendered zone.
+        """
+        rendered = []
+        for zi in self.zone_info:
+            parameters = self.make_parameters(), self.get_zone_parameters(zi)
+            digest = get_zone_digest(*parameters)
+            if zone_digests is not None:
+                if zone_digests.get(zi.zone_name) == digest:
+                    continue
+            rendered.append(
+                DNSRenderedZoneConfig(
+                    zi.zone_name,
+                    digest=digest,
+                    content=self.render_zone_file(*parameters),
+                    records=get_zone_records(zi.zone_name, *parameters),
+                )
+            )
+        return rendered
+
+    def get_zone_records(self):
+        """Return a dict mapping each zone name to its `ZoneRecords`."""
+        return {
+            zi.zone_name: get_zone_records(
+                zi.zone_name,
+                self.make_parameters(),
+                self.get_zone_parameters(zi),
+            )
+            for zi in self.zone_info
+        }
+
+
+class DNSRenderedZoneConfig:
+    """Writes a zone file that has already been rendered.
+
+    This is how a zone rendered by `DomainConfigBase.render_config`, possibly
+    by another region controller, is written out.  It can be used wherever a
+    `DomainConfigBase` is expected.
+    """
+
+    def __init__(self, zone_name, digest, content, records):
+        """
+        :param zone_name: Fully-qualified zone name.
+        :param digest: The digest of the zone, see `get_zone_digest`.
+        :param content: The content of the zone file.
+        :param records: The `ZoneRecords` of the zone.
+        """
+        self.zone_info = [DomainInfo(None, zone_name)]
+        self.digest = digest
+        self.content = content
+        self.records = records
+
+    def write_config(
+        self, zone_digests=None, zone_records=None, zone_names=None
+    ):
+        """See `DomainConfigBase.write_config`."""
+        zi = self.zone_info[0]
+        if zone_names is not None and zi.zone_name not in zone_names:
+            return []
+        if zone_digests is not None:
+            if zone_digests.get(zi.zone_name) == self.digest:
+                return []
+        with report_missing_config_dir():
+            incremental_write(
+                self.content.encode("utf-8"), zi.target_path, mode=0o644
+            )
+        if zone_digests is not None:
+            zone_digests[zi.zone_name] = self.digest
+        if zone_records is not None:
+            zone_records[zi.zone_name] = self.records
+        return [zi.zone_name]
+
+    def get_zone_records(self):
+        """See `DomainConfigBase.get_zone_records`."""
+        return {self.zone_info[0].zone_name: self.records}
+
 
 class DNSForwardZoneConfig(DomainConfigBase):
     """Writes forward zone files.
@@ -281,33 +554,28 @@ class DNSForwardZoneConfig(DomainConfigBase):
 
         return sorted(generate_directives, key=lambda directive: directive[2])
 
-    def write_config(self):
-        """Write the zone file."""
+    def get_zone_parameters(self, zone_info):
+        """See `DomainConfigBase.get_zone_parameters`."""
         # Create GENERATE directives for IPv4 ranges.
-        for zi in self.zone_info:
-            generate_directives = list(
-                chain.from_iterable(
-                    self.get_GENERATE_directives(dynamic_range)
-                    for dynamic_range in self._dynamic_ranges
-                    if dynamic_range.version == 4
-                )
-            )
-            self.write_zone_file(
-                zi.target_path,
-                self.make_parameters(),
-                {
-                    "mappings": {
-                        "A": self.get_A_mapping(self._mapping, self._ipv4_ttl),
-                        "AAAA": self.get_AAAA_mapping(
-                            self._mapping, self._ipv6_ttl
-                        ),
-                    },
-                    "other_mapping": enumerate_rrset_mapping(
-                        self._other_mapping
-                    ),
-                    "generate_directives": {"A": generate_directives},
-                },
+        generate_directives = list(
+            chain.from_iterable(
+                self.get_GENERATE_directives(dynamic_range)
+                for dynamic_range in self._dynamic_ranges
+                if dynamic_range.version == 4
             )
+        )
+        return {
+            "mappings": {
+                "A": list(self.get_A_mapping(self._mapping, self._ipv4_ttl)),
+                "AAAA": list(
+                    self.get_AAAA_mapping(self._mapping, self._ipv6_ttl)
+                ),
+            },
+            "other_mapping": list(
+                enumerate_rrset_mapping(self._other_mapping)
+            ),
+            "generate_directives": {"A": generate_directives},
+        }
 
 
 class DNSReverseZoneConfig(DomainConfigBase):
@@ -533,34 +801,29 @@ class DNSReverseZoneConfig(DomainConfigBase):
                 generate_directives.add((iterator, "${0,1,x}", hostname))
         return sorted(generate_directives)
 
-    def write_config(self):
-        """Write the zone file."""
+    def get_zone_parameters(self, zone_info):
+        """See `DomainConfigBase.get_zone_parameters`."""
         # Create GENERATE directives for IPv4 ranges.
-        for zi in self.zone_info:
-            generate_directives = list(
-                chain.from_iterable(
-                    self.get_GENERATE_directives(
-                        dynamic_range, self.domain, zi
-                    )
-                    for dynamic_range in self._dynamic_ranges
-                    if dynamic_range.version == 4
+        generate_directives = list(
+            chain.from_iterable(
+                self.get_GENERATE_directives(
+                    dynamic_range, self.domain, zone_info
                 )
+                for dynamic_range in self._dynamic_ranges
+                if dynamic_range.version == 4
             )
-            self.write_zone_file(
-                zi.target_path,
-                self.make_parameters(),
-                {
-                    "mappings": {
-                        "PTR": self.get_PTR_mapping(
-                            self._mapping, zi.subnetwork
-                        )
-                    },
-                    "other_mapping": [],
-                    "generate_directives": {
-                        "PTR": generate_directives,
-                        "CNAME": self.get_rfc2317_GENERATE_directives(
-                            zi.subnetwork, self._rfc2317_ranges, self.domain
-                        ),
-                    },
-                },
-            )
+        )
+        return {
+            "mappings": {
+                "PTR": list(
+                    self.get_PTR_mapping(self._mapping, zone_info.subnetwork)
+                )
+            },
+            "other_mapping": [],
+            "generate_directives": {
+                "PTR": generate_directives,
+                "CNAME": self.get_rfc2317_GENERATE_directives(
+                    zone_info.subnetwork, self._rfc2317_ranges, self.domain
+                ),
+            },
+        }
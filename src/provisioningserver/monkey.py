@@ -105,7 +105,11 @@ def fix_tftp_requests():
             elif datagram.opcode == OP_RRQ:
                 if mode == b"netascii":
                     fs_interface = NetasciiSenderProxy(fs_interface)
-                session = RemoteOriginReadSession(
+                # Allow subclasses to negotiate further options.
+                session_class = getattr(
+                    self, "read_session_class", RemoteOriginReadSession
+                )
+                session = session_class(
                     addr, fs_interface, datagram.options, _clock=self._clock
                 )
                 reactor.listenUDP(0, session, iface)
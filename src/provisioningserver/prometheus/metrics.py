@@ -31,6 +31,44 @@ METRICS_DEFINITIONS = [
         "Latency of TFTP file downloads",
         ["filename"],
     ),
+    MetricDefinition(
+        "Histogram",
+        "maas_tftp_file_transfer_throughput",
+        "Throughput of TFTP file downloads, in bytes per second",
+        ["filename"],
+        buckets=[
+            2 ** 14,
+            2 ** 16,
+            2 ** 18,
+            2 ** 20,
+            2 ** 22,
+            2 ** 24,
+            2 ** 26,
+        ],
+    ),
+    MetricDefinition(
+        "Histogram",
+        "maas_power_monitor_cycle_latency",
+        "Time to query the power state of the nodes due in a monitoring cycle",
+        buckets=[1, 5, 10, 15, 30, 60, 120, 300, 600],
+    ),
+    MetricDefinition(
+        "Gauge",
+        "maas_power_monitor_backlog",
+        "Number of power queries waiting to start",
+    ),
+    MetricDefinition(
+        "Gauge",
+        "maas_power_monitor_concurrency",
+        "Limit on concurrent power queries",
+        ["power_type"],
+    ),
+    MetricDefinition(
+        "Counter",
+        "maas_boot_config_cache_requests",
+        "Number of boot configuration requests, by whether they were cached",
+        ["result"],
+    ),
     # regiond metrics
     MetricDefinition(
         "Histogram",
@@ -83,6 +121,58 @@ METRICS_DEFINITIONS = [
         "HTTP request query latency",
         _WEBSOCKET_CALL_LABELS,
     ),
+    MetricDefinition(
+        "Counter",
+        "maas_websocket_notify_coalesced",
+        "Number of Websocket notify messages superseded before being sent",
+    ),
+    MetricDefinition(
+        "Histogram",
+        "maas_dns_zone_render_latency",
+        "Time to generate and render the DNS zones for a publication",
+    ),
+    MetricDefinition(
+        "Histogram",
+        "maas_dns_zone_apply_latency",
+        "Time to write out the DNS zones and load them in BIND",
+    ),
+    MetricDefinition(
+        "Gauge",
+        "maas_db_notify_queue_depth",
+        "Number of database notifications waiting to be handled",
+    ),
+    MetricDefinition(
+        "Histogram",
+        "maas_db_notify_latency",
+        "Time from receiving a database notification until it was handled",
+        ["channel"],
+    ),
+    MetricDefinition(
+        "Histogram",
+        "maas_dns_serial_propagation_lag",
+        "Time from a DNS publication until BIND was updated with its serial",
+        buckets=[0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120],
+    ),
+    MetricDefinition(
+        "Counter",
+        "maas_boot_image_written_bytes",
+        "Number of bytes of boot image files written",
+        ["filetype"],
+    ),
+    MetricDefinition(
+        "Histogram",
+        "maas_boot_image_write_throughput",
+        "Throughput of writing boot image files, in bytes per second",
+        ["filetype"],
+        buckets=[2 ** power for power in range(20, 31, 2)],
+    ),
+    MetricDefinition(
+        "Histogram",
+        "maas_tag_evaluation_latency",
+        "Time to evaluate a tag's expression against a node's details",
+        ["tag"],
+        buckets=[0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.1],
+    ),
     # Common metrics
     *node_metrics_definitions(),
 ]
@@ -12,11 +12,12 @@ from twisted.application.service import Service
 from twisted.internet import reactor, task
 from twisted.internet.defer import inlineCallbacks
 from twisted.internet.protocol import DatagramProtocol
+from twisted.protocols.amp import UnhandledCommand
 
 from provisioningserver.logger import get_maas_logger
 from provisioningserver.path import get_maas_data_path
 from provisioningserver.rpc.exceptions import NoConnectionsAvailable
-from provisioningserver.rpc.region import UpdateLease
+from provisioningserver.rpc.region import UpdateLease, UpdateLeases
 from provisioningserver.utils.twisted import pause, retries
 
 maaslog = get_maas_logger("lease_socket_service")
@@ -33,6 +34,11 @@ class LeaseSocketService(Service, DatagramProtocol):
     # None, or a Deferred that will fire when the processor exits.
     done = None
 
+    # The maximum number of notifications sent to the region at once. The
+    # notifications received between two runs of the processor, every 0.1
+    # seconds, are sent together, in batches of at most this size.
+    batch_size = 100
+
     def __init__(self, client_service, reactor):
         self.client_service = client_service
         self.reactor = reactor
@@ -86,30 +92,57 @@ class LeaseSocketService(Service, DatagramProtocol):
     def processNotifications(self, clock=reactor):
         """Process all notifications."""
 
-        def gen_notifications(notifications):
+        def gen_batches(notifications):
             while len(notifications) != 0:
-                yield notifications.popleft()
+                count = min(len(notifications), self.batch_size)
+                yield [notifications.popleft() for _ in range(count)]
 
         return task.coiterate(
-            self.processNotification(notification, clock=clock)
-            for notification in gen_notifications(self.notifications)
+            self.processNotificationBatch(batch, clock=clock)
+            for batch in gen_batches(self.notifications)
         )
 
     @inlineCallbacks
-    def processNotification(self, notification, clock=reactor):
-        """Send a notification to the region."""
-        client = None
+    def _getClient(self, clock=reactor):
+        """Return a client for the region, or None if there's none."""
         for elapsed, remaining, wait in retries(30, 10, clock):
             try:
                 client = yield self.client_service.getClientNow()
-                break
+                return client
             except NoConnectionsAvailable:
-                yield pause(wait, self.clock)
+                yield pause(wait, clock)
         else:
             maaslog.error(
                 "Can't send DHCP lease information, no RPC "
                 "connection to region."
             )
+            return None
+
+    @inlineCallbacks
+    def processNotificationBatch(self, notifications, clock=reactor):
+        """Send a batch of notifications to the region.
+
+        The region applies them in order. A region that doesn't support
+        `UpdateLeases` is sent the notifications one at a time.
+        """
+        client = yield self._getClient(clock=clock)
+        if client is None:
+            return
+        try:
+            yield client(
+                UpdateLeases,
+                cluster_uuid=client.localIdent,
+                updates=notifications,
+            )
+        except UnhandledCommand:
+            for notification in notifications:
+                yield self.processNotification(notification, clock=clock)
+
+    @inlineCallbacks
+    def processNotification(self, notification, clock=reactor):
+        """Send a notification to the region."""
+        client = yield self._getClient(clock=clock)
+        if client is None:
             return
 
         # Notification contains all the required data except for the cluster
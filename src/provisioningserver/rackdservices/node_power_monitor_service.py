@@ -4,19 +4,21 @@
 """Service to periodically query the power state on this cluster's nodes."""
 
 
+from collections import deque
 from datetime import timedelta
 
 from twisted.application.internet import TimerService
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet.defer import DeferredList, inlineCallbacks
 from twisted.internet.error import ConnectionDone
 
 from provisioningserver.logger import get_maas_logger, LegacyLogger
+from provisioningserver.prometheus.metrics import PROMETHEUS_METRICS
 from provisioningserver.rpc import getRegionClient
 from provisioningserver.rpc.exceptions import (
     NoConnectionsAvailable,
     NoSuchCluster,
 )
-from provisioningserver.rpc.power import query_all_nodes
+from provisioningserver.rpc.power import PowerQueryScheduler, query_all_nodes
 from provisioningserver.rpc.region import ListNodePowerParameters
 
 maaslog = get_maas_logger("power_monitor_service")
@@ -27,12 +29,19 @@ class NodePowerMonitorService(TimerService, object):
     """Service to monitor the power status of all nodes in this cluster."""
 
     check_interval = timedelta(seconds=15).total_seconds()
-    max_nodes_at_once = 5
 
-    def __init__(self, clock=None):
+    # The region considers the nodes it lists as queried, so stop listing
+    # more while this many queries are waiting to start.
+    max_backlog = 100
+
+    def __init__(self, clock=None, prometheus_metrics=PROMETHEUS_METRICS):
         # Call self.query_nodes() every self.check_interval.
         super().__init__(self.check_interval, self.try_query_nodes)
         self.clock = clock
+        self.scheduler = PowerQueryScheduler(clock)
+        self.prometheus_metrics = prometheus_metrics
+        # The number of nodes queried in the previous cycle.
+        self.queried = 0
 
     def try_query_nodes(self):
         """Attempt to query nodes' power states.
@@ -53,21 +62,60 @@ class NodePowerMonitorService(TimerService, object):
 
     @inlineCallbacks
     def query_nodes(self, client):
+        started = self.scheduler.clock.seconds()
+        # Spread the queries across the interval, expecting as many nodes
+        # to be due as in the previous cycle.
+        self.scheduler.start_cycle(self.queried, self.check_interval)
         # Get the nodes' power parameters from the region. Keep getting more
-        # power parameters until the region returns an empty list.
+        # power parameters until the region returns an empty list, querying
+        # the nodes meanwhile.
+        queries = deque()
+        queried = 0
         while True:
             response = yield client(
                 ListNodePowerParameters, uuid=client.localIdent
             )
             power_parameters = response["nodes"]
             if len(power_parameters) > 0:
-                yield query_all_nodes(
-                    power_parameters,
-                    max_concurrency=self.max_nodes_at_once,
-                    clock=self.clock,
+                queried += len(power_parameters)
+                queries.append(
+                    query_all_nodes(
+                        power_parameters,
+                        clock=self.clock,
+                        scheduler=self.scheduler,
+                    )
                 )
+                self._update_backlog_metric()
+                while (
+                    self.scheduler.backlog >= self.max_backlog
+                    and len(queries) > 0
+                ):
+                    yield queries.popleft()
             else:
                 break
+        yield DeferredList(queries)
+        self.queried = queried
+        self._update_cycle_metrics(self.scheduler.clock.seconds() - started)
+
+    def _update_backlog_metric(self):
+        self.prometheus_metrics.update(
+            "maas_power_monitor_backlog",
+            "set",
+            value=self.scheduler.backlog,
+        )
+
+    def _update_cycle_metrics(self, latency):
+        self.prometheus_metrics.update(
+            "maas_power_monitor_cycle_latency", "observe", value=latency
+        )
+        self._update_backlog_metric()
+        for power_type, limit in self.scheduler.concurrency.items():
+            self.prometheus_metrics.update(
+                "maas_power_monitor_concurrency",
+                "set",
+                value=limit,
+                labels={"power_type": power_type},
+            )
 
     def query_nodes_failed(self, failure, localIdent):
         if failure.check(NoSuchCluster):
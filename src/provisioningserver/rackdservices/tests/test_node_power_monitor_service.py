@@ -5,18 +5,21 @@
 :py:module:`~provisioningserver.rackdservices.node_power_monitor_service`."""
 
 
-from unittest.mock import ANY, Mock, sentinel
+from unittest.mock import ANY, call, Mock, sentinel
 
 from fixtures import FakeLogger
+import prometheus_client
 from testtools.matchers import MatchesStructure
-from twisted.internet.defer import fail, succeed
+from twisted.internet.defer import Deferred, fail, succeed
 from twisted.internet.error import ConnectionDone
 from twisted.internet.task import Clock
 
 from maastesting.factory import factory
-from maastesting.matchers import MockCalledOnceWith
+from maastesting.matchers import MockCalledOnceWith, MockCallsMatch
 from maastesting.testcase import MAASTestCase, MAASTwistedRunTest
 from maastesting.twisted import extract_result, TwistedLoggerFixture
+from provisioningserver.prometheus.metrics import METRICS_DEFINITIONS
+from provisioningserver.prometheus.utils import create_metrics
 from provisioningserver.rackdservices import node_power_monitor_service as npms
 from provisioningserver.rpc import exceptions, getRegionClient, region
 from provisioningserver.rpc.testing import MockClusterToRegionRPCFixture
@@ -37,10 +40,24 @@ class TestNodePowerMonitorService(MAASTestCase):
             ),
         )
 
-    def make_monitor_service(self):
-        service = npms.NodePowerMonitorService(Clock())
+    def make_monitor_service(self, prometheus_metrics=None):
+        if prometheus_metrics is None:
+            prometheus_metrics = create_metrics(
+                METRICS_DEFINITIONS,
+                registry=prometheus_client.CollectorRegistry(),
+            )
+        service = npms.NodePowerMonitorService(Clock(), prometheus_metrics)
         return service
 
+    def make_power_parameters(self):
+        return {
+            "system_id": factory.make_UUID(),
+            "hostname": factory.make_hostname(),
+            "power_state": factory.make_name("power_state"),
+            "power_type": factory.make_name("power_type"),
+            "context": {},
+        }
+
     def test_query_nodes_calls_the_region(self):
         service = self.make_monitor_service()
 
@@ -64,15 +81,8 @@ class TestNodePowerMonitorService(MAASTestCase):
 
     def test_query_nodes_calls_query_all_nodes(self):
         service = self.make_monitor_service()
-        service.max_nodes_at_once = sentinel.max_nodes_at_once
 
-        example_power_parameters = {
-            "system_id": factory.make_UUID(),
-            "hostname": factory.make_hostname(),
-            "power_state": factory.make_name("power_state"),
-            "power_type": factory.make_name("power_type"),
-            "context": {},
-        }
+        example_power_parameters = self.make_power_parameters()
 
         rpc_fixture = self.useFixture(MockClusterToRegionRPCFixture())
         proto_region, io = rpc_fixture.makeEventLoop(
@@ -84,6 +94,7 @@ class TestNodePowerMonitorService(MAASTestCase):
         ]
 
         query_all_nodes = self.patch(npms, "query_all_nodes")
+        query_all_nodes.return_value = succeed(None)
 
         d = service.query_nodes(getRegionClient())
         io.flush()
@@ -93,11 +104,96 @@ class TestNodePowerMonitorService(MAASTestCase):
             query_all_nodes,
             MockCalledOnceWith(
                 [example_power_parameters],
-                max_concurrency=sentinel.max_nodes_at_once,
                 clock=service.clock,
+                scheduler=service.scheduler,
+            ),
+        )
+
+    def test_query_nodes_paces_as_many_nodes_as_in_previous_cycle(self):
+        service = self.make_monitor_service()
+        start_cycle = self.patch(service.scheduler, "start_cycle")
+
+        rpc_fixture = self.useFixture(MockClusterToRegionRPCFixture())
+        proto_region, io = rpc_fixture.makeEventLoop(
+            region.ListNodePowerParameters
+        )
+        proto_region.ListNodePowerParameters.side_effect = [
+            succeed({"nodes": [self.make_power_parameters()]}),
+            succeed({"nodes": [self.make_power_parameters()]}),
+            succeed({"nodes": []}),
+            succeed({"nodes": []}),
+        ]
+        self.patch(npms, "query_all_nodes").return_value = succeed(None)
+
+        client = getRegionClient()
+        for _ in range(2):
+            d = service.query_nodes(client)
+            io.flush()
+            self.assertEqual(None, extract_result(d))
+
+        self.assertThat(
+            start_cycle,
+            MockCallsMatch(
+                call(0, service.check_interval),
+                call(2, service.check_interval),
             ),
         )
 
+    def test_query_nodes_stops_listing_nodes_while_backlogged(self):
+        service = self.make_monitor_service()
+        service.max_backlog = 0
+
+        rpc_fixture = self.useFixture(MockClusterToRegionRPCFixture())
+        proto_region, io = rpc_fixture.makeEventLoop(
+            region.ListNodePowerParameters
+        )
+        proto_region.ListNodePowerParameters.side_effect = [
+            succeed({"nodes": [self.make_power_parameters()]}),
+            succeed({"nodes": []}),
+        ]
+        queries = Deferred()
+        self.patch(npms, "query_all_nodes").return_value = queries
+
+        d = service.query_nodes(getRegionClient())
+        io.flush()
+        self.assertEqual(1, proto_region.ListNodePowerParameters.call_count)
+
+        queries.callback(None)
+        io.flush()
+        self.assertEqual(2, proto_region.ListNodePowerParameters.call_count)
+        self.assertEqual(None, extract_result(d))
+
+    def test_query_nodes_records_metrics(self):
+        prometheus_metrics = create_metrics(
+            METRICS_DEFINITIONS, registry=prometheus_client.CollectorRegistry()
+        )
+        service = self.make_monitor_service(prometheus_metrics)
+        power_parameters = self.make_power_parameters()
+
+        rpc_fixture = self.useFixture(MockClusterToRegionRPCFixture())
+        proto_region, io = rpc_fixture.makeEventLoop(
+            region.ListNodePowerParameters
+        )
+        proto_region.ListNodePowerParameters.side_effect = [
+            succeed({"nodes": [power_parameters]}),
+            succeed({"nodes": []}),
+        ]
+        self.patch(npms, "query_all_nodes").return_value = succeed(None)
+        service.scheduler.acquire(power_parameters["power_type"])
+
+        d = service.query_nodes(getRegionClient())
+        io.flush()
+
+        self.assertEqual(None, extract_result(d))
+        metrics = prometheus_metrics.generate_latest().decode("ascii")
+        self.assertIn("maas_power_monitor_cycle_latency_count 1.0", metrics)
+        self.assertIn("maas_power_monitor_backlog 0.0", metrics)
+        self.assertIn(
+            'maas_power_monitor_concurrency{power_type="%s"} 5.0'
+            % power_parameters["power_type"],
+            metrics,
+        )
+
     def test_query_nodes_copes_with_NoSuchCluster(self):
         service = self.make_monitor_service()
 
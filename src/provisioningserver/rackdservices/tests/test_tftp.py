@@ -27,8 +27,13 @@ from testtools.matchers import (
     MatchesStructure,
 )
 from tftp.backend import IReader
-from tftp.datagram import RQDatagram
-from tftp.errors import BackendError, FileNotFound
+from tftp.datagram import ACKDatagram, DATADatagram, RQDatagram
+from tftp.errors import (
+    AccessViolation,
+    BackendError,
+    FileNotFound,
+    Unsupported,
+)
 import tftp.protocol
 from tftp.protocol import TFTP
 from twisted.application import internet
@@ -56,13 +61,19 @@ from provisioningserver.rackdservices import tftp as tftp_module
 from provisioningserver.rackdservices.tftp import (
     get_boot_image,
     log_request,
+    MAX_WINDOWSIZE,
+    MemoryMappedReader,
     Port,
     TFTPBackend,
     TFTPService,
     track_tftp_latency,
     TransferTimeTrackingTFTP,
     UDPServer,
+    WindowedReadSession,
+    WindowedRemoteOriginReadSession,
 )
+from provisioningserver.rpc.boot_configs import BootConfigCache
+from provisioningserver.rpc.boot_images import BootImageIndex
 from provisioningserver.rpc.exceptions import BootConfigNoResponse
 from provisioningserver.rpc.region import GetBootConfig
 from provisioningserver.testing.boot_images import (
@@ -101,7 +112,9 @@ class TestGetBootImage(MAASTestCase):
         return images, return_image
 
     def patch_list_boot_images(self, images):
-        self.patch(tftp_module, "list_boot_images").return_value = images
+        self.patch(
+            tftp_module, "get_boot_image_index"
+        ).return_value = BootImageIndex(images)
 
     def get_params_from_boot_image(self, image):
         return {
@@ -193,6 +206,162 @@ class TestBytesReader(MAASTestCase):
         self.assertRaises(ValueError, reader.read, 1)
 
 
+class TestMemoryMappedReader(MAASTestCase):
+    """Tests for `MemoryMappedReader`."""
+
+    def test_interfaces(self):
+        reader = MemoryMappedReader(self.make_file())
+        self.addCleanup(reader.finish)
+        verifyObject(IReader, reader)
+
+    def test_reads_file_in_blocks(self):
+        data = factory.make_bytes(size=1000)
+        reader = MemoryMappedReader(self.make_file(contents=data))
+        self.addCleanup(reader.finish)
+        self.assertEqual(len(data), reader.size)
+        self.assertEqual(
+            [data[:512], data[512:], b""],
+            [reader.read(512) for _ in range(3)],
+        )
+
+    def test_reads_empty_file(self):
+        reader = MemoryMappedReader(self.make_file(contents=b""))
+        self.addCleanup(reader.finish)
+        self.assertEqual(0, reader.size)
+        self.assertEqual(b"", reader.read(512))
+
+    def test_finish_unmaps_file(self):
+        reader = MemoryMappedReader(self.make_file(contents=b"data"))
+        reader.finish()
+        self.assertIsNone(reader.buffer)
+        self.assertEqual(b"", reader.read(512))
+
+
+class FakeUDPTransport:
+
+    listening = True
+
+    def __init__(self):
+        self.written = []
+
+    def write(self, datagram):
+        self.written.append(datagram)
+
+    def stopListening(self):
+        self.listening = False
+
+
+class TestWindowedReadSession(MAASTestCase):
+    """Tests for `WindowedReadSession`."""
+
+    # Three blocks of 4 bytes, the last one short.
+    data = b"0123456789"
+
+    def make_session(self, window_size=2):
+        clock = Clock()
+        session = WindowedReadSession(BytesReader(self.data), _clock=clock)
+        session.block_size = 4
+        session.window_size = window_size
+        session.transport = FakeUDPTransport()
+        return session, clock
+
+    def make_blocks(self, *blocknums):
+        return [
+            DATADatagram(
+                blocknum, self.data[(blocknum - 1) * 4 : blocknum * 4]
+            ).to_wire()
+            for blocknum in blocknums
+        ]
+
+    def test_sends_window_of_blocks(self):
+        session, _ = self.make_session()
+        session.startProtocol()
+        self.assertEqual(self.make_blocks(1, 2), session.transport.written)
+
+    def test_sends_next_window_when_window_acknowledged(self):
+        session, _ = self.make_session()
+        session.startProtocol()
+        session.transport.written.clear()
+        session.datagramReceived(ACKDatagram(2))
+        self.assertEqual(self.make_blocks(3), session.transport.written)
+        self.assertTrue(session.transport.listening)
+
+    def test_restarts_window_after_acknowledged_block(self):
+        session, _ = self.make_session()
+        session.startProtocol()
+        session.transport.written.clear()
+        session.datagramReceived(ACKDatagram(1))
+        self.assertEqual(self.make_blocks(2, 3), session.transport.written)
+
+    def test_ignores_acknowledgement_of_previous_window(self):
+        session, _ = self.make_session()
+        session.startProtocol()
+        session.datagramReceived(ACKDatagram(2))
+        session.transport.written.clear()
+        session.datagramReceived(ACKDatagram(4))
+        self.assertEqual([], session.transport.written)
+
+    def test_finishes_when_last_block_acknowledged(self):
+        session, _ = self.make_session()
+        session.startProtocol()
+        session.datagramReceived(ACKDatagram(2))
+        session.datagramReceived(ACKDatagram(3))
+        self.assertFalse(session.transport.listening)
+
+    def test_sends_window_again_on_timeout(self):
+        session, clock = self.make_session()
+        session.startProtocol()
+        session.transport.written.clear()
+        clock.advance(session.timeout[0])
+        self.assertEqual(self.make_blocks(1, 2), session.transport.written)
+
+    def test_times_out(self):
+        session, clock = self.make_session()
+        session.startProtocol()
+        for timeout in session.timeout:
+            clock.advance(timeout)
+        self.assertFalse(session.transport.listening)
+
+    def test_sends_single_blocks_without_window(self):
+        session, _ = self.make_session(window_size=1)
+        session.startProtocol()
+        self.assertEqual(self.make_blocks(1), session.transport.written)
+
+
+class TestWindowedRemoteOriginReadSession(MAASTestCase):
+    """Tests for `WindowedRemoteOriginReadSession`."""
+
+    def make_session(self):
+        return WindowedRemoteOriginReadSession(
+            ("127.0.0.1", 1069), BytesReader(b""), _clock=Clock()
+        )
+
+    def test_uses_windowed_read_session(self):
+        session = self.make_session()
+        self.assertIsInstance(session.session, WindowedReadSession)
+
+    def test_accepts_windowsize(self):
+        session = self.make_session()
+        options = session.processOptions({b"windowsize": b"8"})
+        self.assertEqual(b"8", options[b"windowsize"])
+
+    def test_limits_windowsize(self):
+        session = self.make_session()
+        options = session.processOptions({b"WindowSize": b"1000"})
+        self.assertEqual(b"%d" % MAX_WINDOWSIZE, options[b"windowsize"])
+
+    def test_rejects_invalid_windowsize(self):
+        session = self.make_session()
+        for value in (b"0", b"-1", b"many"):
+            options = session.processOptions({b"windowsize": value})
+            self.assertNotIn(b"windowsize", options)
+
+    def test_applies_windowsize(self):
+        session = self.make_session()
+        session.applyOptions(session.session, {b"windowsize": b"8"})
+        self.assertEqual(8, session.session.window_size)
+
+
 class TestTFTPBackend(MAASTestCase):
     """Tests for `TFTPBackend`."""
 
@@ -203,6 +372,7 @@ class TestTFTPBackend(MAASTestCase):
         self.useFixture(ClusterConfigurationFixture())
         self.patch(boot, "find_mac_via_arp")
         self.patch(tftp_module, "log_request")
+        self.patch(tftp_module, "boot_config_cache", BootConfigCache())
 
     def test_init(self):
         temp_dir = self.make_dir()
@@ -220,15 +390,33 @@ class TestTFTPBackend(MAASTestCase):
 
     @inlineCallbacks
     def test_get_reader_regular_file(self):
-        # TFTPBackend.get_reader() returns a regular FilesystemReader for
-        # paths not matching re_config_file.
+        # TFTPBackend.get_reader() returns a MemoryMappedReader for paths not
+        # matching re_config_file.
         data = factory.make_string().encode("ascii")
         reader = yield self.get_reader(data)
         self.addCleanup(reader.finish)
+        self.assertIsInstance(reader, MemoryMappedReader)
         self.assertEqual(len(data), reader.size)
         self.assertEqual(data, reader.read(len(data)))
         self.assertEqual(b"", reader.read(1))
 
+    @inlineCallbacks
+    def test_get_reader_missing_file(self):
+        backend = TFTPBackend(self.make_dir(), Mock())
+        with ExpectedException(FileNotFound):
+            yield backend.get_reader(factory.make_name("file").encode("ascii"))
+
+    @inlineCallbacks
+    def test_get_reader_rejects_paths_outside_root(self):
+        backend = TFTPBackend(self.make_dir(), Mock())
+        with ExpectedException(AccessViolation):
+            yield backend.get_reader(b"../etc/passwd")
+
+    def test_get_static_reader_requires_reading_to_be_supported(self):
+        backend = TFTPBackend(self.make_dir(), Mock())
+        backend.can_read = False
+        self.assertRaises(Unsupported, backend.get_static_reader, b"example")
+
     @inlineCallbacks
     def test_get_reader_handles_backslashes_in_path(self):
         data = factory.make_string().encode("ascii")
@@ -355,7 +543,7 @@ class TestTFTPBackend(MAASTestCase):
         fake_kernel_params = make_kernel_parameters()
         fake_params = fake_kernel_params._asdict()
 
-        # Stub the output of list_boot_images so the label is set in the
+        # Stub the boot image index so the label is set in the
         # kernel parameters.
         boot_image = {
             "osystem": fake_params["osystem"],
@@ -366,7 +554,9 @@ class TestTFTPBackend(MAASTestCase):
             "supported_subarches": "",
             "label": fake_params["label"],
         }
-        self.patch(tftp_module, "list_boot_images").return_value = [boot_image]
+        self.patch(
+            tftp_module, "get_boot_image_index"
+        ).return_value = BootImageIndex([boot_image])
         del fake_params["label"]
 
         # Stub RPC call to return the fake configuration parameters.
@@ -423,7 +613,7 @@ class TestTFTPBackend(MAASTestCase):
         fake_kernel_params = make_kernel_parameters()
         fake_params = fake_kernel_params._asdict()
 
-        # Stub the output of list_boot_images so the label is set in the
+        # Stub the boot image index so the label is set in the
         # kernel parameters.
         boot_image = {
             "osystem": fake_params["osystem"],
@@ -434,7 +624,9 @@ class TestTFTPBackend(MAASTestCase):
             "supported_subarches": "",
             "label": fake_params["label"],
         }
-        self.patch(tftp_module, "list_boot_images").return_value = [boot_image]
+        self.patch(
+            tftp_module, "get_boot_image_index"
+        ).return_value = BootImageIndex([boot_image])
         del fake_params["label"]
 
         # Stub RPC call to return the fake configuration parameters.
@@ -494,7 +686,7 @@ class TestTFTPBackend(MAASTestCase):
         fake_kernel_params = make_kernel_parameters()
         fake_params = fake_kernel_params._asdict()
 
-        # Stub the output of list_boot_images so the label is set in the
+        # Stub the boot image index so the label is set in the
         # kernel parameters.
         boot_image = {
             "osystem": fake_params["osystem"],
@@ -505,7 +697,9 @@ class TestTFTPBackend(MAASTestCase):
             "supported_subarches": "",
             "label": fake_params["label"],
         }
-        self.patch(tftp_module, "list_boot_images").return_value = [boot_image]
+        self.patch(
+            tftp_module, "get_boot_image_index"
+        ).return_value = BootImageIndex([boot_image])
         del fake_params["label"]
 
         # Stub RPC call to return the fake configuration parameters.
@@ -566,7 +760,7 @@ class TestTFTPBackend(MAASTestCase):
         fake_kernel_params = make_kernel_parameters()
         fake_params = fake_kernel_params._asdict()
 
-        # Stub the output of list_boot_images so the label is set in the
+        # Stub the boot image index so the label is set in the
         # kernel parameters.
         boot_image = {
             "osystem": fake_params["osystem"],
@@ -577,7 +771,9 @@ class TestTFTPBackend(MAASTestCase):
             "supported_subarches": "",
             "label": fake_params["label"],
         }
-        self.patch(tftp_module, "list_boot_images").return_value = [boot_image]
+        self.patch(
+            tftp_module, "get_boot_image_index"
+        ).return_value = BootImageIndex([boot_image])
         del fake_params["label"]
 
         # Stub RPC call to return the fake configuration parameters.
@@ -715,8 +911,10 @@ class TestTFTPBackend(MAASTestCase):
         fake_kernel_params = make_kernel_parameters(label="no-such-image")
         fake_params = fake_kernel_params._asdict()
 
-        # Stub the output of list_boot_images so no images exist.
-        self.patch(tftp_module, "list_boot_images").return_value = []
+        # Stub the boot image index so no images exist.
+        self.patch(
+            tftp_module, "get_boot_image_index"
+        ).return_value = BootImageIndex([])
         del fake_params["label"]
 
         # Stub RPC call to return the fake configuration parameters.
@@ -763,7 +961,7 @@ class TestTFTPBackend(MAASTestCase):
         )
         fake_params = fake_kernel_params._asdict()
 
-        # Stub the output of list_boot_images so the label is set in the
+        # Stub the boot image index so the label is set in the
         # kernel parameters.
         boot_image = {
             "osystem": fake_params["osystem"],
@@ -774,7 +972,9 @@ class TestTFTPBackend(MAASTestCase):
             "supported_subarches": "",
             "label": fake_params["label"],
         }
-        self.patch(tftp_module, "list_boot_images").return_value = [boot_image]
+        self.patch(
+            tftp_module, "get_boot_image_index"
+        ).return_value = BootImageIndex([boot_image])
 
         del fake_params["label"]
 
@@ -862,6 +1062,32 @@ class TestTFTPBackend(MAASTestCase):
             MockCalledOnceWith(client, GetBootConfig, **params_okay),
         )
 
+    def test_get_kernel_params_caches_boot_config(self):
+        params = {
+            name.decode("ascii"): factory.make_name("value")
+            for name, _ in GetBootConfig.arguments
+        }
+
+        client = Mock()
+        client.localIdent = params["system_id"]
+        client_service = Mock()
+        client_service.getClientNow.return_value = succeed(client)
+
+        backend = TFTPBackend(self.make_dir(), client_service)
+        backend.fetcher = Mock()
+        backend.fetcher.return_value = succeed({"system_id": None})
+        self.patch(backend, "get_boot_image").return_value = (
+            make_kernel_parameters()._asdict()
+        )
+
+        backend.get_kernel_params(params.copy())
+        backend.get_kernel_params(params.copy())
+
+        self.assertThat(
+            backend.fetcher,
+            MockCalledOnceWith(client, GetBootConfig, **params),
+        )
+
 
 class TestTFTPService(MAASTestCase):
     def test_tftp_service(self):
@@ -1013,6 +1239,12 @@ class TestTransferTimeTrackingTFTP(MAASTestCase):
         tftp = TransferTimeTrackingTFTP(sentinel.backend)
         return tftp._clean_filename(datagram)
 
+    def test_read_session_class_negotiates_windowsize(self):
+        self.assertIs(
+            WindowedRemoteOriginReadSession,
+            TransferTimeTrackingTFTP.read_session_class,
+        )
+
     def test_clean_filename(self):
         self.assertEqual(
             self.clean_filename(b"files/foo.txt"), "files/foo.txt"
@@ -1077,6 +1309,33 @@ class TestTransferTimeTrackingTFTPStartSession(MAASTestCase):
             metrics,
         )
 
+    @inlineCallbacks
+    def test_wb_start_session_tracks_throughput(self):
+        prometheus_metrics = create_metrics(
+            METRICS_DEFINITIONS, registry=prometheus_client.CollectorRegistry()
+        )
+        stream_session = FakeStreamSession()
+        stream_session.reader = BytesReader(factory.make_bytes(size=1024))
+        session = FakeSession(stream_session)
+        self.patch(tftp_module, "time").side_effect = [100.0, 101.0]
+        tftp_mock = self.patch(tftp.protocol.TFTP, "_startSession")
+        tftp_mock.return_value = succeed(session)
+        tracking_tftp = TransferTimeTrackingTFTP(sentinel.backend)
+        datagram = RQDatagram(b"file.txt", b"octet", {})
+        result = yield tracking_tftp._startSession(
+            datagram,
+            "192.168.1.1",
+            "read",
+            prometheus_metrics=prometheus_metrics,
+        )
+        result.session.cancel()
+        metrics = prometheus_metrics.generate_latest().decode("ascii")
+        self.assertIn(
+            'maas_tftp_file_transfer_throughput_count{filename="file.txt"} '
+            "1.0",
+            metrics,
+        )
+
 
 class TestTrackTFTPLatency(MAASTestCase):
     def test_track_tftp_latency(self):
@@ -1121,6 +1380,49 @@ class TestTrackTFTPLatency(MAASTestCase):
         )
 
 
+    def test_track_tftp_latency_tracks_throughput(self):
+        start_time = time.time()
+        prometheus_metrics = create_metrics(
+            METRICS_DEFINITIONS, registry=prometheus_client.CollectorRegistry()
+        )
+        cancel = track_tftp_latency(
+            lambda: None,
+            start_time=start_time,
+            filename="myfile.txt",
+            prometheus_metrics=prometheus_metrics,
+            size=2 ** 20,
+        )
+        time_mock = self.patch(tftp_module, "time")
+        time_mock.return_value = start_time + 2
+        cancel()
+
+        metrics = prometheus_metrics.generate_latest().decode("ascii")
+        self.assertIn(
+            'maas_tftp_file_transfer_throughput_sum{filename="myfile.txt"} '
+            "524288.0",
+            metrics,
+        )
+
+    def test_track_tftp_latency_without_size(self):
+        start_time = time.time()
+        prometheus_metrics = create_metrics(
+            METRICS_DEFINITIONS, registry=prometheus_client.CollectorRegistry()
+        )
+        cancel = track_tftp_latency(
+            lambda: None,
+            start_time=start_time,
+            filename="myfile.txt",
+            prometheus_metrics=prometheus_metrics,
+        )
+        cancel()
+
+        metrics = prometheus_metrics.generate_latest().decode("ascii")
+        self.assertNotIn(
+            'maas_tftp_file_transfer_throughput_count{filename="myfile.txt"}',
+            metrics,
+        )
+
+
 class DummyProtocol(Protocol):
     def doStop(self):
         pass
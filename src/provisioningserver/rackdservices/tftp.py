@@ -5,13 +5,23 @@
 
 
 from functools import partial
+import mmap
+import os
 from socket import AF_INET, AF_INET6
 from time import time
 
 from netaddr import IPAddress
-from tftp.backend import FilesystemSynchronousBackend
-from tftp.errors import BackendError, FileNotFound
+from tftp.backend import FilesystemSynchronousBackend, IReader
+from tftp.bootstrap import RemoteOriginReadSession
+from tftp.datagram import DATADatagram, OP_ACK
+from tftp.errors import (
+    AccessViolation,
+    BackendError,
+    FileNotFound,
+    Unsupported,
+)
 from tftp.protocol import TFTP
+from tftp.session import ReadSession
 from twisted.application import internet
 from twisted.application.service import MultiService
 from twisted.internet import reactor, udp
@@ -24,7 +34,8 @@ from twisted.internet.defer import (
     succeed,
 )
 from twisted.internet.task import deferLater
-from twisted.python.filepath import FilePath
+from twisted.python.filepath import FilePath, InsecurePath
+from zope.interface import implementer
 
 from provisioningserver.boot import BootMethodRegistry
 from provisioningserver.drivers import ArchitectureRegistry
@@ -33,7 +44,8 @@ from provisioningserver.events import EVENT_TYPES, send_node_event_ip_address
 from provisioningserver.kernel_opts import KernelParameters
 from provisioningserver.logger import get_maas_logger, LegacyLogger
 from provisioningserver.prometheus.metrics import PROMETHEUS_METRICS
-from provisioningserver.rpc.boot_images import list_boot_images
+from provisioningserver.rpc.boot_configs import boot_config_cache
+from provisioningserver.rpc.boot_images import get_boot_image_index
 from provisioningserver.rpc.exceptions import BootConfigNoResponse
 from provisioningserver.rpc.region import GetBootConfig, MarkNodeFailed
 from provisioningserver.utils import network, tftp, typed
@@ -52,34 +64,15 @@ def get_boot_image(params):
     if purpose == "enlist":
         purpose = "commissioning"
 
-    # Get the matching boot images, minus subarchitecture.
-    boot_images = list_boot_images()
-    boot_images = [
-        image
-        for image in boot_images
-        if (
-            image["osystem"] == params["osystem"]
-            and image["release"] == params["release"]
-            and image["architecture"] == params["arch"]
-            and image["purpose"] == purpose
-        )
-    ]
-
-    # See if exact subarchitecture match.
-    for image in boot_images:
-        if image["subarchitecture"] == params["subarch"]:
-            return image
-
-    # Not exact match check if subarchitecture is in the supported
-    # subarchitectures list.
-    for image in boot_images:
-        subarches = image.get("supported_subarches", "")
-        subarches = subarches.split(",")
-        if params["subarch"] in subarches:
-            return image
-
-    # No matching boot image was found.
-    return None
+    # The index prefers an image of the exact subarchitecture to one that
+    # lists it in its supported subarchitectures.
+    return get_boot_image_index().get(
+        params["osystem"],
+        params["release"],
+        params["arch"],
+        params["subarch"],
+        purpose,
+    )
 
 
 def log_request(file_name, clock=reactor):
@@ -112,6 +105,39 @@ def log_request(file_name, clock=reactor):
     d.addErrback(log.err, "Logging TFTP request failed.")
 
 
+@implementer(IReader)
+class MemoryMappedReader:
+    """A reader for a static file, served from a memory map of it.
+
+    Each block is sliced from the map, rather than read from the file with a
+    system call of its own. Empty files can't be mapped, and are served from
+    an empty buffer.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as fd:
+            self.size = os.fstat(fd.fileno()).st_size
+            if self.size > 0:
+                self.buffer = mmap.mmap(
+                    fd.fileno(), 0, access=mmap.ACCESS_READ
+                )
+            else:
+                self.buffer = None
+        self.position = 0
+
+    def read(self, size):
+        if self.buffer is None:
+            return b""
+        data = self.buffer[self.position : self.position + size]
+        self.position += len(data)
+        return data
+
+    def finish(self):
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+
+
 class TFTPBackend(FilesystemSynchronousBackend):
     """A partially dynamic read-only TFTP server.
 
@@ -291,7 +317,9 @@ class TFTPBackend(FilesystemSynchronousBackend):
 
         def fetch(client, params):
             params["system_id"] = client.localIdent
-            d = self.fetcher(client, GetBootConfig, **params)
+            d = boot_config_cache.get(
+                params, partial(self.fetcher, client, GetBootConfig)
+            )
             d.addCallback(self.get_boot_image, client, params["remote_ip"])
             d.addCallback(lambda data: KernelParameters(**data))
             return d
@@ -327,7 +355,7 @@ class TFTPBackend(FilesystemSynchronousBackend):
     def handle_boot_method(self, file_name: TFTPPath, result):
         boot_method, params = result
         if boot_method is None:
-            return super().get_reader(file_name)
+            return self.get_static_reader(file_name)
 
         # Map pxe namespace architecture names to MAAS's.
         arch = params.get("arch")
@@ -344,6 +372,24 @@ class TFTPBackend(FilesystemSynchronousBackend):
         d = self.get_boot_method_reader(boot_method, params)
         return d
 
+    def get_static_reader(self, file_name):
+        """Return a `MemoryMappedReader` for the file `file_name`.
+
+        As for `FilesystemSynchronousBackend.get_reader`, the backend must
+        allow reading and the file must be beneath the root directory of the
+        server.
+        """
+        if not self.can_read:
+            raise Unsupported("Reading not supported")
+        try:
+            path = self.base.descendant(file_name.split(b"/"))
+        except InsecurePath as error:
+            raise AccessViolation("Insecure path: %s" % error)
+        try:
+            return MemoryMappedReader(path.path)
+        except (OSError, ValueError):
+            raise FileNotFound(path)
+
     @staticmethod
     def all_is_lost_errback(failure):
         if failure.check(BackendError):
@@ -414,9 +460,17 @@ class UDPServer(internet.UDPServer):
 
 
 def track_tftp_latency(
-    func, start_time, filename, prometheus_metrics=PROMETHEUS_METRICS
+    func,
+    start_time,
+    filename,
+    prometheus_metrics=PROMETHEUS_METRICS,
+    size=None,
 ):
-    """Wraps a function and tracks TFTP transfer latency."""
+    """Wraps a function and tracks TFTP transfer latency.
+
+    When the `size` of the file is known, the transfer throughput is tracked
+    too, in bytes per second.
+    """
 
     def wrapped():
         result = func()
@@ -427,12 +481,124 @@ def track_tftp_latency(
             labels={"filename": filename},
             value=latency,
         )
+        if size is not None and latency > 0:
+            prometheus_metrics.update(
+                "maas_tftp_file_transfer_throughput",
+                "observe",
+                labels={"filename": filename},
+                value=size / latency,
+            )
         return result
 
     return wrapped
 
 
+# The largest window, in blocks, agreed to with the windowsize option.
+MAX_WINDOWSIZE = 64
+
+
+class WindowedReadSession(ReadSession):
+    """A read session that sends `window_size` blocks per acknowledgement.
+
+    See RFC 7440. The client acknowledges the last block of each window, or
+    the last block it received in order, and the window restarts after the
+    acknowledged block; unacknowledged blocks are sent again. With a window
+    of one block this is the lock-step transfer of `ReadSession`.
+    """
+
+    window_size = 1
+
+    def startProtocol(self):
+        if self.window_size == 1:
+            return super().startProtocol()
+        self.started = True
+        # Block numbers are counted from the start of the transfer, and
+        # wrap around on the wire.
+        self.acked = 0
+        self.window = []
+        return self.fillWindow()
+
+    def datagramReceived(self, datagram):
+        if self.window_size == 1 or datagram.opcode != OP_ACK:
+            return super().datagramReceived(datagram)
+        acked = (datagram.blocknum - self.acked) % 65536
+        if acked > len(self.window):
+            # An acknowledgement for a previous window, ignore it.
+            return None
+        if self.timeout_watchdog.active():
+            self.timeout_watchdog.cancel()
+        del self.window[:acked]
+        self.acked += acked
+        if self.completed and len(self.window) == 0:
+            # The final block was acknowledged.
+            self.cancel()
+            return None
+        return self.fillWindow()
+
+    def fillWindow(self):
+        """Read blocks until the window is full, and send it."""
+        if self.completed or len(self.window) == self.window_size:
+            self.sendWindow()
+            return succeed(None)
+        d = maybeDeferred(self.reader.read, self.block_size)
+        d.addCallbacks(self.addToWindow, self.readFailed)
+        return d
+
+    def addToWindow(self, data):
+        self.blocknum += 1
+        if len(data) < self.block_size:
+            self.completed = True
+        datagram = DATADatagram(self.blocknum % 65536, data)
+        self.window.append(datagram.to_wire())
+        return self.fillWindow()
+
+    def sendWindow(self, attempt=0):
+        """Send the window, and again after each of the timeouts."""
+        for datagram in self.window:
+            self.transport.write(datagram)
+        if attempt < len(self.timeout) - 1:
+            self.timeout_watchdog = self._clock.callLater(
+                self.timeout[attempt], self.sendWindow, attempt + 1
+            )
+        else:
+            self.timeout_watchdog = self._clock.callLater(
+                self.timeout[attempt], self.timedOut
+            )
+
+
+class WindowedRemoteOriginReadSession(RemoteOriginReadSession):
+    """A read session that negotiates the windowsize option of RFC 7440."""
+
+    def __init__(self, remote, reader, options=None, _clock=None):
+        super().__init__(remote, reader, options, _clock=_clock)
+        self.session = WindowedReadSession(reader, _clock=_clock)
+
+    def processOptions(self, options):
+        accepted_options = super().processOptions(options)
+        for name, value in options.items():
+            if name.lower() == b"windowsize":
+                try:
+                    window_size = int(value)
+                except ValueError:
+                    continue
+                if window_size >= 1:
+                    window_size = min(window_size, MAX_WINDOWSIZE)
+                    accepted_options[b"windowsize"] = b"%d" % window_size
+        return accepted_options
+
+    def applyOptions(self, session, options):
+        options = options.copy()
+        window_size = options.pop(b"windowsize", None)
+        super().applyOptions(session, options)
+        if window_size is not None:
+            session.window_size = int(window_size)
+
+
 class TransferTimeTrackingTFTP(TFTP):
+
+    # Used by `provisioningserver.monkey.fix_tftp_requests`.
+    read_session_class = WindowedRemoteOriginReadSession
+
     @inlineCallbacks
     def _startSession(
         self, datagram, addr, mode, prometheus_metrics=PROMETHEUS_METRICS
@@ -444,11 +610,13 @@ class TransferTimeTrackingTFTP(TFTP):
         if stream_session is not None:
             filename = self._clean_filename(datagram)
             start_time = time()
+            reader = getattr(stream_session, "reader", None)
             stream_session.cancel = track_tftp_latency(
                 stream_session.cancel,
                 start_time,
                 filename,
                 prometheus_metrics=prometheus_metrics,
+                size=getattr(reader, "size", None),
             )
         returnValue(session)
 
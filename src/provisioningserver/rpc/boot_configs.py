@@ -0,0 +1,130 @@
+# Copyright 2020 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""RPC relating to boot configurations."""
+
+from twisted.internet import reactor
+from twisted.internet.defer import fail, succeed
+
+from provisioningserver.prometheus.metrics import PROMETHEUS_METRICS
+from provisioningserver.rpc.exceptions import BootConfigNoResponse
+
+# The number of seconds a boot configuration from the region is cached for.
+BOOT_CONFIG_TTL = 60
+
+
+class BootConfigCache:
+    """Cache the boot configurations the region returns for `GetBootConfig`.
+
+    Booting machines request the same configurations over and over, as they
+    try each file their bootloader looks for, and as they retry. Results,
+    including `BootConfigNoResponse` failures, are cached for `ttl` seconds
+    keyed on the arguments of the request, bar the rack controller's system
+    ID.
+
+    Only the configurations the region marks as cacheable are cached. The
+    region does more than render the configurations of some known machines,
+    e.g. it resets their status timeouts and logs their PXE requests, so
+    those are fetched for every request.
+
+    The region invalidates the configurations of nodes when the fields they
+    are rendered from change, and those of unknown machines when nodes are
+    created, as the configuration of a new node is no longer that of an
+    unknown machine.
+    """
+
+    def __init__(self, ttl=BOOT_CONFIG_TTL, clock=reactor):
+        self.ttl = ttl
+        self.clock = clock
+        # Map of request arguments to (expiry time, result).
+        self._configs = {}
+        # Incremented on invalidation, so that the results of requests made
+        # before are not cached.
+        self._generation = 0
+        self._pruned_at = 0
+
+    def get(self, params, fetch):
+        """Return the boot configuration for the `GetBootConfig` `params`.
+
+        :param fetch: Called with `params` to fetch the configuration from
+            the region when it's not cached; returns a `Deferred`.
+        :return: A `Deferred` firing with a copy of the configuration.
+        """
+        key = tuple(
+            sorted(
+                (name, value)
+                for name, value in params.items()
+                if name != "system_id"
+            )
+        )
+        now = self.clock.seconds()
+        cached = self._configs.get(key)
+        if cached is not None and cached[0] > now:
+            self._record("hit")
+            result = cached[1]
+            if isinstance(result, Exception):
+                return fail(result)
+            return succeed(dict(result))
+
+        self._record("miss")
+        self._prune(now)
+        generation = self._generation
+
+        def store(result):
+            result = dict(result)
+            cacheable = result.pop("cacheable", False)
+            if cacheable and self._generation == generation:
+                self._configs[key] = (now + self.ttl, dict(result))
+            return result
+
+        def store_no_response(failure):
+            failure.trap(BootConfigNoResponse)
+            if self._generation == generation:
+                self._configs[key] = (now + self.ttl, failure.value)
+            return failure
+
+        d = fetch(**params)
+        d.addCallbacks(store, store_no_response)
+        return d
+
+    def invalidate(self, system_ids, unknown=False):
+        """Drop the configurations of the nodes with `system_ids`.
+
+        :param unknown: Whether to drop the configurations of unknown
+            machines too.
+        """
+        self._generation += 1
+        system_ids = set(system_ids)
+        for key, (_, result) in list(self._configs.items()):
+            if isinstance(result, Exception):
+                del self._configs[key]
+            elif result.get("system_id") is None:
+                if unknown:
+                    del self._configs[key]
+            elif result["system_id"] in system_ids:
+                del self._configs[key]
+
+    def _prune(self, now):
+        """Drop the expired configurations, at most once every `ttl`."""
+        if now < self._pruned_at + self.ttl:
+            return
+        self._pruned_at = now
+        for key, (expires, _) in list(self._configs.items()):
+            if expires <= now:
+                del self._configs[key]
+
+    def _record(self, result):
+        PROMETHEUS_METRICS.update(
+            "maas_boot_config_cache_requests",
+            "inc",
+            labels={"result": result},
+        )
+
+
+boot_config_cache = BootConfigCache()
+
+
+def invalidate_boot_configs(system_ids, unknown=False):
+    """Invalidate the cached boot configurations of the nodes with
+    `system_ids`, and those of unknown machines if `unknown`."""
+    boot_config_cache.invalidate(system_ids, unknown=unknown)
@@ -23,6 +23,42 @@ log = LegacyLogger()
 
 
 CACHED_BOOT_IMAGES = None
+CACHED_BOOT_IMAGE_INDEX = None
+
+
+class BootImageIndex:
+    """An index of boot images, to look up the image to boot.
+
+    The images are keyed on their osystem, release, architecture and
+    purpose. For each key, every subarchitecture is mapped to the first image
+    of that subarchitecture or, if there's none, to the first image that
+    supports it.
+    """
+
+    def __init__(self, images):
+        self._images = {}
+        for image in images:
+            subarches = self._images.setdefault(self._get_key(image), {})
+            subarches.setdefault(image["subarchitecture"], image)
+        for image in images:
+            subarches = self._images[self._get_key(image)]
+            for subarch in image.get("supported_subarches", "").split(","):
+                subarches.setdefault(subarch, image)
+
+    def _get_key(self, image):
+        return (
+            image["osystem"],
+            image["release"],
+            image["architecture"],
+            image["purpose"],
+        )
+
+    def get(self, osystem, release, arch, subarch, purpose):
+        """Return the boot image matching the parameters, or None."""
+        subarches = self._images.get((osystem, release, arch, purpose))
+        if subarches is None:
+            return None
+        return subarches.get(subarch)
 
 
 def list_boot_images():
@@ -44,10 +80,22 @@ def list_boot_images():
 def reload_boot_images():
     """Update the cached boot images so `list_boot_images` returns the
     most up-to-date boot images list."""
-    global CACHED_BOOT_IMAGES
+    global CACHED_BOOT_IMAGES, CACHED_BOOT_IMAGE_INDEX
     with ClusterConfiguration.open() as config:
         tftp_root = config.tftp_root
     CACHED_BOOT_IMAGES = tftppath.list_boot_images(tftp_root)
+    CACHED_BOOT_IMAGE_INDEX = BootImageIndex(CACHED_BOOT_IMAGES)
+
+
+def get_boot_image_index():
+    """Return a `BootImageIndex` of the images from `list_boot_images`.
+
+    The index is cached, and rebuilt by `reload_boot_images`.
+    """
+    global CACHED_BOOT_IMAGE_INDEX
+    if CACHED_BOOT_IMAGE_INDEX is None:
+        CACHED_BOOT_IMAGE_INDEX = BootImageIndex(list_boot_images())
+    return CACHED_BOOT_IMAGE_INDEX
 
 
 def get_hosts_from_sources(sources):
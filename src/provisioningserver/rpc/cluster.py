@@ -11,9 +11,11 @@ __all__ = [
     "ConfigureDHCPv4",
     "ConfigureDHCPv4",
     "ConfigureDHCPv4_V2",
+    "ConfigureDHCPv4_V3",
     "ConfigureDHCPv6",
     "ConfigureDHCPv6",
     "ConfigureDHCPv6_V2",
+    "ConfigureDHCPv6_V3",
     "DescribePowerTypes",
     "DescribeNOSTypes",
     "GetPreseedData",
@@ -540,6 +542,55 @@ class _ConfigureDHCP_V2(amp.Command):
     errors = {exceptions.CannotConfigureDHCP: b"CannotConfigureDHCP"}
 
 
+class _ConfigureDHCP_V3(amp.Command):
+    """Configure a DHCP server with the shared networks that changed.
+
+    Only the shared networks, and the hosts on them, that changed since the
+    configuration identified by `base_digest` are sent. When `base_digest` is
+    not given the full configuration is sent. The failover peers, interfaces
+    and global DHCP snippets are always sent in full.
+
+    :since: 2.9
+    """
+
+    arguments = [
+        argument
+        for argument in _ConfigureDHCP_V2.arguments
+        if argument[0] != b"hosts"
+    ] + [
+        (
+            b"hosts",
+            CompressedAmpList(
+                [
+                    (b"host", amp.Unicode()),
+                    (b"mac", amp.Unicode()),
+                    (b"ip", amp.Unicode()),
+                    (
+                        b"dhcp_snippets",
+                        AmpList(
+                            [
+                                (b"name", amp.Unicode()),
+                                (b"description", amp.Unicode(optional=True)),
+                                (b"value", amp.Unicode()),
+                            ],
+                            optional=True,
+                        ),
+                    ),
+                    (b"shared_network", amp.Unicode()),
+                ]
+            ),
+        ),
+        (b"removed_shared_networks", amp.ListOf(amp.Unicode())),
+        (b"base_digest", amp.Unicode(optional=True)),
+        (b"digest", amp.Unicode()),
+    ]
+    response = []
+    errors = {
+        exceptions.CannotConfigureDHCP: b"CannotConfigureDHCP",
+        exceptions.DHCPConfigurationOutOfSync: b"DHCPConfigurationOutOfSync",
+    }
+
+
 class _ValidateDHCPConfig(_ConfigureDHCP):
     """Validate the configure the DHCPv4 server.
 
@@ -598,6 +649,13 @@ class ConfigureDHCPv4_V2(_ConfigureDHCP_V2):
     """
 
 
+class ConfigureDHCPv4_V3(_ConfigureDHCP_V3):
+    """Configure the DHCPv4 server with the shared networks that changed.
+
+    :since: 2.9
+    """
+
+
 class ValidateDHCPv4Config(_ValidateDHCPConfig):
     """Validate the configure the DHCPv4 server.
 
@@ -626,6 +684,13 @@ class ConfigureDHCPv6_V2(_ConfigureDHCP_V2):
     """
 
 
+class ConfigureDHCPv6_V3(_ConfigureDHCP_V3):
+    """Configure the DHCPv6 server with the shared networks that changed.
+
+    :since: 2.9
+    """
+
+
 class ValidateDHCPv6Config(_ValidateDHCPConfig):
     """Configure the DHCPv6 server.
 
@@ -932,3 +997,20 @@ class CheckIPs(amp.Command):
         )
     ]
     errors = {}
+
+
+class InvalidateBootConfigs(amp.Command):
+    """Invalidate the boot configurations cached for nodes.
+
+    The configurations cached for unknown machines are invalidated too when
+    `unknown` is set.
+
+    :since: 2.9
+    """
+
+    arguments = [
+        (b"system_ids", amp.ListOf(amp.Unicode())),
+        (b"unknown", amp.Boolean(optional=True)),
+    ]
+    response = []
+    errors = []
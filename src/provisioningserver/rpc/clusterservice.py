@@ -63,6 +63,7 @@ from provisioningserver.rpc import (
     pods,
     region,
 )
+from provisioningserver.rpc.boot_configs import invalidate_boot_configs
 from provisioningserver.rpc.boot_images import (
     import_boot_images,
     is_import_boot_images_running,
@@ -542,6 +543,57 @@ class Cluster(RPCProtocol):
 
         return d
 
+    @cluster.ConfigureDHCPv4_V3.responder
+    def configure_dhcpv4_v3(
+        self,
+        omapi_key,
+        failover_peers,
+        shared_networks,
+        hosts,
+        interfaces,
+        removed_shared_networks,
+        digest,
+        global_dhcp_snippets=[],
+        base_digest=None,
+    ):
+        server = dhcp.DHCPv4Server(omapi_key)
+        if concurrency.dhcpv4.locked:
+            log.debug(
+                "DHCPv4 configure triggered; another is already processing, "
+                "scheduled next"
+            )
+        else:
+            log.debug("DHCPv4 configure triggered; processing immediately")
+
+        # LP:1785078 - DHCP updating gets stuck and prevents sequential updates
+        # from occurring. Being defensive here and only allowing the DHCP
+        # configure 30 seconds to perform its work.
+        d = concurrency.dhcpv4.run(
+            deferWithTimeout,
+            DHCP_TIMEOUT,
+            dhcp.configure,
+            server,
+            failover_peers,
+            shared_networks,
+            hosts,
+            interfaces,
+            global_dhcp_snippets,
+            removed_shared_networks=removed_shared_networks,
+            base_digest=base_digest,
+            digest=digest,
+        )
+        d.addCallback(lambda _: {})
+
+        # Catch the cancelled error, which means the work timed out.
+        def _timeoutEb(failure):
+            failure.trap(CancelledError)
+            log.err(failure, "DHCPv4 configure timed out")
+            raise CannotConfigureDHCP("timed out") from failure.value
+
+        d.addErrback(_timeoutEb)
+
+        return d
+
     @cluster.ValidateDHCPv4Config.responder
     def validate_dhcpv4_config(
         self,
@@ -650,6 +702,57 @@ class Cluster(RPCProtocol):
 
         return d
 
+    @cluster.ConfigureDHCPv6_V3.responder
+    def configure_dhcpv6_v3(
+        self,
+        omapi_key,
+        failover_peers,
+        shared_networks,
+        hosts,
+        interfaces,
+        removed_shared_networks,
+        digest,
+        global_dhcp_snippets=[],
+        base_digest=None,
+    ):
+        server = dhcp.DHCPv6Server(omapi_key)
+        if concurrency.dhcpv6.locked:
+            log.debug(
+                "DHCPv6 configure triggered; another is already processing, "
+                "scheduled next"
+            )
+        else:
+            log.debug("DHCPv6 configure triggered; processing immediately")
+
+        # LP:1785078 - DHCP updating gets stuck and prevents sequential updates
+        # from occurring. Being defensive here and only allowing the DHCP
+        # configure 30 seconds to perform its work.
+        d = concurrency.dhcpv6.run(
+            deferWithTimeout,
+            DHCP_TIMEOUT,
+            dhcp.configure,
+            server,
+            failover_peers,
+            shared_networks,
+            hosts,
+            interfaces,
+            global_dhcp_snippets,
+            removed_shared_networks=removed_shared_networks,
+            base_digest=base_digest,
+            digest=digest,
+        )
+        d.addCallback(lambda _: {})
+
+        # Catch the cancelled error, which means the work timed out.
+        def _timeoutEb(failure):
+            failure.trap(CancelledError)
+            log.err(failure, "DHCPv6 configure timed out")
+            raise CannotConfigureDHCP("timed out") from failure.value
+
+        d.addErrback(_timeoutEb)
+
+        return d
+
     @cluster.ValidateDHCPv6Config.responder
     def validate_dhcpv6_config(
         self,
@@ -1032,6 +1135,16 @@ class Cluster(RPCProtocol):
         d.addErrback(log.err, "Failed to perform IP address checking.")
         return d
 
+    @cluster.InvalidateBootConfigs.responder
+    def invalidate_boot_configs(self, system_ids, unknown=False):
+        """InvalidateBootConfigs()
+
+        Implementation of
+        :py:class:`~provisioningserver.rpc.cluster.InvalidateBootConfigs`.
+        """
+        invalidate_boot_configs(system_ids, unknown=unknown)
+        return {}
+
 
 @implementer(IConnectionToRegion)
 class ClusterClient(Cluster):
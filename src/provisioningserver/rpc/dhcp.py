@@ -12,6 +12,8 @@ __all__ = [
 ]
 
 from collections import namedtuple
+from hashlib import sha256
+import json
 from operator import itemgetter
 import os
 import re
@@ -30,9 +32,15 @@ from provisioningserver.rpc.exceptions import (
     CannotCreateHostMap,
     CannotModifyHostMap,
     CannotRemoveHostMap,
+    DHCPConfigurationOutOfSync,
 )
 from provisioningserver.service_monitor import service_monitor
-from provisioningserver.utils.fs import sudo_delete_file, sudo_write_file
+from provisioningserver.utils.fs import (
+    atomic_write,
+    read_text_file,
+    sudo_delete_file,
+    sudo_write_file,
+)
 from provisioningserver.utils.service_monitor import (
     SERVICE_STATE,
     ServiceActionError,
@@ -48,6 +56,10 @@ log = LegacyLogger()
 # Holds the current state of DHCPv4 and DHCPv6.
 _current_server_state = {}
 
+# Holds the digest the region gave to the current state of DHCPv4 and DHCPv6,
+# if it was configured with the shared networks that changed.
+_current_server_digest = {}
+
 
 DHCPStateBase = namedtuple(
     "DHCPStateBase",
@@ -146,10 +158,51 @@ class DHCPState(DHCPStateBase):
         )
         return dhcpd_config, " ".join(self.interfaces)
 
+    def merge(self, shared_networks, removed_shared_networks, hosts):
+        """Return the shared networks and hosts of this state, updated with
+        the shared networks that changed.
+
+        :param shared_networks: The shared networks that were added or
+            changed. They replace those of the same name.
+        :param removed_shared_networks: The names of the shared networks
+            that were removed.
+        :param hosts: The hosts on the shared networks that were added or
+            changed. Each has the name of its shared network.
+        """
+        replaced = {
+            shared_network["name"] for shared_network in shared_networks
+        }
+        replaced.update(removed_shared_networks)
+        merged_shared_networks = [
+            shared_network
+            for shared_network in self.shared_networks
+            if shared_network["name"] not in replaced
+        ]
+        merged_shared_networks.extend(shared_networks)
+        merged_hosts = [
+            host
+            for host in self.hosts.values()
+            if host.get("shared_network") not in replaced
+        ]
+        merged_hosts.extend(hosts)
+        return merged_shared_networks, merged_hosts
+
+
+def _get_config_checksum(dhcpd_config, interfaces_config):
+    """Return the checksum of a rendered configuration."""
+    checksum = sha256()
+    checksum.update(dhcpd_config.encode("utf-8"))
+    checksum.update(b"\0")
+    checksum.update(interfaces_config.encode("utf-8"))
+    return checksum.hexdigest()
+
 
 @synchronous
 def _write_config(server, state):
-    """Write the configuration file."""
+    """Write the configuration file.
+
+    :return: The checksum of the configuration that was written.
+    """
     dhcpd_config, interfaces_config = state.get_config(server)
     try:
         sudo_write_file(
@@ -178,6 +231,103 @@ def _write_config(server, state):
             "Could not rewrite %s server configuration: %s"
             % (server.descriptive_name, e.output_as_unicode)
         )
+    return _get_config_checksum(dhcpd_config, interfaces_config)
+
+
+@synchronous
+def _write_state(server, state, digest, checksum):
+    """Save `state` to the server's state file.
+
+    This lets a restarted rack controller carry on from the configuration
+    the DHCP server is running with, updating its host maps over the OMAPI
+    rather than restarting it. Failing to save the state only costs that
+    restart, so it is logged rather than raised.
+    """
+    content = {
+        "omapi_key": state.omapi_key,
+        "failover_peers": state.failover_peers,
+        "shared_networks": state.shared_networks,
+        "hosts": list(state.hosts.values()),
+        "interfaces": state.interfaces,
+        "global_dhcp_snippets": state.global_dhcp_snippets,
+        "digest": digest,
+        "checksum": checksum,
+    }
+    try:
+        atomic_write(
+            json.dumps(content, default=str).encode("utf-8"),
+            server.state_filename,
+            mode=0o600,
+        )
+    except OSError as e:
+        maaslog.warning(
+            "Could not save %s server state: %s", server.descriptive_name, e
+        )
+
+
+@synchronous
+def _read_state(server):
+    """Load the state saved by `_write_state`.
+
+    :return: A `(state, digest)` tuple, or `(None, None)` when there is no
+        usable saved state. That is also the case when the saved state no
+        longer renders to the configuration it was saved with, e.g. after
+        the configuration template changed, or when the configuration files
+        were changed since, e.g. by hand.
+    """
+    try:
+        with open(server.state_filename, "rb") as fd:
+            content = json.loads(fd.read().decode("utf-8"))
+        for shared_network in content["shared_networks"]:
+            for subnet in shared_network["subnets"]:
+                subnet["dns_servers"] = [
+                    IPAddress(dns_server)
+                    for dns_server in subnet["dns_servers"]
+                ]
+        state = DHCPState(
+            content["omapi_key"],
+            content["failover_peers"],
+            content["shared_networks"],
+            content["hosts"],
+            [{"name": name} for name in content["interfaces"]],
+            content["global_dhcp_snippets"],
+        )
+        checksum = _get_config_checksum(*state.get_config(server))
+        file_checksum = _get_config_checksum(
+            read_text_file(server.config_filename),
+            read_text_file(server.interfaces_filename),
+        )
+    except FileNotFoundError:
+        return None, None
+    except Exception as e:
+        maaslog.warning(
+            "Ignoring saved %s server state: %s", server.descriptive_name, e
+        )
+        return None, None
+    if checksum != content["checksum"]:
+        log.debug(
+            "Ignoring saved {name} server state; its configuration has "
+            "changed.",
+            name=server.descriptive_name,
+        )
+        return None, None
+    if file_checksum != content["checksum"]:
+        log.debug(
+            "Ignoring saved {name} server state; its configuration files "
+            "have changed.",
+            name=server.descriptive_name,
+        )
+        return None, None
+    return state, content["digest"]
+
+
+@synchronous
+def _delete_state(server):
+    """Delete the server's state file."""
+    try:
+        os.remove(server.state_filename)
+    except FileNotFoundError:
+        pass
 
 
 @synchronous
@@ -192,18 +342,17 @@ def _update_hosts(server, remove, add, modify):
     """Update the hosts using the OMAPI."""
     omapi_client = OmapiClient(server.omapi_key, server.ipv6)
     try:
-        for host in remove:
-            omapi_client.del_host(host["mac"])
+        omapi_client.del_hosts([host["mac"] for host in remove])
     except OmapiError as e:
         raise CannotRemoveHostMap(str(e))
     try:
-        for host in add:
-            omapi_client.add_host(host["mac"], host["ip"])
+        omapi_client.add_hosts([(host["mac"], host["ip"]) for host in add])
     except OmapiError as e:
         raise CannotCreateHostMap(str(e))
     try:
-        for host in modify:
-            omapi_client.update_host(host["mac"], host["ip"])
+        omapi_client.update_hosts(
+            [(host["mac"], host["ip"]) for host in modify]
+        )
     except OmapiError as e:
         raise CannotModifyHostMap(str(e))
 
@@ -270,6 +419,9 @@ def configure(
     hosts,
     interfaces,
     global_dhcp_snippets=None,
+    removed_shared_networks=None,
+    base_digest=None,
+    digest=None,
 ):
     """Configure the DHCPv6/DHCPv4 server, and restart it as appropriate.
 
@@ -286,7 +438,34 @@ def configure(
         contain a list of hosts the DHCP should statically.
     :param interfaces: List of interfaces that DHCP should use.
     :param global_dhcp_snippets: List of all global DHCP snippets
+    :param removed_shared_networks: Names of the shared networks that were
+        removed since the configuration with `base_digest`.
+    :param base_digest: The digest of the configuration that
+        `shared_networks`, `removed_shared_networks` and `hosts` are changes
+        to. When not given they are the full configuration.
+    :param digest: The digest of the configuration once the changes are
+        applied.
+    :raise DHCPConfigurationOutOfSync: When `base_digest` is not the digest
+        of the current configuration.
     """
+    if server.dhcp_service not in _current_server_state:
+        # The rack controller (re)started; carry on from the saved state.
+        state, saved_digest = yield deferToThread(_read_state, server)
+        _current_server_state[server.dhcp_service] = state
+        _current_server_digest[server.dhcp_service] = saved_digest
+    if base_digest is not None:
+        current_state = _current_server_state.get(server.dhcp_service, None)
+        current_digest = _current_server_digest.get(server.dhcp_service, None)
+        if current_state is None or current_digest != base_digest:
+            raise DHCPConfigurationOutOfSync(
+                "%s server configuration is not the one the changes are "
+                "based on." % server.descriptive_name
+            )
+        shared_networks, hosts = current_state.merge(
+            shared_networks, removed_shared_networks or [], hosts
+        )
+    _current_server_digest[server.dhcp_service] = None
+
     stopping = len(shared_networks) == 0
 
     if global_dhcp_snippets is None:
@@ -301,6 +480,7 @@ def configure(
         # Remove the config so that the even an administrator cannot turn it on
         # accidently when it should be off.
         yield deferToThread(_delete_config, server)
+        yield deferToThread(_delete_state, server)
 
         # Ensure that the service is off and is staying off.
         service = service_monitor.getServiceByName(server.dhcp_service)
@@ -327,7 +507,7 @@ def configure(
             "Writing updated DHCP configuration for {name} service.",
             name=server.descriptive_name,
         )
-        yield deferToThread(_write_config, server, new_state)
+        checksum = yield deferToThread(_write_config, server, new_state)
 
         # Service should always be on if shared_networks exists.
         service = service_monitor.getServiceByName(server.dhcp_service)
@@ -432,6 +612,10 @@ def configure(
 
         # Update the current state to the new state.
         _current_server_state[server.dhcp_service] = new_state
+        _current_server_digest[server.dhcp_service] = digest
+        yield deferToThread(
+            _write_state, server, new_state, digest, checksum
+        )
 
 
 def _parse_dhcpd_errors(error_str):
@@ -60,6 +60,10 @@ class CannotConfigureDHCP(Exception):
     """Failure while configuring a DHCP server."""
 
 
+class DHCPConfigurationOutOfSync(Exception):
+    """The DHCP server's configuration is not the one a change was based on."""
+
+
 class CannotCreateHostMap(Exception):
     """The host map could not be created."""
 
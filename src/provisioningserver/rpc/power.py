@@ -3,6 +3,7 @@
 
 """Power control."""
 
+from collections import deque
 from datetime import timedelta
 from functools import partial
 import sys
@@ -10,6 +11,7 @@ import sys
 from twisted.internet import reactor
 from twisted.internet.defer import (
     CancelledError,
+    Deferred,
     DeferredList,
     DeferredSemaphore,
     inlineCallbacks,
@@ -17,6 +19,8 @@ from twisted.internet.defer import (
     succeed,
 )
 from twisted.internet.task import deferLater
+from twisted.protocols.amp import UnhandledCommand
+from twisted.python.failure import Failure
 
 from provisioningserver.drivers.power import get_error_message, PowerError
 from provisioningserver.drivers.power.registry import PowerDriverRegistry
@@ -28,12 +32,17 @@ from provisioningserver.rpc.exceptions import (
     PowerActionAlreadyInProgress,
     PowerActionFail,
 )
-from provisioningserver.rpc.region import MarkNodeFailed, UpdateNodePowerState
+from provisioningserver.rpc.region import (
+    MarkNodeFailed,
+    UpdateNodePowerState,
+    UpdateNodePowerStates,
+)
 from provisioningserver.utils.twisted import (
     asynchronous,
     callOut,
     deferred,
     deferWithTimeout,
+    pause,
 )
 
 maaslog = get_maas_logger("power")
@@ -367,45 +376,139 @@ def get_power_state(system_id, hostname, power_type, context, clock=reactor):
     raise exc_type(exc_value).with_traceback(exc_trace)
 
 
+class PowerStateReports:
+    """The results of power queries, to be reported to the region together.
+
+    See `query_all_nodes`.
+    """
+
+    # The maximum number of power states reported in one RPC call.
+    batch_size = 500
+
+    def __init__(self):
+        self.states = []
+        self.hostnames = {}
+
+    def add(self, system_id, hostname, power_state, error=None):
+        """Add the result of querying a node's power state."""
+        state = {"system_id": system_id, "power_state": power_state}
+        if error is not None:
+            state["error"] = error
+        self.states.append(state)
+        self.hostnames[system_id] = hostname
+
+    @asynchronous
+    @inlineCallbacks
+    def send(self):
+        """Report the power states to the region.
+
+        A region that doesn't support `UpdateNodePowerStates` is sent them
+        one at a time. Failures are logged rather than raised.
+        """
+        states, self.states = self.states, []
+        if len(states) == 0:
+            return
+        try:
+            client = getRegionClient()
+            for start in range(0, len(states), self.batch_size):
+                batch = states[start : start + self.batch_size]
+                try:
+                    response = yield client(
+                        UpdateNodePowerStates, states=batch
+                    )
+                except UnhandledCommand:
+                    yield DeferredList(
+                        map(self._send_one, batch), consumeErrors=True
+                    )
+                else:
+                    for system_id in response["missing"]:
+                        self._report_missing(system_id)
+        except Exception:
+            failure = Failure()
+            log.err(failure, "Reporting node power states.")
+            maaslog.error(
+                "Failed to report nodes' power states: %s",
+                failure.getErrorMessage(),
+            )
+
+    @inlineCallbacks
+    def _send_one(self, state):
+        system_id = state["system_id"]
+        try:
+            yield power_state_update(system_id, state["power_state"])
+        except NoSuchNode:
+            self._report_missing(system_id)
+            return
+        if "error" in state:
+            yield send_node_event(
+                EVENT_TYPES.NODE_POWER_QUERY_FAILED,
+                system_id,
+                self.hostnames[system_id],
+                state["error"],
+            )
+
+    def _report_missing(self, system_id):
+        log.debug(
+            "{hostname}: Could not update power state: no such node.",
+            hostname=self.hostnames[system_id],
+        )
+
+
 @inlineCallbacks
-def power_query_success(system_id, hostname, state):
-    """Report a node that for which power querying has succeeded."""
+def power_query_success(system_id, hostname, state, reports=None):
+    """Report a node that for which power querying has succeeded.
+
+    :param reports: The `PowerStateReports` to add the report to, rather
+        than sending it to the region right away.
+    """
     log.debug(f"Power state queried for node {system_id}: {state}")
-    yield power_state_update(system_id, state)
+    if reports is None:
+        yield power_state_update(system_id, state)
+    else:
+        reports.add(system_id, hostname, state)
 
 
 @inlineCallbacks
-def power_query_failure(system_id, hostname, failure):
-    """Report a node that for which power querying has failed."""
+def power_query_failure(system_id, hostname, failure, reports=None):
+    """Report a node that for which power querying has failed.
+
+    :param reports: The `PowerStateReports` to add the report to, rather
+        than sending it to the region right away.
+    """
     maaslog.error(
         "%s: Power state could not be queried: %s"
         % (hostname, failure.getErrorMessage())
     )
-    yield power_state_update(system_id, "error")
-    yield send_node_event(
-        EVENT_TYPES.NODE_POWER_QUERY_FAILED,
-        system_id,
-        hostname,
-        failure.getErrorMessage(),
-    )
+    if reports is None:
+        yield power_state_update(system_id, "error")
+        yield send_node_event(
+            EVENT_TYPES.NODE_POWER_QUERY_FAILED,
+            system_id,
+            hostname,
+            failure.getErrorMessage(),
+        )
+    else:
+        reports.add(system_id, hostname, "error", failure.getErrorMessage())
 
 
 @asynchronous
-def report_power_state(d, system_id, hostname):
+def report_power_state(d, system_id, hostname, reports=None):
     """Report the result of a power query.
 
     :param d: A `Deferred` that will fire with the node's updated power state,
         or an error condition. The callback/errback values are passed through
         unaltered. See `get_power_state` for details.
+    :param reports: The `PowerStateReports` to add the result to, rather
+        than sending it to the region right away.
     """
 
     def cb(state):
-        d = power_query_success(system_id, hostname, state)
+        d = power_query_success(system_id, hostname, state, reports)
         d.addCallback(lambda _: state)
         return d
 
     def eb(failure):
-        d = power_query_failure(system_id, hostname, failure)
+        d = power_query_failure(system_id, hostname, failure, reports)
         d.addCallback(lambda _: failure)
         return d
 
@@ -450,10 +553,177 @@ def maaslog_report_failure(node, failure):
         # log.err(failure, "Failed to refresh power state.")
 
 
-def query_node(node, clock):
+class _PowerQueryLimiter:
+    """The limit on concurrent queries for one power type.
+
+    See `PowerQueryScheduler`.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.waiting = deque()
+        # Moving averages of the latency and failure of queries.
+        self.latency = 0.0
+        self.error_rate = 0.0
+        # The queries completed since the limit was last raised.
+        self.successes = 0
+        # When the limit was last lowered.
+        self.lowered_at = float("-inf")
+
+    def acquire(self):
+        d = Deferred()
+        self.waiting.append(d)
+        self._start()
+        return d
+
+    def release(self):
+        self.active -= 1
+        self._start()
+
+    def _start(self):
+        while len(self.waiting) > 0 and self.active < self.limit:
+            self.active += 1
+            self.waiting.popleft().callback(None)
+
+
+class PowerQueryScheduler:
+    """Schedule power queries, adapting their concurrency to each power type.
+
+    Each power type has its own limit on the number of queries in progress,
+    starting at `initial_concurrency`. While queries are waiting, the limit
+    is raised by one each time as many queries as the limit complete. It's
+    halved when the moving average of the latency of queries exceeds
+    `target_latency` seconds, or that of their failures exceeds
+    `max_error_rate`; only once, though, for the queries that were already
+    in progress when it was last lowered. BMCs that answer quickly are thus
+    queried many at a time, and slow or failing ones few at a time.
+
+    The queries of a cycle can also be paced, see `start_cycle`, so that
+    they're spread across the cycle rather than started in a burst.
+    """
+
+    initial_concurrency = 5
+    min_concurrency = 1
+    max_concurrency = 64
+    target_latency = 10.0
+    max_error_rate = 0.5
+    # The weight of each query in the moving averages.
+    smoothing = 0.1
+
+    def __init__(self, clock=None):
+        self.clock = reactor if clock is None else clock
+        # The number of queries waiting to start.
+        self.backlog = 0
+        self._limiters = {}
+        self._spacing = 0
+        self._next_start = 0
+        self._deadline = 0
+
+    @property
+    def concurrency(self):
+        """The limit on concurrent queries for each power type."""
+        return {
+            power_type: limiter.limit
+            for power_type, limiter in self._limiters.items()
+        }
+
+    def start_cycle(self, expected, interval):
+        """Spread the starts of the next `expected` queries across `interval`
+        seconds.
+
+        Queries that would start after `interval` has elapsed, because more
+        than expected are due, are not paced.
+        """
+        now = self.clock.seconds()
+        self._spacing = interval / expected if expected > 0 else 0
+        self._next_start = now
+        self._deadline = now + interval
+
+    @inlineCallbacks
+    def acquire(self, power_type):
+        """Wait for a query of a node with `power_type` to be allowed to start.
+
+        :return: A `Deferred` that fires with a function to call with the
+            outcome of the query once it completes: a power state, a
+            `Failure`, or None if the node wasn't queried after all. That
+            function returns the outcome unaltered.
+        """
+        limiter = self._limiters.get(power_type)
+        if limiter is None:
+            limiter = _PowerQueryLimiter(self.initial_concurrency)
+            self._limiters[power_type] = limiter
+        self.backlog += 1
+        try:
+            delay = self._pace()
+            if delay > 0:
+                yield pause(delay, self.clock)
+            yield limiter.acquire()
+        finally:
+            self.backlog -= 1
+        started = self.clock.seconds()
+
+        def release(outcome):
+            if outcome is not None:
+                self._adapt(limiter, started, isinstance(outcome, Failure))
+            limiter.release()
+            return outcome
+
+        return release
+
+    def _pace(self):
+        """Return how long to wait before starting the next query."""
+        now = self.clock.seconds()
+        start = max(now, self._next_start)
+        if start >= self._deadline:
+            return 0
+        self._next_start = start + self._spacing
+        return start - now
+
+    def _adapt(self, limiter, started, failed):
+        """Adapt the limit of `limiter` to the outcome of a query."""
+        now = self.clock.seconds()
+        limiter.latency += self.smoothing * (now - started - limiter.latency)
+        limiter.error_rate += self.smoothing * (failed - limiter.error_rate)
+        if (
+            limiter.latency > self.target_latency
+            or limiter.error_rate > self.max_error_rate
+        ):
+            if started > limiter.lowered_at:
+                limiter.limit = max(self.min_concurrency, limiter.limit // 2)
+                limiter.lowered_at = now
+                limiter.successes = 0
+        elif len(limiter.waiting) > 0:
+            limiter.successes += 1
+            if limiter.successes >= limiter.limit:
+                limiter.limit = min(self.max_concurrency, limiter.limit + 1)
+                limiter.successes = 0
+
+
+def query_node(node, clock, reports=None, scheduler=None):
     """Calls `get_power_state` on the given node.
 
     Logs to maaslog as errors and power states change.
+
+    :param reports: The `PowerStateReports` to add the result to, rather
+        than sending it to the region right away.
+    :param scheduler: The `PowerQueryScheduler` to wait for before querying
+        the node.
+    """
+    if scheduler is None:
+        return _query_node(node, clock, reports)
+    else:
+        d = scheduler.acquire(node["power_type"])
+        d.addCallback(
+            lambda release: _query_node(node, clock, reports, release)
+        )
+        return d
+
+
+def _query_node(node, clock, reports, release=None):
+    """Query the node; see `query_node`.
+
+    :param release: A function to call with the outcome of the query.
     """
     if node["system_id"] in power_action_registry:
         log.debug(
@@ -461,6 +731,8 @@ def query_node(node, clock):
             "power action already in progress.",
             hostname=node["hostname"],
         )
+        if release is not None:
+            release(None)
         return succeed(None)
     else:
         d = get_power_state(
@@ -470,7 +742,11 @@ def query_node(node, clock):
             node["context"],
             clock=clock,
         )
-        d = report_power_state(d, node["system_id"], node["hostname"])
+        if release is not None:
+            d.addBoth(release)
+        d = report_power_state(
+            d, node["system_id"], node["hostname"], reports=reports
+        )
         d.addCallbacks(
             partial(maaslog_report_success, node),
             partial(maaslog_report_failure, node),
@@ -478,18 +754,31 @@ def query_node(node, clock):
         return d
 
 
-def query_all_nodes(nodes, max_concurrency=5, clock=reactor):
+def query_all_nodes(nodes, max_concurrency=5, clock=reactor, scheduler=None):
     """Queries the given nodes for their power state.
 
-    Nodes' states are reported back to the region.
+    Nodes' states are reported back to the region once all of them have
+    been queried, with a single `UpdateNodePowerStates` call per batch of
+    `PowerStateReports.batch_size` nodes.
 
+    :param max_concurrency: The number of nodes to query at once, unless a
+        `PowerQueryScheduler` is given as `scheduler` to schedule them.
     :return: A deferred, which fires once all nodes have been queried,
-        successfully or not.
+        successfully or not, and their states reported.
     """
-    semaphore = DeferredSemaphore(tokens=max_concurrency)
-    queries = (
-        semaphore.run(query_node, node, clock)
-        for node in nodes
-        if node["power_type"] in PowerDriverRegistry
-    )
-    return DeferredList(queries, consumeErrors=True)
+    reports = PowerStateReports()
+    nodes = [
+        node for node in nodes if node["power_type"] in PowerDriverRegistry
+    ]
+    if scheduler is None:
+        semaphore = DeferredSemaphore(tokens=max_concurrency)
+        queries = (
+            semaphore.run(query_node, node, clock, reports) for node in nodes
+        )
+    else:
+        queries = (
+            query_node(node, clock, reports, scheduler) for node in nodes
+        )
+    d = DeferredList(queries, consumeErrors=True)
+    d.addCallback(callOut, reports.send)
+    return d
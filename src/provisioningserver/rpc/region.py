@@ -34,6 +34,7 @@ __all__ = [
     "UpdateInterfaces",
     "UpdateLastImageSync",
     "UpdateNodePowerState",
+    "UpdateNodePowerStates",
 ]
 
 from twisted.protocols import amp
@@ -41,6 +42,7 @@ from twisted.protocols import amp
 from provisioningserver.rpc.arguments import (
     AmpList,
     Bytes,
+    CompressedAmpList,
     ParsedURL,
     StructureAsJSON,
 )
@@ -154,6 +156,9 @@ class GetBootConfig(amp.Command):
         # will try to use TGT as Twisted sets optional parameters to False when
         # not defined.
         (b"http_boot", amp.Boolean(optional=True)),
+        # Whether the rack controller can cache the configuration, i.e. the
+        # region has nothing more to do when it's requested again.
+        (b"cacheable", amp.Boolean(optional=True)),
     ]
     errors = {BootConfigNoResponse: b"BootConfigNoResponse"}
 
@@ -344,6 +349,34 @@ class UpdateNodePowerState(amp.Command):
     errors = {NoSuchNode: b"NoSuchNode"}
 
 
+class UpdateNodePowerStates(amp.Command):
+    """Update the power states of many nodes at once.
+
+    Each entry may carry the `error` with which querying the node's power
+    state failed, recorded as a `NODE_POWER_QUERY_FAILED` event.
+
+    :since: 2.9
+    """
+
+    arguments = [
+        (
+            b"states",
+            CompressedAmpList(
+                [
+                    (b"system_id", amp.Unicode()),
+                    (b"power_state", amp.Unicode()),
+                    (b"error", amp.Unicode(optional=True)),
+                ]
+            ),
+        )
+    ]
+    response = [
+        # The system_ids of the nodes that don't exist.
+        (b"missing", amp.ListOf(amp.Unicode()))
+    ]
+    errors = []
+
+
 class RegisterEventType(amp.Command):
     """Register an event type.
 
@@ -552,6 +585,36 @@ class UpdateLease(amp.Command):
     errors = {NoSuchCluster: b"NoSuchCluster"}
 
 
+class UpdateLeases(amp.Command):
+    """Report a batch of DHCP lease updates from a rack controller.
+
+    The updates are applied in order, as `UpdateLease` would apply each of
+    them, but in a single transaction.
+
+    :since: 2.9
+    """
+
+    arguments = [
+        (b"cluster_uuid", amp.Unicode()),
+        (
+            b"updates",
+            CompressedAmpList(
+                [
+                    (b"action", amp.Unicode()),
+                    (b"mac", amp.Unicode()),
+                    (b"ip_family", amp.Unicode()),
+                    (b"ip", amp.Unicode()),
+                    (b"timestamp", amp.Integer()),
+                    (b"lease_time", amp.Integer(optional=True)),
+                    (b"hostname", amp.Unicode(optional=True)),
+                ]
+            ),
+        ),
+    ]
+    response = []
+    errors = {NoSuchCluster: b"NoSuchCluster"}
+
+
 class UpdateServices(amp.Command):
     """Report service statuses that are monitored on the rackd.
 
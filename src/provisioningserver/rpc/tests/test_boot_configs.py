@@ -0,0 +1,227 @@
+# Copyright 2020 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for provisioningserver.rpc.boot_configs"""
+
+
+from unittest.mock import Mock
+
+import prometheus_client
+from twisted.internet.defer import Deferred, fail, succeed
+from twisted.internet.task import Clock
+
+from maastesting.factory import factory
+from maastesting.matchers import MockCalledOnceWith
+from maastesting.testcase import MAASTestCase
+from provisioningserver.prometheus.metrics import METRICS_DEFINITIONS
+from provisioningserver.prometheus.utils import create_metrics
+from provisioningserver.rpc import boot_configs
+from provisioningserver.rpc.boot_configs import (
+    BootConfigCache,
+    invalidate_boot_configs,
+)
+from provisioningserver.rpc.exceptions import BootConfigNoResponse
+
+
+def make_params(**params):
+    params.setdefault("system_id", factory.make_name("rack"))
+    params.setdefault("mac", factory.make_mac_address())
+    params.setdefault("arch", factory.make_name("arch"))
+    params.setdefault("remote_ip", factory.make_ipv4_address())
+    return params
+
+
+def make_config(system_id=None, cacheable=True):
+    return {"system_id": system_id, "cacheable": cacheable}
+
+
+def extract_result(d):
+    results = []
+    d.addBoth(results.append)
+    return results[0]
+
+
+class TestBootConfigCache(MAASTestCase):
+    def make_cache(self, ttl=60):
+        return BootConfigCache(ttl=ttl, clock=Clock())
+
+    def test_fetches_config_on_miss(self):
+        cache = self.make_cache()
+        system_id = factory.make_name("system_id")
+        fetch = Mock(return_value=succeed(make_config(system_id)))
+        params = make_params()
+        self.assertEqual(
+            {"system_id": system_id}, extract_result(cache.get(params, fetch))
+        )
+        self.assertThat(fetch, MockCalledOnceWith(**params))
+
+    def test_returns_cached_config_on_hit(self):
+        cache = self.make_cache()
+        system_id = factory.make_name("system_id")
+        fetch = Mock(return_value=succeed(make_config(system_id)))
+        params = make_params()
+        cache.get(params, fetch)
+        self.assertEqual(
+            {"system_id": system_id}, extract_result(cache.get(params, fetch))
+        )
+        self.assertThat(fetch, MockCalledOnceWith(**params))
+
+    def test_returns_copies_of_cached_config(self):
+        cache = self.make_cache()
+        system_id = factory.make_name("system_id")
+        fetch = Mock(return_value=succeed(make_config(system_id)))
+        params = make_params()
+        extract_result(cache.get(params, fetch)).pop("system_id")
+        extract_result(cache.get(params, fetch)).pop("system_id")
+        self.assertEqual(
+            {"system_id": system_id}, extract_result(cache.get(params, fetch))
+        )
+
+    def test_does_not_cache_uncacheable_config(self):
+        cache = self.make_cache()
+        system_id = factory.make_name("system_id")
+        fetch = Mock(
+            return_value=succeed(make_config(system_id, cacheable=False))
+        )
+        params = make_params()
+        self.assertEqual(
+            {"system_id": system_id}, extract_result(cache.get(params, fetch))
+        )
+        cache.get(params, fetch)
+        self.assertEqual(2, fetch.call_count)
+        self.assertEqual({}, cache._configs)
+
+    def test_does_not_cache_config_without_cacheable_flag(self):
+        cache = self.make_cache()
+        fetch = Mock(return_value=succeed({"system_id": None}))
+        params = make_params()
+        cache.get(params, fetch)
+        cache.get(params, fetch)
+        self.assertEqual(2, fetch.call_count)
+
+    def test_ignores_rack_system_id(self):
+        cache = self.make_cache()
+        fetch = Mock(return_value=succeed(make_config()))
+        params = make_params()
+        cache.get(params, fetch)
+        cache.get(dict(params, system_id=factory.make_name("rack")), fetch)
+        self.assertEqual(1, fetch.call_count)
+
+    def test_fetches_different_params_separately(self):
+        cache = self.make_cache()
+        fetch = Mock(return_value=succeed(make_config()))
+        cache.get(make_params(), fetch)
+        cache.get(make_params(), fetch)
+        self.assertEqual(2, fetch.call_count)
+
+    def test_fetches_config_again_once_expired(self):
+        cache = self.make_cache(ttl=10)
+        fetch = Mock(return_value=succeed(make_config()))
+        params = make_params()
+        cache.get(params, fetch)
+        cache.clock.advance(10)
+        cache.get(params, fetch)
+        self.assertEqual(2, fetch.call_count)
+
+    def test_prunes_expired_configs(self):
+        cache = self.make_cache(ttl=10)
+        fetch = Mock(return_value=succeed(make_config()))
+        cache.get(make_params(), fetch)
+        cache.clock.advance(10)
+        cache.get(make_params(), fetch)
+        self.assertEqual(1, len(cache._configs))
+
+    def test_caches_no_response(self):
+        cache = self.make_cache()
+        fetch = Mock(return_value=fail(BootConfigNoResponse()))
+        params = make_params()
+        self.assertRaises(
+            BootConfigNoResponse,
+            extract_result(cache.get(params, fetch)).raiseException,
+        )
+        self.assertRaises(
+            BootConfigNoResponse,
+            extract_result(cache.get(params, fetch)).raiseException,
+        )
+        self.assertEqual(1, fetch.call_count)
+
+    def test_does_not_cache_other_failures(self):
+        cache = self.make_cache()
+        fetch = Mock(side_effect=lambda **params: fail(ZeroDivisionError()))
+        params = make_params()
+        extract_result(cache.get(params, fetch)).trap(ZeroDivisionError)
+        extract_result(cache.get(params, fetch)).trap(ZeroDivisionError)
+        self.assertEqual(2, fetch.call_count)
+
+    def test_invalidate_drops_configs_of_nodes(self):
+        cache = self.make_cache()
+        system_id = factory.make_name("system_id")
+        other_system_id = factory.make_name("system_id")
+        params, other_params = make_params(), make_params()
+        cache.get(params, Mock(return_value=succeed(make_config(system_id))))
+        cache.get(
+            other_params,
+            Mock(return_value=succeed(make_config(other_system_id))),
+        )
+        cache.invalidate([system_id])
+        fetch = Mock(return_value=succeed(make_config(system_id)))
+        cache.get(params, fetch)
+        cache.get(other_params, fetch)
+        self.assertThat(fetch, MockCalledOnceWith(**params))
+
+    def test_invalidate_drops_configs_of_unknown_machines(self):
+        cache = self.make_cache()
+        params, no_response_params = make_params(), make_params()
+        cache.get(params, Mock(return_value=succeed(make_config())))
+        cache.get(
+            no_response_params,
+            Mock(return_value=fail(BootConfigNoResponse())),
+        ).addErrback(lambda failure: None)
+        cache.invalidate([], unknown=True)
+        self.assertEqual({}, cache._configs)
+
+    def test_invalidate_keeps_configs_of_unknown_machines(self):
+        cache = self.make_cache()
+        params = make_params()
+        cache.get(params, Mock(return_value=succeed(make_config())))
+        cache.invalidate([factory.make_name("system_id")])
+        self.assertEqual(1, len(cache._configs))
+
+    def test_does_not_cache_config_fetched_before_invalidation(self):
+        cache = self.make_cache()
+        d = Deferred()
+        params = make_params()
+        cache.get(params, Mock(return_value=d))
+        cache.invalidate([])
+        d.callback(make_config())
+        self.assertEqual({}, cache._configs)
+
+    def test_records_hits_and_misses(self):
+        prometheus_metrics = create_metrics(
+            METRICS_DEFINITIONS, registry=prometheus_client.CollectorRegistry()
+        )
+        self.patch(boot_configs, "PROMETHEUS_METRICS", prometheus_metrics)
+        cache = self.make_cache()
+        fetch = Mock(return_value=succeed(make_config()))
+        params = make_params()
+        for _ in range(3):
+            cache.get(params, fetch)
+        metrics = prometheus_metrics.generate_latest().decode("ascii")
+        self.assertIn(
+            'maas_boot_config_cache_requests_total{result="miss"} 1.0',
+            metrics,
+        )
+        self.assertIn(
+            'maas_boot_config_cache_requests_total{result="hit"} 2.0',
+            metrics,
+        )
+
+
+class TestInvalidateBootConfigs(MAASTestCase):
+    def test_invalidates_global_cache(self):
+        cache = self.patch(boot_configs, "boot_config_cache")
+        system_ids = [factory.make_name("system_id")]
+        invalidate_boot_configs(system_ids, unknown=True)
+        self.assertThat(
+            cache.invalidate, MockCalledOnceWith(system_ids, unknown=True)
+        )
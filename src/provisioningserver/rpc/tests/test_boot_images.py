@@ -23,7 +23,9 @@ from provisioningserver.import_images import boot_resources
 from provisioningserver.rpc import boot_images, region
 from provisioningserver.rpc.boot_images import (
     _run_import,
+    BootImageIndex,
     fix_sources_for_cluster,
+    get_boot_image_index,
     get_hosts_from_sources,
     import_boot_images,
     is_import_boot_images_running,
@@ -32,6 +34,10 @@ from provisioningserver.rpc.boot_images import (
 )
 from provisioningserver.rpc.region import UpdateLastImageSync
 from provisioningserver.rpc.testing import MockLiveClusterToRegionRPCFixture
+from provisioningserver.testing.boot_images import (
+    make_boot_image_params,
+    make_image,
+)
 from provisioningserver.testing.config import (
     BootSourcesFixture,
     ClusterConfigurationFixture,
@@ -85,12 +91,103 @@ class TestReloadBootImages(MAASTestCase):
         self.patch(
             boot_images, "CACHED_BOOT_IMAGES", factory.make_name("old_cache")
         )
-        fake_boot_images = [factory.make_name("image") for _ in range(3)]
+        self.patch(boot_images, "CACHED_BOOT_IMAGE_INDEX", sentinel.index)
+        fake_boot_images = [
+            make_image(make_boot_image_params(), "commissioning")
+            for _ in range(3)
+        ]
         mock_list_boot_images = self.patch(tftppath, "list_boot_images")
         mock_list_boot_images.return_value = fake_boot_images
         reload_boot_images()
         self.assertEqual(boot_images.CACHED_BOOT_IMAGES, fake_boot_images)
 
+    def test_rebuilds_CACHED_BOOT_IMAGE_INDEX(self):
+        self.patch(boot_images, "CACHED_BOOT_IMAGE_INDEX", sentinel.index)
+        image = make_image(make_boot_image_params(), "commissioning")
+        self.patch(tftppath, "list_boot_images").return_value = [image]
+        reload_boot_images()
+        self.assertIsInstance(
+            boot_images.CACHED_BOOT_IMAGE_INDEX, BootImageIndex
+        )
+        self.assertIs(
+            image,
+            get_boot_image_index().get(
+                image["osystem"],
+                image["release"],
+                image["architecture"],
+                image["subarchitecture"],
+                "commissioning",
+            ),
+        )
+
+
+class TestGetBootImageIndex(MAASTestCase):
+    def test_builds_index_of_listed_images(self):
+        self.patch(boot_images, "CACHED_BOOT_IMAGE_INDEX", None)
+        mock_list_boot_images = self.patch(boot_images, "list_boot_images")
+        mock_list_boot_images.return_value = []
+        index = get_boot_image_index()
+        self.assertIsInstance(index, BootImageIndex)
+        self.assertIs(index, get_boot_image_index())
+        self.assertThat(mock_list_boot_images, MockCalledOnceWith())
+
+
+class TestBootImageIndex(MAASTestCase):
+    def get(self, index, image, subarch=None):
+        return index.get(
+            image["osystem"],
+            image["release"],
+            image["architecture"],
+            image["subarchitecture"] if subarch is None else subarch,
+            image["purpose"],
+        )
+
+    def test_get_returns_image(self):
+        params = make_boot_image_params()
+        images = [
+            make_image(params, purpose)
+            for purpose in ("commissioning", "install", "xinstall")
+        ]
+        index = BootImageIndex(images)
+        for image in images:
+            self.assertIs(image, self.get(index, image))
+
+    def test_get_returns_None_for_unknown_image(self):
+        image = make_image(make_boot_image_params(), "commissioning")
+        index = BootImageIndex([image])
+        self.assertIsNone(
+            self.get(index, dict(image, release=factory.make_name("release")))
+        )
+        self.assertIsNone(
+            self.get(index, image, subarch=factory.make_name("subarch"))
+        )
+
+    def test_get_returns_image_by_its_supported_subarches(self):
+        params = make_boot_image_params()
+        params["supported_subarches"] = "hwe-x,hwe-y"
+        image = make_image(params, "commissioning")
+        index = BootImageIndex([image])
+        self.assertIs(image, self.get(index, image, subarch="hwe-y"))
+
+    def test_get_prefers_image_of_subarch(self):
+        params = make_boot_image_params()
+        params["supported_subarches"] = "hwe-x"
+        supporting_image = make_image(params, "commissioning")
+        params["subarchitecture"] = "hwe-x"
+        params["supported_subarches"] = ""
+        image = make_image(params, "commissioning")
+        index = BootImageIndex([supporting_image, image])
+        self.assertIs(image, self.get(index, image))
+
+    def test_get_prefers_first_supporting_image(self):
+        params = make_boot_image_params()
+        params["supported_subarches"] = "hwe-x"
+        first_image = make_image(params, "commissioning")
+        params["subarchitecture"] = factory.make_name("subarch")
+        second_image = make_image(params, "commissioning")
+        index = BootImageIndex([first_image, second_image])
+        self.assertIs(first_image, self.get(index, first_image, "hwe-x"))
+
 
 class TestGetHostsFromSources(MAASTestCase):
     def test_returns_set_of_hosts_from_sources(self):
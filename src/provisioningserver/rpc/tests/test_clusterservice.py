@@ -2747,6 +2747,99 @@ class TestClusterProtocol_ConfigureDHCP(MAASTestCase):
             )
 
 
+class TestClusterProtocol_ConfigureDHCP_V3(MAASTestCase):
+
+    scenarios = (
+        (
+            "DHCPv4",
+            {
+                "dhcp_server": (dhcp, "DHCPv4Server"),
+                "command": cluster.ConfigureDHCPv4_V3,
+            },
+        ),
+        (
+            "DHCPv6",
+            {
+                "dhcp_server": (dhcp, "DHCPv6Server"),
+                "command": cluster.ConfigureDHCPv6_V3,
+            },
+        ),
+    )
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def test_is_registered(self):
+        self.assertIsNotNone(
+            Cluster().locateResponder(self.command.commandName)
+        )
+
+    @inlineCallbacks
+    def test_executes_configure_dhcp(self):
+        DHCPServer = self.patch_autospec(*self.dhcp_server)
+        configure = self.patch_autospec(dhcp, "configure")
+
+        omapi_key = factory.make_name("key")
+        shared_networks = [make_shared_network(with_interface=True)]
+        host = make_host()
+        host["shared_network"] = shared_networks[0]["name"]
+        removed_shared_networks = [factory.make_name("vlan")]
+        interfaces = [make_interface()]
+
+        yield call_responder(
+            Cluster(),
+            self.command,
+            {
+                "omapi_key": omapi_key,
+                "failover_peers": [],
+                "shared_networks": shared_networks,
+                "hosts": [host],
+                "interfaces": interfaces,
+                "removed_shared_networks": removed_shared_networks,
+                "base_digest": "base",
+                "digest": "changed",
+            },
+        )
+
+        self.assertThat(DHCPServer, MockCalledOnceWith(omapi_key))
+        self.assertThat(
+            configure,
+            MockCalledOnceWith(
+                DHCPServer.return_value,
+                [],
+                shared_networks,
+                [host],
+                interfaces,
+                None,
+                removed_shared_networks=removed_shared_networks,
+                base_digest="base",
+                digest="changed",
+            ),
+        )
+
+    @inlineCallbacks
+    def test_propagates_DHCPConfigurationOutOfSync(self):
+        configure = self.patch_autospec(dhcp, "configure")
+        configure.side_effect = exceptions.DHCPConfigurationOutOfSync(
+            "Deliberate failure"
+        )
+
+        with ExpectedException(exceptions.DHCPConfigurationOutOfSync):
+            yield call_responder(
+                Cluster(),
+                self.command,
+                {
+                    "omapi_key": factory.make_name("key"),
+                    "failover_peers": [],
+                    "shared_networks": [],
+                    "hosts": [],
+                    "interfaces": [],
+                    "removed_shared_networks": [],
+                    "base_digest": "base",
+                    "digest": "changed",
+                },
+            )
+
+
 class TestClusterProtocol_ValidateDHCP(MAASTestCase):
 
     scenarios = (
@@ -4319,3 +4412,44 @@ class TestClusterProtocol_CheckIPs(MAASTestCaseThatWaitsForDeferredThreads):
                 }
             ),
         )
+
+
+class TestClusterProtocol_InvalidateBootConfigs(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def test_is_registered(self):
+        protocol = Cluster()
+        responder = protocol.locateResponder(
+            cluster.InvalidateBootConfigs.commandName
+        )
+        self.assertIsNotNone(responder)
+
+    @inlineCallbacks
+    def test_invalidates_boot_configs(self):
+        invalidate_boot_configs = self.patch(
+            clusterservice, "invalidate_boot_configs"
+        )
+        system_ids = [factory.make_name("system_id") for _ in range(3)]
+        response = yield call_responder(
+            Cluster(),
+            cluster.InvalidateBootConfigs,
+            {"system_ids": system_ids},
+        )
+        self.assertEqual({}, response)
+        invalidate_boot_configs.assert_called_once_with(
+            system_ids, unknown=False
+        )
+
+    @inlineCallbacks
+    def test_invalidates_boot_configs_of_unknown_machines(self):
+        invalidate_boot_configs = self.patch(
+            clusterservice, "invalidate_boot_configs"
+        )
+        response = yield call_responder(
+            Cluster(),
+            cluster.InvalidateBootConfigs,
+            {"system_ids": [], "unknown": True},
+        )
+        self.assertEqual({}, response)
+        invalidate_boot_configs.assert_called_once_with([], unknown=True)
@@ -6,6 +6,7 @@
 
 import copy
 from operator import itemgetter
+import os
 from unittest.mock import ANY, call, Mock, sentinel
 
 from fixtures import FakeLogger
@@ -433,6 +434,34 @@ class TestDHCPState(MAASTestCase):
             ),
         )
 
+    def test_merge_replaces_changed_shared_networks_and_hosts(self):
+        (
+            omapi_key,
+            failover_peers,
+            shared_networks,
+            hosts,
+            interfaces,
+            global_dhcp_snippets,
+        ) = self.make_args()
+        for shared_network, host in zip(shared_networks, hosts):
+            host["shared_network"] = shared_network["name"]
+        state = dhcp.DHCPState(
+            omapi_key,
+            failover_peers,
+            shared_networks,
+            hosts,
+            interfaces,
+            global_dhcp_snippets,
+        )
+        changed, removed, unchanged = shared_networks
+        changed = dict(changed, mtu=9000)
+        changed_host = make_host()
+        changed_host["shared_network"] = changed["name"]
+        self.assertEqual(
+            ([unchanged, changed], [hosts[2], changed_host]),
+            state.merge([changed], [removed["name"]], [changed_host]),
+        )
+
 
 class TestUpdateHosts(MAASTestCase):
     def test_creates_client_with_correct_arguments(self):
@@ -452,16 +481,16 @@ class TestUpdateHosts(MAASTestCase):
         self.assertEqual(
             omapi_cli.mock_calls,
             [
-                call.del_host(remove_host["mac"]),
-                call.add_host(add_host["mac"], add_host["ip"]),
-                call.update_host(modify_host["mac"], modify_host["ip"]),
+                call.del_hosts([remove_host["mac"]]),
+                call.add_hosts([(add_host["mac"], add_host["ip"])]),
+                call.update_hosts([(modify_host["mac"], modify_host["ip"])]),
             ],
         )
 
     def test_fail_remove(self):
         host = make_host()
         omapi_cli = Mock()
-        omapi_cli.del_host.side_effect = OmapiError("Fail")
+        omapi_cli.del_hosts.side_effect = OmapiError("Fail")
         self.patch(dhcp, "OmapiClient").return_value = omapi_cli
         err = self.assertRaises(
             exceptions.CannotRemoveHostMap,
@@ -476,7 +505,7 @@ class TestUpdateHosts(MAASTestCase):
     def test_fail_create(self):
         host = make_host()
         omapi_cli = Mock()
-        omapi_cli.add_host.side_effect = OmapiError("Fail")
+        omapi_cli.add_hosts.side_effect = OmapiError("Fail")
         self.patch(dhcp, "OmapiClient").return_value = omapi_cli
         err = self.assertRaises(
             exceptions.CannotCreateHostMap,
@@ -491,7 +520,7 @@ class TestUpdateHosts(MAASTestCase):
     def test_fail_modify(self):
         host = make_host()
         omapi_cli = Mock()
-        omapi_cli.update_host.side_effect = OmapiError("Fail")
+        omapi_cli.update_hosts.side_effect = OmapiError("Fail")
         self.patch(dhcp, "OmapiClient").return_value = omapi_cli
         err = self.assertRaises(
             exceptions.CannotModifyHostMap,
@@ -521,6 +550,7 @@ class TestConfigureDHCP(MAASTestCase):
         self.addCleanup(dhcp.service_monitor.getServiceByName("dhcpd6").off)
         # The dhcp server states are global so we clean them after each test.
         self.addCleanup(dhcp._current_server_state.clear)
+        self.addCleanup(dhcp._current_server_digest.clear)
         # Temporarily prevent hostname resolution when generating DHCP
         # configuration. This is tested elsewhere.
         self.useFixture(DHCPConfigNameResolutionDisabled())
@@ -553,6 +583,20 @@ class TestConfigureDHCP(MAASTestCase):
     def patch_sudo_write_file(self):
         return self.patch_autospec(dhcp, "sudo_write_file")
 
+    def patch_sudo_write_file_to_disk(self):
+        """Write the configuration files into a temporary directory."""
+        config_dir = self.make_dir()
+        for name in ("config_filename", "interfaces_filename"):
+            self.patch(self.server, name, os.path.join(config_dir, name))
+
+        def write_file(filename, contents, mode=0o644):
+            with open(filename, "wb") as fd:
+                fd.write(contents)
+
+        sudo_write_file = self.patch_sudo_write_file()
+        sudo_write_file.side_effect = write_file
+        return sudo_write_file
+
     def patch_restartService(self):
         return self.patch(dhcp.service_monitor, "restartService")
 
@@ -1109,6 +1153,237 @@ class TestConfigureDHCP(MAASTestCase):
             logger.output,
         )
 
+    @inlineCallbacks
+    def test_merges_changes_into_current_state(self):
+        self.patch_sudo_write_file()
+        self.patch_restartService()
+        self.patch_get_config().return_value = factory.make_name("config")
+        dhcp_service = dhcp.service_monitor.getServiceByName(
+            self.server.dhcp_service
+        )
+        self.patch_autospec(dhcp_service, "on")
+
+        omapi_key = factory.make_name("omapi_key")
+        shared_networks = [make_shared_network() for _ in range(2)]
+        hosts = [make_host(), make_host()]
+        for shared_network, host in zip(shared_networks, hosts):
+            host["shared_network"] = shared_network["name"]
+        interface = make_interface()
+        yield dhcp.configure(
+            self.server(omapi_key),
+            [],
+            shared_networks,
+            hosts,
+            [interface],
+            digest="base",
+        )
+        changed_shared_network = make_shared_network()
+        changed_host = make_host()
+        changed_host["shared_network"] = changed_shared_network["name"]
+        yield dhcp.configure(
+            self.server(omapi_key),
+            [],
+            [changed_shared_network],
+            [changed_host],
+            [interface],
+            removed_shared_networks=[shared_networks[0]["name"]],
+            base_digest="base",
+            digest="changed",
+        )
+
+        self.assertEquals(
+            dhcp._current_server_state[self.server.dhcp_service],
+            dhcp.DHCPState(
+                omapi_key,
+                [],
+                [shared_networks[1], changed_shared_network],
+                [hosts[1], changed_host],
+                [interface],
+                [],
+            ),
+        )
+        self.assertEquals(
+            "changed", dhcp._current_server_digest[self.server.dhcp_service]
+        )
+
+    @inlineCallbacks
+    def test_raises_DHCPConfigurationOutOfSync_for_other_base_digest(self):
+        write_file = self.patch_sudo_write_file()
+        old_state = dhcp.DHCPState(
+            factory.make_name("omapi_key"),
+            [],
+            [make_shared_network()],
+            [make_host()],
+            [make_interface()],
+            [],
+        )
+        dhcp._current_server_state[self.server.dhcp_service] = old_state
+        dhcp._current_server_digest[self.server.dhcp_service] = "current"
+
+        with ExpectedException(exceptions.DHCPConfigurationOutOfSync):
+            yield dhcp.configure(
+                self.server(old_state.omapi_key),
+                [],
+                [make_shared_network()],
+                [],
+                [make_interface()],
+                removed_shared_networks=[],
+                base_digest="other",
+                digest="changed",
+            )
+        self.assertThat(write_file, MockNotCalled())
+        self.assertIs(
+            old_state, dhcp._current_server_state[self.server.dhcp_service]
+        )
+
+    @inlineCallbacks
+    def test_carries_on_from_saved_state_after_restart(self):
+        self.patch_sudo_write_file_to_disk()
+        restart_service = self.patch_restartService()
+        ensure_service = self.patch_ensureService()
+        self.patch_get_config().return_value = factory.make_name("config")
+        dhcp_service = dhcp.service_monitor.getServiceByName(
+            self.server.dhcp_service
+        )
+        self.patch_autospec(dhcp_service, "on")
+
+        omapi_key = factory.make_name("omapi_key")
+        shared_network = make_shared_network()
+        host = make_host()
+        host["shared_network"] = shared_network["name"]
+        interface = make_interface()
+        yield dhcp.configure(
+            self.server(omapi_key),
+            [],
+            [shared_network],
+            [host],
+            [interface],
+            digest="base",
+        )
+        state = dhcp._current_server_state[self.server.dhcp_service]
+        # The rack controller restarts.
+        dhcp._current_server_state.clear()
+        dhcp._current_server_digest.clear()
+        yield dhcp.configure(
+            self.server(omapi_key),
+            [],
+            [],
+            [],
+            [interface],
+            removed_shared_networks=[],
+            base_digest="base",
+            digest="base",
+        )
+
+        self.assertThat(
+            restart_service, MockCalledOnceWith(self.server.dhcp_service)
+        )
+        self.assertThat(
+            ensure_service, MockCalledOnceWith(self.server.dhcp_service)
+        )
+        self.assertEquals(
+            state, dhcp._current_server_state[self.server.dhcp_service]
+        )
+
+    @inlineCallbacks
+    def test_ignores_saved_state_that_renders_differently(self):
+        self.patch_sudo_write_file_to_disk()
+        self.patch_restartService()
+        get_config = self.patch_get_config()
+        get_config.return_value = factory.make_name("config")
+        dhcp_service = dhcp.service_monitor.getServiceByName(
+            self.server.dhcp_service
+        )
+        self.patch_autospec(dhcp_service, "on")
+        server = self.server(factory.make_name("omapi_key"))
+        yield dhcp.configure(
+            server,
+            [],
+            [make_shared_network()],
+            [make_host()],
+            [make_interface()],
+            digest="base",
+        )
+        self.assertEqual(
+            (dhcp._current_server_state[server.dhcp_service], "base"),
+            dhcp._read_state(server),
+        )
+        get_config.return_value = factory.make_name("config")
+        self.assertEqual((None, None), dhcp._read_state(server))
+
+    @inlineCallbacks
+    def test_ignores_saved_state_if_config_file_changed(self):
+        self.patch_sudo_write_file_to_disk()
+        self.patch_restartService()
+        self.patch_get_config().return_value = factory.make_name("config")
+        dhcp_service = dhcp.service_monitor.getServiceByName(
+            self.server.dhcp_service
+        )
+        self.patch_autospec(dhcp_service, "on")
+        server = self.server(factory.make_name("omapi_key"))
+        yield dhcp.configure(
+            server,
+            [],
+            [make_shared_network()],
+            [make_host()],
+            [make_interface()],
+            digest="base",
+        )
+        self.assertEqual(
+            (dhcp._current_server_state[server.dhcp_service], "base"),
+            dhcp._read_state(server),
+        )
+        # The configuration file is edited after the rack controller stops.
+        with open(server.config_filename, "a") as fd:
+            fd.write("# Edited.\n")
+        self.assertEqual((None, None), dhcp._read_state(server))
+
+    @inlineCallbacks
+    def test_ignores_saved_state_if_config_file_missing(self):
+        self.patch_sudo_write_file_to_disk()
+        self.patch_restartService()
+        self.patch_get_config().return_value = factory.make_name("config")
+        dhcp_service = dhcp.service_monitor.getServiceByName(
+            self.server.dhcp_service
+        )
+        self.patch_autospec(dhcp_service, "on")
+        server = self.server(factory.make_name("omapi_key"))
+        yield dhcp.configure(
+            server,
+            [],
+            [make_shared_network()],
+            [make_host()],
+            [make_interface()],
+            digest="base",
+        )
+        os.remove(server.interfaces_filename)
+        self.assertEqual((None, None), dhcp._read_state(server))
+
+    def test_ignores_corrupt_saved_state(self):
+        server = self.server(factory.make_name("omapi_key"))
+        with open(server.state_filename, "w") as fd:
+            fd.write("{")
+        with FakeLogger("maas") as logger:
+            self.assertEqual((None, None), dhcp._read_state(server))
+        self.assertDocTestMatches(
+            "Ignoring saved DHCPv... server state: ...", logger.output
+        )
+
+    @inlineCallbacks
+    def test_stopping_deletes_saved_state(self):
+        self.patch_os_exists().return_value = False
+        dhcp_service = dhcp.service_monitor.getServiceByName(
+            self.server.dhcp_service
+        )
+        self.patch_autospec(dhcp_service, "off")
+        self.patch_ensureService()
+        server = self.server(factory.make_name("omapi_key"))
+        with open(server.state_filename, "w") as fd:
+            fd.write("{}")
+        yield dhcp.configure(server, [], [], [], [], [])
+        # os.path.exists is patched.
+        self.assertRaises(FileNotFoundError, os.stat, server.state_filename)
+
     @inlineCallbacks
     def test_converts_failure_writing_file_to_CannotConfigureDHCP(self):
         self.patch_sudo_delete_file()
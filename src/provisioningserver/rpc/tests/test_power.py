@@ -56,7 +56,9 @@ from provisioningserver.testing.events import EventTypesAllRegistered
 def suppress_reporting(test):
     # Skip telling the region; just pass-through the query result.
     report_power_state = test.patch(power, "report_power_state")
-    report_power_state.side_effect = lambda d, system_id, hostname: d
+    report_power_state.side_effect = (
+        lambda d, system_id, hostname, reports=None: d
+    )
 
 
 class TestPowerHelpers(MAASTestCase):
@@ -1070,7 +1072,7 @@ class TestPowerQueryAsync(MAASTestCase):
         get_power_state = self.patch(power, "get_power_state")
         get_power_state.side_effect = queries
         report_power_state = self.patch(power, "report_power_state")
-        report_power_state.side_effect = lambda d, sid, hn: d
+        report_power_state.side_effect = lambda d, sid, hn, reports=None: d
 
         yield power.query_all_nodes(nodes)
         self.assertThat(
@@ -1092,7 +1094,12 @@ class TestPowerQueryAsync(MAASTestCase):
             report_power_state,
             MockCallsMatch(
                 *(
-                    call(query, node["system_id"], node["hostname"])
+                    call(
+                        query,
+                        node["system_id"],
+                        node["hostname"],
+                        reports=ANY,
+                    )
                     for query, node in zip(queries, nodes)
                 )
             ),
@@ -1288,3 +1295,283 @@ class TestPowerQueryAsync(MAASTestCase):
             [(True, node1["power_state"]), (True, node2["power_state"])],
             results,
         )
+
+
+class TestPowerStateReports(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def setUp(self):
+        super().setUp()
+        self.useFixture(EventTypesAllRegistered())
+
+    @inlineCallbacks
+    def patch_rpc_methods(self, *commands):
+        fixture = self.useFixture(MockLiveClusterToRegionRPCFixture())
+        protocol, connecting = fixture.makeEventLoop(*commands)
+        self.addCleanup((yield connecting))
+        returnValue(protocol)
+
+    def make_reports(self, count=3):
+        reports = power.PowerStateReports()
+        for _ in range(count):
+            reports.add(
+                factory.make_name("system_id"),
+                factory.make_name("hostname"),
+                random.choice(["on", "off"]),
+            )
+        return reports
+
+    @inlineCallbacks
+    def test_send_calls_UpdateNodePowerStates_in_batches(self):
+        protocol = yield self.patch_rpc_methods(region.UpdateNodePowerStates)
+        protocol.UpdateNodePowerStates.return_value = {"missing": []}
+        reports = self.make_reports(3)
+        reports.batch_size = 2
+        states = list(reports.states)
+        yield reports.send()
+        self.assertThat(
+            protocol.UpdateNodePowerStates,
+            MockCallsMatch(
+                call(protocol, states=states[:2]),
+                call(protocol, states=states[2:]),
+            ),
+        )
+        self.assertEqual([], reports.states)
+
+    @inlineCallbacks
+    def test_send_includes_query_errors(self):
+        protocol = yield self.patch_rpc_methods(region.UpdateNodePowerStates)
+        protocol.UpdateNodePowerStates.return_value = {"missing": []}
+        reports = power.PowerStateReports()
+        system_id = factory.make_name("system_id")
+        error = factory.make_name("error")
+        reports.add(system_id, factory.make_name("hostname"), "error", error)
+        yield reports.send()
+        self.assertThat(
+            protocol.UpdateNodePowerStates,
+            MockCalledOnceWith(
+                protocol,
+                states=[
+                    {
+                        "system_id": system_id,
+                        "power_state": "error",
+                        "error": error,
+                    }
+                ],
+            ),
+        )
+
+    @inlineCallbacks
+    def test_send_falls_back_to_UpdateNodePowerState(self):
+        protocol = yield self.patch_rpc_methods(
+            region.UpdateNodePowerState, region.SendEvent
+        )
+        reports = self.make_reports(2)
+        error = factory.make_name("error")
+        reports.add(
+            factory.make_name("system_id"),
+            factory.make_name("hostname"),
+            "error",
+            error,
+        )
+        states = list(reports.states)
+        yield reports.send()
+        self.assertThat(
+            protocol.UpdateNodePowerState,
+            MockCallsMatch(
+                *(
+                    call(
+                        protocol,
+                        system_id=state["system_id"],
+                        power_state=state["power_state"],
+                    )
+                    for state in states
+                )
+            ),
+        )
+        self.assertThat(
+            protocol.SendEvent,
+            MockCalledOnceWith(
+                protocol,
+                system_id=states[2]["system_id"],
+                type_name=EVENT_TYPES.NODE_POWER_QUERY_FAILED,
+                description=error,
+            ),
+        )
+
+    @inlineCallbacks
+    def test_send_logs_failures(self):
+        protocol = yield self.patch_rpc_methods(region.UpdateNodePowerStates)
+        protocol.UpdateNodePowerStates.side_effect = always_fail_with(
+            ZeroDivisionError()
+        )
+        reports = self.make_reports(1)
+        with FakeLogger("maas.power") as maaslog, TwistedLoggerFixture():
+            yield reports.send()
+        self.assertDocTestMatches(
+            "Failed to report nodes' power states: ...", maaslog.output
+        )
+
+    @inlineCallbacks
+    def test_query_all_nodes_reports_power_states_together(self):
+        send = self.patch(power.PowerStateReports, "send")
+        nodes = [
+            {
+                "context": {},
+                "hostname": factory.make_name("hostname"),
+                "power_state": "on",
+                "power_type": "virsh",
+                "system_id": factory.make_name("system_id"),
+            }
+            for _ in range(3)
+        ]
+        get_power_state = self.patch(power, "get_power_state")
+        get_power_state.side_effect = [succeed("off") for _ in nodes]
+        power_state_update = self.patch(power, "power_state_update")
+        yield power.query_all_nodes(nodes)
+        self.assertThat(send, MockCalledOnceWith())
+        self.assertThat(power_state_update, MockNotCalled())
+
+
+class TestPowerQueryScheduler(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def make_scheduler(self):
+        return power.PowerQueryScheduler(Clock())
+
+    def acquire(self, scheduler, power_type, count):
+        return [scheduler.acquire(power_type) for _ in range(count)]
+
+    def test_limits_concurrent_queries_per_power_type(self):
+        scheduler = self.make_scheduler()
+        limit = scheduler.initial_concurrency
+        ipmi = self.acquire(scheduler, "ipmi", limit + 1)
+        redfish = self.acquire(scheduler, "redfish", 1)
+        self.assertEqual([True] * limit + [False], [d.called for d in ipmi])
+        self.assertTrue(redfish[0].called)
+        self.assertEqual(1, scheduler.backlog)
+        self.assertEqual(
+            {"ipmi": limit, "redfish": limit}, scheduler.concurrency
+        )
+
+    def test_release_starts_waiting_query(self):
+        scheduler = self.make_scheduler()
+        limit = scheduler.initial_concurrency
+        queries = self.acquire(scheduler, "ipmi", limit + 1)
+        self.assertEqual("on", extract_result(queries[0])("on"))
+        self.assertTrue(queries[-1].called)
+        self.assertEqual(0, scheduler.backlog)
+
+    def test_raises_limit_while_queries_are_waiting(self):
+        scheduler = self.make_scheduler()
+        limit = scheduler.initial_concurrency
+        queries = self.acquire(scheduler, "ipmi", limit * 3)
+        for query in queries[:limit]:
+            extract_result(query)("on")
+        self.assertEqual({"ipmi": limit + 1}, scheduler.concurrency)
+
+    def test_does_not_raise_limit_when_no_queries_are_waiting(self):
+        scheduler = self.make_scheduler()
+        limit = scheduler.initial_concurrency
+        queries = self.acquire(scheduler, "ipmi", limit)
+        for query in queries:
+            extract_result(query)("on")
+        self.assertEqual({"ipmi": limit}, scheduler.concurrency)
+
+    def test_halves_limit_for_slow_queries(self):
+        scheduler = self.make_scheduler()
+        scheduler.smoothing = 1
+        queries = self.acquire(scheduler, "ipmi", 2)
+        scheduler.clock.advance(scheduler.target_latency + 1)
+        extract_result(queries[0])("on")
+        self.assertEqual(
+            {"ipmi": scheduler.initial_concurrency // 2},
+            scheduler.concurrency,
+        )
+
+    def test_halves_limit_for_failing_queries(self):
+        scheduler = self.make_scheduler()
+        scheduler.smoothing = 1
+        queries = self.acquire(scheduler, "ipmi", 1)
+        extract_result(queries[0])(Failure(PowerError()))
+        self.assertEqual(
+            {"ipmi": scheduler.initial_concurrency // 2},
+            scheduler.concurrency,
+        )
+
+    def test_halves_limit_once_for_queries_in_progress(self):
+        scheduler = self.make_scheduler()
+        scheduler.smoothing = 1
+        limit = scheduler.initial_concurrency
+        queries = self.acquire(scheduler, "ipmi", limit)
+        for query in queries:
+            extract_result(query)(Failure(PowerError()))
+        self.assertEqual({"ipmi": limit // 2}, scheduler.concurrency)
+        # Queries started since then lower it again.
+        scheduler.clock.advance(1)
+        queries = self.acquire(scheduler, "ipmi", 1)
+        extract_result(queries[0])(Failure(PowerError()))
+        self.assertEqual({"ipmi": limit // 4}, scheduler.concurrency)
+
+    def test_does_not_adapt_limit_for_skipped_queries(self):
+        scheduler = self.make_scheduler()
+        scheduler.smoothing = 1
+        queries = self.acquire(scheduler, "ipmi", 1)
+        scheduler.clock.advance(scheduler.target_latency + 1)
+        self.assertIsNone(extract_result(queries[0])(None))
+        self.assertEqual(
+            {"ipmi": scheduler.initial_concurrency}, scheduler.concurrency
+        )
+
+    def test_start_cycle_spreads_queries_across_interval(self):
+        scheduler = self.make_scheduler()
+        scheduler.start_cycle(4, 8)
+        queries = self.acquire(scheduler, "ipmi", 4)
+        started = []
+        for _ in range(4):
+            started.append(sum(d.called for d in queries))
+            scheduler.clock.advance(2)
+        self.assertEqual([1, 2, 3, 4], started)
+
+    def test_start_cycle_does_not_pace_queries_beyond_interval(self):
+        scheduler = self.make_scheduler()
+        scheduler.start_cycle(2, 8)
+        queries = self.acquire(scheduler, "ipmi", 4)
+        self.assertEqual(
+            [True, False, True, True], [d.called for d in queries]
+        )
+        scheduler.clock.advance(4)
+        self.assertTrue(queries[1].called)
+
+    @inlineCallbacks
+    def test_query_all_nodes_waits_for_scheduler(self):
+        scheduler = self.make_scheduler()
+        acquire = self.patch(scheduler, "acquire")
+        release = acquire.return_value = Deferred()
+        nodes = [
+            {
+                "context": {},
+                "hostname": factory.make_name("hostname"),
+                "power_state": "on",
+                "power_type": "virsh",
+                "system_id": factory.make_name("system_id"),
+            }
+        ]
+        get_power_state = self.patch(power, "get_power_state")
+        get_power_state.return_value = succeed("off")
+        self.patch(power.PowerStateReports, "send")
+
+        d = power.query_all_nodes(nodes, scheduler=scheduler)
+        self.assertThat(acquire, MockCalledOnceWith("virsh"))
+        self.assertThat(get_power_state, MockNotCalled())
+
+        outcomes = []
+        release.callback(lambda outcome: outcomes.append(outcome) or outcome)
+        yield d
+        self.assertThat(
+            get_power_state,
+            MockCalledOnceWith(ANY, ANY, ANY, ANY, clock=reactor),
+        )
+        self.assertEqual(["off"], outcomes)
@@ -8,6 +8,7 @@ from collections import OrderedDict
 from functools import partial
 import http.client
 import json
+from time import time
 import urllib.error
 import urllib.parse
 import urllib.request
@@ -280,6 +281,38 @@ def gen_node_details(client, batches):
             yield system_id, merge_details(details)
 
 
+def match_nodes(tag_definition, tag_nsmap, details_by_system_id):
+    """Evaluate a tag against the details of nodes.
+
+    This only takes and returns plain data, so that it can be run in another
+    process.
+
+    :param tag_definition: The XPath expression of the tag.
+    :param tag_nsmap: The namespaces to compile the expression with.
+    :param details_by_system_id: A dict mapping system IDs to node details,
+        as accepted by `merge_details`.
+    :return: A ``(matched, unmatched, latencies)`` tuple, where `matched`
+        and `unmatched` are lists of system IDs, and `latencies` lists the
+        time taken to evaluate the tag against each node, in seconds.
+    """
+    xpath = etree.XPath(tag_definition, namespaces=tag_nsmap)
+    node_details = (
+        (system_id, merge_details(details))
+        for system_id, details in details_by_system_id.items()
+    )
+    latencies = []
+
+    def match(doc):
+        before = time()
+        try:
+            return try_match_xpath(xpath, doc, logger=maaslog)
+        finally:
+            latencies.append(time() - before)
+
+    matched, unmatched = classify(match, node_details)
+    return matched, unmatched, latencies
+
+
 def process_all(
     client,
     rack_id,
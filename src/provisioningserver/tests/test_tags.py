@@ -372,6 +372,40 @@ class TestMergeDetails(TestMergeDetailsCleanly):
         )
 
 
+class TestMatchNodes(MAASTestCase):
+    def test_returns_matched_and_unmatched_system_ids(self):
+        details_by_system_id = {
+            "node-1": {"lshw": b"<foo/>", "lldp": None},
+            "node-2": {"lshw": b"<bar/>", "lldp": None},
+            "node-3": {"lshw": None, "lldp": b"<foo/>"},
+        }
+        matched, unmatched, _ = tags.match_nodes(
+            "/foo", {}, details_by_system_id
+        )
+        self.assertEqual(["node-1"], matched)
+        self.assertEqual(["node-2", "node-3"], unmatched)
+
+    def test_compiles_definition_with_nsmap(self):
+        details_by_system_id = {
+            "node-1": {"lshw": None, "lldp": b"<foo/>"},
+            "node-2": {"lshw": b"<foo/>", "lldp": None},
+        }
+        matched, unmatched, _ = tags.match_nodes(
+            "//lldp:foo", {"lldp": "lldp"}, details_by_system_id
+        )
+        self.assertEqual(["node-1"], matched)
+        self.assertEqual(["node-2"], unmatched)
+
+    def test_returns_evaluation_latency_of_each_node(self):
+        self.patch(tags, "time").side_effect = [1.0, 1.5, 2.0, 4.0]
+        details_by_system_id = {
+            "node-1": {"lshw": b"<foo/>", "lldp": None},
+            "node-2": {"lshw": b"<bar/>", "lldp": None},
+        }
+        _, _, latencies = tags.match_nodes("/foo", {}, details_by_system_id)
+        self.assertEqual([0.5, 2.0], latencies)
+
+
 class TestGenBatchSlices(MAASTestCase):
     def test_batch_of_1_no_things(self):
         self.assertSequenceEqual([], list(tags.gen_batch_slices(0, 1)))
@@ -3,6 +3,7 @@
 
 """Generic helpers for `netaddr` and network-related types."""
 
+from bisect import bisect_left, bisect_right, insort
 import codecs
 from collections import namedtuple
 import json
@@ -598,6 +599,89 @@ class MAASIPSet(set):
         return "%s(%s)" % (self.__class__.__name__, item_repr)
 
 
+class FreeIPIndex:
+    """Index of the free addresses in a network, for allocating them one at
+    a time.
+
+    The free addresses are kept as disjoint ranges, sorted both by their
+    first address and by their size. Finding the range an address is in, or
+    the smallest range, takes O(log n) comparisons for n ranges. Removing an
+    address splits its range, which inserts into and deletes from sorted
+    lists in O(n) time, but that is still much cheaper than recomputing the
+    free ranges for each address picked.
+    """
+
+    def __init__(self, free_ranges: Iterable[IPRange], version: int = 4):
+        self.version = version
+        # The first address of each range, sorted.
+        self._firsts = []
+        # The last address of each range, keyed by its first address.
+        self._lasts = {}
+        # (size, first address) of each range, sorted.
+        self._sizes = []
+        for free_range in free_ranges:
+            self._add_range(free_range.first, free_range.last)
+
+    def __len__(self):
+        """Return the number of free ranges."""
+        return len(self._firsts)
+
+    def __contains__(self, ip):
+        ip = IPAddress(ip)
+        return ip.version == self.version and self._find(int(ip)) is not None
+
+    def _find(self, ip: int) -> Optional[int]:
+        """Return the first address of the range containing `ip`, if any."""
+        index = bisect_right(self._firsts, ip) - 1
+        if index >= 0:
+            first = self._firsts[index]
+            if ip <= self._lasts[first]:
+                return first
+        return None
+
+    def _add_range(self, first: int, last: int):
+        insort(self._firsts, first)
+        self._lasts[first] = last
+        insort(self._sizes, (last - first + 1, first))
+
+    def _remove_range(self, first: int) -> int:
+        last = self._lasts.pop(first)
+        del self._firsts[bisect_left(self._firsts, first)]
+        del self._sizes[bisect_left(self._sizes, (last - first + 1, first))]
+        return last
+
+    def get_next_ip(self) -> Optional[IPAddress]:
+        """Return the first address of the smallest free range.
+
+        Picking from the smallest range keeps the larger ones available for
+        applications that need them. Of ranges the same size, the lowest one
+        is picked. Returns `None` if there are no free addresses.
+        """
+        if len(self._sizes) == 0:
+            return None
+        _, first = self._sizes[0]
+        return IPAddress(first, self.version)
+
+    def remove(self, ip) -> bool:
+        """Remove `ip` from the free addresses.
+
+        :return: Whether `ip` was free.
+        """
+        ip = IPAddress(ip)
+        if ip.version != self.version:
+            return False
+        ip = int(ip)
+        first = self._find(ip)
+        if first is None:
+            return False
+        last = self._remove_range(first)
+        if first < ip:
+            self._add_range(first, ip - 1)
+        if ip < last:
+            self._add_range(ip + 1, last)
+        return True
+
+
 def make_ipaddress(input: Optional[MaybeIPAddress]) -> Optional[IPAddress]:
     """Returns an `IPAddress` object for the specified input.
 
@@ -6,6 +6,7 @@
 
 import itertools
 import json
+from operator import attrgetter
 import random
 import socket
 from socket import EAI_BADFLAGS, EAI_NODATA, EAI_NONAME, gaierror, IPPROTO_TCP
@@ -59,6 +60,7 @@ from provisioningserver.utils.network import (
     find_ip_via_arp,
     find_mac_via_arp,
     format_eui,
+    FreeIPIndex,
     generate_mac_address,
     get_all_addresses_for_interface,
     get_all_interface_addresses,
@@ -930,6 +932,81 @@ class TestMAASIPSet(MAASTestCase):
         self.assertThat(str(IPAddress(s1.last)), Equals("10.0.0.8"))
 
 
+class TestFreeIPIndex(MAASTestCase):
+    def make_index(self, *ranges):
+        return FreeIPIndex(
+            make_iprange(first, last) for first, last in ranges
+        )
+
+    def test_contains_free_addresses(self):
+        index = self.make_index(("10.0.0.1", "10.0.0.10"))
+        self.assertIn("10.0.0.1", index)
+        self.assertIn(IPAddress("10.0.0.10"), index)
+        self.assertNotIn("10.0.0.11", index)
+        self.assertNotIn("10.0.0.0", index)
+
+    def test_get_next_ip_returns_first_of_smallest_range(self):
+        index = self.make_index(
+            ("10.0.0.1", "10.0.0.10"),
+            ("10.0.0.20", "10.0.0.22"),
+            ("10.0.0.30", "10.0.0.40"),
+        )
+        self.assertEqual(IPAddress("10.0.0.20"), index.get_next_ip())
+
+    def test_get_next_ip_returns_lowest_of_equal_ranges(self):
+        index = self.make_index(
+            ("10.0.0.20", "10.0.0.22"), ("10.0.0.1", "10.0.0.3")
+        )
+        self.assertEqual(IPAddress("10.0.0.1"), index.get_next_ip())
+
+    def test_get_next_ip_returns_None_without_free_addresses(self):
+        self.assertIsNone(self.make_index().get_next_ip())
+
+    def test_get_next_ip_returns_ipv6_address(self):
+        index = FreeIPIndex([make_iprange("::10", "::20")], version=6)
+        self.assertEqual(IPAddress("::10"), index.get_next_ip())
+
+    def test_remove_splits_range(self):
+        index = self.make_index(("10.0.0.1", "10.0.0.10"))
+        self.assertTrue(index.remove("10.0.0.4"))
+        self.assertNotIn("10.0.0.4", index)
+        self.assertIn("10.0.0.3", index)
+        self.assertIn("10.0.0.5", index)
+        self.assertEqual(2, len(index))
+        self.assertEqual(IPAddress("10.0.0.1"), index.get_next_ip())
+
+    def test_remove_empties_range(self):
+        index = self.make_index(
+            ("10.0.0.1", "10.0.0.1"), ("10.0.0.5", "10.0.0.10")
+        )
+        index.remove("10.0.0.1")
+        self.assertEqual(1, len(index))
+        self.assertEqual(IPAddress("10.0.0.5"), index.get_next_ip())
+
+    def test_remove_ignores_addresses_in_use(self):
+        index = self.make_index(("10.0.0.1", "10.0.0.10"))
+        self.assertFalse(index.remove("10.0.0.11"))
+        self.assertFalse(index.remove("::a00:1"))
+        self.assertEqual(1, len(index))
+
+    def test_picks_same_addresses_as_maasipset(self):
+        network = IPNetwork("10.0.0.0/24")
+        in_use = {
+            IPAddress(network.first + random.randint(1, 254))
+            for _ in range(50)
+        }
+        index = FreeIPIndex(MAASIPSet(in_use).get_unused_ranges(network))
+        for _ in range(20):
+            free_ranges = MAASIPSet(in_use).get_unused_ranges(network)
+            expected = min(
+                free_ranges, key=attrgetter("num_addresses", "first")
+            )
+            next_ip = index.get_next_ip()
+            self.assertEqual(IPAddress(expected.first), next_ip)
+            index.remove(next_ip)
+            in_use.add(next_ip)
+
+
 class TestIPRangeStatistics(MAASTestCase):
     def test_statistics_are_accurate(self):
         s = MAASIPSet(["10.0.0.2", "10.0.0.4", "10.0.0.6", "10.0.0.8"])